@@ -1,11 +1,17 @@
 import os
+import sys
 import json
 import logging
-import requests
 import time
 import base64
 import hashlib
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
+from pathlib import Path
+
+# Add the project root to the path so the shared HTTP transport can be imported
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+from server.utils.http_transport import HTTPTransport
 
 # Configure logging
 logging.basicConfig(
@@ -18,6 +24,9 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Albums fetched at once by sync_recent_plays
+FETCH_WORKERS = 4
+
 class NavidromeSync:
     """Class to sync data with Navidrome music server."""
     
@@ -35,6 +44,8 @@ class NavidromeSync:
         self.token = None
         self.salt = None
         self.token_expiry = None
+        # One keep-alive connection serves every call of a sync run
+        self.http = HTTPTransport(timeout=int(os.getenv('REQUEST_TIMEOUT', '30')))
         
         # Create necessary directories
         os.makedirs('logs', exist_ok=True)
@@ -48,7 +59,7 @@ class NavidromeSync:
         try:
             auth_url = f"{self.base_url}/rest/ping"
             
-            response = requests.get(auth_url, params={
+            response = self.http.get(auth_url, params={
                 "u": self.username,
                 "p": self.password,
                 "v": "1.16.1",  # Subsonic API version
@@ -66,7 +77,7 @@ class NavidromeSync:
                 
                 # Get salt and token for further requests
                 auth_url = f"{self.base_url}/rest/getUser"
-                response = requests.get(auth_url, params={
+                response = self.http.get(auth_url, params={
                     "u": self.username,
                     "p": self.password,
                     "v": "1.16.1",
@@ -133,7 +144,7 @@ class NavidromeSync:
         url = f"{self.base_url}/rest/{endpoint}"
         
         try:
-            response = requests.get(url, params=params)
+            response = self.http.get(url, params=params)
             
             if response.status_code != 200:
                 logger.error(f"API request failed with status code {response.status_code}")
@@ -184,15 +195,20 @@ class NavidromeSync:
         albums = response.get('albumList', {}).get('album', [])
         
         recent_songs = []
-        
-        # For each album, get the songs
-        for album in albums[:10]:  # Limit to 10 albums to avoid too many requests
-            album_id = album.get('id')
-            if album_id:
-                album_response = self.make_request("getAlbum", {"id": album_id})
+        album_ids = [album['id'] for album in albums[:10] if album.get('id')]  # Limit to 10 albums to avoid too many requests
+        
+        # Fetch the albums concurrently, stopping once enough songs are in.
+        # With a fixed pool, albums still queued when we stop are cancelled.
+        with ThreadPoolExecutor(max_workers=min(FETCH_WORKERS, len(album_ids)) or 1) as executor:
+            futures = [executor.submit(self.make_request, "getAlbum", {"id": album_id}) for album_id in album_ids]
+            for future in futures:
+                album_response = future.result()
                 if album_response:
-                    songs = album_response.get('album', {}).get('song', [])
-                    recent_songs.extend(songs)
+                    recent_songs.extend(album_response.get('album', {}).get('song', []))
+                if len(recent_songs) >= limit:
+                    break
+            for future in futures:
+                future.cancel()
         
         # Limit to the requested number
         recent_songs = recent_songs[:limit]
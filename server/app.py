@@ -1,6 +1,7 @@
 import os
 import json
 import logging
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from flask import Flask, request, jsonify, render_template, send_from_directory
 from flask_cors import CORS
@@ -25,6 +26,11 @@ from server.routes.dj_announcements import dj_announcements
 from server.routes.dj_interaction import dj_interaction, init_clients as init_dj_interaction
 from server.routes.music_selection import music_selection
 from server.routes.settings import settings
+from server.utils.tts_cache import TTSCache, audio_url
+from server.utils.completion_cache import CompletionCache, parse_ttls
+from server.utils.http_transport import configure_default_transport
+from server.utils.library_mirror import LibraryMirror
+from server.utils.llm_dispatcher import LLMDispatcher
 
 # Load environment variables
 load_dotenv()
@@ -53,6 +59,29 @@ app.register_blueprint(settings, url_prefix='/api')
 # Initialize configuration
 config = Config()
 
+# Synthesized speech shared by every endpoint that produces audio
+tts_cache = TTSCache(max_bytes=config.tts_cache_max_mb * 1024 * 1024)
+
+# Completions for deterministic prompts such as song info
+completion_cache = None
+if config.llm_cache:
+    completion_cache = CompletionCache(config.llm_cache_path, ttls=parse_ttls(config.llm_cache_ttls))
+
+# Keep-alive connection pools and timeouts shared by every integration client
+http_transport = configure_default_transport(timeout=config.request_timeout,
+                                             connect_timeout=config.http_connect_timeout,
+                                             retries=config.http_retries,
+                                             pool_size=config.http_pool_size)
+
+# Local copy of the Navidrome library, if enabled
+library_mirror = None
+
+# Orders LLM calls by priority and caps how many run at once
+llm_dispatcher = LLMDispatcher(max_concurrent=config.max_concurrent_requests)
+
+# Runs independent upstream calls of one request side by side
+background_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix='upstream')
+
 # Global error handlers
 @app.errorhandler(404)
 def not_found_error(error):
@@ -81,16 +110,18 @@ try:
         ollama_model = os.getenv('OLLAMA_MODEL')
         if not ollama_model:
             raise MusicServiceError('OLLAMA_MODEL not specified', 'Ollama')
-        openai_client = LLMClient(provider='ollama', model=ollama_model)
+        openai_client = LLMClient(provider='ollama', model=ollama_model,
+                                  completion_cache=completion_cache, dispatcher=llm_dispatcher)
     else:
         openai_api_key = os.getenv('OPENAI_API_KEY')
         validate_api_key(openai_api_key, 'OpenAI')
-        openai_client = LLMClient(provider='openai', api_key=openai_api_key)
+        openai_client = LLMClient(provider='openai', api_key=openai_api_key,
+                                  completion_cache=completion_cache, dispatcher=llm_dispatcher)
     
     # Initialize ElevenLabs client
     elevenlabs_api_key = os.getenv('ELEVENLABS_API_KEY')
     validate_api_key(elevenlabs_api_key, 'ElevenLabs')
-    elevenlabs_client = ElevenLabsClient(api_key=elevenlabs_api_key)
+    elevenlabs_client = ElevenLabsClient(tts_cache=tts_cache)
     
     # Initialize Navidrome client with validation
     navidrome_url = os.getenv('NAVIDROME_URL')
@@ -100,7 +131,17 @@ try:
     if not all([navidrome_url, navidrome_username, navidrome_password]):
         raise MusicServiceError("Missing Navidrome credentials", "Navidrome")
     
-    navidrome_client = NavidromeClient(navidrome_url, navidrome_username, navidrome_password)
+    navidrome_client = NavidromeClient(navidrome_url, navidrome_username, navidrome_password,
+                                       cache_size=config.navidrome_cache_size,
+                                       cache_ttls=parse_ttls(config.navidrome_cache_ttls),
+                                       cache_stale_ttl=config.navidrome_cache_stale_ttl)
+    
+    # Answer library reads from a local copy kept in sync in the background
+    if config.library_mirror:
+        library_mirror = LibraryMirror(navidrome_client, db_path=config.library_mirror_path,
+                                       refresh_interval=config.library_mirror_refresh)
+        navidrome_client.mirror = library_mirror
+        library_mirror.start()
     
     # Initialize Last.fm client
     lastfm_api_key = os.getenv('LASTFM_API_KEY')
@@ -118,7 +159,7 @@ try:
     reddit_client = RedditClient()
     
     # Initialize clients for DJ interaction
-    init_dj_interaction(openai_client, elevenlabs_client, navidrome_client)
+    init_dj_interaction(openai_client, elevenlabs_client, navidrome_client, config)
     
     logger.info("All clients initialized successfully")
 except Exception as e:
@@ -166,19 +207,33 @@ def get_playlists():
 @app.route('/api/create_playlist', methods=['POST'])
 @api_error_handler
 def create_playlist():
-    """Create a new AI-generated playlist."""
+    """Create a new playlist, optionally filled from a library search.
+    
+    Besides ``name``, accepts ``description`` (saved as the playlist
+    comment), ``query``, ``genre``, ``year_from`` and ``year_to`` to pick
+    songs, and ``count`` for how many (default 25).
+    """
     try:
         data = request.get_json()
         if not data or 'name' not in data:
             return jsonify({"error": "Missing playlist name"}), 400
             
         playlist_name = data['name']
-        description = data.get('description', '')
         
-        # Generate playlist using AI
+        songs = []
+        if any(data.get(key) for key in ('query', 'genre', 'year_from', 'year_to')):
+            songs = navidrome_client.search_songs(
+                data.get('query', ''),
+                limit=int(data.get('count', 25)),
+                genre=data.get('genre'),
+                year_from=data.get('year_from'),
+                year_to=data.get('year_to')
+            )
+        
         playlist = navidrome_client.create_playlist(
             name=playlist_name,
-            description=description
+            songs=[song['id'] for song in songs],
+            comment=data.get('description')
         )
         
         # Save playlist to file system
@@ -191,11 +246,42 @@ def create_playlist():
         
         return jsonify({
             "success": True,
-            "playlist": playlist
+            "playlist": playlist,
+            "songs": len(songs)
         })
     except Exception as e:
         raise MusicServiceError(f"Error creating playlist: {str(e)}", "Navidrome")
 
+@app.route('/api/search', methods=['GET'])
+@api_error_handler
+def search_library():
+    """Search the library for songs, albums or artists.
+    
+    Query parameters: ``q``, ``type`` (song, album or artist), ``limit``,
+    and for songs ``genre``, ``year_from`` and ``year_to``. The last word
+    of a song search matches as a prefix, for search-as-you-type.
+    """
+    query = request.args.get('q', '')
+    search_type = request.args.get('type', 'song')
+    limit = request.args.get('limit', 20, type=int)
+    if search_type not in ('song', 'album', 'artist'):
+        return jsonify({"error": "type must be song, album or artist"}), 400
+    try:
+        if search_type == 'song':
+            results = navidrome_client.search_songs(
+                query,
+                limit=limit,
+                genre=request.args.get('genre'),
+                year_from=request.args.get('year_from', type=int),
+                year_to=request.args.get('year_to', type=int),
+                prefix=True
+            )
+        else:
+            results = navidrome_client.search(query, search_type, limit)
+        return jsonify({"results": results})
+    except Exception as e:
+        raise MusicServiceError(f"Error searching library: {str(e)}", "Navidrome")
+
 @app.route('/api/speak', methods=['POST'])
 def speak_text():
     """Convert text to speech using ElevenLabs."""
@@ -204,24 +290,60 @@ def speak_text():
         text = data.get('text', '')
         voice_id = data.get('voice_id', config.default_voice_id)
         
-        audio_data = elevenlabs_client.text_to_speech(text, voice_id)
-        
-        # Save audio file
-        timestamp = datetime.now().strftime("%Y%m%d%H%M%S")
-        audio_path = os.path.join('voicebot', 'outputs', f"{timestamp}.mp3")
-        os.makedirs(os.path.dirname(audio_path), exist_ok=True)
-        
-        with open(audio_path, 'wb') as f:
-            f.write(audio_data)
+        audio_path = elevenlabs_client.speech_file(text, voice_id)
+        if not audio_path:
+            return jsonify({"error": "Speech generation failed"}), 500
         
         return jsonify({
             "success": True,
-            "audio_path": f"/static/audio/{os.path.basename(audio_path)}"
+            "audio_path": audio_url(audio_path)
         })
     except Exception as e:
         logger.error(f"Error generating speech: {str(e)}")
         return jsonify({"error": str(e)}), 500
 
+@app.route('/api/llm_cache_stats', methods=['GET'])
+def get_llm_cache_stats():
+    """Report LLM completion cache usage."""
+    if completion_cache is None:
+        return jsonify({"enabled": False})
+    return jsonify(dict(completion_cache.stats(), enabled=True))
+
+@app.route('/api/coalescing_stats', methods=['GET'])
+def get_coalescing_stats():
+    """Report how many identical in-flight LLM and TTS calls were shared."""
+    return jsonify({
+        "llm": openai_client.single_flight.stats(),
+        "tts": elevenlabs_client.single_flight.stats()
+    })
+
+@app.route('/api/llm_dispatch_stats', methods=['GET'])
+def get_llm_dispatch_stats():
+    """Report LLM slot usage and queue waits per priority class."""
+    return jsonify(llm_dispatcher.stats())
+
+@app.route('/api/http_stats', methods=['GET'])
+def get_http_stats():
+    """Report outbound HTTP retries and connection reuse per host."""
+    return jsonify(http_transport.stats())
+
+@app.route('/api/library_mirror_stats', methods=['GET'])
+def get_library_mirror_stats():
+    """Report mirrored library size and sync progress."""
+    if library_mirror is None:
+        return jsonify({"enabled": False})
+    return jsonify(dict(library_mirror.stats(), enabled=True))
+
+@app.route('/api/navidrome_cache_stats', methods=['GET'])
+def get_navidrome_cache_stats():
+    """Report Navidrome metadata cache usage per endpoint."""
+    return jsonify(navidrome_client.cache_stats())
+
+@app.route('/api/tts_stats', methods=['GET'])
+def get_tts_stats():
+    """Report text-to-speech cache usage."""
+    return jsonify(tts_cache.stats())
+
 @app.route('/api/trends', methods=['GET'])
 def get_music_trends():
     """Get music trends from various sources."""
@@ -251,8 +373,8 @@ def get_song_info():
         if not song_id:
             return jsonify({"error": "Song ID is required"}), 400
         
-        # Get basic song info from Navidrome
-        song_info = navidrome_client.get_song_info(song_id)
+        # Get basic song info from Navidrome, copied since it may be cached
+        song_info = dict(navidrome_client.get_song_info(song_id))
         
         # Enrich with AI-generated content
         artist = song_info.get('artist', '')
@@ -285,23 +407,17 @@ def generate_dj_intro():
         )
         
         # Convert to speech
-        audio_data = elevenlabs_client.text_to_speech(
+        audio_path = elevenlabs_client.speech_file(
             intro_text,
             config.default_voice_id
         )
-        
-        # Save audio file
-        timestamp = datetime.now().strftime("%Y%m%d%H%M%S")
-        audio_path = os.path.join('voicebot', 'outputs', f"intro_{timestamp}.mp3")
-        os.makedirs(os.path.dirname(audio_path), exist_ok=True)
-        
-        with open(audio_path, 'wb') as f:
-            f.write(audio_data)
+        if not audio_path:
+            return jsonify({"error": "Speech generation failed"}), 500
         
         return jsonify({
             "success": True,
             "intro_text": intro_text,
-            "audio_path": f"/static/audio/{os.path.basename(audio_path)}"
+            "audio_path": audio_url(audio_path)
         })
     except Exception as e:
         logger.error(f"Error generating DJ intro: {str(e)}")
@@ -399,12 +515,12 @@ def get_recent_activity():
 def analyze_trends():
     """Analyze music trends and compare with user's taste."""
     try:
-        # Get trends
-        lastfm_trends = lastfm_client.get_trending_tracks(limit=5)
-        spotify_trends = spotify_client.get_trending_tracks(limit=5)
-        
-        # Get recent plays
+        # Get trends and recent plays at the same time
+        lastfm_future = background_executor.submit(lastfm_client.get_trending_tracks, limit=5)
+        spotify_future = background_executor.submit(spotify_client.get_trending_tracks, limit=5)
         recent_plays = navidrome_client.get_recent_plays(limit=10)
+        lastfm_trends = lastfm_future.result()
+        spotify_trends = spotify_future.result()
         
         # Combine trends
         all_trends = {
@@ -1,7 +1,11 @@
 import os
 import requests
 import logging
+from datetime import datetime
 from dotenv import load_dotenv
+from server.utils.http_transport import default_transport
+from server.utils.single_flight import SingleFlight
+from server.utils.tts_cache import make_key
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -10,21 +14,44 @@ logger = logging.getLogger(__name__)
 # Load environment variables
 load_dotenv()
 
+MODEL_ID = 'eleven_monolingual_v1'
+VOICE_SETTINGS = {
+    'stability': 0.5,
+    'similarity_boost': 0.75
+}
+
 class ElevenLabsClient:
     """Client for interacting with the ElevenLabs API."""
     
-    def __init__(self):
-        """Initialize the ElevenLabs client."""
+    def __init__(self, tts_cache=None, transport=None):
+        """Initialize the ElevenLabs client.
+
+        Args:
+            tts_cache (TTSCache, optional): Cache of synthesized audio. Without
+                one every call goes to the API.
+            transport (HTTPTransport, optional): Pooled HTTP transport; the
+                shared one if omitted
+        """
         self.api_key = os.getenv('ELEVENLABS_API_KEY')
         self.base_url = 'https://api.elevenlabs.io/v1'
         self.default_voice_id = os.getenv('ELEVENLABS_VOICE_ID', '21m00Tcm4TlvDq8ikWAM')  # Default voice (Rachel)
+        self.tts_cache = tts_cache
+        self.http = transport or default_transport()
+        # Identical syntheses in flight at once share one API call
+        self.single_flight = SingleFlight()
         
         if not self.api_key:
             logger.warning("ElevenLabs API key not found. Text-to-speech functionality will be limited.")
     
+    def _cache_key(self, text, voice_id, speed):
+        return make_key(text, voice_id, MODEL_ID, VOICE_SETTINGS, speed)
+
     def text_to_speech(self, text, voice_id=None, speed=1.0):
         """Convert text to speech using ElevenLabs API.
         
+        Identical requests are answered from the TTS cache when one is set,
+        and concurrent identical requests share a single API call.
+        
         Args:
             text (str): The text to convert to speech
             voice_id (str, optional): The voice ID to use. Defaults to None (uses default voice).
@@ -32,13 +59,60 @@ class ElevenLabsClient:
         Returns:
             bytes: Audio data in MP3 format
         """
+        # Use provided voice ID or fall back to default
+        voice_id = voice_id or self.default_voice_id
+        key = self._cache_key(text, voice_id, speed)
+        
+        if self.tts_cache is not None:
+            audio_data = self.tts_cache.read(key, characters=len(text))
+            if audio_data is not None:
+                return audio_data
+        return self._synthesize_once(key, text, voice_id, speed)
+    
+    def speech_file(self, text, voice_id=None, speed=1.0, output_dir=os.path.join('voicebot', 'outputs')):
+        """Convert text to speech and return the path of the MP3 file.
+        
+        With a TTS cache the cached file itself is returned, so repeated text
+        costs neither an API call nor a copy.
+        
+        Returns:
+            str or None: Path to the audio file, or None if synthesis failed
+        """
+        voice_id = voice_id or self.default_voice_id
+        key = self._cache_key(text, voice_id, speed)
+        
+        if self.tts_cache is not None:
+            path = self.tts_cache.get(key, characters=len(text))
+            if path is None and self._synthesize_once(key, text, voice_id, speed):
+                path = self.tts_cache.path(key)
+            return path
+        
+        audio_data = self._synthesize_once(key, text, voice_id, speed)
+        if not audio_data:
+            return None
+        
+        timestamp = datetime.now().strftime("%Y%m%d%H%M%S%f")
+        path = os.path.join(output_dir, f"speech_{timestamp}.mp3")
+        os.makedirs(output_dir, exist_ok=True)
+        with open(path, 'wb') as f:
+            f.write(audio_data)
+        return path
+    
+    def _synthesize_once(self, key, text, voice_id, speed):
+        """Synthesize and cache audio, coalescing concurrent identical requests."""
+        def synthesize():
+            audio_data = self._synthesize(text, voice_id, speed)
+            if audio_data and self.tts_cache is not None:
+                self.tts_cache.put(key, audio_data)
+            return audio_data
+        return self.single_flight.do(key, synthesize)
+    
+    def _synthesize(self, text, voice_id, speed):
+        """Call the text-to-speech API."""
         if not self.api_key:
             logger.error("ElevenLabs API key not set. Cannot generate speech.")
             return None
         
-        # Use provided voice ID or fall back to default
-        voice_id = voice_id or self.default_voice_id
-        
         url = f"{self.base_url}/text-to-speech/{voice_id}"
         
         headers = {
@@ -49,16 +123,13 @@ class ElevenLabsClient:
         
         data = {
             'text': text,
-            'model_id': 'eleven_monolingual_v1',
-            'voice_settings': {
-                'stability': 0.5,
-                'similarity_boost': 0.75,
-                'speed': speed
-            }
+            'model_id': MODEL_ID,
+            'voice_settings': dict(VOICE_SETTINGS, speed=speed)
         }
         
         try:
-            response = requests.post(url, json=data, headers=headers)
+            # Every synthesis is billed, so only retry requests ElevenLabs never processed
+            response = self.http.post(url, json=data, headers=headers, retry=True, unsent_only=True)
             response.raise_for_status()
             return response.content
         except requests.exceptions.RequestException as e:
@@ -83,7 +154,7 @@ class ElevenLabsClient:
         }
         
         try:
-            response = requests.get(url, headers=headers)
+            response = self.http.get(url, headers=headers)
             response.raise_for_status()
             
             voices_data = response.json().get('voices', [])
@@ -1,13 +1,13 @@
-import requests
 import logging
 import pylast
+from server.utils.http_transport import default_transport
 
 logger = logging.getLogger(__name__)
 
 class LastFMClient:
     """Client for interacting with the Last.fm API."""
     
-    def __init__(self, api_key, api_secret=None, username=None, password_hash=None):
+    def __init__(self, api_key, api_secret=None, username=None, password_hash=None, transport=None):
         """Initialize the Last.fm client.
         
         Args:
@@ -15,8 +15,11 @@ class LastFMClient:
             api_secret (str, optional): Last.fm API secret
             username (str, optional): Last.fm username
             password_hash (str, optional): Last.fm password hash
+            transport (HTTPTransport, optional): Pooled HTTP transport for
+                direct API calls; the shared one if omitted
         """
         self.api_key = api_key
+        self.http = transport or default_transport()
         self.api_secret = api_secret
         self.username = username
         self.password_hash = password_hash
@@ -102,7 +105,7 @@ class LastFMClient:
             if country:
                 params["country"] = country
             
-            response = requests.get(url, params=params)
+            response = self.http.get(url, params=params)
             response.raise_for_status()
             
             data = response.json()
@@ -1,17 +1,99 @@
 import os
 import json
+import time
 import logging
-import requests
 from datetime import datetime
 from openai import OpenAI
+from server.utils.completion_cache import make_key as completion_cache_key
+from server.utils.http_transport import default_transport
+from server.utils.llm_dispatcher import BACKGROUND, STANDARD, LLMDispatcher
+from server.utils.prompt_registry import DEFAULT_PROMPTS_DIR, get_registry
+from server.utils.single_flight import SingleFlight
 
 logger = logging.getLogger(__name__)
 
+# Intents and entities understood by the combined request router
+ROUTER_INTENTS = ('trivia', 'song_info', 'play_song', 'create_playlist', 'generic')
+ROUTER_ENTITIES = ('artist', 'title', 'mood', 'theme')
+
+# Local models can take a while to generate long completions
+OLLAMA_TIMEOUT = 60
+
+class ChatStream:
+    """Iterator over text deltas from a streaming chat completion.
+
+    Timing metadata is collected while iterating and is available from
+    ``metrics`` once the stream has been consumed.
+    """
+
+    def __init__(self, deltas, usage):
+        """Wrap a provider delta generator.
+
+        Args:
+            deltas (iterator): Yields text deltas
+            usage (dict): Filled in by the generator with ``tokens`` if the
+                provider reports an exact count
+        """
+        self._deltas = deltas
+        self._usage = usage
+        self.started_at = time.monotonic()
+        self.first_token_at = None
+        self.finished_at = None
+        self.chunks = 0
+
+    def __iter__(self):
+        for delta in self._deltas:
+            if not delta:
+                continue
+            if self.first_token_at is None:
+                self.first_token_at = time.monotonic()
+            self.chunks += 1
+            yield delta
+        self.finished_at = time.monotonic()
+
+    def collect(self, on_delta=None):
+        """Consume the stream and return the full text.
+
+        Args:
+            on_delta (callable, optional): Called with each delta as it arrives
+        """
+        parts = []
+        for delta in self:
+            parts.append(delta)
+            if on_delta:
+                on_delta(delta)
+        return "".join(parts)
+
+    @property
+    def metrics(self):
+        """Time-to-first-token, total time, token count and tokens/sec."""
+        end = self.finished_at or time.monotonic()
+        tokens = self._usage.get('tokens') or self.chunks
+        ttft = None
+        tokens_per_second = None
+        if self.first_token_at is not None:
+            ttft = self.first_token_at - self.started_at
+            generation_time = end - self.first_token_at
+            if generation_time > 0:
+                tokens_per_second = tokens / generation_time
+        return {
+            'time_to_first_token': ttft,
+            'total_time': end - self.started_at,
+            'tokens': tokens,
+            'tokens_per_second': tokens_per_second
+        }
+
 class LLMClient:
     """Unified client for OpenAI or Ollama language models."""
 
-    def __init__(self, provider='openai', api_key=None, base_url=None, model=None):
+    def __init__(self, provider='openai', api_key=None, base_url=None, model=None, completion_cache=None,
+                 dispatcher=None, transport=None):
         self.provider = provider
+        self.completion_cache = completion_cache
+        # Limits concurrent calls to the provider and orders them by priority
+        self.dispatcher = dispatcher or LLMDispatcher()
+        # Identical templated completions in flight at once share one call
+        self.single_flight = SingleFlight()
 
         if provider == 'openai':
             api_key = api_key or os.getenv('OPENAI_API_KEY')
@@ -19,31 +101,24 @@ class LLMClient:
             self.model = model or os.getenv('OPENAI_MODEL', 'gpt-4')
         elif provider == 'ollama':
             self.base_url = base_url or os.getenv('OLLAMA_BASE_URL', 'http://localhost:11434')
+            # Keep-alive connections to Ollama shared with the other clients
+            self.http = transport or default_transport()
             self.model = model or os.getenv('OLLAMA_MODEL', 'llama3')
         else:
             raise ValueError("Unsupported provider: %s" % provider)
 
-        # Load prompt templates
-        self.templates = {}
-        self._load_templates()
-
-    def _load_templates(self):
-        """Load prompt templates from the prompts directory."""
-        prompts_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), 'prompts')
+        # Prompt templates are shared with the DJ routes and reload on change
+        self.prompts = self._load_templates()
 
+    def _load_templates(self, prompts_dir=DEFAULT_PROMPTS_DIR):
+        """Return the prompt registry, creating default templates if needed."""
         if not os.path.exists(prompts_dir):
             os.makedirs(prompts_dir)
             self._create_default_templates(prompts_dir)
 
-        try:
-            for filename in os.listdir(prompts_dir):
-                if filename.endswith('.json'):
-                    template_name = filename[:-5]
-                    with open(os.path.join(prompts_dir, filename), 'r') as f:
-                        self.templates[template_name] = json.load(f)
-            logger.info("Loaded %d prompt templates", len(self.templates))
-        except Exception as e:
-            logger.error("Error loading prompt templates: %s", str(e))
+        prompts = get_registry(prompts_dir)
+        logger.info("Loaded %d prompt templates", len(prompts.names()))
+        return prompts
 
     def _create_default_templates(self, prompts_dir):
         """Create default prompt templates."""
@@ -60,6 +135,10 @@ class LLMClient:
                 "system": "You are a charismatic DJ introducing the next song or playlist to your audience. Your intros are engaging, informative, and build excitement for the music that's about to play.",
                 "user": "Create a DJ introduction for the song '{title}' by {artist} from the playlist '{playlist_name}'. Make it sound natural, engaging, and brief (30-60 words). Include a reference to the mood, genre, or theme of the song."
             },
+            "router": {
+                "system": "You are the request router for a music DJ system. Decide whether the listener's request is music-related and appropriate, work out what they want, and pull out any details they mention. Respond with a single JSON object and nothing else, using exactly these keys: \"verdict\" (\"MUSIC_RELATED\" or \"NOT_MUSIC_RELATED\"), \"intent\" (one of \"trivia\", \"song_info\", \"play_song\", \"create_playlist\", \"generic\"), \"entities\" (an object with \"artist\", \"title\", \"mood\" and \"theme\", each a string or null) and \"message\" (a string). When the verdict is NOT_MUSIC_RELATED, set \"message\" to a witty but authoritative explanation of why the DJ won't answer; otherwise leave it empty.",
+                "user": "Currently playing: {title} by {artist}\nRequest: {request}"
+            },
             "trend_analyzer": {
                 "system": "You are a music trend analyst who can identify patterns and connections between different music trends and a user's personal music collection.",
                 "user": "Analyze these current music trends: {trends}. Compare them with the user's recent listening: {recent_plays}. Identify connections, recommend songs from trends that match the user's taste, and suggest songs from their collection that align with current trends."
@@ -72,23 +151,25 @@ class LLMClient:
 
     def _format_prompt(self, template_name, **kwargs):
         """Format a prompt template with provided variables."""
-        if template_name not in self.templates:
+        template = self.prompts.get(template_name)
+        if template is None:
             logger.warning("Template %s not found, using default", template_name)
             return [
                 {"role": "system", "content": "You are an AI assistant for a music application."},
                 {"role": "user", "content": str(kwargs)}
             ]
+        return template.messages(**kwargs)
 
-        template = self.templates[template_name]
-        system_content = template["system"]
-        user_content = template["user"].format(**kwargs)
-        return [
-            {"role": "system", "content": system_content},
-            {"role": "user", "content": user_content}
-        ]
+    def chat_completion(self, messages, temperature=0.7, max_tokens=500, priority=None):
+        """Send a chat completion request to the configured provider.
 
-    def chat_completion(self, messages, temperature=0.7, max_tokens=500):
-        """Send a chat completion request to the configured provider."""
+        The call waits for a dispatcher slot at ``priority``, by default the
+        priority of the surrounding ``llm_priority`` block (interactive).
+        """
+        with self.dispatcher.slot(priority):
+            return self._chat_completion(messages, temperature, max_tokens)
+
+    def _chat_completion(self, messages, temperature, max_tokens):
         try:
             if self.provider == 'openai':
                 response = self.client.chat.completions.create(
@@ -105,7 +186,7 @@ class LLMClient:
                     "stream": False,
                     "options": {"temperature": temperature}
                 }
-                r = requests.post(f"{self.base_url}/api/chat", json=payload, timeout=60)
+                r = self.http.post(f"{self.base_url}/api/chat", json=payload, timeout=OLLAMA_TIMEOUT, retry=True)
                 r.raise_for_status()
                 data = r.json()
                 return data.get('message', {}).get('content', '')
@@ -113,9 +194,98 @@ class LLMClient:
             logger.error("Error during chat completion: %s", str(e))
             raise
 
+    def cached_completion(self, template_name, messages, temperature=0.7, max_tokens=500, priority=None):
+        """Run a templated chat completion through the completion cache.
+
+        Concurrent identical requests are coalesced into one call. The result
+        is cached unless there is no cache or the template has opted out.
+        """
+        key = completion_cache_key(self.provider, self.model, template_name, messages,
+                                   temperature, max_tokens)
+        cache = self.completion_cache
+        if cache is not None and cache.ttl_for(template_name) <= 0:
+            cache = None
+
+        if cache is not None:
+            content = cache.get(key)
+            if content is not None:
+                return content
+
+        def generate():
+            content = self.chat_completion(messages, temperature=temperature, max_tokens=max_tokens,
+                                           priority=priority)
+            if content and cache is not None:
+                cache.set(key, template_name, content, provider=self.provider, model=self.model)
+            return content
+
+        return self.single_flight.do(key, generate)
+
+    def stream_chat_completion(self, messages, temperature=0.7, max_tokens=500, priority=None):
+        """Send a streaming chat completion request to the configured provider.
+
+        A dispatcher slot is held from the first iteration until the stream
+        ends, so queue wait counts towards time-to-first-token.
+
+        Returns:
+            ChatStream: Iterator of text deltas with timing ``metrics``
+        """
+        usage = {}
+        if self.provider == 'openai':
+            deltas = self._stream_openai(messages, temperature, max_tokens)
+        else:
+            deltas = self._stream_ollama(messages, temperature, usage)
+        return ChatStream(self._dispatched(deltas, priority), usage)
+
+    def _dispatched(self, deltas, priority):
+        with self.dispatcher.slot(priority):
+            yield from deltas
+
+    def _stream_openai(self, messages, temperature, max_tokens):
+        try:
+            response = self.client.chat.completions.create(
+                model=self.model,
+                messages=messages,
+                temperature=temperature,
+                max_tokens=max_tokens,
+                stream=True
+            )
+            for chunk in response:
+                if chunk.choices and chunk.choices[0].delta.content:
+                    yield chunk.choices[0].delta.content
+        except Exception as e:
+            logger.error("Error during streaming chat completion: %s", str(e))
+            raise
+
+    def _stream_ollama(self, messages, temperature, usage):
+        payload = {
+            "model": self.model,
+            "messages": messages,
+            "stream": True,
+            "options": {"temperature": temperature}
+        }
+        try:
+            with self.http.post(f"{self.base_url}/api/chat", json=payload, stream=True,
+                                timeout=OLLAMA_TIMEOUT, retry=True) as r:
+                r.raise_for_status()
+                for line in r.iter_lines():
+                    if not line:
+                        continue
+                    data = json.loads(line)
+                    if data.get('error'):
+                        raise RuntimeError(data['error'])
+                    content = data.get('message', {}).get('content', '')
+                    if content:
+                        yield content
+                    if data.get('done'):
+                        usage['tokens'] = data.get('eval_count')
+                        break
+        except Exception as e:
+            logger.error("Error during streaming chat completion: %s", str(e))
+            raise
+
     def generate_song_info(self, artist, title):
         messages = self._format_prompt("song_info", artist=artist, title=title)
-        content = self.chat_completion(messages, max_tokens=500)
+        content = self.cached_completion("song_info", messages, max_tokens=500, priority=STANDARD)
         return {
             'info': content,
             'generated_at': datetime.now().strftime("%Y-%m-%d %H:%M:%S")
@@ -130,7 +300,75 @@ class LLMClient:
             title=title,
             playlist_name=playlist_name
         )
-        return self.chat_completion(messages, temperature=0.8, max_tokens=200)
+        return self.cached_completion("dj_intro", messages, temperature=0.8, max_tokens=200,
+                                      priority=BACKGROUND)
+
+    def route_request(self, request_text, now_playing=None):
+        """Moderate and classify a DJ request with a single completion.
+
+        Args:
+            request_text (str): The listener's request
+            now_playing (dict, optional): Currently playing song
+
+        Returns:
+            dict: Parsed router result (see ``_parse_route``)
+
+        Raises:
+            ValueError: If the model did not return a usable JSON verdict
+        """
+        now_playing = now_playing or {}
+        messages = self._format_prompt(
+            "router",
+            request=request_text,
+            title=now_playing.get('title', 'Unknown'),
+            artist=now_playing.get('artist', 'Unknown')
+        )
+        content = self.chat_completion(messages, temperature=0, max_tokens=200)
+        return self._parse_route(content)
+
+    @staticmethod
+    def _parse_route(content):
+        """Parse the JSON object returned by the router prompt.
+
+        Returns:
+            dict: ``is_music_related``, ``verdict``, ``intent``, ``entities``
+            (artist, title, mood, theme) and ``message``
+        """
+        start = content.find('{')
+        end = content.rfind('}')
+        if start == -1 or end <= start:
+            raise ValueError("Router response did not contain a JSON object")
+
+        try:
+            data = json.loads(content[start:end + 1])
+        except json.JSONDecodeError as e:
+            raise ValueError(f"Router response was not valid JSON: {str(e)}")
+
+        verdict = str(data.get('verdict', '')).strip().upper()
+        if verdict not in ('MUSIC_RELATED', 'NOT_MUSIC_RELATED'):
+            raise ValueError(f"Router returned unknown verdict: {verdict!r}")
+
+        intent = str(data.get('intent') or 'generic').strip().lower()
+        if intent not in ROUTER_INTENTS:
+            intent = 'generic'
+
+        raw_entities = data.get('entities')
+        if not isinstance(raw_entities, dict):
+            raw_entities = {}
+        entities = {}
+        for key in ROUTER_ENTITIES:
+            value = raw_entities.get(key)
+            entities[key] = str(value).strip() if value not in (None, '') else None
+            if entities[key] and entities[key].lower() in ('null', 'none', 'unknown'):
+                entities[key] = None
+
+        return {
+            'is_music_related': verdict == 'MUSIC_RELATED',
+            'verdict': verdict,
+            'intent': intent,
+            'entities': entities,
+            'message': str(data.get('message') or '').strip()
+        }
 
     def analyze_trends(self, trends, recent_plays):
         formatted_trends = []
@@ -154,7 +392,7 @@ class LLMClient:
             trends=trends_str,
             recent_plays=recent_plays_str
         )
-        content = self.chat_completion(messages, max_tokens=800)
+        content = self.cached_completion("trend_analyzer", messages, max_tokens=800, priority=BACKGROUND)
         return {
             'analysis': content,
             'generated_at': datetime.now().strftime("%Y-%m-%d %H:%M:%S")
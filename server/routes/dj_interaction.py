@@ -1,10 +1,28 @@
 import os
 import json
+import math
+import queue
 import random
 import logging
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, Response, request, jsonify
 import openai
+from server.utils.conversation_memory import ConversationMemory, messages_tokens
+from server.utils.interaction_log import InteractionLog, LEGACY_LOG_PATH
+from server.utils.library_index import LibraryIndex
+from server.utils.llm_dispatcher import BACKGROUND, llm_priority
+from server.utils.moderation_cache import ModerationCache
+from server.utils.moderation_classifier import load_or_train as load_moderation_classifier
+from server.utils.moderation_store import MemoryModerationStore, create_store as create_moderation_store, expire_penalties
+from server.utils.profile_cache import dj_profile_cache, profile_system_prompt
+from server.utils.prompt_registry import PromptTemplate, get_registry
+from server.utils.rate_limiter import RateLimiter, create_rate_limiter, estimate_request_tokens
+from server.utils.trivia_buffer import TriviaBuffer
+from server.utils.tts_pipeline import SentencePipeline, prune_files
+from server.utils.tts_cache import audio_url
 
 # Initialize logger
 logger = logging.getLogger(__name__)
@@ -16,26 +34,313 @@ dj_interaction = Blueprint('dj_interaction', __name__)
 openai_client = None
 elevenlabs_client = None
 navidrome_client = None
+app_config = None
+moderation_classifier = None
+moderation_cache = ModerationCache()
+trivia_buffer = None
 
-# User management
-user_states = {}  # Store user states (active, muted, suspended)
-moderation_rules = {
-    "mute_duration": 60,  # seconds
-    "warning_threshold": 2,  # warnings before muting
-    "mute_threshold": 3,  # mutes before suspension
-    "suspension_duration": 3600,  # seconds (1 hour)
-}
+# Append-only log of accepted requests, written off the request thread
+interaction_log = InteractionLog(legacy_path=LEGACY_LOG_PATH)
 
-def init_clients(openai_c, elevenlabs_c, navidrome_c):
+# Prompt templates, held in memory and reloaded when the files change
+prompts = get_registry()
+
+# Worker pool used to generate responses while moderation is still running
+request_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix='dj-request')
+
+# Worker pool for per-sentence speech synthesis
+tts_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix='dj-tts')
+
+AUDIO_OUTPUT_DIR = os.path.join('voicebot', 'outputs')
+
+# Name prefix of the combined audio written for sentence-pipelined responses
+RESPONSE_AUDIO_PREFIX = 'dj_response_'
+
+# User management: warnings, mutes, suspensions and moderation rules
+moderation_store = MemoryModerationStore()
+rate_limiter = None
+
+# Recent chat turns and a rolling summary per user
+conversation_memory = None
+
+# In-process song index used to resolve play requests
+library_index = None
+
+DEFAULT_REJECTION_MESSAGE = "Sorry, I only respond to music-related questions. I'm a DJ, not a general assistant."
+
+# Used if prompts/moderation.json is missing
+FALLBACK_MODERATION_PROMPT = PromptTemplate(
+    'moderation',
+    "You are a content moderator for a music DJ system. Your job is to determine if user requests are music-related and appropriate. Respond with 'MUSIC_RELATED' if the request is about music, artists, songs, playlists, or music history. Respond with 'NOT_MUSIC_RELATED' followed by a witty but authoritative explanation if the request is inappropriate or not related to music.",
+    "{request}"
+)
+
+def init_clients(openai_c, elevenlabs_c, navidrome_c, config=None):
     """Initialize clients for use in this module."""
-    global openai_client, elevenlabs_client, navidrome_client
+    global openai_client, elevenlabs_client, navidrome_client, app_config, moderation_classifier, moderation_cache, trivia_buffer
+    global moderation_store, rate_limiter, conversation_memory, library_index
     openai_client = openai_c
     elevenlabs_client = elevenlabs_c
     navidrome_client = navidrome_c
+    app_config = config
+
+    # Cleared whenever the registry reloads a moderation prompt
+    if config is not None:
+        moderation_cache = ModerationCache(max_size=config.moderation_cache_size,
+                                           ttl=config.moderation_cache_ttl,
+                                           registry=prompts)
+    else:
+        moderation_cache = ModerationCache(registry=prompts)
+
+    if config is not None:
+        # Shared by every worker process unless the memory backend is chosen
+        moderation_store = create_moderation_store(config.moderation_store,
+                                                   db_path=config.moderation_store_path,
+                                                   idle_ttl=config.moderation_idle_ttl)
+
+    # Budget LLM and TTS spend per user and across all users
+    if config is None:
+        rate_limiter = RateLimiter()
+    elif config.rate_limit:
+        # Shared by every worker process unless the memory backend is chosen
+        rate_limiter = create_rate_limiter(config.rate_limit_store,
+                                           db_path=config.rate_limit_store_path,
+                                           user_per_minute=config.rate_limit_user_per_minute,
+                                           user_burst=config.rate_limit_user_burst,
+                                           global_per_minute=config.rate_limit_global_per_minute,
+                                           global_burst=config.rate_limit_global_burst)
+    else:
+        rate_limiter = None
+
+    if config is None or config.conversation_memory:
+        max_turns = config.conversation_max_turns if config else 6
+        conversation_memory = ConversationMemory(summarize_conversation, max_turns=max_turns)
+    else:
+        conversation_memory = None
+
+    if library_index is not None:
+        library_index.stop()
+        library_index = None
+    if navidrome_c is not None and (config is None or config.library_index):
+        refresh_interval = config.library_index_refresh if config else 300
+        full_refresh_interval = config.library_index_full_refresh if config else 24 * 3600
+        library_index = LibraryIndex(navidrome_c, refresh_interval=refresh_interval,
+                                     full_refresh_interval=full_refresh_interval)
+        library_index.start()
+
+    if config is None or config.moderation_fast_path:
+        threshold = config.moderation_fast_path_threshold if config else 0.9
+        moderation_classifier = load_moderation_classifier(threshold=threshold)
+    else:
+        moderation_classifier = None
+
+    # Keep trivia with pre-rendered audio ready for each active DJ profile.
+    # Filling starts on the first trivia request, so idle workers don't
+    # spend LLM and TTS calls at startup.
+    if trivia_buffer is not None:
+        trivia_buffer.stop()
+        trivia_buffer = None
+    if config is None or config.trivia_buffer:
+        capacity = config.trivia_buffer_size if config else 3
+        trivia_buffer = TriviaBuffer(produce_trivia, capacity=capacity, active_keys=active_trivia_keys)
+
+    if config is not None:
+        interaction_log.max_bytes = config.interaction_log_max_mb * 1024 * 1024
+        interaction_log.backups = config.interaction_log_backups
     logger.info("DJ Interaction clients initialized")
 
-def process_dj_request(user_request, context=None):
-    """Process a DJ request and return a response."""
+def speculative_moderation_enabled():
+    """Return True if moderation should run alongside response generation."""
+    if app_config is None:
+        return True
+    return app_config.speculative_moderation
+
+def request_router_enabled():
+    """Return True if moderation and intent come from a single router call."""
+    if app_config is None:
+        return True
+    return app_config.use_request_router
+
+def sentence_tts_enabled():
+    """Return True if speech is synthesized sentence by sentence while text streams."""
+    if app_config is None:
+        return True
+    return app_config.sentence_pipelined_tts
+
+def response_audio_limit():
+    """Return how many combined response audio files are kept on disk."""
+    if app_config is None:
+        return 100
+    return app_config.sentence_pipelined_tts_keep
+
+# Request types whose handlers only depend on the request text, so a
+# keyword guess is good enough to start them before the router answers
+SPECULATIVE_REQUEST_TYPES = ('trivia', 'song_info', 'generic')
+
+def moderate_request(user_request, context):
+    """Check that a request is music-related, routing it when enabled.
+
+    With the request router enabled the verdict, intent and entities come
+    from one LLM completion. Requests the local classifier is confident about
+    skip the router and are categorized by keyword instead. If the router
+    answer can't be parsed we fall back to the dedicated moderation prompt.
+
+    Returns:
+        tuple: (is_music_related, message, route, source) where route is None
+        unless the router produced it and source is 'cache', 'fast_path' or
+        'llm'
+    """
+    now_playing = context.get('now_playing')
+
+    if request_router_enabled():
+        cached = moderation_cache.get(user_request, now_playing)
+        if cached and (cached['route'] or not cached['is_music_related']):
+            return cached['is_music_related'], cached['message'], cached['route'], 'cache'
+        # Confident classifier verdicts skip the router; without a route the
+        # intent comes from the local categorize_request keyword path
+        verdict = fast_path_verdict(user_request)
+        if verdict is True:
+            return True, "Music-related content", None, 'fast_path'
+        if verdict is False:
+            return False, DEFAULT_REJECTION_MESSAGE, None, 'fast_path'
+
+        try:
+            route = openai_client.route_request(user_request, now_playing)
+        except ValueError as e:
+            logger.warning(f"Unusable router response, falling back to moderation prompt: {str(e)}")
+        else:
+            if moderation_classifier:
+                moderation_classifier.record_verdict(user_request, route['is_music_related'])
+            if route['is_music_related']:
+                message = "Music-related content"
+            else:
+                message = route['message'] or DEFAULT_REJECTION_MESSAGE
+            moderation_cache.set(user_request, route['is_music_related'], message, route, now_playing)
+            return route['is_music_related'], message, route, 'llm'
+
+    is_music_related, message, source = check_music_relevance(user_request, now_playing)
+    return is_music_related, message, None, source
+
+class DeltaRelay:
+    """Buffer text deltas from a response attempt until a listener attaches.
+
+    Deltas from speculative attempts that end up discarded are never
+    delivered, so a streaming client only sees text from the answer it gets.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._buffer = []
+        self._listener = None
+
+    def __call__(self, delta):
+        with self._lock:
+            if self._listener is None:
+                self._buffer.append(delta)
+            else:
+                self._listener(delta)
+
+    def attach(self, listener):
+        """Deliver buffered deltas to listener, then forward new ones."""
+        with self._lock:
+            for delta in self._buffer:
+                listener(delta)
+            self._buffer = []
+            self._listener = listener
+
+def submit_response(user_request, context, route=None, speculative=False):
+    """Start generating a response on the worker pool.
+
+    Args:
+        speculative (bool): The request hasn't passed moderation yet, so
+            buffered trivia is only peeked at; see ``claim_buffered_trivia``
+
+    Returns:
+        tuple: (future, relay) where future resolves to the response data and
+        relay carries text deltas as they are generated
+    """
+    relay = DeltaRelay()
+    future = request_executor.submit(process_dj_request, user_request, dict(context), route, relay,
+                                     speculative)
+    return future, relay
+
+def claim_buffered_trivia(future):
+    """Take buffered trivia used by an accepted speculative response."""
+    if future.cancelled() or future.exception() is not None:
+        return
+    claim = future.result().get('trivia_claim')
+    if claim and trivia_buffer is not None:
+        trivia_buffer.claim(*claim)
+
+def start_dj_request(user_request, context):
+    """Moderate a request and start generating its response.
+
+    With speculative moderation the response is generated on a worker thread
+    while moderation runs on the request thread. If moderation rejects the
+    request the speculative response is discarded and never reaches
+    text-to-speech. When the router classifies the request differently from
+    the keyword guess the speculative response is discarded as well and the
+    request is handled with the router's intent.
+
+    Returns:
+        tuple: (is_music_related, message, pending, source) where pending is
+        the (future, relay) pair from ``submit_response``, or None if
+        rejected, and source is where the verdict came from (see
+        ``moderate_request``)
+    """
+    pending = None
+    predicted_type = categorize_request(user_request)
+    if speculative_moderation_enabled():
+        if not request_router_enabled() or predicted_type in SPECULATIVE_REQUEST_TYPES:
+            pending = submit_response(user_request, context, speculative=True)
+
+    try:
+        is_music_related, moderation_result, route, source = moderate_request(user_request, context)
+    except Exception:
+        if pending:
+            pending[0].cancel()
+        raise
+
+    if not is_music_related:
+        # cancel() only helps if the worker has not started yet; otherwise the
+        # finished result is simply dropped.
+        if pending:
+            pending[0].cancel()
+        return False, moderation_result, None, source
+
+    if pending and route and route['intent'] != predicted_type:
+        pending[0].cancel()
+        pending = None
+
+    if pending is None:
+        pending = submit_response(user_request, context, route)
+    else:
+        pending[0].add_done_callback(claim_buffered_trivia)
+    return True, moderation_result, pending, source
+
+def generate_text(messages, max_tokens, on_delta=None):
+    """Generate response text, passing it to on_delta as it is produced."""
+    if on_delta is None:
+        return openai_client.chat_completion(messages, max_tokens=max_tokens).strip()
+
+    stream = openai_client.stream_chat_completion(messages, max_tokens=max_tokens)
+    text = stream.collect(on_delta)
+    logger.debug(f"Streamed completion metrics: {stream.metrics}")
+    return text.strip()
+
+def process_dj_request(user_request, context=None, route=None, on_delta=None, speculative=False):
+    """Process a DJ request and return a response.
+
+    Args:
+        user_request (str): The listener's request
+        context (dict, optional): Request context (now playing, profile, tone)
+        route (dict, optional): Router result with intent and entities. When
+            omitted the request is categorized by keyword.
+        on_delta (callable, optional): Receives response text as it is
+            generated by the LLM
+        speculative (bool): Moderation is still running, so buffered trivia
+            is left in the buffer until the request is accepted
+    """
     if context is None:
         context = {}
     
@@ -48,21 +353,26 @@ def process_dj_request(user_request, context=None):
     tone = context.get('tone')
 
     # Categorize the request
-    request_type = categorize_request(user_request)
+    if route:
+        request_type = route['intent']
+        entities = route.get('entities', {})
+    else:
+        request_type = categorize_request(user_request)
+        entities = None
     
     # Process based on request type
     if request_type == 'trivia':
-        return generate_music_trivia(dj_profile, tone)
+        return buffered_trivia(context, speculative) or generate_music_trivia(dj_profile, tone, on_delta)
     elif request_type == 'song_info':
         now_playing = context.get('now_playing', {})
-        return generate_song_info(now_playing, dj_profile, tone)
+        return generate_song_info(now_playing, dj_profile, tone, on_delta)
     elif request_type == 'play_song':
-        return handle_play_song_request(user_request, dj_profile)
+        return handle_play_song_request(user_request, dj_profile, entities)
     elif request_type == 'create_playlist':
-        return handle_create_playlist_request(user_request, dj_profile)
+        return handle_create_playlist_request(user_request, dj_profile, entities)
     else:
         # General conversation
-        return handle_general_conversation(user_request, context, dj_profile, tone)
+        return handle_general_conversation(user_request, context, dj_profile, tone, on_delta)
 
 def categorize_request(request_text):
     """Categorize the type of request from the user."""
@@ -80,27 +390,42 @@ def categorize_request(request_text):
     else:
         return 'generic'
 
-def generate_music_trivia(dj_profile=None, tone=None):
+def load_prompt(name):
+    """Return a prompt template from the registry.
+
+    Raises:
+        FileNotFoundError: If there is no template with that name
+    """
+    template = prompts.get(name)
+    if template is None:
+        raise FileNotFoundError(f"Prompt template {name} not found")
+    return template
+
+def compose_system_prompt(template, dj_profile=None, tone=None):
+    """Prefix a template's system prompt with the DJ's personality and tone."""
+    # Customize prompt with DJ profile if available
+    if dj_profile:
+        system_prompt = profile_system_prompt(dj_profile, template)
+    else:
+        system_prompt = template.system
+
+    if tone and tone != 'default':
+        system_prompt = f"{system_prompt}\nRespond in a {tone} style."
+    return system_prompt
+
+def build_trivia_messages(dj_profile=None, tone=None):
+    """Build the chat messages for a music trivia fact."""
+    trivia_prompt = load_prompt('trivia')
+    return [
+        {"role": "system", "content": compose_system_prompt(trivia_prompt, dj_profile, tone)},
+        {"role": "user", "content": trivia_prompt.format_user()}
+    ]
+
+def generate_music_trivia(dj_profile=None, tone=None, on_delta=None):
     """Generate a random music trivia fact."""
     try:
-        # Load trivia prompt
-        with open(os.path.join('prompts', 'trivia.json'), 'r') as f:
-            trivia_prompt = json.load(f)
-        
-        # Customize prompt with DJ profile if available
-        if dj_profile:
-            system_prompt = f"{dj_profile.get('personality')}\n\n{trivia_prompt['system']}"
-        else:
-            system_prompt = trivia_prompt['system']
-
-        if tone and tone != 'default':
-            system_prompt = f"{system_prompt}\nRespond in a {tone} style."
-        
-        messages = [
-            {"role": "system", "content": system_prompt},
-            {"role": "user", "content": trivia_prompt["user"]}
-        ]
-        trivia_text = openai_client.chat_completion(messages, max_tokens=250).strip()
+        messages = build_trivia_messages(dj_profile, tone)
+        trivia_text = generate_text(messages, 250, on_delta)
         
         return {
             "response": trivia_text,
@@ -116,7 +441,87 @@ def generate_music_trivia(dj_profile=None, tone=None):
             "actions": []
         }
 
-def generate_song_info(now_playing, dj_profile=None, tone=None):
+def trivia_key(context):
+    """Return the trivia buffer key for a request: (profile ID, tone, speed)."""
+    profile_id = context.get('dj_profile')
+    try:
+        voice_speed = float(context.get('voice_speed') or 1.0)
+    except (TypeError, ValueError):
+        voice_speed = 1.0
+    return (
+        str(profile_id) if profile_id else None,
+        context.get('tone') or 'default',
+        voice_speed
+    )
+
+def produce_trivia(key):
+    """Generate a trivia fact and its audio for the trivia buffer.
+
+    Returns:
+        dict or None: ``response``, ``voice_id`` and ``audio_path``
+    """
+    profile_id, tone, voice_speed = key
+    dj_profile = get_dj_profile(profile_id) if profile_id else None
+    if profile_id and not dj_profile:
+        return None
+
+    # Buffered trivia waits behind listeners' requests
+    with llm_priority(BACKGROUND):
+        trivia_text = generate_text(build_trivia_messages(dj_profile, tone), 250)
+    if not trivia_text:
+        return None
+
+    voice_id = dj_profile.get('voice_id') if dj_profile else None
+    audio_path = elevenlabs_client.speech_file(trivia_text, voice_id=voice_id, speed=voice_speed,
+                                               output_dir=AUDIO_OUTPUT_DIR)
+    return {
+        "response": trivia_text,
+        "voice_id": voice_id,
+        "audio_path": audio_url(audio_path) if audio_path else None
+    }
+
+def active_trivia_keys():
+    """Return buffer keys for the default voice and every active DJ profile."""
+    keys = [(None, 'default', 1.0)]
+    try:
+        # Import here to avoid circular imports
+        from server.routes.settings import get_db_connection
+
+        conn = get_db_connection()
+        try:
+            rows = conn.execute('SELECT id FROM dj_profiles WHERE is_active = 1').fetchall()
+        finally:
+            conn.close()
+        keys.extend((str(row['id']), 'default', 1.0) for row in rows)
+    except Exception as e:
+        logger.error(f"Error listing active DJ profiles: {str(e)}")
+    return keys
+
+def buffered_trivia(context, speculative=False):
+    """Take pre-rendered trivia from the buffer, or None if none is ready.
+
+    A speculative request only peeks at the buffer. The response then carries
+    a ``trivia_claim`` that ``claim_buffered_trivia`` uses to take the item
+    once moderation accepts the request, so a rejected request doesn't use
+    up buffered trivia.
+    """
+    if trivia_buffer is None:
+        return None
+    trivia_buffer.start()
+    key = trivia_key(context)
+    item = trivia_buffer.peek(key) if speculative else trivia_buffer.pop(key)
+    if item is None:
+        return None
+    return {
+        "response": item["response"],
+        "generate_audio": True,
+        "voice_id": item["voice_id"],
+        "audio_path": item["audio_path"],
+        "actions": [],
+        "trivia_claim": (key, item) if speculative else None
+    }
+
+def generate_song_info(now_playing, dj_profile=None, tone=None, on_delta=None):
     """Generate interesting information about the current song."""
     try:
         # Check if now_playing info is available
@@ -127,32 +532,21 @@ def generate_song_info(now_playing, dj_profile=None, tone=None):
                 "actions": []
             }
         
-        # Load song info prompt
-        with open(os.path.join('prompts', 'song_info.json'), 'r') as f:
-            song_info_prompt = json.load(f)
+        song_info_prompt = load_prompt('song_info')
         
         # Format the prompt with song info
-        user_prompt = song_info_prompt["user"].format(
+        user_prompt = song_info_prompt.format_user(
             title=now_playing.get('title', 'Unknown'),
             artist=now_playing.get('artist', 'Unknown'),
             album=now_playing.get('album', 'Unknown'),
             year=now_playing.get('year', 'Unknown')
         )
         
-        # Customize prompt with DJ profile if available
-        if dj_profile:
-            system_prompt = f"{dj_profile.get('personality')}\n\n{song_info_prompt['system']}"
-        else:
-            system_prompt = song_info_prompt['system']
-
-        if tone and tone != 'default':
-            system_prompt = f"{system_prompt}\nRespond in a {tone} style."
-        
         messages = [
-            {"role": "system", "content": system_prompt},
+            {"role": "system", "content": compose_system_prompt(song_info_prompt, dj_profile, tone)},
             {"role": "user", "content": user_prompt}
         ]
-        song_info_text = openai_client.chat_completion(messages, max_tokens=300).strip()
+        song_info_text = generate_text(messages, 300, on_delta)
         
         return {
             "response": song_info_text,
@@ -168,32 +562,45 @@ def generate_song_info(now_playing, dj_profile=None, tone=None):
             "actions": []
         }
 
-def handle_general_conversation(user_request, context, dj_profile=None, tone=None):
+def conversation_token_budget():
+    """Return the most tokens a chat prompt may use, including history."""
+    if app_config is None:
+        return 1500
+    return app_config.conversation_token_budget
+
+def summarize_conversation(summary, turns):
+    """Fold turns that left the memory window into the running summary."""
+    summary_prompt = load_prompt('conversation_summary')
+    transcript = "\n".join(f"Listener: {request}\nDJ: {response}" for request, response in turns)
+    messages = summary_prompt.messages(summary=summary or "(none yet)", turns=transcript)
+    with llm_priority(BACKGROUND):
+        return openai_client.chat_completion(messages, temperature=0.3, max_tokens=150)
+
+def remember_turn(session_id, user_request, response):
+    """Add a delivered exchange to the session's conversation memory."""
+    if conversation_memory is not None and session_id and response:
+        conversation_memory.add_turn(session_id, user_request, response)
+
+def handle_general_conversation(user_request, context, dj_profile=None, tone=None, on_delta=None):
     """Handle general conversation with the DJ."""
     try:
-        # Load chat prompt
-        with open(os.path.join('prompts', 'dj_chat.json'), 'r') as f:
-            chat_prompt = json.load(f)
+        chat_prompt = load_prompt('dj_chat')
         
         # Format the prompt with context
         now_playing = context.get('now_playing', {})
+        system_message = {"role": "system", "content": compose_system_prompt(chat_prompt, dj_profile, tone)}
+        user_message = {"role": "user", "content": f"Current song: {now_playing.get('title', 'Unknown')} by {now_playing.get('artist', 'Unknown')}\n\nUser request: {user_request}"}
         
-        # Customize prompt with DJ profile if available
-        if dj_profile:
-            system_prompt = f"{dj_profile.get('personality')}\n\n{chat_prompt['system']}"
-        else:
-            system_prompt = chat_prompt['system']
-
-        if tone and tone != 'default':
-            system_prompt = f"{system_prompt}\nRespond in a {tone} style."
+        # Recall earlier turns within what is left of the token budget
+        history = []
+        if conversation_memory is not None and context.get('session_id'):
+            budget = conversation_token_budget() - messages_tokens([system_message, user_message])
+            history = conversation_memory.messages(context['session_id'], budget)
         
         # Generate chat response using OpenAI
-        messages = [
-            {"role": "system", "content": system_prompt},
-            {"role": "user", "content": f"Current song: {now_playing.get('title', 'Unknown')} by {now_playing.get('artist', 'Unknown')}\n\nUser request: {user_request}"}
-        ]
+        messages = [system_message] + history + [user_message]
         
-        chat_response = openai_client.chat_completion(messages, max_tokens=250).strip()
+        chat_response = generate_text(messages, 250, on_delta)
         
         return {
             "response": chat_response,
@@ -209,25 +616,39 @@ def handle_general_conversation(user_request, context, dj_profile=None, tone=Non
             "actions": []
         }
 
-def handle_play_song_request(request_text, dj_profile=None):
+def handle_play_song_request(request_text, dj_profile=None, entities=None):
     """Handle requests to play specific songs."""
-    # Extract song/artist from request
-    # This is a simple implementation - in a real system, you'd use NLP to extract entities
-    request_lower = request_text.lower().replace('play', '').replace('a song', '').strip()
+    # Use the title/artist extracted by the router when available
+    entities = entities or {}
+    title, artist = entities.get('title'), entities.get('artist')
+    if title or artist:
+        request_lower = " ".join(part for part in (title, artist) if part)
+    else:
+        # Keyword fallback when the router is disabled
+        request_lower = request_text.lower().replace('play', '').replace('a song', '').strip()
     
-    # Search for songs in Navidrome
     try:
-        search_results = navidrome_client.search_songs(request_lower, limit=5)
-        
-        if not search_results or len(search_results) == 0:
-            return {
-                "response": f"I couldn't find any songs matching '{request_lower}'. Would you like to try another search?",
-                "generate_audio": True,
-                "actions": []
-            }
+        # Resolve locally when the library index is built, otherwise search the
+        # library (the mirror's full-text index when synced, else Navidrome)
+        song = None
+        if library_index is not None and library_index.ready:
+            if title or artist:
+                song = library_index.resolve(title=title, artist=artist)
+            else:
+                song = library_index.resolve(request_lower)
         
-        # Get the first result
-        song = search_results[0]
+        if song is None:
+            search_results = navidrome_client.search_songs(request_lower, limit=5, title=title, artist=artist)
+            
+            if not search_results or len(search_results) == 0:
+                return {
+                    "response": f"I couldn't find any songs matching '{request_lower}'. Would you like to try another search?",
+                    "generate_audio": True,
+                    "actions": []
+                }
+            
+            # Get the first result
+            song = search_results[0]
         
         # Create action to play the song
         actions = [{
@@ -253,10 +674,9 @@ def handle_play_song_request(request_text, dj_profile=None):
             "actions": []
         }
 
-def handle_create_playlist_request(request_text, dj_profile=None):
+def handle_create_playlist_request(request_text, dj_profile=None, entities=None):
     """Handle requests to create playlists."""
-    # Extract mood/theme from request
-    # This is a simple implementation - in a real system, you'd use NLP to extract entities
+    entities = entities or {}
     request_words = request_text.lower().split()
     
     # Default values
@@ -276,6 +696,12 @@ def handle_create_playlist_request(request_text, dj_profile=None):
         if keyword in request_words or keyword.replace(" ", "") in request_words:
             theme = keyword
             break
+
+    # Prefer the mood/theme extracted by the router
+    if entities.get('mood'):
+        mood = entities['mood'].lower()
+    if entities.get('theme'):
+        theme = entities['theme'].lower()
     
     # Create action to generate playlist
     actions = [{
@@ -296,77 +722,192 @@ def handle_create_playlist_request(request_text, dj_profile=None):
         "actions": actions
     }
 
+def parse_dj_request(data):
+    """Extract the request text, context and user ID from a request body.
+
+    Conversation memory is keyed on ``session_id``, or on ``user_id`` when no
+    session is given. Requests with neither share the ``default_user`` ID for
+    moderation and rate limits, but get no memory, so anonymous callers never
+    see each other's conversations.
+    """
+    user_request = data.get('request', '')
+    context = data.get('context') or {}
+    user_id = data.get('user_id', 'default_user')
+
+    # Pass tone, speed, the user and the conversation session in context
+    context['tone'] = data.get('tone', 'default')
+    context['voice_speed'] = data.get('voice_speed', 1.0)
+    context['user_id'] = user_id
+    context['session_id'] = data.get('session_id') or data.get('user_id')
+
+    logger.info(f"Received DJ request from {user_id}: {user_request}")
+    return user_request, context, user_id
+
+def user_status_rejection(user_status):
+    """Build the response for a muted or suspended user."""
+    return {
+        "success": False,
+        "response": user_status.get('message'),
+        "muted_until": user_status.get('muted_until'),
+        "suspended_until": user_status.get('suspended_until')
+    }
+
+def rate_limited_response(user_status):
+    """Build a 429 response telling a rate-limited client when to retry."""
+    response = jsonify({
+        "success": False,
+        "error": "rate_limited",
+        "response": user_status.get('message'),
+        "retry_after": user_status.get('retry_after'),
+        "scope": user_status.get('scope')
+    })
+    response.status_code = 429
+    response.headers['Retry-After'] = str(user_status.get('retry_after'))
+    return response
+
+def moderation_rejection(user_id, message, source='llm'):
+    """Record a warning for a rejected request and build the response.
+
+    Rejections by the local classifier alone are not counted as warnings,
+    so a misclassification can't lead to a mute.
+    """
+    if source == 'fast_path':
+        user_state = moderation_store.get_user(user_id) or {}
+    else:
+        user_state = update_user_warnings(user_id)
+    return {
+        "success": False,
+        "response": message,
+        "warnings": user_state.get('warnings', 0)
+    }
+
+def new_audio_name():
+    """Return a unique base name for a response's audio files."""
+    timestamp = datetime.now().strftime("%Y%m%d%H%M%S")
+    return f"{RESPONSE_AUDIO_PREFIX}{timestamp}_{uuid.uuid4().hex[:8]}"
+
+def synthesize_response(response_data, context):
+    """Convert a response to speech and save it.
+
+    Returns:
+        str or None: URL of the saved audio file
+    """
+    if not response_data.get('generate_audio', True):
+        return None
+
+    # Buffered responses come with their audio already rendered
+    if response_data.get('audio_path'):
+        return response_data['audio_path']
+
+    # Get voice ID from response data or use default
+    voice_id = response_data.get('voice_id')
+    voice_speed = context.get('voice_speed', 1.0)
+
+    # Repeated replies come straight from the TTS cache
+    audio_path = elevenlabs_client.speech_file(
+        response_data['response'],
+        voice_id=voice_id,
+        speed=voice_speed,
+        output_dir=AUDIO_OUTPUT_DIR
+    )
+    
+    return audio_url(audio_path) if audio_path else None
+
+def create_tts_pipeline(context, on_chunk=None, on_complete=None):
+    """Start synthesizing a response sentence by sentence.
+
+    Returns:
+        SentencePipeline or None: None if sentence-pipelined TTS is disabled
+    """
+    if not sentence_tts_enabled():
+        return None
+
+    dj_profile = get_dj_profile(context['dj_profile']) if context.get('dj_profile') else None
+    voice_id = dj_profile.get('voice_id') if dj_profile else None
+    voice_speed = context.get('voice_speed', 1.0)
+
+    # Chunks are served from the TTS cache rather than copied per response
+    def synthesize(text):
+        return elevenlabs_client.speech_file(text, voice_id=voice_id, speed=voice_speed,
+                                             output_dir=AUDIO_OUTPUT_DIR)
+
+    return SentencePipeline(synthesize, tts_executor, AUDIO_OUTPUT_DIR, new_audio_name(),
+                            on_chunk=on_chunk, on_complete=on_complete)
+
+def close_tts_pipeline(pipeline, response_data):
+    """Flush a pipeline with the final response.
+
+    Returns:
+        bool: True if the pipeline's audio can be used for this response
+    """
+    if not response_data.get('generate_audio', True) or response_data.get('audio_path'):
+        pipeline.abandon()
+        return False
+    return pipeline.close(response_data['response'])
+
+def finish_response_audio(response_data, context, pipeline=None):
+    """Produce the audio for a finished response.
+
+    Uses the sentence pipeline's chunks when available, falling back to
+    synthesizing the whole response in one call.
+
+    Returns:
+        tuple: (audio_path, audio_chunks) as URLs; audio_chunks is empty when
+        the response was synthesized in one piece
+    """
+    if pipeline is None or not close_tts_pipeline(pipeline, response_data):
+        return synthesize_response(response_data, context), []
+
+    chunk_paths = pipeline.wait()
+    combined_path = pipeline.concatenate()
+    prune_files(AUDIO_OUTPUT_DIR, RESPONSE_AUDIO_PREFIX, response_audio_limit())
+    audio_path = audio_url(combined_path) if combined_path else None
+    return audio_path, [audio_url(path) for path in chunk_paths]
+
+def format_sse(event, data):
+    """Format a Server-Sent Events message."""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
 @dj_interaction.route('/dj_request', methods=['POST'])
 def handle_dj_request():
     """Handle user requests sent to the DJ."""
     try:
-        data = request.json
-        user_request = data.get('request', '')
-        context = data.get('context', {})
-        user_id = data.get('user_id', 'default_user')
-        tone = data.get('tone', 'default')
-        voice_speed = data.get('voice_speed', 1.0)
-
-        # Pass tone and speed in context
-        context['tone'] = tone
-        context['voice_speed'] = voice_speed
-        
-        logger.info(f"Received DJ request from {user_id}: {user_request}")
+        user_request, context, user_id = parse_dj_request(request.json)
         
         # Check if user is allowed to interact
-        user_status = check_user_status(user_id)
+        user_status = check_user_status(user_id, cost=estimate_request_tokens(user_request))
+        if user_status.get('status') == 'rate_limited':
+            return rate_limited_response(user_status)
         if user_status.get('status') != 'active':
-            return jsonify({
-                "success": False,
-                "response": user_status.get('message'),
-                "muted_until": user_status.get('muted_until'),
-                "suspended_until": user_status.get('suspended_until')
-            })
+            return jsonify(user_status_rejection(user_status))
         
-        # Check for non-music content
-        is_music_related, moderation_result = check_music_relevance(user_request)
+        # Check for non-music content, generating the response speculatively
+        # when enabled so the two LLM calls overlap
+        is_music_related, moderation_result, pending, source = start_dj_request(user_request, context)
         if not is_music_related:
-            # Update user warnings
-            update_user_warnings(user_id)
-            return jsonify({
-                "success": False,
-                "response": moderation_result,
-                "warnings": user_states.get(user_id, {}).get('warnings', 0)
-            })
+            return jsonify(moderation_rejection(user_id, moderation_result, source))
         
-        # Process the request
-        response_data = process_dj_request(user_request, context)
+        # Synthesize each sentence as soon as it has been generated
+        response_future, relay = pending
+        pipeline = create_tts_pipeline(context)
+        if pipeline:
+            relay.attach(pipeline.feed)
+        
+        # Wait for the response
+        response_data = response_future.result()
         
         # Generate audio response if needed
-        audio_path = None
-        if response_data.get('generate_audio', True):
-            # Get voice ID from response data or use default
-            voice_id = response_data.get('voice_id')
-            voice_speed = context.get('voice_speed', 1.0)
-
-            audio_data = elevenlabs_client.text_to_speech(
-                response_data['response'],
-                voice_id=voice_id,
-                speed=voice_speed
-            )
-            
-            # Save audio file
-            timestamp = datetime.now().strftime("%Y%m%d%H%M%S")
-            audio_path = os.path.join('voicebot', 'outputs', f"dj_{timestamp}.mp3")
-            os.makedirs(os.path.dirname(audio_path), exist_ok=True)
-            
-            with open(audio_path, 'wb') as f:
-                f.write(audio_data)
-            
-            audio_path = f"/static/audio/{os.path.basename(audio_path)}"
+        audio_path, audio_chunks = finish_response_audio(response_data, context, pipeline)
         
         # Log the request and response
         log_interaction(user_request, response_data['response'], user_id)
+        remember_turn(context['session_id'], user_request, response_data['response'])
         
         return jsonify({
             "success": True,
             "response": response_data['response'],
             "audio_path": audio_path,
+            "audio_chunks": audio_chunks,
             "actions": response_data.get('actions', [])
         })
     except Exception as e:
@@ -376,87 +917,197 @@ def handle_dj_request():
             "error": str(e)
         }), 500
 
+@dj_interaction.route('/dj_request/stream', methods=['POST'])
+def stream_dj_request():
+    """Handle a DJ request, streaming each stage as Server-Sent Events.
+
+    Events are emitted in this order as each stage completes:
+    ``moderation`` (the verdict, with the rejection details on failure),
+    ``text-delta`` (response text as it is generated), ``text-done`` (the
+    final response text), ``actions`` and ``audio-ready``. With
+    sentence-pipelined TTS, ``audio-chunk`` events carry each sentence's
+    audio in order as soon as it is synthesized, interleaved with the text
+    events. An ``error`` event is sent if processing fails part-way through.
+    """
+    user_request, context, user_id = parse_dj_request(request.json)
+
+    # Rate limits are answered before the stream starts so clients get a 429
+    user_status = check_user_status(user_id, cost=estimate_request_tokens(user_request))
+    if user_status.get('status') == 'rate_limited':
+        return rate_limited_response(user_status)
+
+    def generate():
+        try:
+            if user_status.get('status') != 'active':
+                yield format_sse('moderation', user_status_rejection(user_status))
+                return
+
+            is_music_related, moderation_result, pending, source = start_dj_request(user_request, context)
+            if not is_music_related:
+                yield format_sse('moderation', moderation_rejection(user_id, moderation_result, source))
+                return
+            yield format_sse('moderation', {"success": True})
+
+            # Text deltas and audio chunks share one queue so they reach the
+            # client as soon as they are ready; None marks the end of a stage
+            events = queue.Queue()
+
+            def on_chunk(index, chunk_path):
+                if chunk_path:
+                    events.put(('audio-chunk', {"index": index, "audio_path": audio_url(chunk_path)}))
+
+            pipeline = create_tts_pipeline(context, on_chunk=on_chunk,
+                                           on_complete=lambda: events.put(None))
+
+            def on_delta(delta):
+                events.put(('text-delta', {"delta": delta}))
+                if pipeline:
+                    pipeline.feed(delta)
+
+            # The done callback runs after the last delta has been queued
+            response_future, relay = pending
+            relay.attach(on_delta)
+            response_future.add_done_callback(lambda _: events.put(None))
+            for event in iter(events.get, None):
+                yield format_sse(*event)
+
+            response_data = response_future.result()
+            yield format_sse('text-done', {"response": response_data['response']})
+            yield format_sse('actions', {"actions": response_data.get('actions', [])})
+
+            # Flush the last sentence and relay the remaining audio chunks
+            if pipeline and close_tts_pipeline(pipeline, response_data):
+                for event in iter(events.get, None):
+                    yield format_sse(*event)
+            audio_path, audio_chunks = finish_response_audio(response_data, context, pipeline)
+            yield format_sse('audio-ready', {"audio_path": audio_path, "audio_chunks": audio_chunks})
+
+            log_interaction(user_request, response_data['response'], user_id)
+            remember_turn(context['session_id'], user_request, response_data['response'])
+        except Exception as e:
+            logger.error(f"Error streaming DJ request: {str(e)}")
+            yield format_sse('error', {"error": str(e)})
+
+    return Response(generate(), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
+
+def load_dj_profile(profile_id):
+    """Read a DJ profile from the settings database."""
+    # Import here to avoid circular imports
+    from server.routes.settings import get_db_connection
+    
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    
+    cursor.execute('SELECT id, name, voice_id, personality FROM dj_profiles WHERE id = ?', (profile_id,))
+    profile = cursor.fetchone()
+    
+    conn.close()
+    
+    if profile:
+        return {
+            "id": profile['id'],
+            "name": profile['name'],
+            "voice_id": profile['voice_id'],
+            "personality": profile['personality']
+        }
+    
+    return None
+
 def get_dj_profile(profile_id):
-    """Get a DJ profile by ID."""
+    """Get a DJ profile by ID from the profile cache."""
     try:
-        # Import here to avoid circular imports
-        from server.routes.settings import get_db_connection
-        
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute('SELECT id, name, voice_id, personality FROM dj_profiles WHERE id = ?', (profile_id,))
-        profile = cursor.fetchone()
-        
-        conn.close()
-        
-        if profile:
-            return {
-                "id": profile['id'],
-                "name": profile['name'],
-                "voice_id": profile['voice_id'],
-                "personality": profile['personality']
-            }
-        
-        return None
+        return dj_profile_cache.get(profile_id, load_dj_profile)
     except Exception as e:
         logger.error(f"Error getting DJ profile: {str(e)}")
         return None
 
-def check_music_relevance(request_text):
+def discard_profile_trivia(profile_id):
+    """Drop buffered trivia rendered with a profile that has changed."""
+    if trivia_buffer is None:
+        return
+    if profile_id is None:
+        trivia_buffer.clear()
+    else:
+        trivia_buffer.clear(match=lambda key: key[0] == str(profile_id))
+
+dj_profile_cache.add_listener(discard_profile_trivia)
+
+def fast_path_rejects_enabled():
+    """Return True if the local classifier may reject requests on its own."""
+    if app_config is None:
+        return False
+    return app_config.moderation_fast_path_reject
+
+def fast_path_verdict(request_text):
+    """Return a local moderation verdict, or None to escalate to the LLM.
+
+    Confident rejects are escalated too unless fast-path rejects are enabled.
+    """
+    if moderation_classifier is None:
+        return None
+    return moderation_classifier.classify(request_text, allow_reject=fast_path_rejects_enabled())
+
+def check_music_relevance(request_text, now_playing=None):
     """Check if the request is music-related and appropriate.
+
+    Verdicts for previously seen phrasings come from the moderation cache and
+    obvious music requests are accepted by the local classifier; anything
+    else is escalated to the LLM moderation prompt.
+
+    Args:
+        request_text (str): The request to check
+        now_playing (dict, optional): Current song, used to normalize the
+            cache key
     
     Returns:
-        tuple: (is_music_related, message)
+        tuple: (is_music_related, message, source) where source is 'cache',
+        'fast_path' or 'llm'
     """
+    cached = moderation_cache.get(request_text, now_playing)
+    if cached:
+        return cached['is_music_related'], cached['message'], 'cache'
+
+    verdict = fast_path_verdict(request_text)
+    if verdict is True:
+        return True, "Music-related content", 'fast_path'
+    if verdict is False:
+        return False, DEFAULT_REJECTION_MESSAGE, 'fast_path'
+
     # Load moderation prompt
-    try:
-        with open(os.path.join('prompts', 'moderation.json'), 'r') as f:
-            moderation_prompt = json.load(f)
-    except FileNotFoundError:
-        # Fallback prompt if file not found
-        moderation_prompt = {
-            "system": "You are a content moderator for a music DJ system. Your job is to determine if user requests are music-related and appropriate. Respond with 'MUSIC_RELATED' if the request is about music, artists, songs, playlists, or music history. Respond with 'NOT_MUSIC_RELATED' followed by a witty but authoritative explanation if the request is inappropriate or not related to music.",
-            "user": "{request}"
-        }
+    moderation_prompt = prompts.get('moderation') or FALLBACK_MODERATION_PROMPT
     
     # Format the prompt with the request
-    user_prompt = moderation_prompt["user"].format(request=request_text)
-    
-    messages = [
-        {"role": "system", "content": moderation_prompt["system"]},
-        {"role": "user", "content": user_prompt}
-    ]
+    messages = moderation_prompt.messages(request=request_text)
     result = openai_client.chat_completion(messages, max_tokens=150).strip()
+    is_music_related = result.startswith("MUSIC_RELATED")
+    if moderation_classifier:
+        moderation_classifier.record_verdict(request_text, is_music_related)
     
-    if result.startswith("MUSIC_RELATED"):
-        return True, "Music-related content"
+    if is_music_related:
+        message = "Music-related content"
     else:
         # Extract the explanation (remove the NOT_MUSIC_RELATED prefix)
-        explanation = result.replace("NOT_MUSIC_RELATED", "").strip()
-        if not explanation:
-            explanation = "Sorry, I only respond to music-related questions. I'm a DJ, not a general assistant."
-        return False, explanation
+        message = result.replace("NOT_MUSIC_RELATED", "").strip()
+        if not message:
+            message = DEFAULT_REJECTION_MESSAGE
+    moderation_cache.set(request_text, is_music_related, message, now_playing=now_playing)
+    return is_music_related, message, 'llm'
 
-def check_user_status(user_id):
+def check_user_status(user_id, cost=0):
     """Check if a user is allowed to interact with the DJ.
     
+    Args:
+        user_id (str): User making the request
+        cost (int): Estimated tokens the request will use, charged against
+            the user's and the global rate limit
+    
     Returns:
         dict: User status information
     """
-    if user_id not in user_states:
-        # Initialize new user
-        user_states[user_id] = {
-            'status': 'active',
-            'warnings': 0,
-            'mutes': 0,
-            'muted_until': None,
-            'suspended_until': None,
-            'last_request': datetime.now().timestamp()
-        }
-        return {'status': 'active', 'message': 'Welcome to AI DJ!'}
-    
-    user_state = user_states[user_id]
+    user_state, created = moderation_store.touch(user_id)
     current_time = datetime.now().timestamp()
     
     # Check if user is suspended
@@ -477,78 +1128,42 @@ def check_user_status(user_id):
             'muted_until': user_state['muted_until']
         }
     
-    # If user was muted or suspended but time has passed, reset status
-    if user_state.get('status') != 'active':
-        user_state['status'] = 'active'
-        user_state['muted_until'] = None
-        user_state['suspended_until'] = None
-    
-    # Update last request time
-    user_state['last_request'] = current_time
+    # Check the request fits in the user's and the global budget
+    if rate_limiter is not None and cost:
+        allowed, retry_after, scope = rate_limiter.acquire(user_id, cost)
+        if not allowed:
+            retry_after = max(1, math.ceil(min(retry_after, 24 * 3600)))
+            if scope == 'user':
+                message = f"Whoa, slow down! You can send another request in {retry_after} seconds."
+            else:
+                message = f"The DJ is swamped right now. Please try again in {retry_after} seconds."
+            return {
+                'status': 'rate_limited',
+                'message': message,
+                'retry_after': retry_after,
+                'scope': scope
+            }
     
+    if created:
+        return {'status': 'active', 'message': 'Welcome to AI DJ!'}
     return {'status': 'active', 'message': 'Active user'}
 
 def update_user_warnings(user_id):
-    """Update user warnings and apply muting/suspension if needed."""
-    if user_id not in user_states:
-        user_states[user_id] = {
-            'status': 'active',
-            'warnings': 1,
-            'mutes': 0,
-            'last_request': datetime.now().timestamp()
-        }
-        return
-    
-    user_state = user_states[user_id]
-    current_time = datetime.now().timestamp()
+    """Update user warnings and apply muting/suspension if needed.
     
-    # Increment warnings
-    user_state['warnings'] = user_state.get('warnings', 0) + 1
-    
-    # Check if user should be muted
-    if user_state['warnings'] >= moderation_rules['warning_threshold']:
-        user_state['status'] = 'muted'
-        user_state['muted_until'] = current_time + moderation_rules['mute_duration']
-        user_state['mutes'] = user_state.get('mutes', 0) + 1
-        user_state['warnings'] = 0  # Reset warnings after muting
-        
-        # Check if user should be suspended after multiple mutes
-        if user_state['mutes'] >= moderation_rules['mute_threshold']:
-            user_state['status'] = 'suspended'
-            user_state['suspended_until'] = current_time + moderation_rules['suspension_duration']
-            user_state['mutes'] = 0  # Reset mutes after suspension
+    Returns:
+        dict: The user's updated state
+    """
+    return moderation_store.record_warning(user_id)
 
 def log_interaction(request, response, user_id='default_user'):
     """Log user-DJ interactions."""
-    try:
-        log_dir = os.path.join('logs')
-        os.makedirs(log_dir, exist_ok=True)
-        
-        log_file = os.path.join(log_dir, 'dj_interactions.json')
-        
-        # Load existing log or create new one
-        if os.path.exists(log_file):
-            with open(log_file, 'r') as f:
-                try:
-                    logs = json.load(f)
-                except json.JSONDecodeError:
-                    logs = []
-        else:
-            logs = []
-        
-        # Add new log entry
-        logs.append({
-            "timestamp": datetime.now().isoformat(),
-            "user_id": user_id,
-            "request": request,
-            "response": response
-        })
-        
-        # Save logs (keep only last 100 entries)
-        with open(log_file, 'w') as f:
-            json.dump(logs[-100:], f, indent=2)
-    except Exception as e:
-        logger.error(f"Error logging interaction: {str(e)}")
+    interaction_log.append({
+        "timestamp": datetime.now().isoformat(),
+        "user_id": user_id,
+        "request": request,
+        "response": response
+    })
 
 # Additional routes for DJ interaction
 
@@ -556,15 +1171,7 @@ def log_interaction(request, response, user_id='default_user'):
 def get_recent_interactions():
     """Get recent DJ interactions."""
     try:
-        log_file = os.path.join('logs', 'dj_interactions.json')
-        
-        if not os.path.exists(log_file):
-            return jsonify({"interactions": []})
-        
-        with open(log_file, 'r') as f:
-            logs = json.load(f)
-        
-        return jsonify({"interactions": logs[-10:]})  # Return last 10 interactions
+        return jsonify({"interactions": interaction_log.tail(10)})  # Return last 10 interactions
     except Exception as e:
         logger.error(f"Error getting recent interactions: {str(e)}")
         return jsonify({"error": str(e)}), 500
@@ -574,29 +1181,16 @@ def get_recent_interactions():
 @dj_interaction.route('/user_status/<user_id>', methods=['GET'])
 def get_user_status(user_id):
     """Get the status of a specific user."""
-    if user_id not in user_states:
+    user_state = moderation_store.get_user(user_id)
+    if user_state is None:
         return jsonify({
             "status": "active",
             "warnings": 0,
             "mutes": 0
         })
     
-    user_state = user_states[user_id]
-    current_time = datetime.now().timestamp()
-    
     # Check if mute/suspension has expired
-    if user_state.get('status') != 'active':
-        if (user_state.get('status') == 'muted' and 
-            user_state.get('muted_until') and 
-            current_time >= user_state['muted_until']):
-            user_state['status'] = 'active'
-            user_state['muted_until'] = None
-        
-        if (user_state.get('status') == 'suspended' and 
-            user_state.get('suspended_until') and 
-            current_time >= user_state['suspended_until']):
-            user_state['status'] = 'active'
-            user_state['suspended_until'] = None
+    expire_penalties(user_state, datetime.now().timestamp())
     
     return jsonify({
         "status": user_state.get('status', 'active'),
@@ -606,42 +1200,120 @@ def get_user_status(user_id):
         "suspended_until": user_state.get('suspended_until')
     })
 
+@dj_interaction.route('/user_statuses', methods=['GET'])
+def get_user_statuses():
+    """Get the status of many users in one response.
+
+    Query parameters:
+        since: Cursor from a previous response; only users changed after it
+            are returned
+        active_within: Only users who made a request in this many seconds
+        limit: Page size (default 100, at most 500)
+    """
+    try:
+        limit = min(max(int(request.args.get('limit', 100)), 1), 500)
+        active_within = request.args.get('active_within')
+        active_since = None
+        if active_within:
+            active_since = datetime.now().timestamp() - float(active_within)
+        users, next_since, has_more = moderation_store.list_users(
+            since=request.args.get('since'), active_since=active_since, limit=limit)
+    except ValueError:
+        return jsonify({"error": "Invalid since, active_within or limit parameter"}), 400
+
+    current_time = datetime.now().timestamp()
+    statuses = []
+    for user_state in users:
+        updated_at = user_state['updated_at']
+        # Check if mute/suspension has expired
+        expire_penalties(user_state, current_time)
+        statuses.append({
+            "user_id": user_state['user_id'],
+            "status": user_state.get('status', 'active'),
+            "warnings": user_state.get('warnings', 0),
+            "mutes": user_state.get('mutes', 0),
+            "muted_until": user_state.get('muted_until'),
+            "suspended_until": user_state.get('suspended_until'),
+            "last_request": user_state.get('last_request'),
+            "updated_at": updated_at
+        })
+
+    return jsonify({
+        "users": statuses,
+        "next_since": next_since,
+        "has_more": has_more
+    })
+
 @dj_interaction.route('/reset_user/<user_id>', methods=['POST'])
 def reset_user(user_id):
     """Reset a user's status (admin function)."""
-    if user_id in user_states:
-        user_states[user_id] = {
-            'status': 'active',
-            'warnings': 0,
-            'mutes': 0,
-            'muted_until': None,
-            'suspended_until': None,
-            'last_request': datetime.now().timestamp()
-        }
+    moderation_store.reset_user(user_id)
     
     return jsonify({
         "success": True,
         "message": f"User {user_id} has been reset"
     })
 
+@dj_interaction.route('/moderation_stats', methods=['GET'])
+def get_moderation_stats():
+    """Get moderation fast-path statistics."""
+    stats = {
+        "fast_path": moderation_classifier.stats() if moderation_classifier else None,
+        "cache": moderation_cache.stats(),
+        "state_store": moderation_store.stats()
+    }
+    return jsonify(stats)
+
+@dj_interaction.route('/rate_limit_stats', methods=['GET'])
+def get_rate_limit_stats():
+    """Report allowed and rate-limited request counters."""
+    if rate_limiter is None:
+        return jsonify({"enabled": False})
+    return jsonify(dict(rate_limiter.stats(), enabled=True))
+
+@dj_interaction.route('/conversation_stats', methods=['GET'])
+def get_conversation_stats():
+    """Report conversation memory size and summarization counters."""
+    if conversation_memory is None:
+        return jsonify({"enabled": False})
+    return jsonify(dict(conversation_memory.stats(), enabled=True))
+
+@dj_interaction.route('/library_index_stats', methods=['GET'])
+def get_library_index_stats():
+    """Report library index size and lookup counters."""
+    if library_index is None:
+        return jsonify({"enabled": False})
+    return jsonify(dict(library_index.stats(), enabled=True))
+
+@dj_interaction.route('/trivia_buffer_stats', methods=['GET'])
+def get_trivia_buffer_stats():
+    """Report buffered trivia levels and hit rate."""
+    if trivia_buffer is None:
+        return jsonify({"enabled": False})
+    return jsonify(dict(trivia_buffer.stats(), enabled=True))
+
+@dj_interaction.route('/profile_cache_stats', methods=['GET'])
+def get_profile_cache_stats():
+    """Report DJ profile cache size and hit rate."""
+    return jsonify(dj_profile_cache.stats())
+
 @dj_interaction.route('/moderation_settings', methods=['GET', 'POST'])
 def manage_moderation_settings():
     """Get or update moderation settings."""
-    global moderation_rules
-    
     if request.method == 'POST':
         data = request.json
         
-        # Update moderation rules
-        for key in ['mute_duration', 'warning_threshold', 'mute_threshold', 'suspension_duration']:
-            if key in data:
-                moderation_rules[key] = data[key]
+        # Update moderation rules for every worker
+        try:
+            settings = moderation_store.update_rules(data)
+        except (TypeError, ValueError):
+            return jsonify({"error": "Moderation settings must be whole numbers"}), 400
         
         return jsonify({
             "success": True,
             "message": "Moderation settings updated",
-            "settings": moderation_rules
+            "settings": settings
         })
     
     # GET request - return current settings
-    return jsonify(moderation_rules)
+    return jsonify(moderation_store.rules())
@@ -6,6 +6,7 @@ from datetime import datetime
 from flask import Blueprint, request, jsonify, current_app
 from werkzeug.security import generate_password_hash, check_password_hash
 from dotenv import load_dotenv
+from server.utils.profile_cache import SQLiteVersionStamp, dj_profile_cache
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -15,9 +16,14 @@ logger = logging.getLogger(__name__)
 settings = Blueprint('settings', __name__)
 
 # Database setup
+SETTINGS_DB_PATH = os.path.join('data', 'user_settings.db')
+
+# Profile changes saved by any worker process reach every worker's cache
+dj_profile_cache.use_stamp(SQLiteVersionStamp(SETTINGS_DB_PATH, 'dj_profiles'))
+
 def get_db_connection():
     """Get a connection to the SQLite database."""
-    db_path = os.path.join('data', 'user_settings.db')
+    db_path = SETTINGS_DB_PATH
     os.makedirs(os.path.dirname(db_path), exist_ok=True)
     conn = sqlite3.connect(db_path)
     conn.row_factory = sqlite3.Row
@@ -296,6 +302,7 @@ def add_dj_profile():
         
         conn.commit()
         conn.close()
+        dj_profile_cache.invalidate(profile_id)
         
         return jsonify({
             "success": True, 
@@ -330,6 +337,7 @@ def delete_dj_profile(profile_id):
         
         conn.commit()
         conn.close()
+        dj_profile_cache.invalidate(profile_id)
         
         return jsonify({"success": True, "message": "DJ profile deleted successfully"})
     except Exception as e:
@@ -364,6 +372,7 @@ def activate_dj_profile(profile_id):
         
         conn.commit()
         conn.close()
+        dj_profile_cache.invalidate(profile_id)
         
         return jsonify({"success": True, "message": "DJ profile activated successfully"})
     except Exception as e:
@@ -502,6 +511,8 @@ def import_settings():
         
         conn.commit()
         conn.close()
+        if 'dj_profiles' in settings_data:
+            dj_profile_cache.invalidate()
         
         return jsonify({"success": True, "message": "Settings imported successfully"})
     except Exception as e:
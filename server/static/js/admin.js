@@ -23,11 +23,11 @@ function initAdminInterface() {
     
     // Add event listeners
     document.getElementById('save-settings-btn').addEventListener('click', saveModerationSettings);
-    document.getElementById('refresh-users-btn').addEventListener('click', loadUserStatusList);
+    document.getElementById('refresh-users-btn').addEventListener('click', () => loadUserStatusList());
     document.getElementById('refresh-interactions-btn').addEventListener('click', loadRecentInteractions);
     
-    // Set up interval to refresh user list every 30 seconds
-    setInterval(loadUserStatusList, 30000);
+    // Set up interval to fetch changed users every 30 seconds
+    setInterval(() => loadUserStatusList(true), 30000);
     
     // Set up interval to refresh interactions every 60 seconds
     setInterval(loadRecentInteractions, 60000);
@@ -95,116 +95,151 @@ function saveModerationSettings() {
     });
 }
 
+// Users shown in the status table, keyed by user ID
+const userStatuses = new Map();
+// Cursor from the last status response; only users changed after it are fetched
+let userStatusCursor = null;
+// Only list users who made a request in the last day
+const USER_STATUS_WINDOW = 24 * 60 * 60;
+
 /**
  * Load user status list
+ * @param {boolean} incremental - Only fetch users changed since the last load
  */
-function loadUserStatusList() {
+function loadUserStatusList(incremental) {
     // Get user list container
     const userListContainer = document.getElementById('user-list');
     
-    // Show loading message
-    userListContainer.innerHTML = '<div class="text-center"><i class="fas fa-spinner fa-spin"></i> Loading user data...</div>';
+    if (incremental !== true) {
+        userStatuses.clear();
+        userStatusCursor = null;
+        
+        // Show loading message
+        userListContainer.innerHTML = '<div class="text-center"><i class="fas fa-spinner fa-spin"></i> Loading user data...</div>';
+    }
     
-    // Get recent interactions to find active users
-    fetch('/api/recent_interactions')
-        .then(response => response.json())
-        .then(data => {
-            // Extract unique user IDs
-            const userIds = [...new Set(data.map(item => item.user_id))];
-            
-            // If no users found
-            if (userIds.length === 0) {
-                userListContainer.innerHTML = '<div class="text-center">No active users found</div>';
-                return;
-            }
-            
-            // Get status for each user
-            Promise.all(userIds.map(userId => 
-                fetch(`/api/user_status/${userId}`)
-                    .then(response => response.json())
-                    .then(status => ({ userId, ...status }))
-            ))
-            .then(userStatuses => {
-                // Clear container
-                userListContainer.innerHTML = '';
-                
-                // Create table
-                const table = document.createElement('table');
-                table.className = 'table table-dark table-striped';
-                table.innerHTML = `
-                    <thead>
-                        <tr>
-                            <th>User ID</th>
-                            <th>Status</th>
-                            <th>Warnings</th>
-                            <th>Mutes</th>
-                            <th>Time Remaining</th>
-                            <th>Actions</th>
-                        </tr>
-                    </thead>
-                    <tbody id="user-table-body"></tbody>
-                `;
-                
-                userListContainer.appendChild(table);
-                const tableBody = document.getElementById('user-table-body');
-                
-                // Add rows for each user
-                userStatuses.forEach(user => {
-                    const row = document.createElement('tr');
-                    
-                    // Calculate time remaining if muted or suspended
-                    let timeRemaining = '';
-                    const currentTime = Math.floor(Date.now() / 1000);
-                    
-                    if (user.status === 'muted' && user.muted_until && user.muted_until > currentTime) {
-                        const seconds = Math.floor(user.muted_until - currentTime);
-                        timeRemaining = `${seconds}s`;
-                    } else if (user.status === 'suspended' && user.suspended_until && user.suspended_until > currentTime) {
-                        const totalSeconds = Math.floor(user.suspended_until - currentTime);
-                        const minutes = Math.floor(totalSeconds / 60);
-                        const seconds = totalSeconds % 60;
-                        timeRemaining = `${minutes}m ${seconds}s`;
-                    }
-                    
-                    // Status badge class
-                    let statusBadgeClass = 'bg-success';
-                    if (user.status === 'muted') {
-                        statusBadgeClass = 'bg-warning';
-                    } else if (user.status === 'suspended') {
-                        statusBadgeClass = 'bg-danger';
-                    }
-                    
-                    row.innerHTML = `
-                        <td>${user.userId}</td>
-                        <td><span class="badge ${statusBadgeClass}">${user.status}</span></td>
-                        <td>${user.warnings || 0}</td>
-                        <td>${user.mutes || 0}</td>
-                        <td>${timeRemaining}</td>
-                        <td>
-                            <button class="btn btn-sm btn-primary reset-user-btn" data-user-id="${user.userId}">
-                                Reset
-                            </button>
-                        </td>
-                    `;
-                    
-                    tableBody.appendChild(row);
-                });
-                
-                // Add event listeners to reset buttons
-                document.querySelectorAll('.reset-user-btn').forEach(button => {
-                    button.addEventListener('click', function() {
-                        const userId = this.getAttribute('data-user-id');
-                        resetUser(userId);
-                    });
-                });
-            });
-        })
+    fetchUserStatusPages(userStatusCursor)
+        .then(() => renderUserStatusList())
         .catch(error => {
             console.error('Error loading user data:', error);
             userListContainer.innerHTML = '<div class="text-center text-danger">Error loading user data</div>';
         });
 }
 
+/**
+ * Fetch every page of user statuses changed after a cursor
+ * @param {string|null} since - Cursor from a previous response
+ * @returns {Promise}
+ */
+function fetchUserStatusPages(since) {
+    const params = new URLSearchParams({ active_within: USER_STATUS_WINDOW, limit: 100 });
+    if (since) {
+        params.set('since', since);
+    }
+    
+    return fetch(`/api/user_statuses?${params}`)
+        .then(response => response.json())
+        .then(data => {
+            data.users.forEach(user => userStatuses.set(user.user_id, user));
+            userStatusCursor = data.next_since;
+            if (data.has_more) {
+                return fetchUserStatusPages(data.next_since);
+            }
+        });
+}
+
+/**
+ * Render the user status table from the loaded statuses
+ */
+function renderUserStatusList() {
+    const userListContainer = document.getElementById('user-list');
+    const currentTime = Math.floor(Date.now() / 1000);
+    const users = [...userStatuses.values()]
+        .filter(user => user.last_request >= currentTime - USER_STATUS_WINDOW)
+        .sort((a, b) => b.last_request - a.last_request);
+    
+    // If no users found
+    if (users.length === 0) {
+        userListContainer.innerHTML = '<div class="text-center">No active users found</div>';
+        return;
+    }
+    
+    // Clear container
+    userListContainer.innerHTML = '';
+    
+    // Create table
+    const table = document.createElement('table');
+    table.className = 'table table-dark table-striped';
+    table.innerHTML = `
+        <thead>
+            <tr>
+                <th>User ID</th>
+                <th>Status</th>
+                <th>Warnings</th>
+                <th>Mutes</th>
+                <th>Time Remaining</th>
+                <th>Actions</th>
+            </tr>
+        </thead>
+        <tbody id="user-table-body"></tbody>
+    `;
+    
+    userListContainer.appendChild(table);
+    const tableBody = document.getElementById('user-table-body');
+    
+    // Add rows for each user, most recently active first
+    users.forEach(user => {
+        const row = document.createElement('tr');
+        
+        // Calculate time remaining if muted or suspended
+        let timeRemaining = '';
+        
+        if (user.status === 'muted' && user.muted_until && user.muted_until > currentTime) {
+            const seconds = Math.floor(user.muted_until - currentTime);
+            timeRemaining = `${seconds}s`;
+        } else if (user.status === 'suspended' && user.suspended_until && user.suspended_until > currentTime) {
+            const totalSeconds = Math.floor(user.suspended_until - currentTime);
+            const minutes = Math.floor(totalSeconds / 60);
+            const seconds = totalSeconds % 60;
+            timeRemaining = `${minutes}m ${seconds}s`;
+        }
+        
+        // Mutes and suspensions expire without a status change being sent
+        const status = timeRemaining ? user.status : 'active';
+        
+        // Status badge class
+        let statusBadgeClass = 'bg-success';
+        if (status === 'muted') {
+            statusBadgeClass = 'bg-warning';
+        } else if (status === 'suspended') {
+            statusBadgeClass = 'bg-danger';
+        }
+        
+        row.innerHTML = `
+            <td>${user.user_id}</td>
+            <td><span class="badge ${statusBadgeClass}">${status}</span></td>
+            <td>${user.warnings || 0}</td>
+            <td>${user.mutes || 0}</td>
+            <td>${timeRemaining}</td>
+            <td>
+                <button class="btn btn-sm btn-primary reset-user-btn" data-user-id="${user.user_id}">
+                    Reset
+                </button>
+            </td>
+        `;
+        
+        tableBody.appendChild(row);
+    });
+    
+    // Add event listeners to reset buttons
+    document.querySelectorAll('.reset-user-btn').forEach(button => {
+        button.addEventListener('click', function() {
+            const userId = this.getAttribute('data-user-id');
+            resetUser(userId);
+        });
+    });
+}
+
 /**
  * Reset a user's status
  * @param {string} userId - User ID to reset
@@ -217,7 +252,7 @@ function resetUser(userId) {
     .then(data => {
         if (data.success) {
             showAlert('success', `User ${userId} has been reset`);
-            loadUserStatusList(); // Refresh the list
+            loadUserStatusList(true); // Refresh the changed user
         } else {
             showAlert('error', 'Failed to reset user');
         }
@@ -239,9 +274,9 @@ function loadRecentInteractions() {
     interactionsContainer.innerHTML = '<div class="text-center"><i class="fas fa-spinner fa-spin"></i> Loading interactions...</div>';
     
     // Fetch recent interactions
-    fetch('/api/recent_interactions')
+    fetch('/api/recent_dj_interactions')
         .then(response => response.json())
-        .then(data => {
+        .then(({ interactions: data }) => {
             // If no interactions found
             if (data.length === 0) {
                 interactionsContainer.innerHTML = '<div class="text-center">No recent interactions found</div>';
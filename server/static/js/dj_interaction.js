@@ -9,11 +9,16 @@ let isListening = false;
 let requestQueue = [];
 let isProcessingRequest = false;
 let userId = localStorage.getItem('dj_user_id') || generateUserId();
+let sessionId = sessionStorage.getItem('dj_session_id') || generateSessionId();
 let userStatus = 'active';
 let warningCount = 0;
 let mutedUntil = null;
 let suspendedUntil = null;
+let rateLimitedUntil = 0;
+let rateLimitTimer = null;
 let activeDjProfile = null;
+let chunkPlayer = null;
+let chunkQueue = [];
 
 // Initialize when document is ready
 document.addEventListener('DOMContentLoaded', function() {
@@ -169,6 +174,15 @@ function generateUserId() {
     return id;
 }
 
+/**
+ * Generate a conversation session ID for this tab
+ */
+function generateSessionId() {
+    const id = 'session_' + Math.random().toString(36).substring(2, 15);
+    sessionStorage.setItem('dj_session_id', id);
+    return id;
+}
+
 /**
  * Check user status
  */
@@ -442,6 +456,18 @@ function processRequestQueue() {
         return;
     }
     
+    // Hold queued requests until the server's Retry-After has passed
+    const waitMs = rateLimitedUntil - Date.now();
+    if (waitMs > 0) {
+        if (!rateLimitTimer) {
+            rateLimitTimer = setTimeout(() => {
+                rateLimitTimer = null;
+                processRequestQueue();
+            }, waitMs);
+        }
+        return;
+    }
+    
     isProcessingRequest = true;
     const request = requestQueue.shift();
     updateRequestQueue();
@@ -449,28 +475,125 @@ function processRequestQueue() {
     // Show loading message
     addMessageToChat('dj', '<i class="fas fa-spinner fa-spin"></i> Processing your request...');
     
-    // Send request to server
-    fetch('/api/dj_request', {
+    const payload = {
+        request: request,
+        user_id: userId,
+        session_id: sessionId,
+        tone: localStorage.getItem('ai_dj_response_tone') || 'default',
+        voice_speed: parseFloat(localStorage.getItem('ai_dj_voice_speed') || '1'),
+        context: {
+            now_playing: getCurrentSongInfo(),
+            dj_profile: activeDjProfile ? activeDjProfile.id : null
+        }
+    };
+    
+    // Stream the response when the browser can read response bodies
+    const canStream = window.ReadableStream && window.TextDecoder;
+    const pendingRequest = canStream ? streamDJRequest(payload) : sendDJRequestJSON(payload);
+    
+    pendingRequest
+        .catch(error => {
+            console.error('Error processing DJ request:', error);
+            
+            // Remove loading message
+            removeLoadingMessage();
+            
+            // Add error message
+            addMessageToChat('dj', 'Sorry, I encountered an error processing your request. Please try again.', null, 'error');
+        })
+        .finally(() => {
+            isProcessingRequest = false;
+        });
+}
+
+/**
+ * Remove the "Processing your request..." message
+ */
+function removeLoadingMessage() {
+    const chatContainer = document.getElementById('dj-chat-container');
+    const loading = chatContainer.lastChild;
+    if (loading && loading.querySelector && loading.querySelector('.fa-spinner')) {
+        chatContainer.removeChild(loading);
+    }
+}
+
+/**
+ * Handle a rejected request (moderation, mute or suspension)
+ * @param {Object} data - Response data from the server
+ */
+function handleRejectedRequest(data) {
+    if (data.retry_after !== undefined) {
+        rateLimitedUntil = Date.now() + data.retry_after * 1000;
+        addMessageToChat('dj', data.response, null, 'warning');
+    } else if (data.warnings !== undefined) {
+        warningCount = data.warnings;
+        addMessageToChat('dj', data.response, null, 'warning');
+        updateUserStatusDisplay();
+    } else if (data.muted_until || data.suspended_until) {
+        mutedUntil = data.muted_until;
+        suspendedUntil = data.suspended_until;
+        userStatus = data.muted_until ? 'muted' : 'suspended';
+        addMessageToChat('dj', data.response, null, 'error');
+        updateUserStatusDisplay();
+    } else {
+        // General error
+        addMessageToChat('dj', data.error || 'Sorry, I encountered an error processing your request.', null, 'error');
+    }
+}
+
+/**
+ * Play a DJ audio response
+ * @param {string} audioPath - URL of the audio file
+ */
+function playDJAudio(audioPath) {
+    const audioPlayer = document.getElementById('audio-player');
+    audioPlayer.src = audioPath;
+    audioPlayer.play();
+}
+
+/**
+ * Queue a sentence of DJ audio, playing chunks back to back in arrival order
+ * @param {string} audioPath - URL of the audio chunk
+ */
+function queueDJAudioChunk(audioPath) {
+    if (!chunkPlayer) {
+        chunkPlayer = new Audio();
+        chunkPlayer.addEventListener('ended', playNextAudioChunk);
+    }
+    chunkQueue.push(audioPath);
+    if (chunkPlayer.paused && chunkQueue.length === 1) {
+        playNextAudioChunk();
+    }
+}
+
+/**
+ * Play the next queued DJ audio chunk, if any
+ */
+function playNextAudioChunk() {
+    if (chunkQueue.length === 0) {
+        return;
+    }
+    chunkPlayer.src = chunkQueue.shift();
+    chunkPlayer.play();
+}
+
+/**
+ * Send a DJ request and wait for the complete JSON response
+ * @param {Object} payload - Request body
+ * @returns {Promise}
+ */
+function sendDJRequestJSON(payload) {
+    return fetch('/api/dj_request', {
         method: 'POST',
         headers: {
             'Content-Type': 'application/json'
         },
-        body: JSON.stringify({
-            request: request,
-            user_id: userId,
-            tone: localStorage.getItem('ai_dj_response_tone') || 'default',
-            voice_speed: parseFloat(localStorage.getItem('ai_dj_voice_speed') || '1'),
-            context: {
-                now_playing: getCurrentSongInfo(),
-                dj_profile: activeDjProfile ? activeDjProfile.id : null
-            }
-        })
+        body: JSON.stringify(payload)
     })
     .then(response => response.json())
     .then(data => {
         // Remove loading message
-        const chatContainer = document.getElementById('dj-chat-container');
-        chatContainer.removeChild(chatContainer.lastChild);
+        removeLoadingMessage();
         
         if (data.success) {
             // Add DJ response to chat
@@ -478,44 +601,147 @@ function processRequestQueue() {
             
             // Play audio if available
             if (data.audio_path) {
-                const audioPlayer = document.getElementById('audio-player');
-                audioPlayer.src = data.audio_path;
-                audioPlayer.play();
+                playDJAudio(data.audio_path);
             }
         } else {
             // Handle moderation response
-            if (data.warnings !== undefined) {
-                warningCount = data.warnings;
-                addMessageToChat('dj', data.response, null, 'warning');
-                updateUserStatusDisplay();
-            } else if (data.muted_until || data.suspended_until) {
-                mutedUntil = data.muted_until;
-                suspendedUntil = data.suspended_until;
-                userStatus = data.muted_until ? 'muted' : 'suspended';
-                addMessageToChat('dj', data.response, null, 'error');
-                updateUserStatusDisplay();
-            } else {
-                // General error
-                addMessageToChat('dj', data.error || 'Sorry, I encountered an error processing your request.', null, 'error');
+            handleRejectedRequest(data);
+        }
+    });
+}
+
+/**
+ * Send a DJ request and render the response as it streams in
+ * @param {Object} payload - Request body
+ * @returns {Promise}
+ */
+function streamDJRequest(payload) {
+    let messageText = null;
+    let messageContent = null;
+    let chunksPlayed = false;
+    
+    const handlers = {
+        'moderation': data => {
+            if (!data.success) {
+                removeLoadingMessage();
+                handleRejectedRequest(data);
+            }
+        },
+        'text-delta': data => {
+            if (!messageText) {
+                removeLoadingMessage();
+                addMessageToChat('dj', '');
+                const chatContainer = document.getElementById('dj-chat-container');
+                messageContent = chatContainer.lastChild.querySelector('.message-content');
+                messageText = messageContent.querySelector('p');
             }
+            messageText.textContent += data.delta;
+        },
+        'text-done': data => {
+            if (!messageText) {
+                handlers['text-delta']({ delta: '' });
+            }
+            messageText.textContent = data.response;
+        },
+        'audio-chunk': data => {
+            chunksPlayed = true;
+            queueDJAudioChunk(data.audio_path);
+        },
+        'audio-ready': data => {
+            if (data.audio_path && messageContent) {
+                const audio = document.createElement('audio');
+                audio.controls = true;
+                audio.src = data.audio_path;
+                audio.className = 'w-100 mt-2';
+                messageContent.appendChild(audio);
+                // Sentences already played as they arrived
+                if (!chunksPlayed) {
+                    playDJAudio(data.audio_path);
+                }
+            }
+        },
+        'actions': () => {},
+        'error': data => {
+            removeLoadingMessage();
+            handleRejectedRequest({ error: data.error });
         }
-        
-        isProcessingRequest = false;
+    };
+    
+    return fetch('/api/dj_request/stream', {
+        method: 'POST',
+        headers: {
+            'Content-Type': 'application/json',
+            'Accept': 'text/event-stream'
+        },
+        body: JSON.stringify(payload)
     })
-    .catch(error => {
-        console.error('Error processing DJ request:', error);
-        
-        // Remove loading message
-        const chatContainer = document.getElementById('dj-chat-container');
-        chatContainer.removeChild(chatContainer.lastChild);
-        
-        // Add error message
-        addMessageToChat('dj', 'Sorry, I encountered an error processing your request. Please try again.', null, 'error');
-        
-        isProcessingRequest = false;
+    .then(response => {
+        if (response.status === 429) {
+            return response.json().then(data => {
+                removeLoadingMessage();
+                handleRejectedRequest(data);
+            });
+        }
+        if (!response.ok || !response.body) {
+            throw new Error(`Streaming request failed with status ${response.status}`);
+        }
+        return readEventStream(response.body, (event, data) => {
+            const handler = handlers[event];
+            if (handler) {
+                handler(data);
+            }
+        });
     });
 }
 
+/**
+ * Read a Server-Sent Events stream from a fetch response body
+ * @param {ReadableStream} body - Response body
+ * @param {Function} onEvent - Called with (eventName, parsedData) for each event
+ * @returns {Promise}
+ */
+function readEventStream(body, onEvent) {
+    const reader = body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+    
+    function dispatch(block) {
+        let event = 'message';
+        const dataLines = [];
+        block.split('\n').forEach(line => {
+            if (line.startsWith('event:')) {
+                event = line.slice(6).trim();
+            } else if (line.startsWith('data:')) {
+                dataLines.push(line.slice(5).trim());
+            }
+        });
+        if (dataLines.length > 0) {
+            onEvent(event, JSON.parse(dataLines.join('\n')));
+        }
+    }
+    
+    function pump() {
+        return reader.read().then(({ done, value }) => {
+            if (done) {
+                if (buffer.trim()) {
+                    dispatch(buffer);
+                }
+                return;
+            }
+            buffer += decoder.decode(value, { stream: true });
+            let boundary = buffer.indexOf('\n\n');
+            while (boundary !== -1) {
+                dispatch(buffer.slice(0, boundary));
+                buffer = buffer.slice(boundary + 2);
+                boundary = buffer.indexOf('\n\n');
+            }
+            return pump();
+        });
+    }
+    
+    return pump();
+}
+
 /**
  * Get current song information
  * @returns {Object} Current song info or null
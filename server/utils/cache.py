@@ -0,0 +1,230 @@
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+from server.utils.single_flight import SingleFlight
+
+logger = logging.getLogger(__name__)
+
+
+class TTLCache:
+    """Thread-safe bounded LRU cache whose entries expire after a TTL."""
+
+    def __init__(self, max_size=1024, ttl=300, clock=time.monotonic):
+        """Initialize the cache.
+
+        Args:
+            max_size (int): Maximum number of entries before the least
+                recently used one is evicted
+            ttl (float): Default time-to-live in seconds
+            clock (callable, optional): Time source, overridable for tests
+        """
+        self.max_size = max_size
+        self.ttl = ttl
+        self.clock = clock
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key, default=None):
+        """Return the cached value for key, or default if missing or expired."""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return default
+
+            value, expires_at = entry
+            if expires_at <= self.clock():
+                del self._data[key]
+                self.misses += 1
+                return default
+
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value, ttl=None):
+        """Store a value, evicting the least recently used entry if full."""
+        ttl = self.ttl if ttl is None else ttl
+        with self._lock:
+            self._data[key] = (value, self.clock() + ttl)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, key):
+        """Remove a key if present."""
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        """Remove all entries."""
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        with self._lock:
+            return len(self._data)
+
+    def stats(self):
+        """Return size and hit/miss counters."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._data),
+                "max_size": self.max_size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / lookups if lookups else 0.0
+            }
+
+
+class ReadThroughCache:
+    """Bounded LRU cache that loads missing keys and refreshes stale ones in the background.
+
+    Entries are fresh for ``ttl`` seconds and then stale for ``stale_ttl``
+    more. A stale entry is still returned at once while one background call
+    reloads it; if that call fails the stale value is kept until it expires.
+    Concurrent misses for a key share one load. Loads that were in flight
+    when ``invalidate`` or ``clear`` ran are not stored.
+    """
+
+    def __init__(self, load, max_size=1024, ttl=300, stale_ttl=3600, executor=None, clock=time.monotonic):
+        """Initialize the cache.
+
+        Args:
+            load (callable): Called with a key to fetch its value
+            max_size (int): Maximum number of entries before the least
+                recently used one is evicted
+            ttl (float): Seconds an entry is fresh; 0 disables caching
+            stale_ttl (float): Seconds after that an entry may be served
+                while it is refreshed
+            executor (Executor, optional): Runs background refreshes; without
+                one, stale entries are reloaded before returning
+            clock (callable, optional): Time source, overridable for tests
+        """
+        self.load = load
+        self.max_size = max_size
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.executor = executor
+        self.clock = clock
+        self.single_flight = SingleFlight()
+        self._data = OrderedDict()
+        self._refreshing = set()
+        # Bumped by invalidation so loads that started earlier aren't stored
+        self._generation = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.refreshes = 0
+        self.refresh_failures = 0
+        self.evictions = 0
+
+    def get(self, key):
+        """Return the value for key, loading it if it isn't cached."""
+        if self.ttl <= 0:
+            return self.load(key)
+
+        refresh = False
+        with self._lock:
+            now = self.clock()
+            entry = self._data.get(key)
+            if entry is not None:
+                value, fresh_until, stale_until = entry
+                if now < fresh_until:
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return value
+                if now < stale_until and self.executor is not None:
+                    self._data.move_to_end(key)
+                    self.stale_hits += 1
+                    if key not in self._refreshing:
+                        self._refreshing.add(key)
+                        refresh = True
+                else:
+                    entry = None
+            if entry is None:
+                self.misses += 1
+            generation = self._generation
+
+        if entry is not None:
+            if refresh:
+                try:
+                    self.executor.submit(self._refresh, key, generation)
+                except RuntimeError:
+                    # Executor shut down; the next lookup tries again
+                    with self._lock:
+                        self._refreshing.discard(key)
+            return value
+
+        value = self.single_flight.do(key, lambda: self.load(key))
+        self._store(key, value, generation)
+        return value
+
+    def _refresh(self, key, generation):
+        try:
+            value = self.load(key)
+        except Exception as e:
+            with self._lock:
+                self.refresh_failures += 1
+            logger.warning(f"Keeping stale cache entry for {key!r}, refresh failed: {str(e)}")
+        else:
+            with self._lock:
+                self.refreshes += 1
+            self._store(key, value, generation)
+        finally:
+            with self._lock:
+                self._refreshing.discard(key)
+
+    def _store(self, key, value, generation):
+        with self._lock:
+            if generation != self._generation:
+                return
+            now = self.clock()
+            self._data[key] = (value, now + self.ttl, now + self.ttl + self.stale_ttl)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, key):
+        """Drop a key so the next lookup loads it again."""
+        with self._lock:
+            self._data.pop(key, None)
+            self._generation += 1
+
+    def clear(self):
+        """Remove all entries."""
+        with self._lock:
+            self._data.clear()
+            self._generation += 1
+
+    def __len__(self):
+        with self._lock:
+            return len(self._data)
+
+    def stats(self):
+        """Return size, hit/miss and refresh counters."""
+        with self._lock:
+            lookups = self.hits + self.stale_hits + self.misses
+            return {
+                "size": len(self._data),
+                "max_size": self.max_size,
+                "ttl": self.ttl,
+                "stale_ttl": self.stale_ttl,
+                "hits": self.hits,
+                "stale_hits": self.stale_hits,
+                "misses": self.misses,
+                "refreshes": self.refreshes,
+                "refresh_failures": self.refresh_failures,
+                "evictions": self.evictions,
+                "hit_rate": (self.hits + self.stale_hits) / lookups if lookups else 0.0
+            }
@@ -0,0 +1,251 @@
+"""Persistent cache of LLM completions for deterministic prompt templates.
+
+Completions are stored in SQLite keyed on provider, model, template name, the
+rendered messages, temperature and max_tokens. Each template has its own TTL;
+creative templates such as ``dj_chat`` have a TTL of 0 and are never cached.
+
+Inspect or purge the cache from the repository root with::
+
+    python -m server.utils.completion_cache stats
+    python -m server.utils.completion_cache list [--template song_info]
+    python -m server.utils.completion_cache purge [--template song_info] [--expired]
+"""
+
+import argparse
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_DB_PATH = os.path.join('data', 'llm_cache.db')
+
+# Seconds a completion stays valid, per template. 0 opts a template out.
+DEFAULT_TEMPLATE_TTLS = {
+    "song_info": 30 * 24 * 3600,
+    "trend_analyzer": 3600,
+    "dj_chat": 0,
+    "dj_intro": 0,
+    "trivia": 0,
+    "playlist_generator": 0,
+}
+
+# TTL for templates not listed above
+DEFAULT_TTL = 24 * 3600
+
+
+def parse_ttls(value):
+    """Parse ``template:seconds`` pairs, e.g. ``"song_info:86400,dj_intro:0"``.
+
+    Returns:
+        dict: Template name to TTL in seconds
+    """
+    ttls = {}
+    for item in (value or "").split(","):
+        if not item.strip():
+            continue
+        name, _, seconds = item.partition(":")
+        try:
+            ttls[name.strip()] = int(seconds)
+        except ValueError:
+            logger.warning(f"Ignoring invalid cache TTL: {item!r}")
+    return ttls
+
+
+def make_key(provider, model, template, messages, temperature, max_tokens):
+    """Return the cache key for a completion request."""
+    payload = json.dumps({
+        "provider": provider,
+        "model": model,
+        "template": template,
+        "messages": messages,
+        "temperature": temperature,
+        "max_tokens": max_tokens
+    }, sort_keys=True)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class CompletionCache:
+    """SQLite-backed completion cache with per-template TTLs."""
+
+    def __init__(self, db_path=DEFAULT_DB_PATH, ttls=None, default_ttl=DEFAULT_TTL):
+        """Initialize the cache.
+
+        Args:
+            db_path (str): SQLite database file
+            ttls (dict, optional): Per-template TTL overrides in seconds
+            default_ttl (int): TTL for templates without an entry
+        """
+        self.db_path = db_path
+        self.ttls = dict(DEFAULT_TEMPLATE_TTLS, **(ttls or {}))
+        self.default_ttl = default_ttl
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._init_db()
+
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=10)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def _init_db(self):
+        os.makedirs(os.path.dirname(self.db_path) or '.', exist_ok=True)
+        conn = self._connect()
+        try:
+            conn.execute('''
+            CREATE TABLE IF NOT EXISTS completions (
+                key TEXT PRIMARY KEY,
+                template TEXT NOT NULL,
+                provider TEXT,
+                model TEXT,
+                content TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                expires_at REAL NOT NULL,
+                hits INTEGER NOT NULL DEFAULT 0
+            )
+            ''')
+            conn.execute('CREATE INDEX IF NOT EXISTS idx_completions_template ON completions (template)')
+            conn.commit()
+        finally:
+            conn.close()
+
+    def ttl_for(self, template):
+        """Return the TTL for a template; 0 means it is never cached."""
+        return self.ttls.get(template, self.default_ttl)
+
+    def get(self, key):
+        """Return the cached completion for key, or None if missing or expired."""
+        conn = self._connect()
+        try:
+            row = conn.execute('SELECT content FROM completions WHERE key = ? AND expires_at > ?',
+                               (key, time.time())).fetchone()
+            if row is not None:
+                conn.execute('UPDATE completions SET hits = hits + 1 WHERE key = ?', (key,))
+                conn.commit()
+        finally:
+            conn.close()
+
+        with self._lock:
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+        return row['content']
+
+    def set(self, key, template, content, provider=None, model=None):
+        """Store a completion using the template's TTL."""
+        ttl = self.ttl_for(template)
+        if ttl <= 0:
+            return
+        now = time.time()
+        conn = self._connect()
+        try:
+            conn.execute('''
+            INSERT OR REPLACE INTO completions (key, template, provider, model, content, created_at, expires_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+            ''', (key, template, provider, model, content, now, now + ttl))
+            conn.commit()
+        finally:
+            conn.close()
+
+    def entries(self, template=None, limit=50):
+        """Return the most recent entries, optionally for one template."""
+        query = 'SELECT key, template, provider, model, content, created_at, expires_at, hits FROM completions'
+        params = []
+        if template:
+            query += ' WHERE template = ?'
+            params.append(template)
+        query += ' ORDER BY created_at DESC LIMIT ?'
+        params.append(limit)
+        conn = self._connect()
+        try:
+            return [dict(row) for row in conn.execute(query, params)]
+        finally:
+            conn.close()
+
+    def purge(self, template=None, expired_only=False):
+        """Delete entries.
+
+        Returns:
+            int: Number of entries removed
+        """
+        conditions = []
+        params = []
+        if template:
+            conditions.append('template = ?')
+            params.append(template)
+        if expired_only:
+            conditions.append('expires_at <= ?')
+            params.append(time.time())
+        query = 'DELETE FROM completions'
+        if conditions:
+            query += ' WHERE ' + ' AND '.join(conditions)
+        conn = self._connect()
+        try:
+            removed = conn.execute(query, params).rowcount
+            conn.commit()
+            return removed
+        finally:
+            conn.close()
+
+    def stats(self):
+        """Return hit/miss counters and entry counts per template."""
+        conn = self._connect()
+        try:
+            rows = conn.execute('''
+            SELECT template, COUNT(*) AS entries, SUM(hits) AS hits,
+                   SUM(expires_at <= ?) AS expired
+            FROM completions GROUP BY template
+            ''', (time.time(),)).fetchall()
+        finally:
+            conn.close()
+
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "templates": {
+                    row['template']: {
+                        "entries": row['entries'],
+                        "hits": row['hits'] or 0,
+                        "expired": row['expired'] or 0,
+                        "ttl": self.ttl_for(row['template'])
+                    }
+                    for row in rows
+                }
+            }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Inspect or purge the LLM completion cache")
+    parser.add_argument("command", choices=["stats", "list", "purge"])
+    parser.add_argument("--db", default=DEFAULT_DB_PATH, help="Cache database path")
+    parser.add_argument("--template", help="Only entries for this template")
+    parser.add_argument("--expired", action="store_true", help="Only purge expired entries")
+    parser.add_argument("--limit", type=int, default=20, help="Number of entries to list")
+    args = parser.parse_args()
+
+    cache = CompletionCache(args.db)
+
+    if args.command == "stats":
+        print(json.dumps(cache.stats()["templates"], indent=2))
+    elif args.command == "list":
+        for entry in cache.entries(args.template, args.limit):
+            expires_in = entry['expires_at'] - time.time()
+            preview = entry['content'].replace("\n", " ")[:80]
+            print(f"{entry['key'][:12]}  {entry['template']:<16} hits={entry['hits']:<4} "
+                  f"expires_in={int(expires_in)}s  {preview}")
+    else:
+        removed = cache.purge(args.template, args.expired)
+        print(f"Removed {removed} cached completions")
+
+
+if __name__ == "__main__":
+    main()
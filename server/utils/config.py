@@ -39,8 +39,69 @@ class Config:
         self.log_level = os.getenv('LOG_LEVEL', 'INFO')
         
         # Resource limits (to maintain target 50% load)
-        self.max_concurrent_requests = int(os.getenv('MAX_CONCURRENT_REQUESTS', '5'))
+        self.max_concurrent_requests = int(os.getenv('MAX_CONCURRENT_REQUESTS', '5'))  # concurrent LLM calls
         self.request_timeout = int(os.getenv('REQUEST_TIMEOUT', '30'))  # seconds
+        self.http_connect_timeout = float(os.getenv('HTTP_CONNECT_TIMEOUT', '5'))  # seconds
+        self.http_retries = int(os.getenv('HTTP_RETRIES', '2'))  # idempotent requests only
+        self.http_pool_size = int(os.getenv('HTTP_POOL_SIZE', '10'))  # keep-alive connections per host
+
+        # DJ request pipeline
+        self.speculative_moderation = os.getenv('SPECULATIVE_MODERATION', 'True').lower() == 'true'
+        self.use_request_router = os.getenv('USE_REQUEST_ROUTER', 'True').lower() == 'true'
+        self.moderation_fast_path = os.getenv('MODERATION_FAST_PATH', 'True').lower() == 'true'
+        self.moderation_fast_path_threshold = float(os.getenv('MODERATION_FAST_PATH_THRESHOLD', '0.9'))
+        # Off until the model has been trained on logged traffic
+        self.moderation_fast_path_reject = os.getenv('MODERATION_FAST_PATH_REJECT', 'False').lower() == 'true'
+        self.moderation_cache_size = int(os.getenv('MODERATION_CACHE_SIZE', '1000'))
+        self.moderation_cache_ttl = int(os.getenv('MODERATION_CACHE_TTL', '3600'))  # seconds
+        self.moderation_store = os.getenv('MODERATION_STORE', 'sqlite')  # sqlite or memory
+        self.moderation_store_path = os.getenv('MODERATION_STORE_PATH', os.path.join('data', 'moderation_state.db'))
+        self.moderation_idle_ttl = int(os.getenv('MODERATION_IDLE_TTL', str(7 * 24 * 3600)))  # seconds
+
+        # Token-bucket limits on DJ requests, in estimated LLM tokens
+        self.rate_limit = os.getenv('RATE_LIMIT', 'True').lower() == 'true'
+        self.rate_limit_user_per_minute = int(os.getenv('RATE_LIMIT_USER_PER_MINUTE', '3000'))
+        self.rate_limit_user_burst = int(os.getenv('RATE_LIMIT_USER_BURST', '6000'))
+        self.rate_limit_global_per_minute = int(os.getenv('RATE_LIMIT_GLOBAL_PER_MINUTE', '30000'))
+        self.rate_limit_global_burst = int(os.getenv('RATE_LIMIT_GLOBAL_BURST', '60000'))
+        self.rate_limit_store = os.getenv('RATE_LIMIT_STORE', 'sqlite')  # sqlite or memory
+        self.rate_limit_store_path = os.getenv('RATE_LIMIT_STORE_PATH', os.path.join('data', 'rate_limits.db'))
+
+        # Per-user chat memory: recent turns kept verbatim, older ones summarized
+        self.conversation_memory = os.getenv('CONVERSATION_MEMORY', 'True').lower() == 'true'
+        self.conversation_max_turns = int(os.getenv('CONVERSATION_MAX_TURNS', '6'))
+        self.conversation_token_budget = int(os.getenv('CONVERSATION_TOKEN_BUDGET', '1500'))  # whole chat prompt
+
+        # In-process index of the Navidrome library for play requests
+        self.library_index = os.getenv('LIBRARY_INDEX', 'True').lower() == 'true'
+        self.library_index_refresh = int(os.getenv('LIBRARY_INDEX_REFRESH', '300'))  # seconds
+        self.library_index_full_refresh = int(os.getenv('LIBRARY_INDEX_FULL_REFRESH', '86400'))  # seconds
+
+        # Local SQLite copy of the Navidrome library, synced incrementally
+        self.library_mirror = os.getenv('LIBRARY_MIRROR', 'True').lower() == 'true'
+        self.library_mirror_path = os.getenv('LIBRARY_MIRROR_PATH', os.path.join('data', 'library.db'))
+        self.library_mirror_refresh = int(os.getenv('LIBRARY_MIRROR_REFRESH', '300'))  # seconds
+
+        # Navidrome metadata cache
+        self.navidrome_cache_size = int(os.getenv('NAVIDROME_CACHE_SIZE', '512'))  # entries per endpoint
+        self.navidrome_cache_ttls = os.getenv('NAVIDROME_CACHE_TTLS', '')  # e.g. getSong:3600,getPlaylists:0
+        self.navidrome_cache_stale_ttl = int(os.getenv('NAVIDROME_CACHE_STALE_TTL', '3600'))  # seconds
+        self.sentence_pipelined_tts = os.getenv('SENTENCE_PIPELINED_TTS', 'True').lower() == 'true'
+        self.sentence_pipelined_tts_keep = int(os.getenv('SENTENCE_PIPELINED_TTS_KEEP', '100'))  # combined files
+        self.trivia_buffer = os.getenv('TRIVIA_BUFFER', 'True').lower() == 'true'
+        self.trivia_buffer_size = int(os.getenv('TRIVIA_BUFFER_SIZE', '3'))
+
+        # Text-to-speech cache
+        self.tts_cache_max_mb = int(os.getenv('TTS_CACHE_MAX_MB', '500'))
+
+        # LLM completion cache
+        self.llm_cache = os.getenv('LLM_CACHE', 'True').lower() == 'true'
+        self.llm_cache_path = os.getenv('LLM_CACHE_PATH', os.path.join('data', 'llm_cache.db'))
+        self.llm_cache_ttls = os.getenv('LLM_CACHE_TTLS', '')  # e.g. song_info:86400,dj_intro:0
+
+        # DJ interaction log (logs/dj_interactions.jsonl)
+        self.interaction_log_max_mb = int(os.getenv('INTERACTION_LOG_MAX_MB', '10'))
+        self.interaction_log_backups = int(os.getenv('INTERACTION_LOG_BACKUPS', '3'))
         
     def validate(self):
         """Validate that all required configuration is present."""
@@ -0,0 +1,186 @@
+import logging
+import math
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+CHARS_PER_TOKEN = 4
+
+
+def estimate_tokens(text):
+    """Rough token count for budgeting prompts."""
+    return math.ceil(len(text or '') / CHARS_PER_TOKEN)
+
+
+def messages_tokens(messages):
+    # A few tokens of overhead per message for the role and separators
+    return sum(estimate_tokens(message['content']) + 4 for message in messages)
+
+
+def turn_messages(turn):
+    request, response = turn
+    return [
+        {"role": "user", "content": request},
+        {"role": "assistant", "content": response}
+    ]
+
+
+class Conversation:
+    """One user's recent turns, running summary and turns waiting to be folded in."""
+
+    def __init__(self):
+        self.turns = deque()
+        self.summary = ''
+        self.unsummarized = []
+        self.summarizing = False
+        self.last_active = 0.0
+
+
+class ConversationMemory:
+    """Per-user chat memory: a window of recent turns plus a rolling summary.
+
+    When the window is full the oldest turns move to a queue that a
+    background worker folds into the summary with ``summarize(summary,
+    turns)``, so requests never wait on summarization. ``messages`` returns
+    the summary and as many recent turns as fit in a token budget, newest
+    turns kept first. Memory is held per process for at most ``max_users``
+    users, each forgotten after ``idle_ttl`` seconds without a turn.
+    """
+
+    def __init__(self, summarize, max_turns=6, max_users=1000, idle_ttl=3600,
+                 executor=None, clock=time.monotonic):
+        """Initialize the memory.
+
+        Args:
+            summarize (callable): Takes the current summary and a list of
+                (request, response) turns, returns the new summary
+            max_turns (int): Recent turns kept verbatim per user
+            max_users (int): Users remembered, least recently active dropped
+                first
+            idle_ttl (float): Seconds after which an idle user is forgotten
+            executor (Executor, optional): Runs summarization; a single
+                background thread is used if omitted
+            clock (callable, optional): Time source, overridable for tests
+        """
+        self.summarize = summarize
+        self.max_turns = max_turns
+        self.max_users = max_users
+        self.idle_ttl = idle_ttl
+        self.executor = executor or ThreadPoolExecutor(max_workers=1, thread_name_prefix='dj-memory')
+        self.clock = clock
+        self._conversations = OrderedDict()
+        self._lock = threading.Lock()
+        self.summaries = 0
+        self.summary_failures = 0
+
+    def _conversation(self, user_id, create=False):
+        """Return the user's conversation, dropping idle ones. Call with the lock held."""
+        now = self.clock()
+        while self._conversations:
+            oldest_id, oldest = next(iter(self._conversations.items()))
+            if now - oldest.last_active < self.idle_ttl:
+                break
+            del self._conversations[oldest_id]
+
+        conversation = self._conversations.get(user_id)
+        if conversation is None and create:
+            conversation = self._conversations[user_id] = Conversation()
+            while len(self._conversations) > self.max_users:
+                self._conversations.popitem(last=False)
+        return conversation
+
+    def add_turn(self, user_id, request, response):
+        """Remember a delivered turn, summarizing overflow in the background."""
+        with self._lock:
+            conversation = self._conversation(user_id, create=True)
+            conversation.last_active = self.clock()
+            self._conversations.move_to_end(user_id)
+            conversation.turns.append((request, response))
+            while len(conversation.turns) > self.max_turns:
+                conversation.unsummarized.append(conversation.turns.popleft())
+            if conversation.summarizing:
+                return
+            # If summarization keeps failing, the oldest turns are dropped
+            del conversation.unsummarized[:-self.max_turns]
+            if not conversation.unsummarized:
+                return
+            conversation.summarizing = True
+        self.executor.submit(self._summarize, conversation)
+
+    def _summarize(self, conversation):
+        while True:
+            with self._lock:
+                turns = list(conversation.unsummarized)
+                summary = conversation.summary
+                if not turns:
+                    conversation.summarizing = False
+                    return
+            try:
+                new_summary = self.summarize(summary, turns)
+            except Exception as e:
+                logger.error(f"Error summarizing conversation: {str(e)}")
+                new_summary = None
+
+            with self._lock:
+                if not new_summary:
+                    # Try again with the next overflow
+                    self.summary_failures += 1
+                    conversation.summarizing = False
+                    return
+                conversation.summary = new_summary.strip()
+                # Turns may have been dropped or added while summarizing
+                del conversation.unsummarized[:len(turns)]
+                self.summaries += 1
+
+    def messages(self, user_id, budget):
+        """Return chat messages recalling the conversation within a token budget.
+
+        The summary comes first as a system message, followed by the most
+        recent turns that fit. Turns still waiting to be summarized are
+        included ahead of the window when there is room.
+        """
+        with self._lock:
+            conversation = self._conversation(user_id)
+            if conversation is None:
+                return []
+            summary = conversation.summary
+            turns = conversation.unsummarized + list(conversation.turns)
+
+        history = []
+        if summary and budget > 0:
+            summary_message = {"role": "system", "content": f"Summary of the conversation so far: {summary}"}
+            if messages_tokens([summary_message]) > budget:
+                # Keep the start of an oversized summary
+                summary_message["content"] = summary_message["content"][:max(budget - 4, 0) * CHARS_PER_TOKEN]
+            history.append(summary_message)
+            budget -= messages_tokens([summary_message])
+
+        recent = []
+        for turn in reversed(turns):
+            messages = turn_messages(turn)
+            cost = messages_tokens(messages)
+            if cost > budget:
+                break
+            recent[:0] = messages
+            budget -= cost
+        return history + recent
+
+    def clear(self, user_id=None):
+        """Forget one user's conversation, or everyone's."""
+        with self._lock:
+            if user_id is None:
+                self._conversations.clear()
+            else:
+                self._conversations.pop(user_id, None)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "users": len(self._conversations),
+                "max_turns": self.max_turns,
+                "summaries": self.summaries,
+                "summary_failures": self.summary_failures
+            }
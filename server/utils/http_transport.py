@@ -0,0 +1,190 @@
+"""Shared HTTP transport for the integration clients.
+
+Every client sends its requests through one ``requests.Session``. The
+session keeps a keep-alive connection pool per host, so consecutive calls to
+Navidrome, Ollama, ElevenLabs or Last.fm reuse connections instead of
+repeating the TCP and TLS handshake. Requests get default connect and read
+timeouts. Idempotent requests that fail to connect, time out, or get a
+429/502/503/504 are retried with jittered exponential backoff. Billed,
+non-idempotent calls can ask to be retried only when the server can't have
+acted on them: the connection was never made, or the answer was 429/503.
+"""
+
+import logging
+import random
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import ConnectTimeoutError, NewConnectionError
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TIMEOUT = 30
+DEFAULT_CONNECT_TIMEOUT = 5
+IDEMPOTENT_METHODS = {'GET', 'HEAD', 'OPTIONS', 'PUT', 'DELETE'}
+RETRY_STATUSES = {429, 502, 503, 504}
+# Statuses that mean the server refused the request without processing it
+UNSENT_RETRY_STATUSES = {429, 503}
+# Longest Retry-After we honour before giving up on a retry
+MAX_RETRY_DELAY = 10
+
+
+class HTTPTransport:
+    """Pooled, keep-alive HTTP session with timeouts and retries."""
+
+    def __init__(self, timeout=DEFAULT_TIMEOUT, connect_timeout=DEFAULT_CONNECT_TIMEOUT, retries=2,
+                 backoff=0.5, pool_size=10, sleep=time.sleep):
+        """Initialize the transport.
+
+        Args:
+            timeout (float): Default read timeout in seconds
+            connect_timeout (float): Default connect timeout in seconds
+            retries (int): Extra attempts for retryable requests
+            backoff (float): Base delay in seconds, doubled on each retry
+                and jittered by +/-50%
+            pool_size (int): Keep-alive connections kept per host
+            sleep (callable, optional): Used to wait between attempts,
+                overridable for tests
+        """
+        self.timeout = timeout
+        self.connect_timeout = connect_timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.sleep = sleep
+        self.session = requests.Session()
+        # Retries are handled here so they can be jittered and counted
+        self.adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=0)
+        self.session.mount('http://', self.adapter)
+        self.session.mount('https://', self.adapter)
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.retried = 0
+        self.failures = 0
+
+    def _delay(self, attempt, response=None):
+        if response is not None and response.status_code == 429:
+            retry_after = response.headers.get('Retry-After', '')
+            if retry_after.isdigit():
+                return min(int(retry_after), MAX_RETRY_DELAY)
+        return self.backoff * (2 ** attempt) * random.uniform(0.5, 1.5)
+
+    @staticmethod
+    def _never_connected(error):
+        """Return True if the request failed before a connection was made."""
+        if isinstance(error, requests.exceptions.ConnectTimeout):
+            return True
+        reason = getattr(error.args[0], 'reason', None) if error.args else None
+        return isinstance(reason, (NewConnectionError, ConnectTimeoutError))
+
+    def request(self, method, url, retry=None, timeout=None, unsent_only=False, **kwargs):
+        """Send a request.
+
+        Args:
+            method (str): HTTP method
+            url (str): Request URL
+            retry (bool, optional): Whether failures may be retried; by
+                default only idempotent methods are
+            timeout (float or tuple, optional): Read timeout, or a
+                (connect, read) tuple; defaults to the transport's timeouts
+            unsent_only (bool): Retry only failures the server can't have
+                acted on (no connection made, or a 429/503 answer), for
+                requests that must not run twice
+            **kwargs: Passed to ``requests.Session.request``
+
+        Returns:
+            requests.Response: The last response received
+
+        Raises:
+            requests.exceptions.RequestException: If the last attempt failed
+                to connect or timed out
+        """
+        method = method.upper()
+        if retry is None:
+            retry = method in IDEMPOTENT_METHODS
+        if timeout is None:
+            timeout = self.timeout
+        if not isinstance(timeout, tuple):
+            timeout = (self.connect_timeout, timeout)
+        attempts = 1 + (self.retries if retry else 0)
+        retry_statuses = UNSENT_RETRY_STATUSES if unsent_only else RETRY_STATUSES
+
+        for attempt in range(attempts):
+            with self._lock:
+                self.requests += 1
+            last_attempt = attempt == attempts - 1
+            try:
+                response = self.session.request(method, url, timeout=timeout, **kwargs)
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+                if last_attempt or (unsent_only and not self._never_connected(e)):
+                    with self._lock:
+                        self.failures += 1
+                    raise
+                logger.warning(f"{method} {url} failed ({str(e)}), retrying")
+                delay = self._delay(attempt)
+            else:
+                if last_attempt or response.status_code not in retry_statuses:
+                    return response
+                logger.warning(f"{method} {url} returned {response.status_code}, retrying")
+                delay = self._delay(attempt, response)
+                response.close()
+            with self._lock:
+                self.retried += 1
+            self.sleep(delay)
+
+    def get(self, url, **kwargs):
+        return self.request('GET', url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.request('POST', url, **kwargs)
+
+    def stats(self):
+        """Return request counters and connection reuse per host."""
+        hosts = {}
+        pools = self.adapter.poolmanager.pools
+        for key in list(pools.keys()):
+            pool = pools.get(key)
+            if pool is None:
+                continue
+            host = f"{pool.scheme}://{pool.host}:{pool.port}"
+            entry = hosts.setdefault(host, {"requests": 0, "connections": 0})
+            entry["requests"] += pool.num_requests
+            entry["connections"] += pool.num_connections
+        for entry in hosts.values():
+            entry["reused"] = max(entry["requests"] - entry["connections"], 0)
+            entry["reuse_ratio"] = entry["reused"] / entry["requests"] if entry["requests"] else 0.0
+
+        with self._lock:
+            return {
+                "requests": self.requests,
+                "retried": self.retried,
+                "failures": self.failures,
+                "timeout": self.timeout,
+                "connect_timeout": self.connect_timeout,
+                "hosts": hosts
+            }
+
+
+_default_transport = None
+_default_lock = threading.Lock()
+
+
+def default_transport():
+    """Return the process-wide transport shared by the integration clients."""
+    global _default_transport
+    with _default_lock:
+        if _default_transport is None:
+            _default_transport = HTTPTransport()
+        return _default_transport
+
+
+def configure_default_transport(**kwargs):
+    """Replace the shared transport with one built from ``HTTPTransport`` kwargs.
+
+    Call before creating clients; clients keep the transport they started with.
+    """
+    global _default_transport
+    with _default_lock:
+        _default_transport = HTTPTransport(**kwargs)
+        return _default_transport
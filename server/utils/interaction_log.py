@@ -0,0 +1,261 @@
+import atexit
+import json
+import logging
+import os
+import threading
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:
+    # Windows has no flock; there the server runs as a single process
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_LOG_PATH = os.path.join('logs', 'dj_interactions.jsonl')
+# Whole-file JSON array written by earlier versions
+LEGACY_LOG_PATH = os.path.join('logs', 'dj_interactions.json')
+
+READ_BLOCK_SIZE = 8192
+
+
+def backup_path(path, index):
+    """Return the name of the index-th rotated file, e.g. ``log.jsonl.1``."""
+    return f"{path}.{index}"
+
+
+def _parse_lines(lines):
+    entries = []
+    for line in lines:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            entries.append(json.loads(line))
+        except ValueError:
+            # A line cut short by a crash; skip it
+            continue
+    return entries
+
+
+def tail_file(path, n):
+    """Return the last n entries of a JSONL file, oldest first.
+
+    Reads backwards from the end in blocks, so the cost depends on n rather
+    than the size of the file.
+    """
+    if n <= 0:
+        return []
+    try:
+        with open(path, 'rb') as f:
+            f.seek(0, os.SEEK_END)
+            position = f.tell()
+            data = b''
+            while position > 0 and data.count(b'\n') <= n:
+                size = min(READ_BLOCK_SIZE, position)
+                position -= size
+                f.seek(position)
+                data = f.read(size) + data
+    except OSError:
+        return []
+
+    lines = data.decode('utf-8', errors='replace').splitlines()
+    if position > 0:
+        # The first line is partial
+        lines = lines[1:]
+    return _parse_lines(lines)[-n:]
+
+
+def read_legacy_log(path=LEGACY_LOG_PATH):
+    """Return entries from a legacy JSON array log, or [] if unreadable."""
+    try:
+        with open(path, 'r') as f:
+            entries = json.load(f)
+    except (OSError, ValueError):
+        return []
+    return entries if isinstance(entries, list) else []
+
+
+def read_interactions(path=DEFAULT_LOG_PATH, backups=3, legacy_path=LEGACY_LOG_PATH):
+    """Return every logged interaction, oldest first, including rotated files.
+
+    Falls back to the legacy JSON log if nothing has been written yet.
+    """
+    files = [backup_path(path, i) for i in range(backups, 0, -1)] + [path]
+    files = [name for name in files if os.path.exists(name)]
+    if not files:
+        return read_legacy_log(legacy_path) if legacy_path else []
+
+    entries = []
+    for name in files:
+        try:
+            with open(name, 'r', encoding='utf-8', errors='replace') as f:
+                entries.extend(_parse_lines(f))
+        except OSError as e:
+            logger.error(f"Error reading interaction log {name}: {str(e)}")
+    return entries
+
+
+class InteractionLog:
+    """Append-only JSONL log written by a background thread.
+
+    ``append`` only queues the entry, so request latency doesn't depend on the
+    size of the log. A single writer thread appends queued entries in batches
+    and rotates the file once it would grow past ``max_bytes``, keeping
+    ``backups`` older files as ``<path>.1`` (newest) to ``<path>.<backups>``.
+    Worker processes writing the same log take an exclusive ``flock`` on
+    ``<path>.lock`` around the size check, rotation and append, so two
+    workers can't rotate the file at the same time.
+    """
+
+    def __init__(self, path=DEFAULT_LOG_PATH, max_bytes=10 * 1024 * 1024, backups=3, legacy_path=None):
+        """Initialize the log.
+
+        Args:
+            path (str): JSONL file to append to
+            max_bytes (int): Size at which the file is rotated
+            backups (int): Number of rotated files to keep
+            legacy_path (str, optional): JSON array log whose entries are
+                copied over if ``path`` doesn't exist yet
+        """
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self.legacy_path = legacy_path
+        self._pending = []
+        self._writing = False
+        self._condition = threading.Condition()
+        # Held while a batch moves from the queue into the file
+        self._file_lock = threading.Lock()
+        self._thread = None
+        self._stopped = False
+        self.written = 0
+        self.dropped = 0
+        self.rotations = 0
+        atexit.register(self.close)
+
+    def append(self, entry):
+        """Queue an entry for writing and return immediately."""
+        with self._condition:
+            self._pending.append(entry)
+            self._condition.notify_all()
+            if self._thread is None:
+                self._start()
+
+    def _start(self):
+        self._stopped = False
+        self._thread = threading.Thread(target=self._run, name='interaction-log', daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        self._migrate_legacy()
+        while True:
+            with self._condition:
+                while not self._pending and not self._stopped:
+                    self._condition.wait()
+                if not self._pending and self._stopped:
+                    return
+            self._write_pending()
+
+    @contextmanager
+    def _process_lock(self, exclusive=True):
+        """Hold a flock on ``<path>.lock`` shared with other processes."""
+        if fcntl is None:
+            yield
+            return
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        with open(self.path + '.lock', 'a') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _write_pending(self):
+        with self._file_lock:
+            with self._condition:
+                batch = self._pending
+                self._pending = []
+                self._writing = True
+            try:
+                data = ''.join(json.dumps(entry) + '\n' for entry in batch).encode('utf-8')
+                os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+                with self._process_lock():
+                    self._rotate_if_needed(len(data))
+                    with open(self.path, 'ab') as f:
+                        f.write(data)
+                self.written += len(batch)
+            except Exception as e:
+                self.dropped += len(batch)
+                logger.error(f"Error writing interaction log: {str(e)}")
+            finally:
+                with self._condition:
+                    self._writing = False
+                    self._condition.notify_all()
+
+    def _rotate_if_needed(self, incoming):
+        try:
+            size = os.path.getsize(self.path)
+        except OSError:
+            return
+        if size == 0 or size + incoming <= self.max_bytes:
+            return
+
+        if self.backups > 0:
+            for index in range(self.backups - 1, 0, -1):
+                if os.path.exists(backup_path(self.path, index)):
+                    os.replace(backup_path(self.path, index), backup_path(self.path, index + 1))
+            os.replace(self.path, backup_path(self.path, 1))
+        else:
+            os.remove(self.path)
+        self.rotations += 1
+
+    def _migrate_legacy(self):
+        """Copy entries from the old JSON array log the first time we run."""
+        if not self.legacy_path or os.path.exists(self.path):
+            return
+        entries = read_legacy_log(self.legacy_path)
+        if not entries:
+            return
+        with self._condition:
+            self._pending[:0] = entries
+        logger.info(f"Migrating {len(entries)} entries from {self.legacy_path}")
+
+    def tail(self, n=10):
+        """Return the last n entries, oldest first, including queued ones."""
+        with self._file_lock:
+            with self._condition:
+                pending = list(self._pending)
+            entries = pending[-n:] if n > 0 else []
+            index = 0
+            name = self.path
+            # Shared, so another worker can't rotate files mid-read
+            with self._process_lock(exclusive=False):
+                while len(entries) < n and index <= self.backups:
+                    if index > 0:
+                        name = backup_path(self.path, index)
+                    entries = tail_file(name, n - len(entries)) + entries
+                    index += 1
+        return entries
+
+    def flush(self, timeout=None):
+        """Wait until every queued entry has been written.
+
+        Returns:
+            bool: False if the timeout expired first
+        """
+        with self._condition:
+            return self._condition.wait_for(
+                lambda: not self._pending and not self._writing, timeout)
+
+    def close(self, timeout=5.0):
+        """Write remaining entries and stop the writer thread."""
+        with self._condition:
+            thread = self._thread
+            self._stopped = True
+            self._condition.notify_all()
+        if thread is not None:
+            thread.join(timeout)
+        with self._condition:
+            self._thread = None
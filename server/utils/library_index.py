@@ -0,0 +1,419 @@
+"""In-process search index over the Navidrome library.
+
+Play requests are resolved against an inverted index of title, artist and
+album tokens instead of a ``search3`` round trip. Lookups tolerate one typo
+per word (symmetric-delete matching), rank songs by IDF-weighted coverage of
+the query and understand "<title> by <artist>".
+
+The index is built from the library in the background and kept fresh by
+polling ``getScanStatus``: newly added albums are merged in, and the index is
+rebuilt when songs disappear. It is also rebuilt every
+``full_refresh_interval``, even if the scan status never changes, to pick up
+edits a scan count can't reveal (retagged or replaced songs).
+"""
+
+import heapq
+import logging
+import math
+import re
+import threading
+import time
+import unicodedata
+
+logger = logging.getLogger(__name__)
+
+TOKEN = re.compile(r"[a-z0-9]+")
+
+# Words that carry no information about which song is meant
+QUERY_STOPWORDS = {
+    "play", "put", "on", "some", "song", "songs", "track", "tune", "please",
+    "can", "could", "you", "me", "for", "i", "want", "to", "hear", "listen",
+    "a", "an", "the", "by", "called", "named", "my", "lets", "let", "us"
+}
+
+# Field weights when a query doesn't say which part is the title or artist
+FIELD_WEIGHTS = {"title": 1.0, "artist": 0.9, "album": 0.5}
+FUZZY_WEIGHT = 0.8
+MIN_SCORE = 0.5
+# Bonus for titles made up of the query's title words only
+TITLE_BONUS = 0.05
+# Songs scored per lookup at most, preferring those matching the most query
+# words; exact title matches are always scored
+MAX_CANDIDATES = 1000
+
+
+def normalize(text):
+    """Lowercase, strip accents and map '&' to 'and'."""
+    text = str(text or '')
+    if not text.isascii():
+        text = unicodedata.normalize('NFKD', text).encode('ascii', 'ignore').decode('ascii')
+    return text.lower().replace('&', ' and ').replace("'", '')
+
+
+def tokenize(text):
+    return TOKEN.findall(normalize(text))
+
+
+def deletions(token):
+    """Return the token with each single character removed."""
+    return {token[:i] + token[i + 1:] for i in range(len(token))}
+
+
+def parse_song_query(text):
+    """Split a request into (title, artist) on the last " by ".
+
+    Returns:
+        tuple: (title, artist) where artist is None if the request doesn't
+            name one
+    """
+    match = re.match(r"(?i)^(.*\S)\s+by\s+(\S.*)$", text.strip())
+    if match:
+        return match.group(1), match.group(2)
+    return text, None
+
+
+class LibraryIndex:
+    """Typo-tolerant ranked lookup of library songs."""
+
+    def __init__(self, client, refresh_interval=300, full_refresh_interval=24 * 3600, page_size=500):
+        """Initialize the index.
+
+        Args:
+            client (NavidromeClient): Library source
+            refresh_interval (float): Seconds between scan status checks
+            full_refresh_interval (float): Seconds after which the index is
+                rebuilt even if no songs were removed
+            page_size (int): Songs fetched per library request
+        """
+        self.client = client
+        self.refresh_interval = refresh_interval
+        self.full_refresh_interval = full_refresh_interval
+        self.page_size = page_size
+
+        self._songs = []
+        self._ids = {}
+        self._postings = {"title": {}, "artist": {}, "album": {}}
+        self._deletes = {}
+        self._titles = {}
+        self._lock = threading.RLock()
+        self._scan_status = None
+        self._newest_album = None
+        self._built_at = 0.0
+        self._stopped = threading.Event()
+        self._thread = None
+        self.lookups = 0
+        self.misses = 0
+        self.rebuilds = 0
+        self.incremental_updates = 0
+
+    @property
+    def ready(self):
+        return bool(self._songs)
+
+    def __len__(self):
+        return len(self._ids)
+
+    # Building
+
+    def _add_token(self, field, token, position):
+        postings = self._postings[field]
+        if token not in postings:
+            postings[token] = set()
+            # Symmetric-delete entries for typo lookups
+            self._deletes.setdefault(token, set()).add(token)
+            if len(token) >= 4:
+                for variant in deletions(token):
+                    self._deletes.setdefault(variant, set()).add(token)
+        postings[token].add(position)
+
+    def add_songs(self, songs):
+        """Add songs to the index, replacing any with the same ID."""
+        with self._lock:
+            for song in songs:
+                song_id = song.get('id')
+                if not song_id:
+                    continue
+                entry = {
+                    "id": song_id,
+                    "title": song.get('title') or '',
+                    "artist": song.get('artist') or '',
+                    "album": song.get('album') or '',
+                    "tokens": {field: set(tokenize(song.get(field))) for field in ("artist", "album")}
+                }
+                title_tokens = tokenize(entry["title"])
+                entry["tokens"]["title"] = set(title_tokens)
+                title_key = " ".join(title_tokens)
+                position = self._ids.get(song_id)
+                if position is None:
+                    position = self._ids[song_id] = len(self._songs)
+                    self._songs.append(entry)
+                else:
+                    self._remove_postings(position)
+                    self._songs[position] = entry
+                for field, tokens in entry["tokens"].items():
+                    for token in tokens:
+                        self._add_token(field, token, position)
+                self._titles.setdefault(title_key, set()).add(position)
+
+    def _remove_postings(self, position):
+        song = self._songs[position]
+        for field, tokens in song["tokens"].items():
+            for token in tokens:
+                self._postings[field].get(token, set()).discard(position)
+        self._titles.get(" ".join(tokenize(song["title"])), set()).discard(position)
+
+    def _replace(self, other):
+        with self._lock:
+            self._songs = other._songs
+            self._ids = other._ids
+            self._postings = other._postings
+            self._deletes = other._deletes
+            self._titles = other._titles
+
+    # Lookup
+
+    def _expand(self, token):
+        """Return {vocabulary token: weight} for a query token, exact match first."""
+        matches = {}
+        candidates = set(self._deletes.get(token, ()))
+        if len(token) >= 4:
+            for variant in deletions(token):
+                candidates.update(self._deletes.get(variant, ()))
+        for candidate in candidates:
+            matches[candidate] = 1.0 if candidate == token else FUZZY_WEIGHT
+        return matches
+
+    def _term_postings(self, token, fields):
+        """Return [(positions, weight)] of songs matching token in fields, best weight first."""
+        postings = []
+        for candidate, match_weight in self._expand(token).items():
+            for field, field_weight in fields.items():
+                positions = self._postings[field].get(candidate)
+                if positions:
+                    postings.append((positions, match_weight * field_weight))
+        postings.sort(key=lambda posting: -posting[1])
+        return postings
+
+    def _rank(self, terms, limit, title_text=None):
+        """Score songs against (token, fields) terms. Call with the lock held."""
+        # Filler words only count if nothing else is left
+        terms = [term for term in terms if term[0] not in QUERY_STOPWORDS] or terms
+        if not terms:
+            return []
+
+        total = len(self._songs) or 1
+        matches = []
+        for token, fields in terms:
+            postings = self._term_postings(token, fields)
+            size = sum(len(positions) for positions, _ in postings)
+            matches.append((postings, size, math.log(1 + total / (1 + size))))
+        possible = sum(idf for _, _, idf in matches)
+
+        # A song matching none of the rarest words can't reach MIN_SCORE on
+        # the common ones alone, so only the rare words' songs are scored
+        by_rarity = sorted(matches, key=lambda match: -match[2])
+        candidates = set()
+        remaining = possible
+        for postings, size, idf in by_rarity:
+            if remaining + TITLE_BONUS * possible < MIN_SCORE * possible:
+                break
+            remaining -= idf
+            for positions, _ in postings:
+                room = MAX_CANDIDATES - len(candidates)
+                if room <= 0:
+                    break
+                new = positions - candidates
+                if len(new) <= room:
+                    candidates |= new
+                else:
+                    others = [match for match in by_rarity if match[0] is not postings]
+                    candidates |= self._best_positions(new, others, room)
+        if title_text:
+            tokens = tokenize(title_text)
+            while tokens and tokens[0] in QUERY_STOPWORDS and len(tokens) > 1:
+                candidates.update(self._titles.get(" ".join(tokens), ()))
+                tokens = tokens[1:]
+            candidates.update(self._titles.get(" ".join(tokens), ()))
+
+        title_tokens = {token for token, fields in terms if "title" in fields}
+        scored = []
+        for position in candidates:
+            score = 0.0
+            for postings, _, idf in matches:
+                for positions, weight in postings:
+                    if position in positions:
+                        score += weight * idf
+                        break
+            score /= possible
+            # Prefer "Yesterday" over "Yesterday Once More"
+            song_title_tokens = self._songs[position]["tokens"]["title"]
+            if song_title_tokens:
+                score += TITLE_BONUS * len(song_title_tokens & title_tokens) / len(song_title_tokens)
+            if score >= MIN_SCORE:
+                scored.append((score, position))
+
+        return [
+            dict({key: self._songs[position][key] for key in ("id", "title", "artist", "album")},
+                 score=round(min(score, 1.0), 3))
+            for score, position in heapq.nsmallest(limit, scored, key=lambda item: (-item[0], item[1]))
+        ]
+
+    @staticmethod
+    def _best_positions(positions, matches, count):
+        """Pick count positions, preferring songs that match more of the other words.
+
+        Songs also matching the rarest other words come first and ties go to
+        library order, so truncation never depends on set iteration order.
+        """
+        tiers = [positions]
+        for postings, _, _ in matches:
+            narrowed = set()
+            for term_positions, _ in postings:
+                narrowed |= tiers[-1] & term_positions
+            if narrowed:
+                tiers.append(narrowed)
+
+        chosen = set()
+        for tier in reversed(tiers):
+            room = count - len(chosen)
+            if room <= 0:
+                break
+            extra = tier - chosen
+            if len(extra) <= room:
+                chosen |= extra
+            else:
+                chosen.update(sorted(extra)[:room])
+        return chosen
+
+    def search(self, query=None, title=None, artist=None, limit=5):
+        """Return the best matching songs, best first.
+
+        Pass either a free-text ``query`` (which may be "<title> by
+        <artist>") or ``title`` and/or ``artist``.
+
+        Returns:
+            list: Song dicts with ``id``, ``title``, ``artist``, ``album`` and
+                ``score`` (0-1, the IDF-weighted share of the query matched)
+        """
+        free_text = None
+        if title is None and artist is None:
+            free_text = query or ''
+            title, artist = parse_song_query(free_text)
+
+        with self._lock:
+            self.lookups += 1
+            results = []
+            if artist is not None or free_text is None:
+                terms = [(token, {"title": 1.0, "album": 0.3}) for token in tokenize(title)]
+                terms += [(token, {"artist": 1.0}) for token in tokenize(artist)]
+                results = self._rank(terms, limit, title)
+            # "Stand by Me" isn't a title and an artist
+            if not results and free_text is not None:
+                results = self._rank([(token, FIELD_WEIGHTS) for token in tokenize(free_text)], limit, free_text)
+            if not results:
+                self.misses += 1
+            return results
+
+    def resolve(self, query=None, title=None, artist=None):
+        """Return the single best matching song, or None."""
+        results = self.search(query, title=title, artist=artist, limit=1)
+        return results[0] if results else None
+
+    # Refreshing
+
+    def _library_pages(self):
+        offset = 0
+        while not self._stopped.is_set():
+            songs = self.client.get_library_songs(offset=offset, size=self.page_size)
+            if not songs:
+                return
+            yield songs
+            offset += len(songs)
+            if len(songs) < self.page_size:
+                return
+
+    def rebuild(self):
+        """Build a fresh index from the whole library and swap it in."""
+        started = time.monotonic()
+        fresh = LibraryIndex(self.client, page_size=self.page_size)
+        for songs in self._library_pages():
+            fresh.add_songs(songs)
+        newest = self.client.get_newest_albums(size=1)
+        self._replace(fresh)
+        self._newest_album = newest[0].get('id') if newest else None
+        self._built_at = time.monotonic()
+        self.rebuilds += 1
+        logger.info(f"Indexed {len(self)} library songs in {time.monotonic() - started:.1f}s")
+
+    def add_new_albums(self):
+        """Merge songs from albums added since the last refresh.
+
+        Returns:
+            int: Number of albums added
+        """
+        added = []
+        offset = 0
+        while True:
+            albums = self.client.get_newest_albums(size=50, offset=offset)
+            for album in albums:
+                if album.get('id') == self._newest_album:
+                    albums = []
+                    break
+                added.append(album)
+            if len(albums) < 50:
+                break
+            offset += len(albums)
+
+        for album in reversed(added):
+            self.add_songs(self.client.get_album_info(album['id']).get('song', []))
+        if added:
+            self._newest_album = added[0]['id']
+            self.incremental_updates += 1
+        return len(added)
+
+    def refresh(self):
+        """Bring the index up to date if the library changed or the index is due a rebuild."""
+        status = self.client.get_scan_status()
+        if status.get('scanning'):
+            return
+        previous = self._scan_status
+        current = {"count": status.get('count'), "lastScan": status.get('lastScan')}
+        stale = time.monotonic() - self._built_at >= self.full_refresh_interval
+        if previous == current and self.ready and not stale:
+            return
+
+        shrunk = previous and (current['count'] or 0) < (previous['count'] or 0)
+        if not self.ready or stale or shrunk or self._newest_album is None:
+            self.rebuild()
+        else:
+            self.add_new_albums()
+        # Only remember the scan once it's indexed, so a failed update is retried
+        self._scan_status = current
+
+    def _run(self):
+        while not self._stopped.is_set():
+            try:
+                self.refresh()
+            except Exception as e:
+                logger.error(f"Error refreshing library index: {str(e)}")
+            self._stopped.wait(self.refresh_interval)
+
+    def start(self):
+        """Build the index and keep it refreshed on a background thread."""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='library-index', daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "songs": len(self._ids),
+                "vocabulary": sum(len(postings) for postings in self._postings.values()),
+                "lookups": self.lookups,
+                "misses": self.misses,
+                "rebuilds": self.rebuilds,
+                "incremental_updates": self.incremental_updates
+            }
@@ -0,0 +1,507 @@
+"""Local SQLite mirror of the Navidrome library.
+
+Artists, albums and songs are copied into SQLite by a paged crawl
+(``getArtists``, ``getAlbumList2``, ``getAlbum``). Song, album and library
+reads in ``NavidromeClient`` are then answered by local queries.
+
+Syncs are incremental. A sync only runs when ``getScanStatus`` or the
+``getIndexes`` ``ifModifiedSince`` probe reports a change. It then lists
+albums (one call per 500 albums) and fetches only the albums that are new or
+whose song count, duration or timestamps changed. Albums that disappeared are
+deleted along with their songs.
+
+Rows keep the Subsonic JSON they came from, so readers get the same dicts as
+from a live call. An FTS5 index over song titles, artists, albums and genres,
+kept current by triggers, answers ``search``.
+"""
+
+import json
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_DB_PATH = os.path.join('data', 'library.db')
+
+ALBUM_PAGE_SIZE = 500
+# Albums written per transaction while syncing
+WRITE_BATCH = 50
+
+# bm25 weights for the title, artist, album and genre columns
+SEARCH_WEIGHTS = (10.0, 5.0, 2.0, 1.0)
+SEARCH_FIELDS = ('title', 'artist', 'album', 'genre')
+# Shorter prefixes match too much of the library to be useful
+MIN_PREFIX = 2
+
+_TERM = re.compile(r'(?:(title|artist|album|genre):)?(?:"([^"]*)"?|(\S+))', re.IGNORECASE)
+_WORD = re.compile(r'\w+')
+
+
+def _phrase(words, prefix=False):
+    star = '*' if prefix and len(words[-1]) >= MIN_PREFIX else ''
+    return '"' + ' '.join(words) + '"' + star
+
+
+def match_expression(query=None, prefix=False, **fields):
+    """Translate a search into an FTS5 MATCH expression.
+
+    Words must all match. ``"quoted text"`` matches a phrase, ``word*`` a
+    prefix, and ``artist:word`` (or title:, album:, genre:) one field.
+    Punctuation is ignored and operators are matched as plain words.
+
+    Args:
+        query (str, optional): Search text
+        prefix (bool): Also match the last word as a prefix, for
+            search-as-you-type
+        **fields: Text that must match within one field, e.g. ``title=``
+
+    Returns:
+        str: MATCH expression, or None if there is nothing to search for
+    """
+    terms = []
+    for match in _TERM.finditer(query or ''):
+        field, quoted, bare = match.groups()
+        words = _WORD.findall(quoted if quoted is not None else bare)
+        if not words:
+            continue
+        star = bare is not None and bare.endswith('*')
+        terms.append([field.lower() if field else None, words, star, quoted is None])
+    if prefix and terms and terms[-1][3] and not (query or '').endswith(' '):
+        terms[-1][2] = True
+    parts = [f"{field} : {_phrase(words, star)}" if field else _phrase(words, star)
+             for field, words, star, _ in terms]
+
+    for field, text in fields.items():
+        if field not in SEARCH_FIELDS:
+            raise ValueError(f"Unknown search field: {field}")
+        words = _WORD.findall(text or '')
+        if words:
+            parts.append(f"{field} : (" + ' '.join(_phrase([word]) for word in words) + ")")
+    # Implicit AND doesn't follow a parenthesised group
+    return ' AND '.join(parts) or None
+
+
+def album_signature(album):
+    """Return the album-list fields that change when an album's songs change."""
+    return json.dumps([album.get(key) for key in ('songCount', 'duration', 'created', 'changed', 'name', 'artist')])
+
+
+class LibraryMirror:
+    """SQLite copy of the library with a background incremental sync."""
+
+    def __init__(self, client, db_path=DEFAULT_DB_PATH, refresh_interval=300, fetch_workers=4):
+        """Initialize the mirror.
+
+        Args:
+            client (NavidromeClient): Server to mirror
+            db_path (str): SQLite database file
+            refresh_interval (float): Seconds between change checks
+            fetch_workers (int): Albums fetched at once while syncing
+        """
+        self.client = client
+        self.db_path = db_path
+        self.refresh_interval = refresh_interval
+        # Separate from the client's fan-out pool so a long sync never
+        # delays requests that fan out on behalf of listeners
+        self.fetch_executor = ThreadPoolExecutor(max_workers=fetch_workers, thread_name_prefix='library-mirror')
+        self._sync_lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._thread = None
+        self.syncs = 0
+        self.albums_fetched = 0
+        self.last_sync_seconds = None
+        self._init_db()
+        self._ready = self._state('synced_at') is not None
+
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=10, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        # INSERT OR REPLACE must fire the delete trigger that updates the search index
+        conn.execute('PRAGMA recursive_triggers = ON')
+        return conn
+
+    def _init_db(self):
+        os.makedirs(os.path.dirname(self.db_path) or '.', exist_ok=True)
+        conn = self._connect()
+        try:
+            # WAL lets requests read while the sync writes
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('''
+            CREATE TABLE IF NOT EXISTS artists (
+                id TEXT PRIMARY KEY,
+                name TEXT,
+                data TEXT NOT NULL
+            )
+            ''')
+            conn.execute('''
+            CREATE TABLE IF NOT EXISTS albums (
+                id TEXT PRIMARY KEY,
+                name TEXT,
+                artist TEXT,
+                artist_id TEXT,
+                year INTEGER,
+                genre TEXT,
+                created TEXT,
+                signature TEXT NOT NULL,
+                data TEXT NOT NULL
+            )
+            ''')
+            conn.execute('''
+            CREATE TABLE IF NOT EXISTS songs (
+                id TEXT PRIMARY KEY,
+                album_id TEXT NOT NULL,
+                title TEXT,
+                artist TEXT,
+                album TEXT,
+                year INTEGER,
+                genre TEXT,
+                disc INTEGER,
+                track INTEGER,
+                data TEXT NOT NULL
+            )
+            ''')
+            conn.execute('CREATE INDEX IF NOT EXISTS idx_songs_album ON songs (album_id, disc, track)')
+            conn.execute('CREATE INDEX IF NOT EXISTS idx_albums_created ON albums (created)')
+            conn.execute('CREATE INDEX IF NOT EXISTS idx_songs_genre ON songs (genre COLLATE NOCASE, year)')
+            conn.execute('CREATE INDEX IF NOT EXISTS idx_songs_year ON songs (year)')
+            self._init_search(conn)
+            conn.execute('''
+            CREATE TABLE IF NOT EXISTS sync_state (
+                key TEXT PRIMARY KEY,
+                value TEXT
+            )
+            ''')
+        finally:
+            conn.close()
+
+    @staticmethod
+    def _init_search(conn):
+        indexed = conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'songs_fts'").fetchone()
+        # External content: the index stores terms only and reads rows from songs
+        conn.execute('''
+        CREATE VIRTUAL TABLE IF NOT EXISTS songs_fts USING fts5(
+            title, artist, album, genre,
+            content='songs', content_rowid='rowid',
+            tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+        )
+        ''')
+        conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS songs_fts_insert AFTER INSERT ON songs BEGIN
+            INSERT INTO songs_fts (rowid, title, artist, album, genre)
+            VALUES (new.rowid, new.title, new.artist, new.album, new.genre);
+        END
+        ''')
+        conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS songs_fts_delete AFTER DELETE ON songs BEGIN
+            INSERT INTO songs_fts (songs_fts, rowid, title, artist, album, genre)
+            VALUES ('delete', old.rowid, old.title, old.artist, old.album, old.genre);
+        END
+        ''')
+        conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS songs_fts_update AFTER UPDATE ON songs BEGIN
+            INSERT INTO songs_fts (songs_fts, rowid, title, artist, album, genre)
+            VALUES ('delete', old.rowid, old.title, old.artist, old.album, old.genre);
+            INSERT INTO songs_fts (rowid, title, artist, album, genre)
+            VALUES (new.rowid, new.title, new.artist, new.album, new.genre);
+        END
+        ''')
+        # Stored in the index, so every connection ranks with these weights
+        weights = ', '.join(str(weight) for weight in SEARCH_WEIGHTS)
+        conn.execute("INSERT INTO songs_fts (songs_fts, rank) VALUES ('rank', ?)", (f'bm25({weights})',))
+        if not indexed:
+            # Index songs mirrored before search existed
+            conn.execute("INSERT INTO songs_fts (songs_fts) VALUES ('rebuild')")
+
+    @property
+    def ready(self):
+        """True once a full sync has completed."""
+        return self._ready
+
+    def _state(self, key):
+        conn = self._connect()
+        try:
+            row = conn.execute('SELECT value FROM sync_state WHERE key = ?', (key,)).fetchone()
+            return json.loads(row['value']) if row else None
+        finally:
+            conn.close()
+
+    @staticmethod
+    def _set_state(conn, key, value):
+        conn.execute('INSERT OR REPLACE INTO sync_state (key, value) VALUES (?, ?)', (key, json.dumps(value)))
+
+    # Queries
+
+    def get_song(self, song_id):
+        """Return a song dict, or None if it isn't mirrored."""
+        conn = self._connect()
+        try:
+            row = conn.execute('SELECT data FROM songs WHERE id = ?', (song_id,)).fetchone()
+            return json.loads(row['data']) if row else None
+        finally:
+            conn.close()
+
+    def get_album(self, album_id):
+        """Return an album dict with its ``song`` list, or None if it isn't mirrored."""
+        conn = self._connect()
+        try:
+            row = conn.execute('SELECT data FROM albums WHERE id = ?', (album_id,)).fetchone()
+            if row is None:
+                return None
+            album = json.loads(row['data'])
+            album['song'] = [json.loads(song['data']) for song in conn.execute(
+                'SELECT data FROM songs WHERE album_id = ? ORDER BY disc, track', (album_id,))]
+            return album
+        finally:
+            conn.close()
+
+    def get_songs(self, offset=0, size=500):
+        """Return a page of songs in a stable order."""
+        conn = self._connect()
+        try:
+            rows = conn.execute('SELECT data FROM songs ORDER BY rowid LIMIT ? OFFSET ?', (size, offset))
+            return [json.loads(row['data']) for row in rows]
+        finally:
+            conn.close()
+
+    def newest_albums(self, size=50, offset=0):
+        """Return albums, most recently added first."""
+        conn = self._connect()
+        try:
+            rows = conn.execute('SELECT data FROM albums ORDER BY created DESC, id LIMIT ? OFFSET ?',
+                                (size, offset))
+            return [json.loads(row['data']) for row in rows]
+        finally:
+            conn.close()
+
+    def search(self, query=None, limit=20, offset=0, genre=None, year_from=None, year_to=None,
+               prefix=False, **fields):
+        """Full-text search over mirrored songs, best matches first.
+
+        Args:
+            query (str, optional): Search text, see ``match_expression``
+            limit (int): Maximum number of songs to return
+            offset (int): Number of songs to skip
+            genre (str, optional): Only songs in this genre (case-insensitive)
+            year_from (int, optional): Only songs from this year on
+            year_to (int, optional): Only songs up to this year
+            prefix (bool): Match the last word as a prefix
+            **fields: Text that must match within one field (title, artist,
+                album, genre)
+
+        Returns:
+            list: Songs ranked by bm25; with only filters, songs by artist,
+            album and track
+        """
+        expression = match_expression(query, prefix=prefix, **fields)
+        where, args = [], []
+        if genre:
+            where.append('s.genre = ? COLLATE NOCASE')
+            args.append(genre)
+        if year_from is not None:
+            where.append('s.year >= ?')
+            args.append(year_from)
+        if year_to is not None:
+            where.append('s.year <= ?')
+            args.append(year_to)
+        if expression is None and not where:
+            return []
+
+        conn = self._connect()
+        try:
+            if expression is None:
+                rows = conn.execute(f'''
+                SELECT s.data FROM songs s WHERE {' AND '.join(where)}
+                ORDER BY s.artist, s.album, s.disc, s.track LIMIT ? OFFSET ?
+                ''', args + [limit, offset])
+                return [json.loads(row['data']) for row in rows]
+
+            where.insert(0, 'songs_fts MATCH ?')
+            args.insert(0, expression)
+            # The songs join is only needed to filter. CROSS JOIN keeps the
+            # planner from walking the genre or year index and running the
+            # match once per song
+            source = 'songs_fts CROSS JOIN songs s ON s.rowid = songs_fts.rowid' if len(where) > 1 else 'songs_fts'
+            # Rank row ids first so only the returned page of rows is loaded
+            rows = conn.execute(f'''
+            SELECT songs.data FROM (
+                SELECT songs_fts.rowid AS id, songs_fts.rank AS score
+                FROM {source} WHERE {' AND '.join(where)}
+                ORDER BY songs_fts.rank LIMIT ? OFFSET ?
+            ) hits JOIN songs ON songs.rowid = hits.id
+            ORDER BY hits.score
+            ''', args + [limit, offset])
+            return [json.loads(row['data']) for row in rows]
+        finally:
+            conn.close()
+
+    def scan_status(self):
+        """Return the server scan status as of the last completed sync."""
+        return self._state('scan_status') or {}
+
+    def stats(self):
+        conn = self._connect()
+        try:
+            counts = {table: conn.execute(f'SELECT COUNT(*) FROM {table}').fetchone()[0]
+                      for table in ('artists', 'albums', 'songs')}
+        finally:
+            conn.close()
+        return dict(counts,
+                    ready=self.ready,
+                    syncs=self.syncs,
+                    albums_fetched=self.albums_fetched,
+                    last_sync_seconds=self.last_sync_seconds,
+                    synced_at=self._state('synced_at'))
+
+    # Syncing. These make raw Subsonic calls, since the client's getters
+    # read from this mirror.
+
+    def _changed(self, status):
+        """Return (changed, last_modified) for the server's current state."""
+        known_status = self._state('scan_status')
+        last_modified = self._state('last_modified') or 0
+        response = self.client._make_request('getIndexes', {'ifModifiedSince': last_modified})
+        current_modified = response.get('indexes', {}).get('lastModified') or last_modified
+        status_changed = {key: status.get(key) for key in ('count', 'lastScan')} != \
+            {key: (known_status or {}).get(key) for key in ('count', 'lastScan')}
+        return not self.ready or status_changed or current_modified > last_modified, current_modified
+
+    def _list_albums(self):
+        albums = []
+        offset = 0
+        while True:
+            response = self.client._make_request('getAlbumList2', {
+                'type': 'alphabeticalByName', 'size': ALBUM_PAGE_SIZE, 'offset': offset})
+            page = response.get('albumList2', {}).get('album', [])
+            albums.extend(page)
+            if len(page) < ALBUM_PAGE_SIZE:
+                return albums
+            offset += len(page)
+
+    def _sync_artists(self, conn):
+        response = self.client._make_request('getArtists')
+        artists = [artist for index in response.get('artists', {}).get('index', [])
+                   for artist in index.get('artist', [])]
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            conn.execute('CREATE TEMP TABLE IF NOT EXISTS seen_artists (id TEXT PRIMARY KEY)')
+            conn.execute('DELETE FROM seen_artists')
+            for artist in artists:
+                conn.execute('INSERT OR REPLACE INTO artists (id, name, data) VALUES (?, ?, ?)',
+                             (artist['id'], artist.get('name'), json.dumps(artist)))
+                conn.execute('INSERT OR IGNORE INTO seen_artists (id) VALUES (?)', (artist['id'],))
+            conn.execute('DELETE FROM artists WHERE id NOT IN (SELECT id FROM seen_artists)')
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+
+    @staticmethod
+    def _write_album(conn, summary, album):
+        songs = album.pop('song', [])
+        conn.execute('DELETE FROM songs WHERE album_id = ?', (album['id'],))
+        conn.execute('''
+        INSERT OR REPLACE INTO albums (id, name, artist, artist_id, year, genre, created, signature, data)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ''', (album['id'], album.get('name'), album.get('artist'), album.get('artistId'), album.get('year'),
+              album.get('genre'), album.get('created'), album_signature(summary), json.dumps(album)))
+        conn.executemany('''
+        INSERT OR REPLACE INTO songs (id, album_id, title, artist, album, year, genre, disc, track, data)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ''', [(song['id'], album['id'], song.get('title'), song.get('artist'), song.get('album'),
+               song.get('year'), song.get('genre'), song.get('discNumber'), song.get('track'), json.dumps(song))
+              for song in songs])
+
+    def _sync_albums(self, conn):
+        listed = {album['id']: album for album in self._list_albums() if album.get('id')}
+        known = {row['id']: row['signature'] for row in conn.execute('SELECT id, signature FROM albums')}
+
+        removed = [album_id for album_id in known if album_id not in listed]
+        if removed:
+            conn.execute('BEGIN IMMEDIATE')
+            for album_id in removed:
+                conn.execute('DELETE FROM songs WHERE album_id = ?', (album_id,))
+                conn.execute('DELETE FROM albums WHERE id = ?', (album_id,))
+            conn.execute('COMMIT')
+
+        changed = [album_id for album_id, album in listed.items()
+                   if known.get(album_id) != album_signature(album)]
+
+        def fetch(album_id):
+            return self.client._make_request('getAlbum', {'id': album_id}).get('album', {})
+
+        # One batch in flight at a time, written before the next is fetched
+        for start in range(0, len(changed), WRITE_BATCH):
+            albums = self.fetch_executor.map(fetch, changed[start:start + WRITE_BATCH])
+            self._write_batch(conn, listed, [album for album in albums if album.get('id')])
+        return len(changed), len(removed)
+
+    def _write_batch(self, conn, listed, batch):
+        if not batch:
+            return
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            for album in batch:
+                self._write_album(conn, listed[album['id']], album)
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+        self.albums_fetched += len(batch)
+        batch.clear()
+
+    def sync(self, force=False):
+        """Bring the mirror up to date if the library changed.
+
+        Returns:
+            bool: True if a sync ran
+        """
+        with self._sync_lock:
+            status = self.client._make_request('getScanStatus').get('scanStatus', {})
+            if status.get('scanning'):
+                return False
+            changed, last_modified = self._changed(status)
+            if not (changed or force):
+                return False
+
+            started = time.monotonic()
+            conn = self._connect()
+            try:
+                self._sync_artists(conn)
+                fetched, removed = self._sync_albums(conn)
+                conn.execute('BEGIN IMMEDIATE')
+                self._set_state(conn, 'scan_status', {key: status.get(key) for key in ('count', 'lastScan')})
+                self._set_state(conn, 'last_modified', last_modified)
+                self._set_state(conn, 'synced_at', time.time())
+                conn.execute('COMMIT')
+            finally:
+                conn.close()
+
+            self._ready = True
+            self.syncs += 1
+            self.last_sync_seconds = time.monotonic() - started
+            logger.info(f"Library mirror synced: {fetched} albums fetched, {removed} removed "
+                        f"in {self.last_sync_seconds:.1f}s")
+            return True
+
+    def _run(self):
+        while not self._stopped.is_set():
+            try:
+                self.sync()
+            except Exception as e:
+                logger.error(f"Error syncing library mirror: {str(e)}")
+            self._stopped.wait(self.refresh_interval)
+
+    def start(self):
+        """Sync now and then every ``refresh_interval`` seconds on a background thread."""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='library-mirror', daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+        self.fetch_executor.shutdown(wait=False, cancel_futures=True)
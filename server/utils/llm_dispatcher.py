@@ -0,0 +1,167 @@
+import contextvars
+import heapq
+import itertools
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+# Priority classes, highest first
+INTERACTIVE = 'interactive'
+STANDARD = 'standard'
+BACKGROUND = 'background'
+PRIORITIES = (INTERACTIVE, STANDARD, BACKGROUND)
+
+# Seconds queued work of each class waits for a slot before giving up;
+# listeners are never turned away
+DEFAULT_MAX_WAIT = {INTERACTIVE: None, STANDARD: 60, BACKGROUND: 120}
+
+# Queue waits kept per class for percentiles
+WAIT_SAMPLES = 500
+
+_current_priority = contextvars.ContextVar('llm_priority', default=INTERACTIVE)
+
+
+def current_priority():
+    """Return the priority class LLM calls made here default to."""
+    return _current_priority.get()
+
+
+@contextmanager
+def llm_priority(priority):
+    """Run LLM calls in the block at the given priority class."""
+    if priority not in PRIORITIES:
+        raise ValueError(f"Unknown LLM priority: {priority!r}")
+    token = _current_priority.set(priority)
+    try:
+        yield
+    finally:
+        _current_priority.reset(token)
+
+
+class LLMQueueTimeout(RuntimeError):
+    """Raised when queued LLM work waits longer than its class allows."""
+
+
+class ClassStats:
+    def __init__(self):
+        self.queued = 0
+        self.running = 0
+        self.started = 0
+        self.preempted = 0
+        self.timed_out = 0
+        self.waits = deque(maxlen=WAIT_SAMPLES)
+        self.max_wait = 0.0
+
+    def snapshot(self):
+        waits = sorted(self.waits)
+        return {
+            "queued": self.queued,
+            "running": self.running,
+            "started": self.started,
+            "preempted": self.preempted,
+            "timed_out": self.timed_out,
+            "wait_avg": sum(waits) / len(waits) if waits else 0.0,
+            "wait_p95": waits[min(len(waits) - 1, int(len(waits) * 0.95))] if waits else 0.0,
+            "wait_max": self.max_wait
+        }
+
+
+class LLMDispatcher:
+    """Admit LLM calls to a provider in priority order, a few at a time.
+
+    At most ``max_concurrent`` calls run at once. Callers waiting for a slot
+    are served highest priority class first, then in arrival order, so a
+    listener's request overtakes queued trend analyses and intros; each time
+    that happens the overtaken class's ``preempted`` counter goes up. Queued
+    work that waits longer than its class's ``max_wait`` raises
+    ``LLMQueueTimeout`` instead of running late.
+    """
+
+    def __init__(self, max_concurrent=5, max_wait=None):
+        """Initialize the dispatcher.
+
+        Args:
+            max_concurrent (int): Calls allowed to run at once
+            max_wait (dict, optional): Seconds each priority class may wait
+                for a slot, None for no limit; defaults to
+                ``DEFAULT_MAX_WAIT``
+        """
+        self.max_concurrent = max(1, int(max_concurrent))
+        self.max_wait = dict(DEFAULT_MAX_WAIT, **(max_wait or {}))
+        self._waiting = []
+        self._sequence = itertools.count()
+        self._active = 0
+        self._cond = threading.Condition()
+        self._stats = {priority: ClassStats() for priority in PRIORITIES}
+
+    def acquire(self, priority=None):
+        """Wait for a slot.
+
+        Raises:
+            LLMQueueTimeout: If the class's max_wait passes first
+        """
+        priority = priority or current_priority()
+        if priority not in PRIORITIES:
+            raise ValueError(f"Unknown LLM priority: {priority!r}")
+        stats = self._stats[priority]
+        max_wait = self.max_wait.get(priority)
+        queued_at = time.monotonic()
+        deadline = queued_at + max_wait if max_wait is not None else None
+
+        with self._cond:
+            entry = (PRIORITIES.index(priority), next(self._sequence), priority)
+            heapq.heappush(self._waiting, entry)
+            stats.queued += 1
+            while self._active >= self.max_concurrent or self._waiting[0] is not entry:
+                remaining = deadline - time.monotonic() if deadline is not None else None
+                if remaining is not None and remaining <= 0:
+                    self._waiting.remove(entry)
+                    heapq.heapify(self._waiting)
+                    stats.queued -= 1
+                    stats.timed_out += 1
+                    # The next waiter may be able to go now
+                    self._cond.notify_all()
+                    raise LLMQueueTimeout(
+                        f"No LLM slot for {priority} work after {max_wait}s")
+                self._cond.wait(remaining)
+
+            heapq.heappop(self._waiting)
+            self._active += 1
+            for rank, sequence, overtaken in self._waiting:
+                if rank > entry[0] and sequence < entry[1]:
+                    self._stats[overtaken].preempted += 1
+            wait = time.monotonic() - queued_at
+            stats.queued -= 1
+            stats.running += 1
+            stats.started += 1
+            stats.waits.append(wait)
+            stats.max_wait = max(stats.max_wait, wait)
+            self._cond.notify_all()
+
+    def release(self, priority=None):
+        priority = priority or current_priority()
+        with self._cond:
+            self._active -= 1
+            self._stats[priority].running -= 1
+            self._cond.notify_all()
+
+    @contextmanager
+    def slot(self, priority=None):
+        """Hold a slot for the duration of the block."""
+        priority = priority or current_priority()
+        self.acquire(priority)
+        try:
+            yield
+        finally:
+            self.release(priority)
+
+    def stats(self):
+        """Return slot usage and per-class queue-wait metrics."""
+        with self._cond:
+            return {
+                "max_concurrent": self.max_concurrent,
+                "active": self._active,
+                "queued": len(self._waiting),
+                "classes": {priority: stats.snapshot() for priority, stats in self._stats.items()}
+            }
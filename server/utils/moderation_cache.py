@@ -0,0 +1,109 @@
+import re
+import threading
+
+from server.utils.cache import TTLCache
+from server.utils.prompt_registry import get_registry
+
+# Prompts whose wording decides moderation verdicts
+MODERATION_PROMPTS = ('moderation', 'router')
+
+# Now-playing fields replaced by placeholders before keying the cache
+NOW_PLAYING_FIELDS = ('title', 'artist', 'album')
+
+
+def normalize_request(text, now_playing=None):
+    """Normalize request text into a cache key.
+
+    Case, punctuation and whitespace are folded, and mentions of the currently
+    playing title, artist or album are replaced by placeholders so
+    "tell me about Yesterday" matches regardless of which song is on. Values
+    are only replaced as whole words, so a title like "Love" leaves "lovely"
+    alone.
+
+    Returns:
+        tuple: (key, substituted) where substituted is True if any
+        now-playing value was replaced
+    """
+    key = text.lower()
+    substituted = False
+    for field in NOW_PLAYING_FIELDS:
+        value = (now_playing or {}).get(field)
+        if not value or len(value.strip()) <= 1:
+            continue
+        # Lookarounds rather than \b so values like "P!nk" or "Help!" still match
+        pattern = rf"(?<!\w){re.escape(value.strip().lower())}(?!\w)"
+        key, count = re.subn(pattern, f" <{field}> ", key)
+        substituted = substituted or count > 0
+    key = re.sub(r"[^\w\s<>]", " ", key)
+    key = re.sub(r"\s+", " ", key).strip()
+    return key, substituted
+
+
+class ModerationCache:
+    """LRU+TTL cache of moderation verdicts keyed on normalized request text.
+
+    The cache is cleared whenever the prompt registry reloads one of the
+    moderation prompts, so cached verdicts always come from the prompts the
+    registry is serving.
+    """
+
+    def __init__(self, max_size=1000, ttl=3600, registry=None, prompt_names=MODERATION_PROMPTS):
+        """Initialize the cache.
+
+        Args:
+            max_size (int): Maximum number of cached verdicts
+            ttl (float): Seconds a verdict stays valid
+            registry (PromptRegistry, optional): Registry the moderation
+                prompts are read from; the shared one if omitted
+            prompt_names (tuple): Templates whose reload invalidates the cache
+        """
+        self.cache = TTLCache(max_size=max_size, ttl=ttl)
+        self.registry = registry or get_registry()
+        self.prompt_names = prompt_names
+        self.invalidations = 0
+        self._lock = threading.Lock()
+        self._prompt_version = self.registry.version(*prompt_names)
+
+    def _check_prompts(self):
+        """Clear the cache if a moderation prompt was reloaded since the last check."""
+        version = self.registry.version(*self.prompt_names)
+        with self._lock:
+            if version == self._prompt_version:
+                return
+            self._prompt_version = version
+            self.invalidations += 1
+        self.cache.clear()
+
+    def get(self, text, now_playing=None):
+        """Return the cached entry for a request, or None.
+
+        Returns:
+            dict or None: ``is_music_related``, ``message`` and ``route`` (the
+            router result, or None if only the verdict was cached)
+        """
+        self._check_prompts()
+        key, _ = normalize_request(text, now_playing)
+        return self.cache.get(key)
+
+    def set(self, text, is_music_related, message, route=None, now_playing=None):
+        """Cache a moderation verdict.
+
+        Router results are only kept when no now-playing value was replaced,
+        because their entities may name the song that was playing at the time.
+        """
+        key, substituted = normalize_request(text, now_playing)
+        if not key:
+            return
+        self.cache.set(key, {
+            "is_music_related": is_music_related,
+            "message": message,
+            "route": None if substituted else route
+        })
+
+    def clear(self):
+        self.cache.clear()
+
+    def stats(self):
+        stats = self.cache.stats()
+        stats["invalidations"] = self.invalidations
+        return stats
@@ -0,0 +1,405 @@
+"""Local fast-path moderation classifier for DJ requests.
+
+A small hashed n-gram logistic regression model screens requests before they
+reach the LLM moderator. Requests the model is confident about are accepted or
+rejected locally; everything else is escalated to the LLM.
+
+Train or inspect the model from the repository root with::
+
+    python -m server.utils.moderation_classifier train [--library]
+    python -m server.utils.moderation_classifier report
+"""
+
+import argparse
+import json
+import logging
+import math
+import os
+import random
+import re
+import threading
+import time
+import zlib
+
+from server.utils.interaction_log import DEFAULT_LOG_PATH, backup_path, read_interactions
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MODEL_PATH = os.path.join('data', 'moderation_classifier.json')
+DEFAULT_SAMPLES_PATH = os.path.join('data', 'moderation_samples.jsonl')
+DEFAULT_MAX_SAMPLES_BYTES = 5 * 1024 * 1024
+DEFAULT_INTERACTION_LOG = DEFAULT_LOG_PATH
+
+# Seed examples so a usable model exists before any traffic has been logged
+SEED_MUSIC_REQUESTS = [
+    "play something chill", "play a song by the beatles", "play some jazz",
+    "tell me about this song", "tell me a fun fact about the current song",
+    "who sings this song", "what album is this from", "when was this song released",
+    "tell me some music trivia", "give me a music quiz", "music trivia please",
+    "create a playlist for a road trip", "make me a workout playlist",
+    "build a chill study mix", "i want a party playlist", "make a romantic dinner playlist",
+    "play more songs like this", "can you play something upbeat", "play the next track",
+    "who is the drummer in this band", "what genre is this", "recommend an artist like radiohead",
+    "play get lucky by daft punk", "play bohemian rhapsody", "who wrote this track",
+    "what's the story behind this song", "tell me about the artist", "play some 80s rock",
+    "i want to hear some hip hop", "play something relaxing", "what instruments are in this song",
+    "is this song a cover", "what are the lyrics about", "play a classic from the 70s",
+    "play taylor swift", "queue up some kendrick lamar", "what other albums did they release",
+    "tell me about the history of punk rock", "who produced this album", "play some lo-fi beats",
+    "play a sad song", "can you play some metal", "what's your favourite album",
+    "which band had the most number one hits", "play an acoustic version", "turn on some blues",
+    "play some classical music", "i love this song", "who was the lead singer of queen",
+    "what bpm is this track", "make a playlist of 90s hits", "play something for focus",
+]
+
+SEED_OFF_TOPIC_REQUESTS = [
+    "what's the weather today", "what is the capital of france", "help me with my homework",
+    "write my essay", "what is 2 plus 2", "tell me a joke about politics",
+    "who won the election", "how do i cook pasta", "what time is it",
+    "can you do my taxes", "how do i fix my car", "what's the stock price of apple",
+    "translate this to spanish", "write some python code", "how tall is mount everest",
+    "who is the president", "book me a flight", "what should i eat for dinner",
+    "explain quantum physics", "how do i lose weight", "recommend a good movie",
+    "what's the news today", "how far is the moon", "solve this math problem",
+    "give me medical advice", "what's the best phone to buy", "how do i make money fast",
+    "tell me about world war two", "what's the recipe for lasagna", "how do i learn to code",
+    "who won the football game", "what is the meaning of life", "help me write a cover letter",
+    "what's your opinion on religion", "how do vaccines work", "write a poem about cats",
+    "how do i hack a website", "send an email to my boss", "what's the population of china",
+    "recommend a good book", "how do i change a tire", "what are the symptoms of flu",
+    "plan my vacation", "what is bitcoin", "how do i install windows",
+    "teach me chemistry", "what's the best pizza place nearby", "order me some food",
+    "tell me about dinosaurs", "how do airplanes fly", "summarize this article",
+]
+
+
+def _tokenize(text):
+    """Lowercase a request and split it into word tokens."""
+    return re.findall(r"[a-z0-9']+", text.lower())
+
+
+def extract_features(text, num_features):
+    """Map a request to a sparse, L2-normalized hashed feature vector.
+
+    Features are word unigrams, word bigrams and character trigrams of each
+    word, hashed into ``num_features`` buckets.
+
+    Returns:
+        dict: Mapping of feature index to value
+    """
+    words = _tokenize(text)
+    grams = ["w:" + word for word in words]
+    grams.extend("b:%s %s" % (a, b) for a, b in zip(words, words[1:]))
+    for word in words:
+        padded = "^%s$" % word
+        grams.extend("c:" + padded[i:i + 3] for i in range(len(padded) - 2))
+
+    features = {}
+    for gram in grams:
+        index = zlib.crc32(gram.encode('utf-8')) % num_features
+        features[index] = features.get(index, 0.0) + 1.0
+
+    norm = math.sqrt(sum(value * value for value in features.values()))
+    if norm:
+        for index in features:
+            features[index] /= norm
+    return features
+
+
+class ModerationClassifier:
+    """Hashed n-gram logistic regression that pre-screens DJ requests."""
+
+    def __init__(self, threshold=0.9, num_features=2 ** 18, model_path=DEFAULT_MODEL_PATH,
+                 samples_path=DEFAULT_SAMPLES_PATH, max_samples_bytes=DEFAULT_MAX_SAMPLES_BYTES):
+        """Initialize an untrained classifier.
+
+        Args:
+            threshold (float): Minimum probability for a local verdict. Requests
+                scoring between ``1 - threshold`` and ``threshold`` are escalated.
+            num_features (int): Number of hash buckets
+            model_path (str): Where trained weights are saved
+            samples_path (str): Where labelled LLM verdicts are recorded
+            max_samples_bytes (int): Size at which the sample file is rotated to
+                ``<samples_path>.1``, replacing the previous rotation
+        """
+        self.threshold = threshold
+        self.num_features = num_features
+        self.model_path = model_path
+        self.samples_path = samples_path
+        self.max_samples_bytes = max_samples_bytes
+        self.weights = {}
+        self.bias = 0.0
+        self.trained = False
+
+        self._lock = threading.Lock()
+        self.fast_accepts = 0
+        self.fast_rejects = 0
+        self.escalations = 0
+        self.total_seconds = 0.0
+
+    def predict_proba(self, text):
+        """Return the probability that a request is music-related."""
+        score = self.bias
+        for index, value in extract_features(text, self.num_features).items():
+            score += self.weights.get(index, 0.0) * value
+        # Clamp to keep math.exp in range
+        score = max(-30.0, min(30.0, score))
+        return 1.0 / (1.0 + math.exp(-score))
+
+    def classify(self, text, allow_accept=True, allow_reject=True):
+        """Classify a request if the model is confident enough.
+
+        Args:
+            text (str): The request text
+            allow_accept (bool): If False only confident rejects are returned,
+                for callers that need the LLM for accepted requests anyway
+            allow_reject (bool): If False confident rejects are escalated too
+
+        Returns:
+            bool or None: True for a confident accept, False for a confident
+            reject, None when the request should be escalated to the LLM
+        """
+        if not self.trained:
+            return None
+
+        start = time.perf_counter()
+        probability = self.predict_proba(text)
+        if probability >= self.threshold and allow_accept:
+            verdict = True
+        elif probability <= 1.0 - self.threshold and allow_reject:
+            verdict = False
+        else:
+            verdict = None
+        elapsed = time.perf_counter() - start
+
+        with self._lock:
+            self.total_seconds += elapsed
+            if verdict is True:
+                self.fast_accepts += 1
+            elif verdict is False:
+                self.fast_rejects += 1
+            else:
+                self.escalations += 1
+        return verdict
+
+    def train(self, samples, epochs=20, learning_rate=0.5, l2=1e-5, seed=0):
+        """Fit the model with stochastic gradient descent.
+
+        Args:
+            samples (list): (text, is_music_related) pairs
+            epochs (int): Passes over the training data
+            learning_rate (float): Initial SGD step size
+            l2 (float): L2 regularization strength
+            seed (int): Shuffle seed, for reproducible models
+        """
+        data = [(extract_features(text, self.num_features), 1.0 if label else 0.0)
+                for text, label in samples if text]
+        if not data or len({label for _, label in data}) < 2:
+            raise ValueError("Training needs both music and non-music examples")
+
+        weights = {}
+        bias = 0.0
+        rng = random.Random(seed)
+        for epoch in range(epochs):
+            rng.shuffle(data)
+            rate = learning_rate / (1.0 + epoch * 0.1)
+            for features, label in data:
+                score = bias + sum(weights.get(i, 0.0) * v for i, v in features.items())
+                score = max(-30.0, min(30.0, score))
+                error = 1.0 / (1.0 + math.exp(-score)) - label
+                for index, value in features.items():
+                    weight = weights.get(index, 0.0)
+                    weights[index] = weight - rate * (error * value + l2 * weight)
+                bias -= rate * error
+
+        self.weights = weights
+        self.bias = bias
+        self.trained = True
+        logger.info("Trained moderation classifier on %d samples", len(data))
+
+    def record_verdict(self, text, is_music_related):
+        """Append an LLM moderation verdict to the labelled sample file.
+
+        Recorded verdicts are used as training data the next time the model is
+        trained, so escalated requests teach the fast path over time. Once the
+        file reaches ``max_samples_bytes`` it is moved to ``<samples_path>.1``,
+        so at most two files' worth of samples are kept on disk.
+        """
+        line = json.dumps({"text": text, "label": bool(is_music_related)}) + "\n"
+        try:
+            os.makedirs(os.path.dirname(self.samples_path) or '.', exist_ok=True)
+            with self._lock:
+                try:
+                    size = os.path.getsize(self.samples_path)
+                except OSError:
+                    size = 0
+                if size and size + len(line) > self.max_samples_bytes:
+                    os.replace(self.samples_path, backup_path(self.samples_path, 1))
+                with open(self.samples_path, 'a') as f:
+                    f.write(line)
+        except OSError as e:
+            logger.error("Error recording moderation sample: %s", str(e))
+
+    def save(self, path=None):
+        """Save trained weights as JSON."""
+        path = path or self.model_path
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'w') as f:
+            json.dump({
+                "num_features": self.num_features,
+                "bias": self.bias,
+                "weights": {str(index): weight for index, weight in self.weights.items()}
+            }, f)
+
+    def load(self, path=None):
+        """Load trained weights saved by ``save``.
+
+        Returns:
+            bool: True if a model was loaded
+        """
+        path = path or self.model_path
+        if not os.path.exists(path):
+            return False
+        with open(path, 'r') as f:
+            data = json.load(f)
+        self.num_features = data["num_features"]
+        self.bias = data["bias"]
+        self.weights = {int(index): weight for index, weight in data["weights"].items()}
+        self.trained = True
+        return True
+
+    def stats(self):
+        """Return fast-path counters, including how many LLM calls were saved."""
+        with self._lock:
+            decided = self.fast_accepts + self.fast_rejects
+            total = decided + self.escalations
+            return {
+                "trained": self.trained,
+                "threshold": self.threshold,
+                "fast_accepts": self.fast_accepts,
+                "fast_rejects": self.fast_rejects,
+                "escalations": self.escalations,
+                "llm_calls_saved": decided,
+                "saved_ratio": decided / total if total else 0.0,
+                "avg_latency_ms": (self.total_seconds / total * 1000) if total else 0.0
+            }
+
+
+def load_interaction_requests(log_file=DEFAULT_INTERACTION_LOG):
+    """Return requests from the interaction log, including rotated files.
+
+    Only requests that passed moderation are logged, so they are all positive
+    examples.
+    """
+    return [entry.get('request', '') for entry in read_interactions(log_file) if entry.get('request')]
+
+
+def load_recorded_samples(samples_path=DEFAULT_SAMPLES_PATH):
+    """Return (text, label) pairs recorded from LLM moderation verdicts.
+
+    Reads the rotated ``<samples_path>.1`` file first, then the current one.
+    """
+    samples = []
+    for path in (backup_path(samples_path, 1), samples_path):
+        if not os.path.exists(path):
+            continue
+        with open(path, 'r') as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                samples.append((entry.get('text', ''), bool(entry.get('label'))))
+    return samples
+
+
+def library_requests(songs):
+    """Build music-related example requests from library songs.
+
+    Args:
+        songs (list): Song dicts with ``title`` and ``artist`` keys
+    """
+    examples = []
+    for song in songs:
+        title = song.get('title')
+        artist = song.get('artist')
+        if title:
+            examples.append(f"play {title}")
+        if title and artist:
+            examples.append(f"{title} by {artist}")
+        if artist:
+            examples.append(f"tell me about {artist}")
+    return examples
+
+
+def build_training_samples(library_songs=None, log_file=DEFAULT_INTERACTION_LOG,
+                           samples_path=DEFAULT_SAMPLES_PATH):
+    """Collect training samples from seeds, logs, recorded verdicts and the library."""
+    samples = [(text, True) for text in SEED_MUSIC_REQUESTS]
+    samples.extend((text, False) for text in SEED_OFF_TOPIC_REQUESTS)
+    samples.extend((text, True) for text in load_interaction_requests(log_file))
+    samples.extend(load_recorded_samples(samples_path))
+    if library_songs:
+        samples.extend((text, True) for text in library_requests(library_songs))
+    return samples
+
+
+def load_or_train(threshold=0.9, model_path=DEFAULT_MODEL_PATH):
+    """Load the saved model, training one from local data if none exists."""
+    classifier = ModerationClassifier(threshold=threshold, model_path=model_path)
+    try:
+        if not classifier.load():
+            classifier.train(build_training_samples(samples_path=classifier.samples_path))
+            classifier.save()
+    except Exception as e:
+        logger.error("Error preparing moderation classifier: %s", str(e))
+    return classifier
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Train or inspect the local moderation classifier")
+    parser.add_argument("command", choices=["train", "report"])
+    parser.add_argument("--library", action="store_true",
+                        help="Include artist/title vocabulary from Navidrome when training")
+    parser.add_argument("--library-size", type=int, default=500,
+                        help="Number of library songs to sample")
+    parser.add_argument("--threshold", type=float, default=0.9)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    from dotenv import load_dotenv
+    load_dotenv()
+
+    classifier = ModerationClassifier(threshold=args.threshold)
+
+    if args.command == "train":
+        library_songs = None
+        if args.library:
+            from server.utils.navidrome import NavidromeClient
+            client = NavidromeClient(os.getenv('NAVIDROME_URL', 'http://localhost:4533'),
+                                     os.getenv('NAVIDROME_USERNAME', ''),
+                                     os.getenv('NAVIDROME_PASSWORD', ''))
+            library_songs = client.search('', search_type="song", limit=args.library_size)
+        samples = build_training_samples(library_songs)
+        classifier.train(samples)
+        classifier.save()
+        print(f"Trained on {len(samples)} samples, saved to {classifier.model_path}")
+        return
+
+    if not classifier.load():
+        print("No trained model found. Run with 'train' first.")
+        return
+    samples = build_training_samples()
+    decided = correct = 0
+    for text, label in samples:
+        verdict = classifier.classify(text)
+        if verdict is not None:
+            decided += 1
+            correct += verdict == label
+    print(json.dumps(classifier.stats(), indent=2))
+    if decided:
+        print(f"Accuracy on decided training samples: {correct / decided:.1%}")
+
+
+if __name__ == "__main__":
+    main()
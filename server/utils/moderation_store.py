@@ -0,0 +1,565 @@
+"""Moderation state (warnings, mutes, suspensions) and moderation rules.
+
+Two interchangeable backends share the same interface:
+
+- ``SQLiteModerationStore`` keeps state in a WAL-mode SQLite database, so
+  every worker process sees the same mutes, suspensions and rules.
+- ``MemoryModerationStore`` keeps state in a dict for single-process use.
+
+Users who have been idle for ``idle_ttl`` seconds and have no active penalty
+are dropped, so state doesn't grow with every user ID ever seen.
+"""
+
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+from server.utils.cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_DB_PATH = os.path.join('data', 'moderation_state.db')
+
+DEFAULT_MODERATION_RULES = {
+    "mute_duration": 60,  # seconds
+    "warning_threshold": 2,  # warnings before muting
+    "mute_threshold": 3,  # mutes before suspension
+    "suspension_duration": 3600,  # seconds (1 hour)
+}
+
+# Idle users without an active mute or suspension are forgotten after a week
+DEFAULT_IDLE_TTL = 7 * 24 * 3600
+
+# How often idle users are purged, and how often last_request is persisted
+PURGE_INTERVAL = 600
+TOUCH_INTERVAL = 60
+
+# Smallest gap between two updated_at values written to SQLite
+STAMP_STEP = 1e-6
+
+
+def new_user_state(now, warnings=0):
+    return {
+        'status': 'active',
+        'warnings': warnings,
+        'mutes': 0,
+        'muted_until': None,
+        'suspended_until': None,
+        'last_request': now,
+        'updated_at': now
+    }
+
+
+def expire_penalties(state, now):
+    """Clear a mute or suspension whose time has passed.
+
+    Returns:
+        bool: True if the state changed
+    """
+    if state.get('status', 'active') == 'active':
+        return False
+    if state.get('suspended_until') and now < state['suspended_until']:
+        return False
+    if state.get('muted_until') and now < state['muted_until']:
+        return False
+    state['status'] = 'active'
+    state['muted_until'] = None
+    state['suspended_until'] = None
+    state['updated_at'] = now
+    return True
+
+
+def apply_warning(state, rules, now):
+    """Add a warning, muting or suspending the user if a threshold is reached."""
+    state['warnings'] = state.get('warnings', 0) + 1
+    state['updated_at'] = now
+
+    # Check if user should be muted
+    if state['warnings'] >= rules['warning_threshold']:
+        state['status'] = 'muted'
+        state['muted_until'] = now + rules['mute_duration']
+        state['mutes'] = state.get('mutes', 0) + 1
+        state['warnings'] = 0  # Reset warnings after muting
+
+        # Check if user should be suspended after multiple mutes
+        if state['mutes'] >= rules['mute_threshold']:
+            state['status'] = 'suspended'
+            state['suspended_until'] = now + rules['suspension_duration']
+            state['mutes'] = 0  # Reset mutes after suspension
+    return state
+
+
+def clean_rules(changes):
+    """Keep only known rule names with integer values."""
+    return {key: int(changes[key]) for key in DEFAULT_MODERATION_RULES if key in changes}
+
+
+def encode_cursor(updated_at, user_id):
+    """Return an opaque cursor for the position just after a user."""
+    return f"{updated_at!r}:{user_id}"
+
+
+def decode_cursor(cursor):
+    """Split a cursor into (updated_at, user_id).
+
+    A bare timestamp is accepted too and means "changed after this time".
+
+    Raises:
+        ValueError: If the cursor is malformed
+    """
+    updated_at, _, user_id = str(cursor).partition(':')
+    return float(updated_at), user_id
+
+
+def paginate(users, limit, since):
+    """Cut a sorted list of users to one page and build the next cursor."""
+    page = users[:limit]
+    has_more = len(users) > limit
+    if page:
+        next_cursor = encode_cursor(page[-1]['updated_at'], page[-1]['user_id'])
+    else:
+        next_cursor = since
+    return page, next_cursor, has_more
+
+
+class MemoryModerationStore:
+    """Moderation state held in this process only."""
+
+    backend = 'memory'
+
+    def __init__(self, idle_ttl=DEFAULT_IDLE_TTL, clock=time.time):
+        self.idle_ttl = idle_ttl
+        self.clock = clock
+        self._users = {}
+        self._rules = dict(DEFAULT_MODERATION_RULES)
+        self._lock = threading.Lock()
+        self._last_purge = clock()
+
+    def get_user(self, user_id):
+        """Return a copy of the user's state, or None if the user is unknown."""
+        with self._lock:
+            state = self._users.get(user_id)
+            return dict(state) if state else None
+
+    def touch(self, user_id):
+        """Record a request from the user, clearing expired penalties.
+
+        Returns:
+            tuple: (state, created) where created is True for a new user
+        """
+        now = self.clock()
+        self._maybe_purge(now)
+        with self._lock:
+            state = self._users.get(user_id)
+            if state is None:
+                state = self._users[user_id] = new_user_state(now)
+                return dict(state), True
+            expire_penalties(state, now)
+            state['last_request'] = now
+            return dict(state), False
+
+    def record_warning(self, user_id):
+        """Add a warning for the user and return the updated state."""
+        with self._lock:
+            now = self.clock()
+            state = self._users.get(user_id)
+            if state is None:
+                # A first warning never mutes
+                state = self._users[user_id] = new_user_state(now, warnings=1)
+            else:
+                apply_warning(state, self._rules, now)
+            return dict(state)
+
+    def reset_user(self, user_id):
+        """Clear warnings and penalties for a known user."""
+        with self._lock:
+            if user_id in self._users:
+                self._users[user_id] = new_user_state(self.clock())
+
+    def list_users(self, since=None, active_since=None, limit=50):
+        """Return users changed after a cursor, oldest change first.
+
+        Args:
+            since (str, optional): Cursor from a previous page
+            active_since (float, optional): Only users who made a request
+                at or after this time
+            limit (int): Maximum number of users to return
+
+        Returns:
+            tuple: (users, next_cursor, has_more); users are state dicts with
+                a ``user_id`` key
+        """
+        after = decode_cursor(since) if since else None
+        with self._lock:
+            users = [dict(state, user_id=user_id) for user_id, state in self._users.items()]
+        users.sort(key=lambda user: (user['updated_at'], user['user_id']))
+        if after is not None:
+            users = [user for user in users if (user['updated_at'], user['user_id']) > after]
+        if active_since is not None:
+            users = [user for user in users if user['last_request'] >= active_since]
+        return paginate(users, limit, since)
+
+    def rules(self):
+        with self._lock:
+            return dict(self._rules)
+
+    def update_rules(self, changes):
+        """Update rule values and return the full rule set."""
+        with self._lock:
+            self._rules.update(clean_rules(changes))
+            return dict(self._rules)
+
+    def purge_idle(self, now=None):
+        """Forget idle users without an active penalty.
+
+        Returns:
+            int: Number of users removed
+        """
+        now = self.clock() if now is None else now
+        cutoff = now - self.idle_ttl
+        with self._lock:
+            idle = [user_id for user_id, state in self._users.items()
+                    if state.get('last_request', 0) < cutoff
+                    and (state.get('muted_until') or 0) <= now
+                    and (state.get('suspended_until') or 0) <= now]
+            for user_id in idle:
+                del self._users[user_id]
+        return len(idle)
+
+    def _maybe_purge(self, now):
+        if now - self._last_purge >= PURGE_INTERVAL:
+            self._last_purge = now
+            self.purge_idle(now)
+
+    def stats(self):
+        with self._lock:
+            return {"backend": self.backend, "users": len(self._users)}
+
+
+class SQLiteModerationStore:
+    """Moderation state shared by all processes through a SQLite database.
+
+    Warnings are applied inside an immediate transaction, so concurrent
+    rejections in different workers are never lost. Reads go through a small
+    in-process cache that lives for ``cache_ttl`` seconds; a mute applied by
+    another worker is therefore seen within that time.
+    """
+
+    backend = 'sqlite'
+
+    def __init__(self, db_path=DEFAULT_DB_PATH, idle_ttl=DEFAULT_IDLE_TTL,
+                 cache_ttl=1.0, cache_size=10000, clock=time.time):
+        """Initialize the store.
+
+        Args:
+            db_path (str): SQLite database file
+            idle_ttl (float): Seconds after which idle users are forgotten
+            cache_ttl (float): Seconds user states and rules are cached in
+                this process
+            cache_size (int): Maximum number of cached user states
+            clock (callable, optional): Time source, overridable for tests
+        """
+        self.db_path = db_path
+        self.idle_ttl = idle_ttl
+        self.cache_ttl = cache_ttl
+        self.clock = clock
+        self._cache = TTLCache(max_size=cache_size, ttl=cache_ttl)
+        self._rules = None
+        self._rules_expire_at = 0.0
+        self._lock = threading.Lock()
+        self._last_purge = clock()
+        self._init_db()
+
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=10, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def _init_db(self):
+        os.makedirs(os.path.dirname(self.db_path) or '.', exist_ok=True)
+        conn = self._connect()
+        try:
+            # WAL lets workers read while another one writes
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('''
+            CREATE TABLE IF NOT EXISTS user_states (
+                user_id TEXT PRIMARY KEY,
+                status TEXT NOT NULL DEFAULT 'active',
+                warnings INTEGER NOT NULL DEFAULT 0,
+                mutes INTEGER NOT NULL DEFAULT 0,
+                muted_until REAL,
+                suspended_until REAL,
+                last_request REAL NOT NULL,
+                updated_at REAL NOT NULL DEFAULT 0
+            )
+            ''')
+            columns = [row['name'] for row in conn.execute('PRAGMA table_info(user_states)')]
+            if 'updated_at' not in columns:
+                conn.execute('ALTER TABLE user_states ADD COLUMN updated_at REAL NOT NULL DEFAULT 0')
+            conn.execute('CREATE INDEX IF NOT EXISTS idx_user_states_last_request ON user_states (last_request)')
+            conn.execute('CREATE INDEX IF NOT EXISTS idx_user_states_updated_at ON user_states (updated_at, user_id)')
+            conn.execute('''
+            CREATE TABLE IF NOT EXISTS moderation_rules (
+                key TEXT PRIMARY KEY,
+                value INTEGER NOT NULL
+            )
+            ''')
+        finally:
+            conn.close()
+
+    @staticmethod
+    def _row_state(row):
+        return {
+            'status': row['status'],
+            'warnings': row['warnings'],
+            'mutes': row['mutes'],
+            'muted_until': row['muted_until'],
+            'suspended_until': row['suspended_until'],
+            'last_request': row['last_request'],
+            'updated_at': row['updated_at']
+        }
+
+    def _load(self, conn, user_id):
+        row = conn.execute('SELECT * FROM user_states WHERE user_id = ?', (user_id,)).fetchone()
+        return self._row_state(row) if row else None
+
+    def _change_stamp(self, conn, now):
+        """Return the ``updated_at`` for a write, later than any stored one.
+
+        Must be called inside the write transaction. Writers then hold the
+        lock while picking a stamp, so stamps increase in commit order and a
+        ``list_users`` cursor can't pass a change that commits later.
+        """
+        latest = conn.execute('SELECT MAX(updated_at) FROM user_states').fetchone()[0]
+        return now if latest is None else max(now, latest + STAMP_STEP)
+
+    def _cache_state(self, user_id, state):
+        self._cache.set(user_id, dict(state))
+        return state
+
+    def get_user(self, user_id):
+        """Return the user's state, or None if the user is unknown."""
+        state = self._cache.get(user_id)
+        if state is not None:
+            return dict(state)
+        conn = self._connect()
+        try:
+            state = self._load(conn, user_id)
+        finally:
+            conn.close()
+        return self._cache_state(user_id, state) if state else None
+
+    def touch(self, user_id):
+        """Record a request from the user, clearing expired penalties.
+
+        ``last_request`` is only written every ``TOUCH_INTERVAL`` seconds,
+        so an active user doesn't cost a write per request.
+
+        Returns:
+            tuple: (state, created) where created is True for a new user
+        """
+        now = self.clock()
+        self._maybe_purge(now)
+        state = self.get_user(user_id)
+        if state is None:
+            conn = self._connect()
+            try:
+                conn.execute('BEGIN IMMEDIATE')
+                created = conn.execute(
+                    'INSERT OR IGNORE INTO user_states (user_id, last_request, updated_at) VALUES (?, ?, ?)',
+                    (user_id, now, self._change_stamp(conn, now))).rowcount == 1
+                state = self._load(conn, user_id)
+                conn.execute('COMMIT')
+            except Exception:
+                conn.execute('ROLLBACK')
+                raise
+            finally:
+                conn.close()
+            return self._cache_state(user_id, state), created
+
+        expired = expire_penalties(state, now)
+        if expired or now - state['last_request'] >= TOUCH_INTERVAL:
+            state['last_request'] = now
+            conn = self._connect()
+            try:
+                conn.execute('BEGIN IMMEDIATE')
+                conn.execute('UPDATE user_states SET last_request = ? WHERE user_id = ?', (now, user_id))
+                if expired:
+                    # Only clear penalties that are still expired in the database
+                    conn.execute('''
+                    UPDATE user_states SET status = 'active', muted_until = NULL, suspended_until = NULL,
+                        updated_at = ?
+                    WHERE user_id = ? AND status != 'active'
+                        AND COALESCE(muted_until, 0) <= ? AND COALESCE(suspended_until, 0) <= ?
+                    ''', (self._change_stamp(conn, now), user_id, now, now))
+                conn.execute('COMMIT')
+            except Exception:
+                conn.execute('ROLLBACK')
+                raise
+            finally:
+                conn.close()
+            self._cache_state(user_id, state)
+        return state, False
+
+    def record_warning(self, user_id):
+        """Add a warning for the user and return the updated state."""
+        rules = self.rules()
+        conn = self._connect()
+        try:
+            conn.execute('BEGIN IMMEDIATE')
+            # The clock is read once the write lock is held
+            now = self.clock()
+            state = self._load(conn, user_id)
+            if state is None:
+                # A first warning never mutes
+                state = new_user_state(now, warnings=1)
+            else:
+                apply_warning(state, rules, now)
+            state['updated_at'] = self._change_stamp(conn, now)
+            conn.execute('''
+            INSERT OR REPLACE INTO user_states
+                (user_id, status, warnings, mutes, muted_until, suspended_until, last_request, updated_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            ''', (user_id, state['status'], state['warnings'], state['mutes'],
+                  state['muted_until'], state['suspended_until'], state['last_request'], state['updated_at']))
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+        finally:
+            conn.close()
+        return dict(self._cache_state(user_id, state))
+
+    def reset_user(self, user_id):
+        """Clear warnings and penalties for a known user."""
+        conn = self._connect()
+        try:
+            conn.execute('BEGIN IMMEDIATE')
+            now = self.clock()
+            conn.execute('''
+            UPDATE user_states SET status = 'active', warnings = 0, mutes = 0,
+                muted_until = NULL, suspended_until = NULL, last_request = ?, updated_at = ?
+            WHERE user_id = ?
+            ''', (now, self._change_stamp(conn, now), user_id))
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+        finally:
+            conn.close()
+        self._cache.delete(user_id)
+
+    def list_users(self, since=None, active_since=None, limit=50):
+        """Return users changed after a cursor, oldest change first.
+
+        Args:
+            since (str, optional): Cursor from a previous page
+            active_since (float, optional): Only users who made a request
+                at or after this time
+            limit (int): Maximum number of users to return
+
+        Returns:
+            tuple: (users, next_cursor, has_more); users are state dicts with
+                a ``user_id`` key
+        """
+        conditions = []
+        params = []
+        if since:
+            updated_at, user_id = decode_cursor(since)
+            conditions.append('(updated_at > ? OR (updated_at = ? AND user_id > ?))')
+            params.extend([updated_at, updated_at, user_id])
+        if active_since is not None:
+            conditions.append('last_request >= ?')
+            params.append(active_since)
+        query = 'SELECT * FROM user_states'
+        if conditions:
+            query += ' WHERE ' + ' AND '.join(conditions)
+        query += ' ORDER BY updated_at, user_id LIMIT ?'
+        params.append(limit + 1)
+
+        conn = self._connect()
+        try:
+            rows = conn.execute(query, params).fetchall()
+        finally:
+            conn.close()
+        users = [dict(self._row_state(row), user_id=row['user_id']) for row in rows]
+        return paginate(users, limit, since)
+
+    def rules(self):
+        """Return the moderation rules, re-read at most every ``cache_ttl`` seconds."""
+        with self._lock:
+            if self._rules is not None and time.monotonic() < self._rules_expire_at:
+                return dict(self._rules)
+
+        conn = self._connect()
+        try:
+            stored = {row['key']: row['value'] for row in conn.execute('SELECT key, value FROM moderation_rules')}
+        finally:
+            conn.close()
+
+        rules = dict(DEFAULT_MODERATION_RULES, **clean_rules(stored))
+        with self._lock:
+            self._rules = rules
+            self._rules_expire_at = time.monotonic() + self.cache_ttl
+        return dict(rules)
+
+    def update_rules(self, changes):
+        """Update rule values for every worker and return the full rule set."""
+        changes = clean_rules(changes)
+        conn = self._connect()
+        try:
+            conn.executemany('INSERT OR REPLACE INTO moderation_rules (key, value) VALUES (?, ?)',
+                             changes.items())
+        finally:
+            conn.close()
+        with self._lock:
+            self._rules = None
+        return self.rules()
+
+    def purge_idle(self, now=None):
+        """Forget idle users without an active penalty.
+
+        Returns:
+            int: Number of users removed
+        """
+        now = self.clock() if now is None else now
+        conn = self._connect()
+        try:
+            removed = conn.execute('''
+            DELETE FROM user_states
+            WHERE last_request < ? AND COALESCE(muted_until, 0) <= ? AND COALESCE(suspended_until, 0) <= ?
+            ''', (now - self.idle_ttl, now, now)).rowcount
+        finally:
+            conn.close()
+        if removed:
+            self._cache.clear()
+        return removed
+
+    def _maybe_purge(self, now):
+        with self._lock:
+            if now - self._last_purge < PURGE_INTERVAL:
+                return
+            self._last_purge = now
+        try:
+            self.purge_idle(now)
+        except sqlite3.Error as e:
+            logger.error(f"Error purging idle moderation state: {str(e)}")
+
+    def stats(self):
+        conn = self._connect()
+        try:
+            users = conn.execute('SELECT COUNT(*) FROM user_states').fetchone()[0]
+        finally:
+            conn.close()
+        return {"backend": self.backend, "users": users, "cache": self._cache.stats()}
+
+
+def create_store(backend='sqlite', db_path=DEFAULT_DB_PATH, idle_ttl=DEFAULT_IDLE_TTL, cache_ttl=1.0):
+    """Create the moderation store for a backend name ('sqlite' or 'memory')."""
+    if backend == 'memory':
+        return MemoryModerationStore(idle_ttl=idle_ttl)
+    if backend != 'sqlite':
+        logger.warning(f"Unknown moderation store backend {backend!r}, using sqlite")
+    return SQLiteModerationStore(db_path, idle_ttl=idle_ttl, cache_ttl=cache_ttl)
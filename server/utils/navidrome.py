@@ -1,25 +1,65 @@
-import requests
 import base64
 import json
 import logging
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
+from server.utils.cache import ReadThroughCache
+from server.utils.http_transport import default_transport
 
 logger = logging.getLogger(__name__)
 
+# Seconds each metadata call stays fresh in the client's cache
+DEFAULT_CACHE_TTLS = {
+    "getSong": 3600,
+    "getAlbum": 600,
+    "getPlaylist": 60,
+    "getPlaylists": 60
+}
+
 class NavidromeClient:
     """Client for interacting with the Navidrome API."""
     
-    def __init__(self, base_url, username, password):
+    def __init__(self, base_url, username, password, transport=None, fan_out_workers=8,
+                 cache_size=512, cache_ttls=None, cache_stale_ttl=3600):
         """Initialize the Navidrome client.
         
         Args:
             base_url (str): The base URL of the Navidrome server
             username (str): Navidrome username
             password (str): Navidrome password
+            transport (HTTPTransport, optional): Pooled HTTP transport;
+                the shared one if omitted
+            fan_out_workers (int, optional): Requests ``fan_out`` runs at once
+            cache_size (int, optional): Entries kept per cached endpoint
+            cache_ttls (dict, optional): Seconds results stay fresh per
+                endpoint, overriding ``DEFAULT_CACHE_TTLS``; 0 disables one
+            cache_stale_ttl (float, optional): Seconds past that a result
+                is still served while it is refreshed in the background
         """
         self.base_url = base_url.rstrip('/')
         self.username = username
         self.password = password
+        self.http = transport or default_transport()
+        self.fan_out_executor = ThreadPoolExecutor(max_workers=fan_out_workers, thread_name_prefix='navidrome')
+        
+        # Read-through caches for metadata calls. Cached values are shared
+        # between callers and must not be modified.
+        ttls = dict(DEFAULT_CACHE_TTLS, **(cache_ttls or {}))
+        self.refresh_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix='navidrome-refresh')
+        loaders = {
+            "getSong": lambda song_id: self._make_request("getSong", {"id": song_id}).get('song', {}),
+            "getAlbum": lambda album_id: self._make_request("getAlbum", {"id": album_id}).get('album', {}),
+            "getPlaylist": lambda playlist_id: self._make_request(
+                "getPlaylist", {"id": playlist_id}).get('playlist', {}),
+            "getPlaylists": lambda _: self._make_request("getPlaylists").get('playlists', {}).get('playlist', [])
+        }
+        self.caches = {
+            endpoint: ReadThroughCache(load, max_size=cache_size, ttl=ttls[endpoint],
+                                       stale_ttl=cache_stale_ttl, executor=self.refresh_executor)
+            for endpoint, load in loaders.items()
+        }
+        # Local copy of the library (LibraryMirror) read before the server
+        self.mirror = None
         self.token = None
         self.token_expiry = None
         
@@ -38,7 +78,7 @@ class NavidromeClient:
                 "f": "json"     # Response format
             }
             
-            response = requests.get(auth_url, params=auth_data)
+            response = self.http.get(auth_url, params=auth_data)
             response.raise_for_status()
             
             data = response.json()
@@ -97,9 +137,9 @@ class NavidromeClient:
         
         try:
             if method.upper() == 'GET':
-                response = requests.get(url, params=params)
+                response = self.http.get(url, params=params)
             elif method.upper() == 'POST':
-                response = requests.post(url, data=params)
+                response = self.http.post(url, data=params)
             else:
                 raise ValueError(f"Unsupported HTTP method: {method}")
             
@@ -124,9 +164,7 @@ class NavidromeClient:
             list: List of playlist objects
         """
         try:
-            response = self._make_request("getPlaylists")
-            playlists = response.get('playlists', {}).get('playlist', [])
-            return playlists
+            return self.caches["getPlaylists"].get(None)
         except Exception as e:
             logger.error(f"Error getting playlists: {str(e)}")
             raise
@@ -141,41 +179,69 @@ class NavidromeClient:
             dict: Playlist object with songs
         """
         try:
-            response = self._make_request("getPlaylist", {"id": playlist_id})
-            playlist = response.get('playlist', {})
-            return playlist
+            return self.caches["getPlaylist"].get(playlist_id)
         except Exception as e:
             logger.error(f"Error getting playlist {playlist_id}: {str(e)}")
             raise
     
-    def create_playlist(self, name, songs=None):
+    def create_playlist(self, name, songs=None, comment=None):
         """Create a new playlist.
         
         Args:
             name (str): Name of the playlist
             songs (list, optional): List of song IDs to add to the playlist
+            comment (str, optional): Playlist comment (shown as its description)
             
         Returns:
             str: ID of the created playlist
         """
         try:
             # Create empty playlist
-            response = self._make_request("createPlaylist", {"name": name}, method="POST")
+            try:
+                response = self._make_request("createPlaylist", {"name": name}, method="POST")
+            finally:
+                self.caches["getPlaylists"].invalidate(None)
             playlist_id = response.get('playlist', {}).get('id')
             
-            # Add songs if provided
-            if songs and playlist_id:
-                song_ids = ",".join(songs)
-                self._make_request("updatePlaylist", {
-                    "playlistId": playlist_id,
-                    "songId": song_ids
-                }, method="POST")
+            # createPlaylist takes no comment, so it is set along with the songs
+            if (songs or comment) and playlist_id:
+                self.update_playlist(playlist_id, comment=comment, song_ids_to_add=songs)
             
             return playlist_id
         except Exception as e:
             logger.error(f"Error creating playlist: {str(e)}")
             raise
     
+    def update_playlist(self, playlist_id, name=None, comment=None, song_ids_to_add=None,
+                        song_indexes_to_remove=None):
+        """Update a playlist's details or songs.
+        
+        Args:
+            playlist_id (str): ID of the playlist
+            name (str, optional): New name
+            comment (str, optional): New comment
+            song_ids_to_add (list, optional): Song IDs to append
+            song_indexes_to_remove (list, optional): Positions of songs to remove
+        """
+        params = {"playlistId": playlist_id}
+        if name is not None:
+            params["name"] = name
+        if comment is not None:
+            params["comment"] = comment
+        if song_ids_to_add:
+            params["songIdToAdd"] = list(song_ids_to_add)
+        if song_indexes_to_remove:
+            params["songIndexToRemove"] = list(song_indexes_to_remove)
+        try:
+            self._make_request("updatePlaylist", params, method="POST")
+        except Exception as e:
+            logger.error(f"Error updating playlist {playlist_id}: {str(e)}")
+            raise
+        finally:
+            # Even a failed call may have been applied
+            self.caches["getPlaylist"].invalidate(playlist_id)
+            self.caches["getPlaylists"].invalidate(None)
+    
     def get_recent_plays(self, limit=20):
         """Get recently played songs.
         
@@ -192,15 +258,28 @@ class NavidromeClient:
             })
             
             albums = response.get('albumList', {}).get('album', [])
-            recent_songs = []
             
-            # For each album, get the songs
+            # Only request the albums needed to reach the limit, going by
+            # their song counts when the server reports them
+            album_ids = []
+            known_songs = 0
             for album in albums:
-                album_id = album.get('id')
-                if album_id:
-                    album_response = self._make_request("getAlbum", {"id": album_id})
-                    songs = album_response.get('album', {}).get('song', [])
-                    recent_songs.extend(songs)
+                if not album.get('id'):
+                    continue
+                album_ids.append(album['id'])
+                if album.get('songCount') is None:
+                    known_songs = None
+                elif known_songs is not None:
+                    known_songs += album['songCount']
+                    if known_songs >= limit:
+                        break
+            recent_songs = []
+            
+            # Fetch the albums concurrently, stopping once enough songs are in
+            for album in self.fan_out(self.get_album_info, album_ids):
+                recent_songs.extend(album.get('song', []))
+                if len(recent_songs) >= limit:
+                    break
             
             # Limit to the requested number
             return recent_songs[:limit]
@@ -208,6 +287,28 @@ class NavidromeClient:
             logger.error(f"Error getting recent plays: {str(e)}")
             raise
     
+    def fan_out(self, fetch, items):
+        """Call fetch on each item concurrently, yielding results in item order.
+        
+        At most ``fan_out_workers`` calls run at once. When the caller stops
+        iterating, calls that haven't started are cancelled, so a caller that
+        has enough results pays for little more than the requests in flight.
+        
+        Args:
+            fetch (callable): Called with one item
+            items (iterable): Items to fetch
+            
+        Yields:
+            The result of each call; a failed call raises when reached
+        """
+        futures = [self.fan_out_executor.submit(fetch, item) for item in items]
+        try:
+            for future in futures:
+                yield future.result()
+        finally:
+            for future in futures:
+                future.cancel()
+    
     def get_song_info(self, song_id):
         """Get detailed information about a song.
         
@@ -217,10 +318,12 @@ class NavidromeClient:
         Returns:
             dict: Song information
         """
+        if self.mirror is not None:
+            song = self.mirror.get_song(song_id)
+            if song is not None:
+                return song
         try:
-            response = self._make_request("getSong", {"id": song_id})
-            song = response.get('song', {})
-            return song
+            return self.caches["getSong"].get(song_id)
         except Exception as e:
             logger.error(f"Error getting song info for {song_id}: {str(e)}")
             raise
@@ -234,10 +337,12 @@ class NavidromeClient:
         Returns:
             dict: Album information with songs
         """
+        if self.mirror is not None:
+            album = self.mirror.get_album(album_id)
+            if album is not None:
+                return album
         try:
-            response = self._make_request("getAlbum", {"id": album_id})
-            album = response.get('album', {})
-            return album
+            return self.caches["getAlbum"].get(album_id)
         except Exception as e:
             logger.error(f"Error getting album info for {album_id}: {str(e)}")
             raise
@@ -245,6 +350,8 @@ class NavidromeClient:
     def search(self, query, search_type="song", limit=20):
         """Search for songs, albums, or artists.
         
+        Song searches use the mirror's full-text index once it is synced.
+        
         Args:
             query (str): Search query
             search_type (str, optional): Type of search (song, album, artist)
@@ -253,6 +360,8 @@ class NavidromeClient:
         Returns:
             list: Search results
         """
+        if search_type == "song" and self.mirror is not None and self.mirror.ready:
+            return self.mirror.search(query, limit=limit)
         try:
             response = self._make_request("search3", {
                 "query": query,
@@ -274,3 +383,110 @@ class NavidromeClient:
         except Exception as e:
             logger.error(f"Error searching for {query}: {str(e)}")
             raise
+    
+    def search_songs(self, query, limit=20, title=None, artist=None, genre=None, year_from=None,
+                     year_to=None, prefix=False):
+        """Search for songs.
+        
+        With a synced mirror this is a local full-text search, see
+        ``LibraryMirror.search``. Otherwise ``query`` goes to ``search3``
+        and the genre and year filters are applied to its results.
+        
+        Args:
+            query (str): Search query
+            limit (int, optional): Maximum number of results
+            title (str, optional): Words the title must contain; used
+                instead of ``query`` when searching the mirror
+            artist (str, optional): Words the artist must contain; used
+                instead of ``query`` when searching the mirror
+            genre (str, optional): Only songs in this genre
+            year_from (int, optional): Only songs from this year on
+            year_to (int, optional): Only songs up to this year
+            prefix (bool, optional): Match the last word as a prefix
+            
+        Returns:
+            list: Matching songs, best first
+        """
+        if self.mirror is not None and self.mirror.ready:
+            fields = {name: value for name, value in (('title', title), ('artist', artist)) if value}
+            return self.mirror.search(None if fields else query, limit=limit, genre=genre,
+                                      year_from=year_from, year_to=year_to, prefix=prefix, **fields)
+        songs = self.search(query, "song", limit)
+        if genre:
+            songs = [song for song in songs if (song.get('genre') or '').lower() == genre.lower()]
+        if year_from is not None:
+            songs = [song for song in songs if (song.get('year') or 0) >= year_from]
+        if year_to is not None:
+            songs = [song for song in songs if song.get('year') and song['year'] <= year_to]
+        return songs
+    
+    def get_library_songs(self, offset=0, size=500):
+        """Get one page of every song in the library.
+        
+        Args:
+            offset (int, optional): Number of songs to skip
+            size (int, optional): Maximum number of songs to return
+            
+        Returns:
+            list: Songs in library order
+        """
+        if self.mirror is not None and self.mirror.ready:
+            return self.mirror.get_songs(offset=offset, size=size)
+        try:
+            # An empty search3 query matches the whole library
+            response = self._make_request("search3", {
+                "query": "",
+                "songCount": size,
+                "songOffset": offset,
+                "albumCount": 0,
+                "artistCount": 0
+            })
+            return response.get('searchResult3', {}).get('song', [])
+        except Exception as e:
+            logger.error(f"Error getting library songs at offset {offset}: {str(e)}")
+            raise
+    
+    def get_newest_albums(self, size=50, offset=0):
+        """Get the most recently added albums.
+        
+        Args:
+            size (int, optional): Maximum number of albums to return
+            offset (int, optional): Number of albums to skip
+            
+        Returns:
+            list: Albums, newest first
+        """
+        if self.mirror is not None and self.mirror.ready:
+            return self.mirror.newest_albums(size=size, offset=offset)
+        try:
+            response = self._make_request("getAlbumList2", {
+                "type": "newest",
+                "size": size,
+                "offset": offset
+            })
+            return response.get('albumList2', {}).get('album', [])
+        except Exception as e:
+            logger.error(f"Error getting newest albums: {str(e)}")
+            raise
+    
+    def get_scan_status(self):
+        """Get the library scan status.
+        
+        With a synced mirror this is the status the mirrored data reflects,
+        so readers refresh once the mirror has caught up with a scan.
+        
+        Returns:
+            dict: Scan status with scanning, count and (on Navidrome) lastScan
+        """
+        if self.mirror is not None and self.mirror.ready:
+            return dict(self.mirror.scan_status(), scanning=False)
+        try:
+            response = self._make_request("getScanStatus")
+            return response.get('scanStatus', {})
+        except Exception as e:
+            logger.error(f"Error getting scan status: {str(e)}")
+            raise
+    
+    def cache_stats(self):
+        """Return hit, miss and refresh counters for each cached endpoint."""
+        return {endpoint: cache.stats() for endpoint, cache in self.caches.items()}
@@ -0,0 +1,209 @@
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class SQLiteVersionStamp:
+    """A counter in an SQLite database that every worker process can read and bump."""
+
+    def __init__(self, db_path, name):
+        """Initialize the stamp.
+
+        Args:
+            db_path (str): Database holding the ``version_stamps`` table
+            name (str): Which counter in the table this stamp is
+        """
+        self.db_path = db_path
+        self.name = name
+
+    def _connect(self):
+        return sqlite3.connect(self.db_path, timeout=10, isolation_level=None)
+
+    def read(self):
+        """Return the current value; 0 until the stamp is first bumped."""
+        # Nothing has changed yet, and reading shouldn't create the database
+        if not os.path.exists(self.db_path):
+            return 0
+        conn = self._connect()
+        try:
+            row = conn.execute('SELECT value FROM version_stamps WHERE name = ?', (self.name,)).fetchone()
+        except sqlite3.OperationalError:
+            return 0
+        finally:
+            conn.close()
+        return row[0] if row else 0
+
+    def bump(self):
+        """Increment the stamp."""
+        os.makedirs(os.path.dirname(self.db_path) or '.', exist_ok=True)
+        conn = self._connect()
+        try:
+            conn.execute('CREATE TABLE IF NOT EXISTS version_stamps (name TEXT PRIMARY KEY, value INTEGER NOT NULL)')
+            conn.execute('''
+            INSERT INTO version_stamps (name, value) VALUES (?, 1)
+            ON CONFLICT(name) DO UPDATE SET value = value + 1
+            ''', (self.name,))
+        finally:
+            conn.close()
+
+
+class ProfileCache:
+    """Process-level cache of DJ profiles keyed by ID.
+
+    Profiles are loaded on first use and kept until ``invalidate`` is called
+    by whatever changes them. Missing profiles are cached too, so a stale
+    profile ID in a client doesn't cost a query per request.
+
+    ``invalidate`` only reaches this process. With a shared version stamp
+    (see ``use_stamp``) every invalidation also bumps the stamp, and each
+    process drops its whole cache when it sees the stamp change, checking at
+    most once per ``check_interval`` seconds.
+    """
+
+    def __init__(self, stamp=None, check_interval=1.0):
+        """Initialize the cache.
+
+        Args:
+            stamp (SQLiteVersionStamp, optional): Version shared between
+                processes; without one invalidation is process-local
+            check_interval (float): Minimum seconds between stamp reads
+        """
+        self._profiles = {}
+        self._listeners = []
+        self._generation = 0
+        self._lock = threading.Lock()
+        self.check_interval = check_interval
+        self.stamp = None
+        self._seen_stamp = None
+        self._last_check = 0.0
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self.remote_invalidations = 0
+        if stamp is not None:
+            self.use_stamp(stamp)
+
+    def use_stamp(self, stamp):
+        """Share invalidations with other processes through stamp."""
+        with self._lock:
+            self.stamp = stamp
+            self._seen_stamp = None
+            self._last_check = 0.0
+            # Profiles cached until now were never checked against the stamp
+            self._profiles.clear()
+            self._generation += 1
+
+    def _check_stamp(self):
+        """Clear the cache if another process invalidated a profile."""
+        now = time.monotonic()
+        with self._lock:
+            stamp = self.stamp
+            if stamp is None or now - self._last_check < self.check_interval:
+                return
+            self._last_check = now
+        try:
+            version = stamp.read()
+        except Exception as e:
+            logger.warning(f"Could not read profile cache version: {str(e)}")
+            return
+        with self._lock:
+            if version == self._seen_stamp:
+                return
+            first_read = self._seen_stamp is None
+            self._seen_stamp = version
+            if first_read:
+                return
+            self._profiles.clear()
+            self._generation += 1
+            self.remote_invalidations += 1
+            listeners = list(self._listeners)
+        # Which profile changed isn't known, so listeners drop everything
+        for listener in listeners:
+            listener(None)
+
+    def get(self, profile_id, loader):
+        """Return the cached profile, loading it with ``loader(profile_id)`` on a miss.
+
+        Exceptions from the loader propagate and nothing is cached.
+        """
+        self._check_stamp()
+        key = str(profile_id)
+        with self._lock:
+            if key in self._profiles:
+                self.hits += 1
+                return self._profiles[key]
+            self.misses += 1
+            generation = self._generation
+
+        profile = loader(profile_id)
+        if profile is not None:
+            # Per-template system prompts composed with this personality
+            profile = dict(profile, system_prompts={})
+
+        with self._lock:
+            # Don't store a profile that was invalidated while it loaded
+            if generation == self._generation:
+                self._profiles[key] = profile
+        return profile
+
+    def invalidate(self, profile_id=None):
+        """Drop one profile, or every profile if no ID is given."""
+        with self._lock:
+            if profile_id is None:
+                self._profiles.clear()
+            else:
+                self._profiles.pop(str(profile_id), None)
+            self._generation += 1
+            self.invalidations += 1
+            listeners = list(self._listeners)
+            stamp = self.stamp
+        if stamp is not None:
+            try:
+                stamp.bump()
+            except Exception as e:
+                logger.error(f"Could not share profile invalidation: {str(e)}")
+        for listener in listeners:
+            listener(profile_id)
+
+    def add_listener(self, listener):
+        """Call ``listener(profile_id)`` after each invalidation."""
+        with self._lock:
+            self._listeners.append(listener)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._profiles),
+                "hits": self.hits,
+                "misses": self.misses,
+                "invalidations": self.invalidations,
+                "remote_invalidations": self.remote_invalidations,
+                "hit_rate": self.hits / lookups if lookups else 0.0
+            }
+
+
+def profile_system_prompt(profile, template):
+    """Return the profile's personality followed by a template's system prompt.
+
+    The result is stored on the cached profile and reused until the template
+    is reloaded.
+    """
+    composed_prompts = profile.get('system_prompts')
+    if composed_prompts is not None:
+        cached = composed_prompts.get(template.name)
+        if cached and cached[0] is template:
+            return cached[1]
+
+    system_prompt = f"{profile.get('personality')}\n\n{template.system}"
+    if composed_prompts is not None:
+        composed_prompts[template.name] = (template, system_prompt)
+    return system_prompt
+
+
+# Shared by the DJ routes that read profiles and the settings routes that change them
+dj_profile_cache = ProfileCache()
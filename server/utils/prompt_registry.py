@@ -0,0 +1,168 @@
+import json
+import logging
+import os
+import string
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PROMPTS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), 'prompts')
+
+
+class PromptError(ValueError):
+    """Raised for malformed templates or missing placeholder values."""
+
+
+def parse_placeholders(text):
+    """Return the placeholder names used in a format string.
+
+    Raises:
+        PromptError: If the string is malformed or uses positional or
+            attribute/index placeholders
+    """
+    names = set()
+    try:
+        for _, field, _, _ in string.Formatter().parse(text):
+            if field is None:
+                continue
+            if not field.isidentifier():
+                raise PromptError(f"Unsupported placeholder {{{field}}}")
+            names.add(field)
+    except ValueError as e:
+        if isinstance(e, PromptError):
+            raise
+        raise PromptError(str(e))
+    return frozenset(names)
+
+
+class PromptTemplate:
+    """A validated prompt with a system message and a user message template."""
+
+    def __init__(self, name, system, user):
+        if not isinstance(system, str) or not isinstance(user, str):
+            raise PromptError(f"Template {name} needs 'system' and 'user' strings")
+        self.name = name
+        self.system = system
+        self.user = user
+        self.placeholders = parse_placeholders(user)
+
+    def format_user(self, **kwargs):
+        """Fill in the user message.
+
+        Raises:
+            PromptError: If a placeholder has no value
+        """
+        missing = self.placeholders - kwargs.keys()
+        if missing:
+            raise PromptError(f"Template {self.name} is missing values for: {', '.join(sorted(missing))}")
+        return self.user.format(**kwargs)
+
+    def messages(self, **kwargs):
+        """Return chat messages with the user template filled in."""
+        return [
+            {"role": "system", "content": self.system},
+            {"role": "user", "content": self.format_user(**kwargs)}
+        ]
+
+
+class PromptRegistry:
+    """Prompt templates from a directory of JSON files, kept in memory.
+
+    Files are re-checked with a directory scan and ``stat`` at most once per
+    ``check_interval`` seconds; only changed files are re-read. A file that
+    fails to parse or validate keeps its previous version. Each template has
+    a version number that goes up whenever it is reloaded or removed, so
+    anything derived from a prompt can tell when to discard its results.
+    """
+
+    def __init__(self, prompts_dir=DEFAULT_PROMPTS_DIR, check_interval=1.0):
+        self.prompts_dir = prompts_dir
+        self.check_interval = check_interval
+        self.reloads = 0
+        self._templates = {}
+        self._file_state = {}
+        self._versions = {}
+        self._lock = threading.Lock()
+        self._last_check = 0.0
+        self.refresh(force=True)
+
+    def _scan(self):
+        state = {}
+        try:
+            with os.scandir(self.prompts_dir) as entries:
+                for entry in entries:
+                    if entry.name.endswith('.json') and entry.is_file():
+                        stat = entry.stat()
+                        state[entry.name[:-5]] = (stat.st_mtime_ns, stat.st_size)
+        except OSError as e:
+            logger.error(f"Error scanning prompts directory: {str(e)}")
+        return state
+
+    def _load(self, name):
+        with open(os.path.join(self.prompts_dir, f"{name}.json"), 'r') as f:
+            data = json.load(f)
+        return PromptTemplate(name, data.get('system'), data.get('user'))
+
+    def refresh(self, force=False):
+        """Reload templates whose files changed since the last check."""
+        now = time.monotonic()
+        with self._lock:
+            if not force and now - self._last_check < self.check_interval:
+                return
+            self._last_check = now
+
+            state = self._scan()
+            for name in list(self._templates):
+                if name not in state:
+                    del self._templates[name]
+                    self._file_state.pop(name, None)
+                    self._versions[name] = self._versions.get(name, 0) + 1
+
+            for name, file_state in state.items():
+                if self._file_state.get(name) == file_state:
+                    continue
+                try:
+                    self._templates[name] = self._load(name)
+                    self._versions[name] = self._versions.get(name, 0) + 1
+                    if name in self._file_state:
+                        self.reloads += 1
+                        logger.info(f"Reloaded prompt template {name}")
+                except (OSError, ValueError) as e:
+                    logger.error(f"Error loading prompt template {name}: {str(e)}")
+                self._file_state[name] = file_state
+
+    def get(self, name):
+        """Return the template called name, or None if there is none."""
+        self.refresh()
+        return self._templates.get(name)
+
+    def version(self, *names):
+        """Return a stamp that changes whenever any named template is reloaded or removed.
+
+        Args:
+            *names (str): Template names
+
+        Returns:
+            tuple: One version number per name
+        """
+        self.refresh()
+        with self._lock:
+            return tuple(self._versions.get(name, 0) for name in names)
+
+    def names(self):
+        self.refresh()
+        return sorted(self._templates)
+
+
+_registries = {}
+_registries_lock = threading.Lock()
+
+
+def get_registry(prompts_dir=DEFAULT_PROMPTS_DIR):
+    """Return the shared registry for a prompts directory."""
+    prompts_dir = os.path.abspath(prompts_dir)
+    with _registries_lock:
+        if prompts_dir not in _registries:
+            _registries[prompts_dir] = PromptRegistry(prompts_dir)
+        return _registries[prompts_dir]
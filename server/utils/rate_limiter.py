@@ -0,0 +1,327 @@
+"""Token-bucket rate limiting for DJ requests.
+
+Two interchangeable limiters share the same interface:
+
+- ``SQLiteRateLimiter`` keeps buckets in a WAL-mode SQLite database, so every
+  worker process draws from the same per-user and global budgets.
+- ``RateLimiter`` keeps buckets in memory for single-process use; under
+  several workers each one enforces the configured limits separately.
+"""
+
+import logging
+import math
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_DB_PATH = os.path.join('data', 'rate_limits.db')
+
+# How often buckets that have refilled completely are deleted from SQLite
+PURGE_INTERVAL = 600
+
+# Row key of the global bucket; user rows are keyed ``user:<id>``
+GLOBAL_KEY = 'global'
+
+# Requests are charged in estimated LLM tokens. The spoken reply's ElevenLabs
+# characters grow with the reply's tokens, so one unit budgets both. The base
+# covers the system prompt, the moderation call and a typical reply.
+BASE_REQUEST_TOKENS = 400
+CHARS_PER_TOKEN = 4
+
+
+def estimate_request_tokens(text):
+    """Estimate the LLM tokens a DJ request will use."""
+    return BASE_REQUEST_TOKENS + math.ceil(len(text or '') / CHARS_PER_TOKEN)
+
+
+class TokenBucket:
+    """Bucket holding up to ``capacity`` tokens, refilled at ``rate`` per second."""
+
+    def __init__(self, capacity, rate, now):
+        self.capacity = capacity
+        self.rate = rate
+        self.tokens = capacity
+        self.updated = now
+
+    def refill(self, now):
+        if now > self.updated:
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+
+    def wait_time(self, cost):
+        """Seconds until cost tokens are available (after ``refill``)."""
+        cost = min(cost, self.capacity)
+        if self.tokens >= cost:
+            return 0.0
+        if self.rate <= 0:
+            return math.inf
+        return (cost - self.tokens) / self.rate
+
+    def consume(self, cost):
+        self.tokens -= min(cost, self.capacity)
+
+
+def take_tokens(user_bucket, global_bucket, cost, now):
+    """Refill both buckets and spend cost from both if each can afford it.
+
+    Returns:
+        tuple: (allowed, retry_after, scope) as returned by ``acquire``
+    """
+    user_bucket.refill(now)
+    user_wait = user_bucket.wait_time(cost)
+    if user_wait > 0:
+        return False, user_wait, 'user'
+
+    if global_bucket is not None:
+        global_bucket.refill(now)
+        global_wait = global_bucket.wait_time(cost)
+        if global_wait > 0:
+            return False, global_wait, 'global'
+        global_bucket.consume(cost)
+
+    user_bucket.consume(cost)
+    return True, 0.0, None
+
+
+class RateLimiter:
+    """Per-user and global token buckets for requests that call paid APIs.
+
+    A request is allowed only if both the user's bucket and the global bucket
+    hold enough tokens; tokens are taken from both or neither, so a user who
+    is over their own limit doesn't drain the shared budget. A request costing
+    more than a bucket's capacity is charged the full capacity instead of
+    being refused forever.
+    """
+
+    def __init__(self, user_per_minute=3000, user_burst=6000, global_per_minute=30000,
+                 global_burst=60000, max_users=10000, clock=time.monotonic):
+        """Initialize the limiter.
+
+        Args:
+            user_per_minute (float): Tokens each user regains per minute
+            user_burst (float): Most tokens a user can spend at once
+            global_per_minute (float): Tokens all users together regain per
+                minute; 0 disables the global limit
+            global_burst (float): Most tokens all users can spend at once
+            max_users (int): Users whose buckets are remembered, least
+                recently seen dropped first (a dropped user starts full)
+            clock (callable, optional): Time source, overridable for tests
+        """
+        self.user_burst = user_burst
+        self.user_rate = user_per_minute / 60.0
+        self.max_users = max_users
+        self.clock = clock
+        self._users = OrderedDict()
+        self._global = TokenBucket(global_burst, global_per_minute / 60.0, clock()) if global_per_minute > 0 else None
+        self._lock = threading.Lock()
+        self.allowed = 0
+        self.limited_user = 0
+        self.limited_global = 0
+        self.tokens_allowed = 0
+
+    def acquire(self, user_id, cost):
+        """Try to spend cost tokens for user_id.
+
+        Returns:
+            tuple: (allowed, retry_after, scope) where retry_after is seconds
+                until the request would be allowed and scope is 'user' or
+                'global' when it is refused
+        """
+        now = self.clock()
+        with self._lock:
+            bucket = self._users.get(user_id)
+            if bucket is None:
+                bucket = self._users[user_id] = TokenBucket(self.user_burst, self.user_rate, now)
+                while len(self._users) > self.max_users:
+                    self._users.popitem(last=False)
+            self._users.move_to_end(user_id)
+
+            result = take_tokens(bucket, self._global, cost, now)
+            self._count(result, cost)
+            return result
+
+    def _count(self, result, cost):
+        allowed, _, scope = result
+        if allowed:
+            self.allowed += 1
+            self.tokens_allowed += cost
+        elif scope == 'user':
+            self.limited_user += 1
+        else:
+            self.limited_global += 1
+
+    def stats(self):
+        """Return counters and the remaining global budget."""
+        with self._lock:
+            if self._global is not None:
+                self._global.refill(self.clock())
+            return {
+                "allowed": self.allowed,
+                "limited_user": self.limited_user,
+                "limited_global": self.limited_global,
+                "tokens_allowed": self.tokens_allowed,
+                "tracked_users": len(self._users),
+                "global_tokens_available": int(self._global.tokens) if self._global else None
+            }
+
+
+class SQLiteRateLimiter(RateLimiter):
+    """Rate limiter whose buckets are shared by all processes through SQLite.
+
+    Each ``acquire`` reads, updates and writes the user's and the global
+    bucket inside one immediate transaction, so concurrent requests in
+    different workers can't both spend the same tokens. Buckets that have
+    been idle long enough to refill completely are deleted, since a missing
+    bucket starts full anyway. Counters in ``stats`` are per process.
+    """
+
+    backend = 'sqlite'
+
+    def __init__(self, db_path=DEFAULT_DB_PATH, user_per_minute=3000, user_burst=6000,
+                 global_per_minute=30000, global_burst=60000, clock=time.time):
+        """Initialize the limiter.
+
+        Args:
+            db_path (str): SQLite database file
+            user_per_minute (float): Tokens each user regains per minute
+            user_burst (float): Most tokens a user can spend at once
+            global_per_minute (float): Tokens all users together regain per
+                minute; 0 disables the global limit
+            global_burst (float): Most tokens all users can spend at once
+            clock (callable, optional): Wall-clock time source shared by all
+                processes, overridable for tests
+        """
+        super().__init__(user_per_minute=user_per_minute, user_burst=user_burst,
+                         global_per_minute=global_per_minute, global_burst=global_burst, clock=clock)
+        self.db_path = db_path
+        self.global_burst = global_burst
+        self.global_rate = global_per_minute / 60.0 if global_per_minute > 0 else None
+        self._last_purge = clock()
+        self._init_db()
+
+    def _connect(self):
+        return sqlite3.connect(self.db_path, timeout=10, isolation_level=None)
+
+    def _init_db(self):
+        os.makedirs(os.path.dirname(self.db_path) or '.', exist_ok=True)
+        conn = self._connect()
+        try:
+            # WAL lets workers read while another one writes
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('''
+            CREATE TABLE IF NOT EXISTS rate_buckets (
+                key TEXT PRIMARY KEY,
+                tokens REAL NOT NULL,
+                updated REAL NOT NULL
+            )
+            ''')
+            conn.execute('CREATE INDEX IF NOT EXISTS idx_rate_buckets_updated ON rate_buckets (updated)')
+        finally:
+            conn.close()
+
+    @staticmethod
+    def _load(conn, key, capacity, rate, now):
+        bucket = TokenBucket(capacity, rate, now)
+        row = conn.execute('SELECT tokens, updated FROM rate_buckets WHERE key = ?', (key,)).fetchone()
+        if row:
+            bucket.tokens, bucket.updated = row
+        return bucket
+
+    @staticmethod
+    def _save(conn, key, bucket):
+        conn.execute('INSERT OR REPLACE INTO rate_buckets (key, tokens, updated) VALUES (?, ?, ?)',
+                     (key, bucket.tokens, bucket.updated))
+
+    def acquire(self, user_id, cost):
+        """Try to spend cost tokens for user_id.
+
+        Returns:
+            tuple: (allowed, retry_after, scope) where retry_after is seconds
+                until the request would be allowed and scope is 'user' or
+                'global' when it is refused
+        """
+        self._maybe_purge()
+        user_key = f"user:{user_id}"
+        conn = self._connect()
+        try:
+            conn.execute('BEGIN IMMEDIATE')
+            # The clock is read once the write lock is held
+            now = self.clock()
+            bucket = self._load(conn, user_key, self.user_burst, self.user_rate, now)
+            global_bucket = None
+            if self.global_rate is not None:
+                global_bucket = self._load(conn, GLOBAL_KEY, self.global_burst, self.global_rate, now)
+            result = take_tokens(bucket, global_bucket, cost, now)
+            if result[0]:
+                self._save(conn, user_key, bucket)
+                if global_bucket is not None:
+                    self._save(conn, GLOBAL_KEY, global_bucket)
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+        finally:
+            conn.close()
+        with self._lock:
+            self._count(result, cost)
+        return result
+
+    def _maybe_purge(self):
+        now = self.clock()
+        with self._lock:
+            if now - self._last_purge < PURGE_INTERVAL:
+                return
+            self._last_purge = now
+        # An empty bucket is full again after user_burst / user_rate seconds
+        full_after = self.user_burst / self.user_rate if self.user_rate > 0 else math.inf
+        if math.isinf(full_after):
+            return
+        conn = self._connect()
+        try:
+            conn.execute("DELETE FROM rate_buckets WHERE key != ? AND updated < ?", (GLOBAL_KEY, now - full_after))
+        except sqlite3.Error as e:
+            logger.error("Error purging rate limit buckets: %s", str(e))
+        finally:
+            conn.close()
+
+    def stats(self):
+        """Return this process's counters and the shared remaining global budget."""
+        now = self.clock()
+        conn = self._connect()
+        try:
+            tracked = conn.execute("SELECT COUNT(*) FROM rate_buckets WHERE key != ?", (GLOBAL_KEY,)).fetchone()[0]
+            global_bucket = None
+            if self.global_rate is not None:
+                global_bucket = self._load(conn, GLOBAL_KEY, self.global_burst, self.global_rate, now)
+                global_bucket.refill(now)
+        finally:
+            conn.close()
+        with self._lock:
+            return {
+                "allowed": self.allowed,
+                "limited_user": self.limited_user,
+                "limited_global": self.limited_global,
+                "tokens_allowed": self.tokens_allowed,
+                "tracked_users": tracked,
+                "global_tokens_available": int(global_bucket.tokens) if global_bucket else None
+            }
+
+
+def create_rate_limiter(backend='sqlite', db_path=DEFAULT_DB_PATH, **limits):
+    """Create a rate limiter for a backend name ('sqlite' or 'memory').
+
+    Args:
+        backend (str): 'sqlite' to share buckets between worker processes,
+            'memory' for per-process buckets
+        db_path (str): SQLite database file for the 'sqlite' backend
+        **limits: Per-user and global limits passed to the limiter
+    """
+    if backend == 'memory':
+        return RateLimiter(**limits)
+    if backend != 'sqlite':
+        logger.warning(f"Unknown rate limit store backend {backend!r}, using sqlite")
+    return SQLiteRateLimiter(db_path, **limits)
@@ -0,0 +1,189 @@
+import logging
+import threading
+from collections import OrderedDict, deque
+
+logger = logging.getLogger(__name__)
+
+
+class TriviaBuffer:
+    """Small per-key buffers of ready-to-play items filled in the background.
+
+    Keys identify who the item is for, e.g. ``(profile_id, tone, speed)``. A
+    daemon thread keeps every tracked key topped up to ``capacity`` by calling
+    ``produce(key)``. Keys are tracked when returned by ``active_keys`` or
+    when requested through ``pop`` or ``peek``; at most ``max_keys`` requested
+    keys are remembered, least recently used first out.
+
+    Callers that may not use an item, such as a response generated before
+    moderation has finished, ``peek`` it and ``claim`` it once it is used.
+    """
+
+    def __init__(self, produce, capacity=3, active_keys=None, max_keys=8, idle_interval=30.0):
+        """Initialize the buffer.
+
+        Args:
+            produce (callable): Takes a key, returns an item or None
+            capacity (int): Items kept ready per key
+            active_keys (callable, optional): Returns keys that should always
+                be buffered
+            max_keys (int): Maximum number of requested keys to keep filling
+            idle_interval (float): Seconds the producer sleeps when every
+                buffer is full or production failed
+        """
+        self.produce = produce
+        self.capacity = capacity
+        self.active_keys = active_keys
+        self.max_keys = max_keys
+        self.idle_interval = idle_interval
+
+        self._buffers = {}
+        self._requested = OrderedDict()
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stopped = threading.Event()
+        self._thread = None
+        self.hits = 0
+        self.misses = 0
+        self.produced = 0
+        self.failures = 0
+
+    def _track(self, key):
+        """Mark key as requested and return its buffer. Caller holds the lock."""
+        self._requested[key] = True
+        self._requested.move_to_end(key)
+        while len(self._requested) > self.max_keys:
+            dropped, _ = self._requested.popitem(last=False)
+            self._buffers.pop(dropped, None)
+        return self._buffers.get(key)
+
+    def pop(self, key):
+        """Take the oldest ready item for key, or None if the buffer is empty.
+
+        Either way the producer is woken to top the buffer back up.
+        """
+        with self._lock:
+            buffer = self._track(key)
+            item = buffer.popleft() if buffer else None
+            if item is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        self._wake.set()
+        return item
+
+    def peek(self, key):
+        """Return the oldest ready item for key without taking it, or None.
+
+        The item stays buffered until it is passed to ``claim``.
+        """
+        with self._lock:
+            buffer = self._track(key)
+            item = buffer[0] if buffer else None
+            if item is None:
+                self.misses += 1
+        self._wake.set()
+        return item
+
+    def claim(self, key, item):
+        """Remove an item returned by ``peek`` now that it has been used.
+
+        Returns:
+            bool: False if the item had already been taken or cleared
+        """
+        with self._lock:
+            self.hits += 1
+            buffer = self._buffers.get(key)
+            if not buffer or not any(buffered is item for buffered in buffer):
+                return False
+            buffer.remove(item)
+        self._wake.set()
+        return True
+
+    def clear(self, key=None, match=None):
+        """Drop buffered items for one key, for keys where ``match(key)`` is
+        true, or for every key."""
+        with self._lock:
+            if key is not None:
+                self._buffers.pop(key, None)
+            elif match is not None:
+                for buffered_key in [k for k in self._buffers if match(k)]:
+                    del self._buffers[buffered_key]
+            else:
+                self._buffers.clear()
+        self._wake.set()
+
+    def tracked_keys(self):
+        """Return the keys the producer keeps filled."""
+        keys = []
+        if self.active_keys:
+            try:
+                keys.extend(self.active_keys())
+            except Exception as e:
+                logger.error(f"Error listing active trivia keys: {str(e)}")
+        with self._lock:
+            keys.extend(key for key in self._requested if key not in keys)
+        return keys
+
+    def fill_once(self):
+        """Produce at most one item for each tracked key that isn't full.
+
+        Returns:
+            int: Number of items added
+        """
+        added = 0
+        for key in self.tracked_keys():
+            with self._lock:
+                buffer = self._buffers.setdefault(key, deque(maxlen=self.capacity))
+                if len(buffer) >= self.capacity:
+                    continue
+            try:
+                item = self.produce(key)
+            except Exception as e:
+                logger.error(f"Error producing buffered trivia for {key}: {str(e)}")
+                item = None
+            with self._lock:
+                if item is None:
+                    self.failures += 1
+                    continue
+                # The key may have been dropped or cleared while producing
+                buffer = self._buffers.get(key)
+                if buffer is not None:
+                    buffer.append(item)
+                    self.produced += 1
+                    added += 1
+        return added
+
+    def _run(self):
+        while not self._stopped.is_set():
+            self._wake.clear()
+            before = self.failures
+            added = self.fill_once()
+            if not added or self.failures > before:
+                self._wake.wait(self.idle_interval)
+
+    def start(self):
+        """Start the background producer thread if it isn't running yet."""
+        with self._lock:
+            if self._thread is not None or self._stopped.is_set():
+                return
+            self._thread = threading.Thread(target=self._run, name='trivia-buffer', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop the background producer after its current item."""
+        self._stopped.set()
+        self._wake.set()
+
+    def stats(self):
+        """Return buffer levels and hit/miss counters."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "buffers": {str(key): len(buffer) for key, buffer in self._buffers.items()},
+                "capacity": self.capacity,
+                "hits": self.hits,
+                "misses": self.misses,
+                "produced": self.produced,
+                "failures": self.failures,
+                "hit_rate": self.hits / lookups if lookups else 0.0
+            }
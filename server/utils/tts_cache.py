@@ -0,0 +1,181 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+# Served at /static/audio/
+AUDIO_ROOT = os.path.join('voicebot', 'outputs')
+# A directory of its own, so TTS_CACHE_MAX_MB bounds only cached audio
+DEFAULT_CACHE_DIR = os.path.join(AUDIO_ROOT, 'tts_cache')
+FILE_PREFIX = 'tts_'
+
+
+def make_key(text, voice_id, model_id, voice_settings=None, speed=1.0):
+    """Return the content hash identifying a synthesized utterance.
+
+    Every input that changes the audio is part of the key, so a different
+    voice, model, setting or speed never returns stale audio.
+    """
+    payload = json.dumps({
+        "text": text,
+        "voice_id": voice_id,
+        "model_id": model_id,
+        "voice_settings": voice_settings or {},
+        "speed": speed
+    }, sort_keys=True)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def audio_url(path):
+    """Return the URL an audio file under ``AUDIO_ROOT`` is served from."""
+    relative = os.path.relpath(path, AUDIO_ROOT)
+    if relative.startswith(os.pardir):
+        relative = os.path.basename(path)
+    return f"/static/audio/{relative.replace(os.sep, '/')}"
+
+
+class TTSCache:
+    """Disk-backed, size-bounded LRU cache of synthesized speech.
+
+    Audio is stored as ``tts_<hash>.mp3`` in ``cache_dir``, by default
+    ``voicebot/outputs/tts_cache``, so cached files can be served directly
+    from ``/static/audio/tts_cache/``. Nothing else writes to that directory,
+    so ``max_bytes`` bounds all of it. An in-memory index tracks file
+    sizes and recency; it is rebuilt from the directory on start-up, oldest
+    modification time first.
+    """
+
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, max_bytes=500 * 1024 * 1024):
+        """Initialize the cache.
+
+        Args:
+            cache_dir (str): Directory holding cached audio
+            max_bytes (int): Total size above which least recently used
+                files are deleted
+        """
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self._index = OrderedDict()
+        self._total_bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.characters_saved = 0
+        self._load_index()
+
+    def path(self, key):
+        """Return where audio for key is (or would be) stored."""
+        return os.path.join(self.cache_dir, f"{FILE_PREFIX}{key}.mp3")
+
+    def _load_index(self):
+        try:
+            names = [name for name in os.listdir(self.cache_dir)
+                     if name.startswith(FILE_PREFIX) and name.endswith('.mp3')]
+        except OSError:
+            return
+
+        entries = []
+        for name in names:
+            try:
+                stat = os.stat(os.path.join(self.cache_dir, name))
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, name[len(FILE_PREFIX):-len('.mp3')], stat.st_size))
+
+        with self._lock:
+            for _, key, size in sorted(entries):
+                self._index[key] = size
+                self._total_bytes += size
+            self._evict()
+
+    def get(self, key, characters=0):
+        """Return the path of cached audio for key, or None on a miss.
+
+        Args:
+            key (str): Key from ``make_key``
+            characters (int): Length of the text, counted as saved on a hit
+        """
+        path = self.path(key)
+        with self._lock:
+            if key in self._index and os.path.exists(path):
+                self._index.move_to_end(key)
+                self.hits += 1
+                self.characters_saved += characters
+            else:
+                # Another process may have evicted the file
+                if key in self._index:
+                    self._total_bytes -= self._index.pop(key)
+                self.misses += 1
+                return None
+
+        try:
+            # Keep recency across restarts
+            os.utime(path)
+        except OSError:
+            pass
+        return path
+
+    def read(self, key, characters=0):
+        """Return cached audio bytes for key, or None on a miss."""
+        path = self.get(key, characters)
+        if path is None:
+            return None
+        try:
+            with open(path, 'rb') as f:
+                return f.read()
+        except OSError:
+            return None
+
+    def put(self, key, audio_data):
+        """Store audio for key, evicting old entries if over the size limit.
+
+        Returns:
+            str: Path of the cached file
+        """
+        path = self.path(key)
+        os.makedirs(self.cache_dir, exist_ok=True)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(audio_data)
+        os.replace(tmp_path, path)
+
+        with self._lock:
+            if key in self._index:
+                self._total_bytes -= self._index.pop(key)
+            self._index[key] = len(audio_data)
+            self._total_bytes += len(audio_data)
+            self._evict(keep=key)
+        return path
+
+    def _evict(self, keep=None):
+        """Delete least recently used files until under the size limit."""
+        while self._total_bytes > self.max_bytes and self._index:
+            key = next(iter(self._index))
+            if key == keep:
+                break
+            self._total_bytes -= self._index.pop(key)
+            self.evictions += 1
+            try:
+                os.remove(self.path(key))
+            except OSError as e:
+                logger.warning(f"Could not remove cached audio {key}: {str(e)}")
+
+    def stats(self):
+        """Return size and hit/miss counters."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._index),
+                "bytes": self._total_bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "characters_saved": self.characters_saved,
+                "hit_rate": self.hits / lookups if lookups else 0.0
+            }
@@ -0,0 +1,216 @@
+import logging
+import os
+import re
+import threading
+
+logger = logging.getLogger(__name__)
+
+# End of a sentence: terminal punctuation, optional closing quotes/brackets,
+# then whitespace
+SENTENCE_END = re.compile(r'[.!?]+["\')\]]*\s+')
+
+
+def split_sentences(text, min_chars=20):
+    """Split complete sentences off the front of text.
+
+    Sentences shorter than ``min_chars`` are merged with the next one so
+    short interjections don't cost a TTS call of their own.
+
+    Returns:
+        tuple: (sentences, remainder) where remainder is the unfinished tail
+    """
+    sentences = []
+    start = 0
+    for match in SENTENCE_END.finditer(text):
+        sentence = text[start:match.end()].strip()
+        if len(sentence) >= min_chars:
+            sentences.append(sentence)
+            start = match.end()
+    return sentences, text[start:]
+
+
+def prune_files(directory, prefix, keep):
+    """Delete all but the ``keep`` newest ``<prefix>*.mp3`` files in directory.
+
+    Returns:
+        int: Number of files removed
+    """
+    try:
+        names = [name for name in os.listdir(directory)
+                 if name.startswith(prefix) and name.endswith('.mp3')]
+    except OSError:
+        return 0
+
+    entries = []
+    for name in names:
+        path = os.path.join(directory, name)
+        try:
+            entries.append((os.path.getmtime(path), path))
+        except OSError:
+            continue
+
+    removed = 0
+    for _, path in sorted(entries, reverse=True)[keep:]:
+        try:
+            os.remove(path)
+            removed += 1
+        except OSError as e:
+            logger.warning(f"Could not remove old audio {path}: {str(e)}")
+    return removed
+
+
+class SentencePipeline:
+    """Synthesize streamed text one sentence at a time.
+
+    Text deltas are fed in as the LLM produces them. Each completed sentence
+    is sent to TTS on a worker pool straight away, so speech synthesis
+    overlaps generation. ``synthesize`` saves each chunk wherever it keeps
+    audio (normally the TTS cache) and the pipeline reports those paths to
+    ``on_chunk`` strictly in order. Only ``concatenate`` writes to
+    ``output_dir``.
+    """
+
+    def __init__(self, synthesize, executor, output_dir, name, on_chunk=None,
+                 on_complete=None, min_chars=20):
+        """Initialize the pipeline.
+
+        Args:
+            synthesize (callable): Takes text, returns the path of an MP3
+                file or None
+            executor (Executor): Pool that runs TTS calls
+            output_dir (str): Directory for the combined file
+            name (str): File name of the combined file, without extension
+            on_chunk (callable, optional): Called with (index, path) for each
+                chunk in order; path is None if synthesis failed
+            on_complete (callable, optional): Called once every chunk has
+                been reported after ``close``
+            min_chars (int): Minimum characters per TTS call
+        """
+        self.synthesize = synthesize
+        self.executor = executor
+        self.output_dir = output_dir
+        self.name = name
+        self.on_chunk = on_chunk
+        self.on_complete = on_complete
+        self.min_chars = min_chars
+
+        self._lock = threading.RLock()
+        self._text = ""
+        self._buffer = ""
+        self._futures = []
+        self._results = {}
+        self._next_emit = 0
+        self._closed = False
+        self.abandoned = False
+
+    def feed(self, delta):
+        """Add streamed text, sending any completed sentences to TTS."""
+        with self._lock:
+            if self._closed:
+                return
+            self._text += delta
+            self._buffer += delta
+            sentences, self._buffer = split_sentences(self._buffer, self.min_chars)
+            for sentence in sentences:
+                self._submit(sentence)
+
+    def close(self, final_text=None):
+        """Flush the remaining text and stop accepting deltas.
+
+        Args:
+            final_text (str, optional): The complete response. Text that was
+                never streamed (e.g. a canned reply) is synthesized from it.
+
+        Returns:
+            bool: False if the streamed text doesn't match ``final_text``, in
+            which case the pipeline is abandoned and its audio should not be used
+        """
+        with self._lock:
+            if self._closed:
+                return not self.abandoned
+
+            if final_text is not None:
+                streamed = self._text.strip()
+                if not final_text.startswith(streamed):
+                    logger.warning("Streamed text does not match final response; abandoning TTS pipeline")
+                    self.abandon()
+                    return False
+                self._buffer += final_text[len(streamed):]
+
+            # A short tail rides along with the sentence before it
+            sentences, remainder = split_sentences(self._buffer + " ", self.min_chars)
+            remainder = remainder.strip()
+            if remainder and sentences and len(remainder) < self.min_chars:
+                sentences[-1] = f"{sentences[-1]} {remainder}"
+            elif remainder:
+                sentences.append(remainder)
+            for sentence in sentences:
+                self._submit(sentence)
+            self._buffer = ""
+            self._closed = True
+            self._check_complete()
+            return True
+
+    def abandon(self):
+        """Stop accepting text and suppress reporting of pending chunks."""
+        with self._lock:
+            self._closed = True
+            self.abandoned = True
+            self.on_complete = None
+        for future in self._futures:
+            future.cancel()
+
+    def wait(self):
+        """Block until every chunk is synthesized.
+
+        Returns:
+            list: Chunk file paths in order, skipping failed chunks
+        """
+        paths = [future.result() for future in list(self._futures) if not future.cancelled()]
+        return [path for path in paths if path]
+
+    def concatenate(self):
+        """Join the chunks into a single MP3 file.
+
+        Returns:
+            str or None: Path of the combined file, or None if no audio
+        """
+        paths = self.wait()
+        if not paths:
+            return None
+        os.makedirs(self.output_dir, exist_ok=True)
+        output_path = os.path.join(self.output_dir, f"{self.name}.mp3")
+        with open(output_path, 'wb') as out:
+            for path in paths:
+                with open(path, 'rb') as f:
+                    out.write(f.read())
+        return output_path
+
+    def _submit(self, sentence):
+        index = len(self._futures)
+        self._futures.append(self.executor.submit(self._synthesize_chunk, index, sentence))
+
+    def _synthesize_chunk(self, index, sentence):
+        path = None
+        try:
+            path = self.synthesize(sentence)
+        except Exception as e:
+            logger.error(f"Error synthesizing sentence {index}: {str(e)}")
+        self._report(index, path)
+        return path
+
+    def _report(self, index, path):
+        """Record a finished chunk and report every chunk now ready in order."""
+        with self._lock:
+            self._results[index] = path
+            while self._next_emit in self._results:
+                ready_index = self._next_emit
+                self._next_emit += 1
+                if self.on_chunk and not self.abandoned:
+                    self.on_chunk(ready_index, self._results[ready_index])
+            self._check_complete()
+
+    def _check_complete(self):
+        if self._closed and self._next_emit == len(self._futures) and self.on_complete:
+            on_complete, self.on_complete = self.on_complete, None
+            on_complete()
@@ -0,0 +1,221 @@
+import json
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+
+from server.utils.cache import ReadThroughCache, TTLCache
+from server.utils.moderation_cache import ModerationCache, normalize_request
+from server.utils.prompt_registry import PromptRegistry
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestTTLCache(unittest.TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        self.cache = TTLCache(max_size=2, ttl=10, clock=self.clock)
+
+    def test_entries_expire(self):
+        self.cache.set("a", 1)
+        self.clock.now = 9
+        self.assertEqual(self.cache.get("a"), 1)
+        self.clock.now = 10
+        self.assertIsNone(self.cache.get("a"))
+        self.assertEqual(len(self.cache), 0)
+
+    def test_least_recently_used_is_evicted(self):
+        self.cache.set("a", 1)
+        self.cache.set("b", 2)
+        self.cache.get("a")
+        self.cache.set("c", 3)
+        self.assertEqual(self.cache.get("a"), 1)
+        self.assertIsNone(self.cache.get("b"))
+        self.assertEqual(self.cache.stats()["evictions"], 1)
+
+    def test_hit_and_miss_counters(self):
+        self.cache.set("a", 1)
+        self.cache.get("a")
+        self.cache.get("missing")
+        stats = self.cache.stats()
+        self.assertEqual((stats["hits"], stats["misses"]), (1, 1))
+        self.assertAlmostEqual(stats["hit_rate"], 0.5)
+
+
+class ManualExecutor:
+    """Holds submitted calls until the test runs them."""
+
+    def __init__(self):
+        self.calls = []
+
+    def submit(self, fn, *args):
+        self.calls.append((fn, args))
+
+    def run(self):
+        calls, self.calls = self.calls, []
+        for fn, args in calls:
+            fn(*args)
+
+
+class TestReadThroughCache(unittest.TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        self.executor = ManualExecutor()
+        self.loads = []
+        self.values = {}
+        self.cache = ReadThroughCache(self.load, max_size=2, ttl=10, stale_ttl=100,
+                                      executor=self.executor, clock=self.clock)
+
+    def load(self, key):
+        self.loads.append(key)
+        value = self.values.get(key, f"{key}1")
+        if isinstance(value, Exception):
+            raise value
+        return value
+
+    def test_loads_once_while_fresh(self):
+        self.assertEqual(self.cache.get("a"), "a1")
+        self.clock.now = 9
+        self.assertEqual(self.cache.get("a"), "a1")
+        self.assertEqual(self.loads, ["a"])
+
+    def test_stale_value_is_served_while_refreshing(self):
+        self.cache.get("a")
+        self.values["a"] = "a2"
+        self.clock.now = 50
+
+        self.assertEqual(self.cache.get("a"), "a1")
+        self.assertEqual(self.cache.get("a"), "a1")
+        # One refresh per key, run off the request path
+        self.assertEqual(len(self.executor.calls), 1)
+        self.assertEqual(self.loads, ["a"])
+
+        self.executor.run()
+        self.assertEqual(self.cache.get("a"), "a2")
+        stats = self.cache.stats()
+        self.assertEqual((stats["stale_hits"], stats["refreshes"]), (2, 1))
+
+    def test_failed_refresh_keeps_stale_value(self):
+        self.cache.get("a")
+        self.values["a"] = RuntimeError("navidrome down")
+        self.clock.now = 50
+        self.cache.get("a")
+        self.executor.run()
+
+        self.assertEqual(self.cache.get("a"), "a1")
+        self.assertEqual(self.cache.stats()["refresh_failures"], 1)
+
+    def test_expired_stale_value_is_reloaded(self):
+        self.cache.get("a")
+        self.values["a"] = "a2"
+        self.clock.now = 110
+        self.assertEqual(self.cache.get("a"), "a2")
+        self.assertEqual(self.executor.calls, [])
+
+    def test_invalidate_discards_in_flight_refresh(self):
+        self.cache.get("a")
+        self.clock.now = 50
+        self.cache.get("a")
+        self.cache.invalidate("a")
+        self.executor.run()
+
+        self.values["a"] = "a2"
+        self.assertEqual(self.cache.get("a"), "a2")
+
+    def test_errors_are_not_cached(self):
+        self.values["a"] = RuntimeError("boom")
+        with self.assertRaises(RuntimeError):
+            self.cache.get("a")
+        del self.values["a"]
+        self.assertEqual(self.cache.get("a"), "a1")
+
+    def test_zero_ttl_disables_caching(self):
+        cache = ReadThroughCache(self.load, ttl=0)
+        cache.get("a")
+        cache.get("a")
+        self.assertEqual(self.loads, ["a", "a"])
+
+    def test_concurrent_misses_share_one_load(self):
+        started, release = threading.Event(), threading.Event()
+
+        def slow_load(key):
+            self.loads.append(key)
+            started.set()
+            release.wait(5)
+            return key
+
+        cache = ReadThroughCache(slow_load, ttl=10)
+        with ThreadPoolExecutor(max_workers=4) as pool:
+            first = pool.submit(cache.get, "a")
+            started.wait(5)
+            others = [pool.submit(cache.get, "a") for _ in range(3)]
+            release.set()
+            results = [first.result()] + [future.result() for future in others]
+        self.assertEqual(results, ["a"] * 4)
+        self.assertEqual(self.loads, ["a"])
+
+
+class TestNormalizeRequest(unittest.TestCase):
+    def test_folds_case_punctuation_and_whitespace(self):
+        key, substituted = normalize_request("  Play something   CHILL!! ")
+        self.assertEqual(key, "play something chill")
+        self.assertFalse(substituted)
+
+    def test_replaces_now_playing_values(self):
+        now_playing = {"title": "Yesterday", "artist": "The Beatles"}
+        key, substituted = normalize_request("Tell me about Yesterday by The Beatles?", now_playing)
+        self.assertEqual(key, "tell me about <title> by <artist>")
+        self.assertTrue(substituted)
+
+    def test_only_whole_words_are_replaced(self):
+        now_playing = {"title": "Love", "artist": "Art"}
+        key, substituted = normalize_request("Play something lovely and smart", now_playing)
+        self.assertEqual(key, "play something lovely and smart")
+        self.assertFalse(substituted)
+
+    def test_values_ending_in_punctuation_are_replaced(self):
+        key, substituted = normalize_request("Who sang Help! originally", {"title": "Help!"})
+        self.assertEqual(key, "who sang <title> originally")
+        self.assertTrue(substituted)
+
+
+class TestModerationCache(unittest.TestCase):
+    def setUp(self):
+        self.prompts_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.prompts_dir)
+        self.write('moderation', "Moderate.")
+        self.write('trivia', "Be fun.")
+        self.registry = PromptRegistry(self.prompts_dir, check_interval=0)
+        self.cache = ModerationCache(registry=self.registry)
+        self.cache.set("play something chill", True, None)
+
+    def write(self, name, system):
+        path = os.path.join(self.prompts_dir, f"{name}.json")
+        with open(path, 'w') as f:
+            json.dump({"system": system, "user": ""}, f)
+        stat = os.stat(path)
+        os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+    def test_cleared_when_registry_reloads_moderation_prompt(self):
+        self.write('moderation', "Moderate strictly.")
+
+        self.assertIsNone(self.cache.get("play something chill"))
+        self.assertEqual(self.cache.stats()["invalidations"], 1)
+
+    def test_other_prompts_leave_cache_alone(self):
+        self.write('trivia', "Be serious.")
+
+        self.assertIsNotNone(self.cache.get("play something chill"))
+        self.assertEqual(self.cache.stats()["invalidations"], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
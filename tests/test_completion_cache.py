@@ -0,0 +1,83 @@
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+from server.integrations.llm_client import LLMClient
+from server.utils.completion_cache import CompletionCache, make_key, parse_ttls
+
+
+class TestCompletionCache(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmpdir)
+        self.cache = CompletionCache(os.path.join(self.tmpdir, 'llm_cache.db'))
+
+    def test_set_and_get(self):
+        key = make_key('ollama', 'llama3', 'song_info', [{"role": "user", "content": "x"}], 0.7, 500)
+        self.assertIsNone(self.cache.get(key))
+
+        self.cache.set(key, 'song_info', "A classic.")
+
+        self.assertEqual(self.cache.get(key), "A classic.")
+        stats = self.cache.stats()
+        self.assertEqual((stats["hits"], stats["misses"]), (1, 1))
+        self.assertEqual(stats["templates"]["song_info"]["entries"], 1)
+
+    def test_key_covers_generation_parameters(self):
+        messages = [{"role": "user", "content": "x"}]
+        base = make_key('openai', 'gpt-4', 'song_info', messages, 0.7, 500)
+        self.assertNotEqual(base, make_key('openai', 'gpt-4o', 'song_info', messages, 0.7, 500))
+        self.assertNotEqual(base, make_key('openai', 'gpt-4', 'song_info', messages, 0.2, 500))
+        self.assertNotEqual(base, make_key('openai', 'gpt-4', 'song_info', messages, 0.7, 200))
+
+    def test_opted_out_templates_are_not_stored(self):
+        self.cache.set('k', 'dj_chat', "Hey there!")
+        self.assertIsNone(self.cache.get('k'))
+
+    def test_expired_entries_miss_and_purge(self):
+        cache = CompletionCache(self.cache.db_path, ttls={'song_info': 1})
+        with mock.patch('server.utils.completion_cache.time.time', return_value=1000.0):
+            cache.set('k', 'song_info', "A classic.")
+        with mock.patch('server.utils.completion_cache.time.time', return_value=1002.0):
+            self.assertIsNone(cache.get('k'))
+            self.assertEqual(cache.purge(expired_only=True), 1)
+
+    def test_purge_by_template(self):
+        self.cache.set('a', 'song_info', "A")
+        self.cache.set('b', 'trend_analyzer', "B")
+
+        self.assertEqual(self.cache.purge(template='song_info'), 1)
+        self.assertEqual([entry['key'] for entry in self.cache.entries()], ['b'])
+
+    def test_parse_ttls(self):
+        self.assertEqual(parse_ttls("song_info:60, dj_intro:0,bad"), {"song_info": 60, "dj_intro": 0})
+
+
+class TestLLMClientCaching(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmpdir)
+        cache = CompletionCache(os.path.join(self.tmpdir, 'llm_cache.db'))
+        self.client = LLMClient(provider='ollama', model='llama3', completion_cache=cache)
+
+    def test_song_info_generated_once(self):
+        with mock.patch.object(self.client, 'chat_completion', return_value="Great song.") as completion:
+            first = self.client.generate_song_info("The Beatles", "Yesterday")
+            second = self.client.generate_song_info("The Beatles", "Yesterday")
+            self.client.generate_song_info("The Beatles", "Help!")
+
+        self.assertEqual(first['info'], second['info'])
+        self.assertEqual(completion.call_count, 2)
+
+    def test_creative_templates_bypass_cache(self):
+        with mock.patch.object(self.client, 'chat_completion', return_value="Up next!") as completion:
+            self.client.generate_dj_intro({'artist': 'A', 'title': 'B'})
+            self.client.generate_dj_intro({'artist': 'A', 'title': 'B'})
+
+        self.assertEqual(completion.call_count, 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
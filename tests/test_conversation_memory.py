@@ -0,0 +1,118 @@
+import threading
+import unittest
+from concurrent.futures import Future
+
+from server.utils.conversation_memory import ConversationMemory, messages_tokens
+
+
+class InlineExecutor:
+    """Runs submitted work immediately so tests see its effects."""
+
+    def submit(self, fn, *args):
+        future = Future()
+        future.set_result(fn(*args))
+        return future
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class Summarizer:
+    def __init__(self, fail=False):
+        self.fail = fail
+        self.calls = []
+
+    def __call__(self, summary, turns):
+        self.calls.append((summary, list(turns)))
+        if self.fail:
+            raise RuntimeError("LLM down")
+        return (summary + " " if summary else "") + "; ".join(request for request, _ in turns)
+
+
+class TestConversationMemory(unittest.TestCase):
+    def setUp(self):
+        self.clock = Clock()
+
+    def make_memory(self, summarize, **kwargs):
+        return ConversationMemory(summarize, executor=InlineExecutor(), clock=self.clock, **kwargs)
+
+    def test_recent_turns_are_recalled_in_order(self):
+        memory = self.make_memory(Summarizer(), max_turns=3)
+        memory.add_turn('a', "I love jazz", "Great taste!")
+        memory.add_turn('a', "Who is your favourite?", "Miles Davis.")
+
+        messages = memory.messages('a', budget=1000)
+
+        self.assertEqual([m["content"] for m in messages],
+                         ["I love jazz", "Great taste!", "Who is your favourite?", "Miles Davis."])
+        self.assertEqual(memory.messages('b', budget=1000), [])
+
+    def test_overflow_is_folded_into_summary(self):
+        summarize = Summarizer()
+        memory = self.make_memory(summarize, max_turns=2)
+        for i in range(4):
+            memory.add_turn('a', f"request {i}", f"response {i}")
+
+        messages = memory.messages('a', budget=1000)
+
+        self.assertEqual(messages[0]["role"], "system")
+        self.assertIn("request 0 request 1", messages[0]["content"])
+        self.assertEqual([m["content"] for m in messages[1:] if m["role"] == "user"], ["request 2", "request 3"])
+        self.assertEqual(len(summarize.calls), 2)
+
+    def test_budget_keeps_newest_turns(self):
+        memory = self.make_memory(Summarizer(), max_turns=10)
+        for i in range(10):
+            memory.add_turn('a', f"request {i} " + "x" * 40, f"response {i}")
+
+        messages = memory.messages('a', budget=60)
+
+        self.assertLessEqual(messages_tokens(messages), 60)
+        self.assertTrue(messages[-1]["content"].startswith("response 9"))
+        self.assertEqual(memory.messages('a', budget=0), [])
+
+    def test_failed_summaries_keep_memory_bounded(self):
+        summarize = Summarizer(fail=True)
+        memory = self.make_memory(summarize, max_turns=2)
+        for i in range(10):
+            memory.add_turn('a', f"request {i}", f"response {i}")
+
+        user_turns = [m["content"] for m in memory.messages('a', budget=1000) if m["role"] == "user"]
+
+        self.assertEqual(user_turns, [f"request {i}" for i in range(6, 10)])
+        self.assertEqual(memory.stats()["summary_failures"], len(summarize.calls))
+
+    def test_idle_and_excess_users_are_forgotten(self):
+        memory = self.make_memory(Summarizer(), max_users=2, idle_ttl=100)
+        for user_id in ('a', 'b', 'c'):
+            memory.add_turn(user_id, "hi", "hello")
+        self.assertEqual(memory.messages('a', budget=100), [])
+
+        self.clock.now += 200
+        self.assertEqual(memory.messages('c', budget=100), [])
+        self.assertEqual(memory.stats()["users"], 0)
+
+    def test_requests_do_not_wait_for_summaries(self):
+        release = threading.Event()
+
+        def slow_summarize(summary, turns):
+            release.wait(2)
+            return "summary"
+
+        memory = ConversationMemory(slow_summarize, max_turns=1)
+        self.addCleanup(release.set)
+        memory.add_turn('a', "one", "1")
+        memory.add_turn('a', "two", "2")
+
+        # The summary is still being written; the window is served meanwhile
+        contents = [m["content"] for m in memory.messages('a', budget=1000)]
+        self.assertEqual(contents, ["one", "1", "two", "2"])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,717 @@
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import time
+import unittest
+from unittest import mock
+
+from flask import Flask
+
+from server.routes import dj_interaction as dj
+from server.utils.library_index import LibraryIndex
+from server.utils.prompt_registry import PromptRegistry
+
+
+class FakeLLM:
+    """LLM stand-in that answers moderation prompts and counts calls."""
+
+    def __init__(self, verdict="MUSIC_RELATED", delay=0.0):
+        self.verdict = verdict
+        self.delay = delay
+        self.calls = []
+
+    def chat_completion(self, messages, temperature=0.7, max_tokens=500):
+        self.calls.append(messages)
+        time.sleep(self.delay)
+        if "music-related" in messages[-1]["content"]:
+            return self.verdict
+        return "Here is a great answer about music."
+
+    def stream_chat_completion(self, messages, temperature=0.7, max_tokens=500):
+        text = self.chat_completion(messages, temperature, max_tokens)
+        words = text.split(" ")
+        return FakeStream([words[0]] + [" " + word for word in words[1:]])
+
+
+class FakeStream:
+    def __init__(self, deltas):
+        self.deltas = deltas
+        self.metrics = {}
+
+    def collect(self, on_delta=None):
+        for delta in self.deltas:
+            if on_delta:
+                on_delta(delta)
+        return "".join(self.deltas)
+
+
+class FakeRouterLLM(FakeLLM):
+    """LLM stand-in that also answers the combined router prompt."""
+
+    def __init__(self, route, delay=0.0):
+        super().__init__(delay=delay)
+        self.route = route
+        self.route_calls = 0
+
+    def route_request(self, request_text, now_playing=None):
+        self.route_calls += 1
+        time.sleep(self.delay)
+        return self.route
+
+
+class FakeNavidrome:
+    def __init__(self):
+        self.queries = []
+
+    def search_songs(self, query, limit=5, **fields):
+        self.queries.append(query)
+        return [{'id': 's1', 'title': 'Yesterday', 'artist': 'The Beatles'}]
+
+
+class FakeTTS:
+    def __init__(self):
+        self.calls = []
+
+    def text_to_speech(self, text, voice_id=None, speed=1.0):
+        self.calls.append(text)
+        return b"ID3"
+
+    def speech_file(self, text, voice_id=None, speed=1.0, output_dir='.'):
+        audio_data = self.text_to_speech(text, voice_id, speed)
+        os.makedirs(output_dir, exist_ok=True)
+        # Named by content, like the TTS cache
+        path = os.path.join(output_dir, f"speech_{hashlib.sha256(text.encode()).hexdigest()[:16]}.mp3")
+        with open(path, 'wb') as f:
+            f.write(audio_data)
+        return path
+
+
+class FakeConfig:
+    speculative_moderation = True
+    use_request_router = False
+    moderation_fast_path = False
+    moderation_fast_path_threshold = 0.9
+    moderation_fast_path_reject = False
+    moderation_cache_size = 100
+    moderation_cache_ttl = 60
+    moderation_store = 'memory'
+    moderation_store_path = 'moderation_state.db'
+    moderation_idle_ttl = 3600
+    rate_limit = False
+    rate_limit_user_per_minute = 600
+    rate_limit_user_burst = 1000
+    rate_limit_global_per_minute = 0
+    rate_limit_global_burst = 0
+    rate_limit_store = 'memory'
+    rate_limit_store_path = 'rate_limits.db'
+    conversation_memory = False
+    conversation_max_turns = 2
+    conversation_token_budget = 1500
+    library_index = False
+    library_index_refresh = 300
+    library_index_full_refresh = 86400
+    sentence_pipelined_tts = False
+    sentence_pipelined_tts_keep = 100
+    trivia_buffer = False
+    trivia_buffer_size = 2
+    interaction_log_max_mb = 1
+    interaction_log_backups = 1
+
+
+class DJRequestTestCase(unittest.TestCase):
+    def setUp(self):
+        self.app = Flask(__name__)
+        self.app.register_blueprint(dj.dj_interaction, url_prefix='/api')
+        self.client = self.app.test_client()
+        self.config = FakeConfig()
+        patcher = mock.patch.object(dj, 'log_interaction')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        # Run from a scratch directory so audio files don't land in the repo
+        repo_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        self.workdir = tempfile.mkdtemp()
+        os.symlink(os.path.join(repo_root, 'prompts'), os.path.join(self.workdir, 'prompts'))
+        self.addCleanup(shutil.rmtree, self.workdir)
+        self.addCleanup(os.chdir, os.getcwd())
+        os.chdir(self.workdir)
+
+    def post(self, text, user_id='tester'):
+        return self.client.post('/api/dj_request', json={
+            'request': text,
+            'user_id': user_id,
+            'context': {'now_playing': {'title': 'Song', 'artist': 'Artist'}}
+        })
+
+
+class TestSpeculativeModeration(DJRequestTestCase):
+    def test_rejected_request_skips_tts(self):
+        """A rejected request discards the speculative answer and never speaks it."""
+        llm = FakeLLM(verdict="NOT_MUSIC_RELATED Stick to the music.")
+        tts = FakeTTS()
+        dj.init_clients(llm, tts, None, self.config)
+
+        data = self.post("what's the weather like").get_json()
+
+        self.assertFalse(data["success"])
+        self.assertEqual(data["response"], "Stick to the music.")
+        self.assertEqual(tts.calls, [])
+
+    def test_accepted_request_overlaps_llm_calls(self):
+        """Moderation and response generation run concurrently."""
+        llm = FakeLLM(delay=0.2)
+        tts = FakeTTS()
+        dj.init_clients(llm, tts, None, self.config)
+
+        start = time.monotonic()
+        data = self.post("how are you today dj").get_json()
+        elapsed = time.monotonic() - start
+
+        self.assertTrue(data["success"])
+        self.assertEqual(len(llm.calls), 2)
+        self.assertEqual(tts.calls, [data["response"]])
+        self.assertLess(elapsed, 0.35)
+
+    def test_sequential_mode(self):
+        """With speculation disabled moderation runs before the handler."""
+        self.config.speculative_moderation = False
+        llm = FakeLLM(verdict="NOT_MUSIC_RELATED")
+        tts = FakeTTS()
+        dj.init_clients(llm, tts, None, self.config)
+
+        data = self.post("do my taxes").get_json()
+
+        self.assertFalse(data["success"])
+        self.assertEqual(len(llm.calls), 1)
+        self.assertEqual(tts.calls, [])
+
+
+def make_route(intent, verdict="MUSIC_RELATED", message="", **entities):
+    return {
+        'is_music_related': verdict == "MUSIC_RELATED",
+        'verdict': verdict,
+        'intent': intent,
+        'entities': {key: entities.get(key) for key in ('artist', 'title', 'mood', 'theme')},
+        'message': message
+    }
+
+
+class TestRequestRouter(DJRequestTestCase):
+    def setUp(self):
+        super().setUp()
+        self.config.use_request_router = True
+
+    def test_play_song_uses_router_entities(self):
+        """Play requests search with the router's title/artist, no extra LLM call."""
+        self.config.speculative_moderation = False
+        llm = FakeRouterLLM(make_route('play_song', title='Yesterday', artist='The Beatles'))
+        navidrome = FakeNavidrome()
+        dj.init_clients(llm, FakeTTS(), navidrome, self.config)
+
+        data = self.post("could you put on yesterday by the beatles").get_json()
+
+        self.assertTrue(data["success"])
+        self.assertEqual(navidrome.queries, ['Yesterday The Beatles'])
+        self.assertEqual(llm.route_calls, 1)
+        self.assertEqual(llm.calls, [])
+        self.assertEqual(data["actions"][0]["data"]["song_id"], 's1')
+
+    def test_play_song_resolves_from_library_index(self):
+        """A built library index answers play requests without a Navidrome search."""
+        self.config.speculative_moderation = False
+        llm = FakeRouterLLM(make_route('play_song', title='Yesterdy', artist='Beatles'))
+        navidrome = FakeNavidrome()
+        dj.init_clients(llm, FakeTTS(), navidrome, self.config)
+        dj.library_index = LibraryIndex(navidrome)
+        dj.library_index.add_songs([
+            {'id': 's7', 'title': 'Yesterday', 'artist': 'The Beatles'},
+            {'id': 's8', 'title': 'Yesterday Once More', 'artist': 'Carpenters'}
+        ])
+
+        data = self.post("could you put on yesterday by the beatles").get_json()
+
+        self.assertEqual(navidrome.queries, [])
+        self.assertEqual(data["actions"][0]["data"]["song_id"], 's7')
+
+    def test_playlist_uses_router_mood_and_theme(self):
+        llm = FakeRouterLLM(make_route('create_playlist', mood='Mellow', theme='rainy day'))
+        dj.init_clients(llm, FakeTTS(), None, self.config)
+
+        data = self.post("make me a mix for a rainy afternoon").get_json()
+
+        self.assertEqual(data["actions"][0]["data"]["mood"], 'mellow')
+        self.assertEqual(data["actions"][0]["data"]["theme"], 'rainy day')
+
+    def test_router_rejection(self):
+        llm = FakeRouterLLM(make_route('generic', verdict="NOT_MUSIC_RELATED", message="Nope."))
+        tts = FakeTTS()
+        dj.init_clients(llm, tts, None, self.config)
+
+        data = self.post("write my essay").get_json()
+
+        self.assertFalse(data["success"])
+        self.assertEqual(data["response"], "Nope.")
+        self.assertEqual(tts.calls, [])
+
+    def test_speculative_response_discarded_on_intent_mismatch(self):
+        """A keyword guess that the router overrules is regenerated with the router's intent."""
+        llm = FakeRouterLLM(make_route('create_playlist', mood='chill', theme='study'))
+        dj.init_clients(llm, FakeTTS(), None, self.config)
+
+        data = self.post("tell me about a chill study vibe").get_json()
+
+        self.assertEqual(data["actions"][0]["type"], 'create_playlist')
+
+    def test_unparseable_router_falls_back_to_moderation(self):
+        llm = FakeLLM(verdict="NOT_MUSIC_RELATED Off topic.")
+        llm.route_request = mock.Mock(side_effect=ValueError("no JSON"))
+        dj.init_clients(llm, FakeTTS(), None, self.config)
+
+        data = self.post("what's for dinner").get_json()
+
+        self.assertFalse(data["success"])
+        self.assertEqual(data["response"], "Off topic.")
+
+
+class TestModerationFastPath(DJRequestTestCase):
+    def setUp(self):
+        super().setUp()
+        self.config.moderation_fast_path = True
+        self.config.speculative_moderation = False
+
+    def test_local_rejects_are_escalated_by_default(self):
+        llm = FakeLLM()
+        dj.init_clients(llm, FakeTTS(), None, self.config)
+
+        data = self.post("help me with my math homework").get_json()
+
+        # The LLM has the final say on anything the classifier would reject
+        self.assertTrue(data["success"])
+        self.assertEqual(len([call for call in llm.calls if "music-related" in call[-1]["content"]]), 1)
+        stats = self.client.get('/api/moderation_stats').get_json()
+        self.assertEqual(stats["fast_path"]["fast_rejects"], 0)
+
+    def test_fast_path_reject_never_counts_warnings(self):
+        self.config.moderation_fast_path_reject = True
+        llm = FakeLLM()
+        dj.init_clients(llm, FakeTTS(), None, self.config)
+
+        for _ in range(5):
+            data = self.post("help me with my math homework").get_json()
+            self.assertFalse(data["success"])
+            self.assertEqual(data["warnings"], 0)
+
+        self.assertEqual(llm.calls, [])
+        self.assertEqual(dj.check_user_status('tester')['status'], 'active')
+        stats = self.client.get('/api/moderation_stats').get_json()
+        self.assertEqual(stats["fast_path"]["fast_rejects"], 5)
+
+    def test_obvious_accept_skips_moderation_llm(self):
+        llm = FakeLLM()
+        dj.init_clients(llm, FakeTTS(), None, self.config)
+
+        data = self.post("make me a chill playlist").get_json()
+
+        self.assertTrue(data["success"])
+        self.assertEqual(llm.calls, [])
+
+    def test_obvious_accept_skips_router(self):
+        self.config.use_request_router = True
+        llm = FakeRouterLLM(make_route('create_playlist', mood='chill'))
+        dj.init_clients(llm, FakeTTS(), None, self.config)
+
+        with mock.patch.object(dj, 'process_dj_request', wraps=dj.process_dj_request) as process:
+            data = self.post("make me a chill playlist").get_json()
+
+        self.assertTrue(data["success"])
+        self.assertEqual(llm.route_calls, 0)
+        # The intent falls back to the local keyword categorizer
+        self.assertIsNone(process.call_args.args[2])
+
+    def test_escalated_verdicts_are_recorded(self):
+        llm = FakeLLM(verdict="NOT_MUSIC_RELATED")
+        dj.init_clients(llm, FakeTTS(), None, self.config)
+
+        self.post("hello there")
+
+        self.assertEqual(len(llm.calls), 1)
+        with open(dj.moderation_classifier.samples_path) as f:
+            self.assertIn('"label": false', f.read())
+
+
+class TestModerationCache(DJRequestTestCase):
+    def setUp(self):
+        super().setUp()
+        self.config.speculative_moderation = False
+
+    def moderation_calls(self, llm):
+        return [call for call in llm.calls if "music-related" in call[-1]["content"]]
+
+    def test_repeat_phrasing_skips_moderation_llm(self):
+        llm = FakeLLM()
+        dj.init_clients(llm, FakeTTS(), None, self.config)
+
+        self.post("How are you today, DJ?")
+        self.post("how are you   today dj")
+
+        self.assertEqual(len(self.moderation_calls(llm)), 1)
+        stats = self.client.get('/api/moderation_stats').get_json()
+        self.assertEqual(stats["cache"]["hits"], 1)
+
+    def test_cached_route_skips_router(self):
+        self.config.use_request_router = True
+        llm = FakeRouterLLM(make_route('create_playlist', mood='chill'))
+        dj.init_clients(llm, FakeTTS(), None, self.config)
+
+        self.post("Make me a mix!")
+        self.post("make me a mix")
+
+        self.assertEqual(llm.route_calls, 1)
+
+    def test_prompt_change_invalidates(self):
+        # Load prompts from a copy so the moderation prompt can be modified
+        prompts_dir = os.path.join(self.workdir, 'prompts_copy')
+        shutil.copytree(os.path.realpath('prompts'), prompts_dir)
+        patcher = mock.patch.object(dj, 'prompts', PromptRegistry(prompts_dir, check_interval=0))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        llm = FakeLLM()
+        dj.init_clients(llm, FakeTTS(), None, self.config)
+        self.post("how are you today dj")
+
+        # The cache follows the registry, whatever the working directory
+        os.chdir(tempfile.mkdtemp(dir=self.workdir))
+        with open(os.path.join(prompts_dir, 'moderation.json'), 'a') as f:
+            f.write("\n")
+        self.post("how are you today dj")
+
+        self.assertEqual(len(self.moderation_calls(llm)), 2)
+        self.assertEqual(dj.moderation_cache.stats()["invalidations"], 1)
+
+
+def parse_sse(body):
+    events = []
+    for block in body.strip().split("\n\n"):
+        lines = dict(line.split(": ", 1) for line in block.split("\n"))
+        events.append((lines["event"], json.loads(lines["data"])))
+    return events
+
+
+class TestStreamingRequest(DJRequestTestCase):
+    def stream(self, text):
+        response = self.client.post('/api/dj_request/stream', json={
+            'request': text,
+            'user_id': 'tester',
+            'context': {'now_playing': {'title': 'Song', 'artist': 'Artist'}}
+        })
+        self.assertEqual(response.mimetype, 'text/event-stream')
+        return parse_sse(response.get_data(as_text=True))
+
+    def test_event_order(self):
+        dj.init_clients(FakeLLM(), FakeTTS(), None, self.config)
+
+        events = self.stream("how are you today dj")
+        names = [name for name, _ in events]
+
+        self.assertEqual(names, ['moderation'] + ['text-delta'] * 7 + ['text-done', 'actions', 'audio-ready'])
+        self.assertTrue(events[0][1]["success"])
+        deltas = "".join(data["delta"] for name, data in events if name == 'text-delta')
+        self.assertEqual(deltas, "Here is a great answer about music.")
+        self.assertEqual(events[-3][1]["response"], "Here is a great answer about music.")
+        self.assertTrue(events[-1][1]["audio_path"].startswith("/static/audio/"))
+
+    def test_rejection_stops_after_moderation(self):
+        tts = FakeTTS()
+        dj.init_clients(FakeLLM(verdict="NOT_MUSIC_RELATED Nope."), tts, None, self.config)
+
+        events = self.stream("what's the weather")
+
+        self.assertEqual(events, [('moderation', {'success': False, 'response': 'Nope.', 'warnings': 1})])
+        self.assertEqual(tts.calls, [])
+
+    def test_discarded_speculation_deltas_are_not_streamed(self):
+        self.config.use_request_router = True
+        llm = FakeRouterLLM(make_route('create_playlist', mood='chill', theme='study'))
+        dj.init_clients(llm, FakeTTS(), None, self.config)
+
+        events = self.stream("tell me about a chill study vibe")
+
+        self.assertNotIn('text-delta', [name for name, _ in events])
+        self.assertEqual(dict(events)['actions']['actions'][0]['type'], 'create_playlist')
+
+
+class StoryLLM(FakeLLM):
+    """LLM stand-in whose answers span several sentences."""
+
+    def chat_completion(self, messages, temperature=0.7, max_tokens=500):
+        answer = super().chat_completion(messages, temperature, max_tokens)
+        if answer == self.verdict:
+            return answer
+        return "Welcome back to the show, friends. This next track is a real gem, so enjoy it!"
+
+
+class TestSentencePipelinedTTS(DJRequestTestCase):
+    SENTENCES = ["Welcome back to the show, friends.", "This next track is a real gem, so enjoy it!"]
+
+    def setUp(self):
+        super().setUp()
+        self.config.sentence_pipelined_tts = True
+
+    def test_stream_emits_audio_chunks_in_order(self):
+        tts = FakeTTS()
+        dj.init_clients(StoryLLM(), tts, None, self.config)
+
+        response = self.client.post('/api/dj_request/stream', json={'request': 'how are you today dj'})
+        events = parse_sse(response.get_data(as_text=True))
+        names = [name for name, _ in events]
+
+        self.assertEqual(tts.calls, self.SENTENCES)
+        chunks = [data for name, data in events if name == 'audio-chunk']
+        self.assertEqual([chunk["index"] for chunk in chunks], [0, 1])
+        self.assertEqual(names[-1], 'audio-ready')
+        ready = events[-1][1]
+        self.assertEqual(ready["audio_chunks"], [chunk["audio_path"] for chunk in chunks])
+        self.assertLess(names.index('audio-chunk'), names.index('audio-ready'))
+
+        combined = os.path.join('voicebot', 'outputs', os.path.basename(ready["audio_path"]))
+        with open(combined, 'rb') as f:
+            self.assertEqual(f.read(), b"ID3" * 2)
+
+    def test_json_response_includes_chunks(self):
+        tts = FakeTTS()
+        dj.init_clients(StoryLLM(), tts, None, self.config)
+
+        data = self.post("how are you today dj").get_json()
+
+        self.assertTrue(data["success"])
+        self.assertEqual(tts.calls, self.SENTENCES)
+        self.assertEqual(len(data["audio_chunks"]), 2)
+        self.assertTrue(data["audio_path"].startswith("/static/audio/"))
+
+    def test_chunks_are_served_from_tts_files(self):
+        """Only the combined file is written per response, and old ones are pruned."""
+        self.config.sentence_pipelined_tts_keep = 1
+        dj.init_clients(StoryLLM(), FakeTTS(), None, self.config)
+
+        first = self.post("how are you today dj").get_json()
+        second = self.post("how are you doing dj").get_json()
+
+        self.assertEqual(first["audio_chunks"], second["audio_chunks"])
+        self.assertTrue(all(os.path.basename(chunk).startswith("speech_") for chunk in second["audio_chunks"]))
+        outputs = sorted(os.listdir(os.path.join('voicebot', 'outputs')))
+        responses = [name for name in outputs if name.startswith(dj.RESPONSE_AUDIO_PREFIX)]
+        self.assertEqual(responses, [os.path.basename(second["audio_path"])])
+        self.assertEqual(len(outputs), 3)
+
+    def test_unstreamed_response_is_synthesized(self):
+        """Canned replies that never stream are still spoken."""
+        tts = FakeTTS()
+        dj.init_clients(FakeLLM(), tts, FakeNavidrome(), self.config)
+
+        data = self.post("play Yesterday").get_json()
+
+        self.assertTrue(data["success"])
+        self.assertEqual(" ".join(tts.calls), data["response"])
+        self.assertEqual(len(data["audio_chunks"]), len(tts.calls))
+
+
+class TestTriviaBuffer(DJRequestTestCase):
+    def setUp(self):
+        super().setUp()
+        self.config.trivia_buffer = True
+        patcher = mock.patch.object(dj.TriviaBuffer, 'start')
+        self.start = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_trivia_served_from_buffer(self):
+        llm = FakeLLM()
+        tts = FakeTTS()
+        dj.init_clients(llm, tts, None, self.config)
+        dj.trivia_buffer.fill_once()
+        self.assertEqual(len(tts.calls), 1)
+        llm.calls.clear()
+
+        data = self.post("tell me some music trivia").get_json()
+
+        self.assertTrue(data["success"])
+        self.assertEqual(data["response"], "Here is a great answer about music.")
+        self.assertTrue(data["audio_path"].startswith("/static/audio/speech_"))
+        # Only moderation reached the LLM, and nothing new was synthesized
+        self.assertEqual(len(llm.calls), 1)
+        self.assertEqual(len(tts.calls), 1)
+
+    def test_empty_buffer_falls_back_to_live_generation(self):
+        llm = FakeLLM()
+        tts = FakeTTS()
+        dj.init_clients(llm, tts, None, self.config)
+
+        data = self.post("tell me some music trivia").get_json()
+
+        self.assertTrue(data["success"])
+        self.assertEqual(len(llm.calls), 2)
+        self.assertEqual(tts.calls, [data["response"]])
+        self.assertEqual(dj.trivia_buffer.stats()["misses"], 1)
+
+    def test_filling_starts_on_first_trivia_request(self):
+        dj.init_clients(FakeLLM(), FakeTTS(), None, self.config)
+        self.start.assert_not_called()
+
+        self.post("tell me some music trivia")
+
+        self.start.assert_called()
+
+    def test_rejected_speculative_request_keeps_buffered_trivia(self):
+        dj.init_clients(FakeLLM(verdict="NOT_MUSIC_RELATED"), FakeTTS(), None, self.config)
+        dj.trivia_buffer.fill_once()
+
+        data = self.post("tell me some music trivia").get_json()
+
+        self.assertFalse(data["success"])
+        self.assertEqual(dj.trivia_buffer.stats()["buffers"], {"(None, 'default', 1.0)": 1})
+
+    def test_accepted_speculative_request_takes_buffered_trivia(self):
+        dj.init_clients(FakeLLM(), FakeTTS(), None, self.config)
+        dj.trivia_buffer.fill_once()
+
+        data = self.post("tell me some music trivia").get_json()
+
+        self.assertTrue(data["success"])
+        # The claim runs as the response future's done callback
+        for _ in range(100):
+            stats = dj.trivia_buffer.stats()
+            if stats["hits"]:
+                break
+            time.sleep(0.01)
+        self.assertEqual(stats["buffers"], {"(None, 'default', 1.0)": 0})
+        self.assertEqual(stats["hits"], 1)
+
+    def test_invalid_voice_speed_uses_default_key(self):
+        self.assertEqual(dj.trivia_key({'voice_speed': 'fast'}), (None, 'default', 1.0))
+        self.assertEqual(dj.trivia_key({'voice_speed': [1.2]}), (None, 'default', 1.0))
+
+
+
+class TestRateLimiting(DJRequestTestCase):
+    def setUp(self):
+        super().setUp()
+        # Room for two requests per user, refilled at a trickle
+        self.config.rate_limit = True
+        self.config.rate_limit_user_per_minute = 6
+        self.config.rate_limit_user_burst = 2 * dj.estimate_request_tokens("how are you today dj")
+
+    def test_third_request_gets_429_without_llm_calls(self):
+        llm = FakeLLM()
+        dj.init_clients(llm, FakeTTS(), None, self.config)
+        self.post("how are you today dj")
+        self.post("how are you today dj")
+        llm.calls.clear()
+
+        response = self.post("how are you today dj")
+
+        self.assertEqual(response.status_code, 429)
+        self.assertGreater(int(response.headers['Retry-After']), 0)
+        data = response.get_json()
+        self.assertEqual((data["error"], data["scope"]), ("rate_limited", "user"))
+        self.assertEqual(llm.calls, [])
+        self.assertEqual(dj.rate_limiter.stats()["limited_user"], 1)
+
+    def test_other_users_are_not_limited(self):
+        dj.init_clients(FakeLLM(), FakeTTS(), None, self.config)
+        for _ in range(3):
+            self.post("how are you today dj", user_id='greedy')
+
+        self.assertEqual(self.post("how are you today dj", user_id='polite').status_code, 200)
+
+    def test_stream_is_refused_before_it_starts(self):
+        dj.init_clients(FakeLLM(), FakeTTS(), None, self.config)
+        self.post("how are you today dj")
+        self.post("how are you today dj")
+
+        response = self.client.post('/api/dj_request/stream', json={'request': "how are you today dj", 'user_id': 'tester'})
+
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response.mimetype, 'application/json')
+
+
+
+class TestUserStatuses(DJRequestTestCase):
+    def test_batch_status_with_since_cursor(self):
+        dj.init_clients(FakeLLM(verdict="NOT_MUSIC_RELATED Nope."), FakeTTS(), None, self.config)
+        self.post("what's the weather", user_id='alice')
+        self.post("what's the weather", user_id='bob')
+
+        data = self.client.get('/api/user_statuses?active_within=60').get_json()
+        self.assertEqual(sorted(user["user_id"] for user in data["users"]), ['alice', 'bob'])
+        self.assertFalse(data["has_more"])
+
+        self.post("what's the weather", user_id='bob')
+        changed = self.client.get(f'/api/user_statuses?since={data["next_since"]}').get_json()
+
+        self.assertEqual([(user["user_id"], user["status"]) for user in changed["users"]], [('bob', 'muted')])
+
+    def test_invalid_cursor(self):
+        dj.init_clients(FakeLLM(), FakeTTS(), None, self.config)
+
+        response = self.client.get('/api/user_statuses?since=yesterday')
+
+        self.assertEqual(response.status_code, 400)
+
+
+
+class TestConversationMemory(DJRequestTestCase):
+    def test_follow_up_includes_previous_turn(self):
+        self.config.conversation_memory = True
+        llm = FakeLLM()
+        dj.init_clients(llm, FakeTTS(), None, self.config)
+
+        self.post("hey dj, my name is Sam")
+        llm.calls.clear()
+        self.post("hey dj, what is my name")
+
+        chat = [messages for messages in llm.calls if messages[-1]["content"].startswith("Current song")]
+        self.assertEqual(len(chat), 1)
+        self.assertEqual([m["content"] for m in chat[0][1:3]],
+                         ["hey dj, my name is Sam", "Here is a great answer about music."])
+
+    def test_other_users_do_not_share_memory(self):
+        self.config.conversation_memory = True
+        llm = FakeLLM()
+        dj.init_clients(llm, FakeTTS(), None, self.config)
+
+        self.post("hey dj, my name is Sam", user_id='sam')
+        llm.calls.clear()
+        self.post("hey dj, what is my name", user_id='alex')
+
+        chat = [messages for messages in llm.calls if messages[-1]["content"].startswith("Current song")]
+        self.assertEqual(len(chat[0]), 2)
+
+    def test_anonymous_requests_get_no_memory(self):
+        self.config.conversation_memory = True
+        llm = FakeLLM()
+        dj.init_clients(llm, FakeTTS(), None, self.config)
+
+        for text in ("hey dj, my name is Sam", "hey dj, what is my name"):
+            self.client.post('/api/dj_request', json={'request': text})
+
+        chat = [messages for messages in llm.calls if messages[-1]["content"].startswith("Current song")]
+        self.assertEqual([len(messages) for messages in chat], [2, 2])
+        self.assertEqual(dj.conversation_memory.stats()["users"], 0)
+
+    def test_memory_is_kept_per_session(self):
+        self.config.conversation_memory = True
+        llm = FakeLLM()
+        dj.init_clients(llm, FakeTTS(), None, self.config)
+
+        self.client.post('/api/dj_request', json={
+            'request': "hey dj, my name is Sam", 'user_id': 'tester', 'session_id': 'tab-1'})
+        llm.calls.clear()
+        self.client.post('/api/dj_request', json={
+            'request': "hey dj, what is my name", 'user_id': 'tester', 'session_id': 'tab-2'})
+
+        chat = [messages for messages in llm.calls if messages[-1]["content"].startswith("Current song")]
+        self.assertEqual(len(chat[0]), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,124 @@
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock
+
+import requests
+
+from server.utils.http_transport import HTTPTransport
+
+
+class Handler(BaseHTTPRequestHandler):
+    # Keep-alive needs HTTP/1.1
+    protocol_version = 'HTTP/1.1'
+
+    def respond(self):
+        server = self.server
+        server.hits += 1
+        length = int(self.headers.get('Content-Length') or 0)
+        if length:
+            self.rfile.read(length)
+        status = server.statuses.pop(0) if server.statuses else 200
+        body = b'ok'
+        self.send_response(status)
+        if status == 429:
+            self.send_header('Retry-After', '0')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    do_GET = respond
+    do_POST = respond
+
+    def log_message(self, format, *args):
+        pass
+
+
+class TestHTTPTransport(unittest.TestCase):
+    def setUp(self):
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.server.hits = 0
+        self.server.statuses = []
+        thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        thread.start()
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}/rest/ping"
+        self.delays = []
+        self.transport = HTTPTransport(timeout=2, retries=2, sleep=self.delays.append)
+
+    def test_connections_are_reused(self):
+        for _ in range(5):
+            self.assertEqual(self.transport.get(self.url).text, 'ok')
+
+        host = next(iter(self.transport.stats()["hosts"].values()))
+        self.assertEqual(host["requests"], 5)
+        self.assertEqual(host["connections"], 1)
+        self.assertEqual(host["reused"], 4)
+
+    def test_idempotent_requests_retry_with_backoff(self):
+        self.server.statuses = [503, 502]
+        response = self.transport.get(self.url)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.server.hits, 3)
+        self.assertEqual(len(self.delays), 2)
+        # Jittered exponential backoff: 0.5s then 1s, each +/-50%
+        self.assertTrue(0.25 <= self.delays[0] <= 0.75)
+        self.assertTrue(0.5 <= self.delays[1] <= 1.5)
+        self.assertEqual(self.transport.stats()["retried"], 2)
+
+    def test_retry_after_is_honoured(self):
+        self.server.statuses = [429]
+        self.assertEqual(self.transport.get(self.url).status_code, 200)
+        self.assertEqual(self.delays, [0])
+
+    def test_post_is_not_retried_unless_asked(self):
+        self.server.statuses = [503, 503]
+        self.assertEqual(self.transport.post(self.url, data={'a': 1}).status_code, 503)
+        self.assertEqual(self.server.hits, 1)
+
+        self.server.statuses = [503]
+        self.assertEqual(self.transport.post(self.url, json={}, retry=True).status_code, 200)
+
+    def test_unsent_only_retries_refusals_but_not_gateway_errors(self):
+        self.server.statuses = [429, 503]
+        self.assertEqual(self.transport.post(self.url, json={}, retry=True, unsent_only=True).status_code, 200)
+        self.assertEqual(self.server.hits, 3)
+
+        # A 502/504 may come after the upstream already did the work
+        self.server.statuses = [502]
+        self.assertEqual(self.transport.post(self.url, json={}, retry=True, unsent_only=True).status_code, 502)
+        self.assertEqual(self.server.hits, 4)
+
+    def test_unsent_only_retries_refused_connections(self):
+        self.server.shutdown()
+        self.server.server_close()
+        with self.assertRaises(requests.exceptions.ConnectionError):
+            self.transport.post(self.url, json={}, retry=True, unsent_only=True)
+        self.assertEqual(self.transport.stats()["requests"], 3)
+
+    def test_unsent_only_does_not_retry_read_timeouts(self):
+        with mock.patch.object(self.transport.session, 'request',
+                               side_effect=requests.exceptions.ReadTimeout("read timed out")) as request:
+            with self.assertRaises(requests.exceptions.ReadTimeout):
+                self.transport.post(self.url, json={}, retry=True, unsent_only=True)
+        self.assertEqual(request.call_count, 1)
+
+    def test_last_status_is_returned_when_retries_run_out(self):
+        self.server.statuses = [503, 503, 503]
+        self.assertEqual(self.transport.get(self.url).status_code, 503)
+        self.assertEqual(self.server.hits, 3)
+
+    def test_connection_errors_raise_after_retries(self):
+        self.server.shutdown()
+        self.server.server_close()
+        with self.assertRaises(requests.exceptions.ConnectionError):
+            self.transport.get(self.url)
+        stats = self.transport.stats()
+        self.assertEqual(stats["requests"], 3)
+        self.assertEqual(stats["failures"], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,109 @@
+import json
+import multiprocessing
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+
+from server.utils import interaction_log
+from server.utils.interaction_log import InteractionLog, read_interactions, tail_file
+
+
+def write_from_process(path, worker, count):
+    log = InteractionLog(path, max_bytes=1000, backups=2000)
+    for i in range(count):
+        log.append({"request": f"{worker}-{i}"})
+        log.flush()
+    log.close()
+
+
+class TestInteractionLog(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmpdir)
+        self.path = os.path.join(self.tmpdir, 'logs', 'dj_interactions.jsonl')
+
+    def make_log(self, **kwargs):
+        log = InteractionLog(self.path, **kwargs)
+        self.addCleanup(log.close)
+        return log
+
+    def test_concurrent_appends_are_all_written(self):
+        log = self.make_log()
+
+        def worker(n):
+            for i in range(50):
+                log.append({"request": f"{n}-{i}"})
+
+        threads = [threading.Thread(target=worker, args=(n,)) for n in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertTrue(log.flush(timeout=5))
+
+        requests = [entry["request"] for entry in read_interactions(self.path)]
+        self.assertEqual(len(requests), 400)
+        self.assertEqual(len(set(requests)), 400)
+
+    @unittest.skipIf(interaction_log.fcntl is None, "flock is unavailable on this platform")
+    def test_worker_processes_rotate_without_losing_entries(self):
+        context = multiprocessing.get_context('fork')
+        processes = [context.Process(target=write_from_process, args=(self.path, n, 200)) for n in range(8)]
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join()
+
+        requests = [entry["request"] for entry in read_interactions(self.path, backups=2000)]
+        self.assertEqual(len(requests), 1600)
+        self.assertEqual(len(set(requests)), 1600)
+
+    def test_rotation_keeps_backups_and_tail_spans_files(self):
+        log = self.make_log(max_bytes=200, backups=2)
+        for i in range(30):
+            log.append({"request": f"request number {i:02d}"})
+            log.flush(timeout=5)
+
+        self.assertTrue(os.path.exists(f"{self.path}.1"))
+        self.assertTrue(os.path.exists(f"{self.path}.2"))
+        self.assertFalse(os.path.exists(f"{self.path}.3"))
+        self.assertLessEqual(os.path.getsize(self.path), 200)
+
+        recent = [entry["request"] for entry in log.tail(8)]
+        self.assertEqual(recent, [f"request number {i:02d}" for i in range(22, 30)])
+
+    def test_tail_includes_queued_entries(self):
+        log = self.make_log()
+        log.append({"request": "first"})
+        log.flush(timeout=5)
+
+        with log._file_lock:
+            # Hold the writer off so the next entry stays queued
+            log._pending.append({"request": "second"})
+        self.assertEqual([entry["request"] for entry in log.tail(5)], ["first", "second"])
+
+    def test_tail_skips_partial_lines(self):
+        os.makedirs(os.path.dirname(self.path))
+        with open(self.path, 'w') as f:
+            for i in range(3):
+                f.write(json.dumps({"request": i}) + "\n")
+            f.write('{"request": ')
+
+        self.assertEqual(tail_file(self.path, 2), [{"request": 1}, {"request": 2}])
+
+    def test_legacy_log_is_migrated(self):
+        legacy_path = os.path.join(self.tmpdir, 'dj_interactions.json')
+        with open(legacy_path, 'w') as f:
+            json.dump([{"request": "old"}], f, indent=2)
+
+        log = self.make_log(legacy_path=legacy_path)
+        log.append({"request": "new"})
+        log.close()
+
+        self.assertEqual([entry["request"] for entry in read_interactions(self.path)], ["old", "new"])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,209 @@
+import random
+import time
+import unittest
+
+from server.utils.library_index import LibraryIndex, parse_song_query
+
+SONGS = [
+    {'id': 's1', 'title': 'Yesterday', 'artist': 'The Beatles', 'album': 'Help!'},
+    {'id': 's2', 'title': 'Yesterday Once More', 'artist': 'Carpenters', 'album': 'Now & Then'},
+    {'id': 's3', 'title': 'Stand by Me', 'artist': 'Ben E. King', 'album': "Don't Play That Song"},
+    {'id': 's4', 'title': 'Help!', 'artist': 'The Beatles', 'album': 'Help!'},
+    {'id': 's5', 'title': 'Jóga', 'artist': 'Björk', 'album': 'Homogenic'},
+    {'id': 's6', 'title': 'Hurt', 'artist': 'Johnny Cash', 'album': 'American IV'},
+    {'id': 's7', 'title': 'Hurt', 'artist': 'Nine Inch Nails', 'album': 'The Downward Spiral'},
+]
+
+
+class FakeLibrary:
+    def __init__(self, songs, albums=None):
+        self.songs = list(songs)
+        self.albums = albums or []
+        self.status = {'scanning': False, 'count': len(self.songs), 'lastScan': '1'}
+        self.album_requests = []
+
+    def get_library_songs(self, offset=0, size=500):
+        return self.songs[offset:offset + size]
+
+    def get_newest_albums(self, size=50, offset=0):
+        return [{'id': album['id']} for album in self.albums[offset:offset + size]]
+
+    def get_album_info(self, album_id):
+        self.album_requests.append(album_id)
+        return next(album for album in self.albums if album['id'] == album_id)
+
+    def get_scan_status(self):
+        return dict(self.status)
+
+
+def build(songs=SONGS):
+    index = LibraryIndex(FakeLibrary(songs))
+    index.add_songs(songs)
+    return index
+
+
+class TestParseSongQuery(unittest.TestCase):
+    def test_splits_on_last_by(self):
+        self.assertEqual(parse_song_query("stand by me by ben e king"), ("stand by me", "ben e king"))
+
+    def test_no_artist(self):
+        self.assertEqual(parse_song_query("yesterday"), ("yesterday", None))
+
+
+class TestLibraryIndex(unittest.TestCase):
+    def test_title_by_artist(self):
+        self.assertEqual(build().resolve("hurt by nine inch nails")['id'], 's7')
+        self.assertEqual(build().resolve("hurt by johnny cash")['id'], 's6')
+
+    def test_exact_title_beats_longer_title(self):
+        self.assertEqual(build().resolve("yesterday")['id'], 's1')
+
+    def test_tolerates_typos(self):
+        index = build()
+        self.assertEqual(index.resolve("yesterdy by the beatels")['id'], 's1')
+        self.assertEqual(index.resolve("yestreday")['id'], 's1')
+
+    def test_title_containing_by(self):
+        self.assertEqual(build().resolve("stand by me")['id'], 's3')
+
+    def test_accents_and_filler_words(self):
+        self.assertEqual(build().resolve("could you play joga by bjork please")['id'], 's5')
+
+    def test_entities(self):
+        self.assertEqual(build().resolve(title="Help", artist="Beatles")['id'], 's4')
+
+    def test_no_match(self):
+        index = build()
+        self.assertIsNone(index.resolve("completely unrelated words"))
+        self.assertEqual(index.stats()['misses'], 1)
+
+    def test_update_replaces_song(self):
+        index = build()
+        index.add_songs([{'id': 's6', 'title': 'Ring of Fire', 'artist': 'Johnny Cash'}])
+        self.assertEqual([song['id'] for song in index.search("hurt")], ['s7'])
+        self.assertEqual(index.resolve("ring of fire")['id'], 's6')
+        self.assertEqual(len(index), len(SONGS))
+
+    def test_truncation_keeps_songs_matching_more_words(self):
+        songs = [{'id': f"n{i}", 'title': f"Neon x{i}", 'artist': 'A', 'album': 'B'} for i in range(1500)]
+        songs.append({'id': 'target', 'title': 'Neon River', 'artist': 'Glow', 'album': 'Night'})
+        songs += [{'id': f"r{i}", 'title': f"River y{i}", 'artist': 'A', 'album': 'B'} for i in range(3000)]
+        index = build(songs)
+
+        self.assertEqual(index.resolve("neon rivr")['id'], 'target')
+
+
+class TestRefresh(unittest.TestCase):
+    def test_first_refresh_builds_and_unchanged_library_is_skipped(self):
+        library = FakeLibrary(SONGS, albums=[{'id': 'a1', 'song': []}])
+        index = LibraryIndex(library, page_size=3)
+        index.refresh()
+        self.assertEqual(len(index), len(SONGS))
+        index.refresh()
+        self.assertEqual(index.stats()['rebuilds'], 1)
+
+    def test_new_albums_are_added_incrementally(self):
+        library = FakeLibrary(SONGS, albums=[{'id': 'a1', 'song': []}])
+        index = LibraryIndex(library)
+        index.refresh()
+
+        new_song = {'id': 's8', 'title': 'Karma Police', 'artist': 'Radiohead', 'album': 'OK Computer'}
+        library.albums.insert(0, {'id': 'a2', 'song': [new_song]})
+        library.songs.append(new_song)
+        library.status.update(count=len(library.songs), lastScan='2')
+        index.refresh()
+
+        self.assertEqual(index.resolve("karma police")['id'], 's8')
+        self.assertEqual(library.album_requests, ['a2'])
+        self.assertEqual(index.stats()['rebuilds'], 1)
+        self.assertEqual(index.stats()['incremental_updates'], 1)
+
+    def test_stale_index_is_rebuilt_without_a_scan_change(self):
+        library = FakeLibrary(SONGS, albums=[{'id': 'a1', 'song': []}])
+        index = LibraryIndex(library, full_refresh_interval=3600)
+        index.refresh()
+
+        # Retagged in place: same song count and scan time
+        library.songs[5] = dict(library.songs[5], title='Hurt Again')
+        index.refresh()
+        self.assertEqual(index.stats()['rebuilds'], 1)
+
+        index._built_at -= 3600
+        index.refresh()
+        self.assertEqual(index.stats()['rebuilds'], 2)
+        self.assertEqual(index.resolve("hurt again by johnny cash")['id'], 's6')
+
+    def test_removed_songs_trigger_rebuild(self):
+        library = FakeLibrary(SONGS, albums=[{'id': 'a1', 'song': []}])
+        index = LibraryIndex(library)
+        index.refresh()
+
+        library.songs = [song for song in library.songs if song['id'] != 's3']
+        library.status.update(count=len(library.songs), lastScan='2')
+        index.refresh()
+
+        self.assertEqual(index.stats()['rebuilds'], 2)
+        self.assertNotEqual((index.resolve("stand by me") or {}).get('id'), 's3')
+
+    def test_failed_rebuild_is_retried(self):
+        library = FakeLibrary(SONGS, albums=[{'id': 'a1', 'song': []}])
+        index = LibraryIndex(library)
+        index.refresh()
+
+        library.songs = [song for song in library.songs if song['id'] != 's3']
+        library.status.update(count=len(library.songs), lastScan='2')
+        rebuild = index.rebuild
+        failures = [ConnectionError("navidrome unavailable")]
+
+        def flaky_rebuild():
+            if failures:
+                raise failures.pop()
+            rebuild()
+
+        index.rebuild = flaky_rebuild
+        with self.assertRaises(ConnectionError):
+            index.refresh()
+        index.refresh()
+
+        self.assertEqual(index.stats()['rebuilds'], 2)
+        self.assertNotEqual((index.resolve("stand by me") or {}).get('id'), 's3')
+
+    def test_skips_while_scanning(self):
+        library = FakeLibrary(SONGS)
+        library.status['scanning'] = True
+        index = LibraryIndex(library)
+        index.refresh()
+        self.assertFalse(index.ready)
+
+
+class TestLargeLibrary(unittest.TestCase):
+    def test_lookup_is_fast_on_200k_songs(self):
+        rng = random.Random(7)
+        words = [''.join(rng.choice('abcdefghijklmnopqrstuvwxyz') for _ in range(rng.randint(3, 9)))
+                 for _ in range(20000)]
+        common = ['love', 'night', 'heart', 'the', 'you', 'baby', 'dance', 'time']
+        songs = [
+            {'id': f"s{i}",
+             'title': ' '.join(rng.choice(common if rng.random() < 0.3 else words) for _ in range(rng.randint(1, 4))),
+             'artist': f"{rng.choice(words)} {rng.choice(words)}",
+             'album': rng.choice(words)}
+            for i in range(200000)
+        ]
+        songs.append({'id': 'target', 'title': 'Love Will Tear Us Apart', 'artist': 'Joy Division', 'album': 'Closer'})
+        index = build(songs)
+
+        queries = ["love will tear us apart by joy division", "love wil tear us apart",
+                   "night", "dance the night away", "baby love by the supremes"]
+        for query in queries:
+            index.search(query)
+        started = time.perf_counter()
+        for query in queries:
+            index.search(query)
+        per_lookup = (time.perf_counter() - started) / len(queries)
+
+        self.assertEqual(index.resolve("love wil tear us apart by joy divison")['id'], 'target')
+        self.assertLess(per_lookup, 0.01)
+
+
+if __name__ == '__main__':
+    unittest.main()
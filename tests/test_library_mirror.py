@@ -0,0 +1,304 @@
+import os
+import random
+import shutil
+import tempfile
+import time
+import unittest
+from unittest import mock
+
+from server.utils.library_mirror import LibraryMirror, match_expression
+from server.utils.navidrome import NavidromeClient
+
+
+class FakeSubsonic:
+    """In-memory Subsonic server with a scan counter."""
+
+    def __init__(self):
+        self.albums = {}
+        self.last_scan = 1
+        self.last_modified = 1000
+        self.scanning = False
+        self.calls = []
+
+    def add_album(self, album_id, songs, created='2024-01-01', artist='Artist', genre=None, year=None):
+        self.albums[album_id] = {
+            'id': album_id, 'name': f"Album {album_id}", 'artist': artist, 'artistId': 'ar1',
+            'created': created, 'songCount': len(songs),
+            'song': [{'id': song_id, 'title': title, 'album': f"Album {album_id}", 'albumId': album_id,
+                      'artist': artist, 'genre': genre, 'year': year, 'track': n + 1}
+                     for n, (song_id, title) in enumerate(songs)]
+        }
+
+    def rescan(self):
+        self.last_scan += 1
+        self.last_modified += 1000
+
+    def __call__(self, endpoint, params=None, method='GET'):
+        params = params or {}
+        self.calls.append(endpoint)
+        if endpoint == 'getScanStatus':
+            count = sum(album['songCount'] for album in self.albums.values())
+            return {'scanStatus': {'scanning': self.scanning, 'count': count, 'lastScan': self.last_scan}}
+        if endpoint == 'getIndexes':
+            if params.get('ifModifiedSince', 0) >= self.last_modified:
+                return {'indexes': {}}
+            return {'indexes': {'lastModified': self.last_modified}}
+        if endpoint == 'getArtists':
+            return {'artists': {'index': [{'name': 'A', 'artist': [{'id': 'ar1', 'name': 'Artist'}]}]}}
+        if endpoint == 'getAlbumList2':
+            summaries = [{key: value for key, value in album.items() if key != 'song'}
+                         for album in sorted(self.albums.values(), key=lambda album: album['id'])]
+            offset, size = params['offset'], params['size']
+            return {'albumList2': {'album': summaries[offset:offset + size]}}
+        if endpoint == 'getAlbum':
+            album = self.albums[params['id']]
+            return {'album': dict(album, song=[dict(song) for song in album['song']])}
+        if endpoint == 'getSong':
+            for album in self.albums.values():
+                for song in album['song']:
+                    if song['id'] == params['id']:
+                        return {'song': song}
+            raise Exception("API request failed: Song not found")
+        raise AssertionError(f"Unexpected endpoint {endpoint}")
+
+
+class TestLibraryMirror(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp)
+        self.server = FakeSubsonic()
+        self.server.add_album('al1', [('s1', 'Yesterday'), ('s2', 'Help!')])
+        self.server.add_album('al2', [('s3', 'Hurt')], created='2024-02-01')
+
+        with mock.patch.object(NavidromeClient, '_authenticate'):
+            self.client = NavidromeClient('http://navidrome', 'user', 'pass')
+        patcher = mock.patch.object(self.client, '_make_request', side_effect=self.server)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.db_path = os.path.join(self.tmp, 'library.db')
+        self.mirror = LibraryMirror(self.client, db_path=self.db_path)
+        self.client.mirror = self.mirror
+
+    def test_initial_sync_mirrors_library(self):
+        self.assertFalse(self.mirror.ready)
+        self.assertTrue(self.mirror.sync())
+
+        stats = self.mirror.stats()
+        self.assertTrue(stats['ready'])
+        self.assertEqual((stats['artists'], stats['albums'], stats['songs']), (1, 2, 3))
+        album = self.mirror.get_album('al1')
+        self.assertEqual([song['id'] for song in album['song']], ['s1', 's2'])
+        self.assertEqual(self.mirror.get_song('s3')['title'], 'Hurt')
+
+    def test_client_reads_mirror_first(self):
+        self.mirror.sync()
+        self.server.calls.clear()
+
+        self.assertEqual(self.client.get_song_info('s1')['title'], 'Yesterday')
+        self.assertEqual(len(self.client.get_album_info('al1')['song']), 2)
+        self.assertEqual([song['id'] for song in self.client.get_library_songs(size=10)], ['s1', 's2', 's3'])
+        self.assertEqual(self.client.get_newest_albums(size=1)[0]['id'], 'al2')
+        self.assertEqual(self.client.get_scan_status()['count'], 3)
+        self.assertEqual(self.server.calls, [])
+
+    def test_unmirrored_reads_fall_back_to_server(self):
+        self.assertEqual(self.client.get_song_info('s1')['title'], 'Yesterday')
+        self.assertIn('getSong', self.server.calls)
+
+    def test_unchanged_library_is_not_crawled(self):
+        self.mirror.sync()
+        self.server.calls.clear()
+
+        self.assertFalse(self.mirror.sync())
+        self.assertEqual(self.server.calls, ['getScanStatus', 'getIndexes'])
+
+    def test_incremental_sync_fetches_only_changed_albums(self):
+        self.mirror.sync()
+        self.server.add_album('al3', [('s4', 'Karma Police')])
+        self.server.add_album('al1', [('s1', 'Yesterday'), ('s2', 'Help!'), ('s5', 'Ticket to Ride')])
+        del self.server.albums['al2']
+        self.server.rescan()
+        self.server.calls.clear()
+
+        self.assertTrue(self.mirror.sync())
+
+        self.assertEqual(self.server.calls.count('getAlbum'), 2)
+        self.assertIsNone(self.mirror.get_album('al2'))
+        self.assertIsNone(self.mirror.get_song('s3'))
+        self.assertEqual(len(self.mirror.get_album('al1')['song']), 3)
+        self.assertEqual(self.mirror.get_song('s4')['title'], 'Karma Police')
+
+    def test_sync_does_not_use_request_fan_out_pool(self):
+        for n in range(120):
+            self.server.add_album(f"bulk{n}", [(f"bulk{n}-s", f"Song {n}")])
+        with mock.patch.object(self.client, 'fan_out', side_effect=AssertionError("shared pool used")):
+            self.assertTrue(self.mirror.sync())
+        self.assertEqual(self.mirror.stats()['albums'], 122)
+
+    def test_skips_while_scanning(self):
+        self.server.scanning = True
+        self.assertFalse(self.mirror.sync())
+        self.assertFalse(self.mirror.ready)
+
+    def test_mirror_survives_restart(self):
+        self.mirror.sync()
+        reopened = LibraryMirror(self.client, db_path=self.db_path)
+        self.assertTrue(reopened.ready)
+        self.assertEqual(reopened.get_song('s2')['title'], 'Help!')
+
+
+class TestMatchExpression(unittest.TestCase):
+    def test_words_are_quoted(self):
+        self.assertEqual(match_expression('love AND war'), '"love" AND "AND" AND "war"')
+        self.assertIsNone(match_expression('  !? '))
+
+    def test_phrases_prefixes_and_fields(self):
+        self.assertEqual(match_expression('"paint it black" artist:stones'),
+                         '"paint it black" AND artist : "stones"')
+        self.assertEqual(match_expression("don't sto*"), '"don t" AND "sto"*')
+        self.assertEqual(match_expression('bohemian rh', prefix=True), '"bohemian" AND "rh"*')
+        # Single letters are too broad to expand
+        self.assertEqual(match_expression('bohemian r', prefix=True), '"bohemian" AND "r"')
+
+    def test_field_arguments(self):
+        self.assertEqual(match_expression(title='Hurt', artist='Johnny Cash'),
+                         'title : ("Hurt") AND artist : ("Johnny" "Cash")')
+        with self.assertRaises(ValueError):
+            match_expression(year='1990')
+
+
+class TestLibraryMirrorSearch(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp)
+        self.server = FakeSubsonic()
+        self.server.add_album('al1', [('s1', 'Hurt'), ('s2', 'Personal Jesus')], artist='Johnny Cash',
+                              genre='Country', year=2002)
+        self.server.add_album('al2', [('s3', 'Hurt'), ('s4', 'Closer')], artist='Nine Inch Nails',
+                              genre='Industrial', year=1994)
+        self.server.add_album('al3', [('s5', 'Hurts So Good'), ('s6', 'Café del Mar')], artist='Energy 52',
+                              genre='Trance', year=1993)
+
+        with mock.patch.object(NavidromeClient, '_authenticate'):
+            self.client = NavidromeClient('http://navidrome', 'user', 'pass')
+        patcher = mock.patch.object(self.client, '_make_request', side_effect=self.server)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.mirror = LibraryMirror(self.client, db_path=os.path.join(self.tmp, 'library.db'))
+        self.client.mirror = self.mirror
+        self.mirror.sync()
+        self.server.calls.clear()
+
+    def ids(self, songs):
+        return [song['id'] for song in songs]
+
+    def test_ranks_title_matches_first(self):
+        self.assertEqual(self.ids(self.mirror.search('hurt'))[:2], ['s1', 's3'])
+        self.assertEqual(self.ids(self.mirror.search('hurt nine')), ['s3'])
+        self.assertEqual(self.ids(self.mirror.search('hurt cash')), ['s1'])
+
+    def test_prefix_phrase_and_diacritics(self):
+        self.assertEqual(self.ids(self.mirror.search('hur', prefix=True)), ['s1', 's3', 's5'])
+        self.assertEqual(self.ids(self.mirror.search('"so good"')), ['s5'])
+        self.assertEqual(self.ids(self.mirror.search('"good so"')), [])
+        self.assertEqual(self.ids(self.mirror.search('cafe')), ['s6'])
+
+    def test_every_match_is_ranked(self):
+        mirror = LibraryMirror(client=None, db_path=os.path.join(self.tmp, 'ranked.db'))
+        conn = mirror._connect()
+        try:
+            conn.execute('BEGIN')
+            for album_number in range(300):
+                songs = [{'id': f"s{album_number}_{n}", 'title': f"love song {n} with a long title",
+                          'artist': f"Band {album_number}", 'album': f"Album {album_number}", 'genre': 'Pop'}
+                         for n in range(10)]
+                album = {'id': f"al{album_number}", 'song': songs}
+                mirror._write_album(conn, album, album)
+            album = {'id': 'love', 'song': [{'id': 'exact', 'title': 'Love', 'artist': 'Love', 'album': 'Love',
+                                             'genre': 'Rock'}]}
+            mirror._write_album(conn, album, album)
+            conn.execute('COMMIT')
+        finally:
+            conn.close()
+
+        self.assertEqual(self.ids(mirror.search('love', limit=1)), ['exact'])
+        self.assertEqual(self.ids(mirror.search('love', genre='rock')), ['exact'])
+
+    def test_filters(self):
+        self.assertEqual(self.ids(self.mirror.search('hurt', year_from=1990, year_to=1999)), ['s3'])
+        self.assertEqual(self.ids(self.mirror.search('hurt', genre='country')), ['s1'])
+        self.assertEqual(self.ids(self.mirror.search(genre='trance')), ['s5', 's6'])
+        self.assertEqual(self.mirror.search(), [])
+
+    def test_fields(self):
+        self.assertEqual(self.ids(self.mirror.search(title='hurt', artist='nine inch nails')), ['s3'])
+        self.assertEqual(self.ids(self.mirror.search(artist='hurt')), [])
+
+    def test_index_follows_sync(self):
+        self.server.add_album('al2', [('s4', 'Closer')], artist='Nine Inch Nails', genre='Industrial', year=1994)
+        del self.server.albums['al1']
+        self.server.rescan()
+        self.mirror.sync()
+
+        self.assertEqual(self.ids(self.mirror.search('hurt')), [])
+        self.assertEqual(self.ids(self.mirror.search('hurts')), ['s5'])
+        self.assertEqual(self.ids(self.mirror.search('closer')), ['s4'])
+
+    def test_client_searches_mirror(self):
+        self.assertEqual(self.ids(self.client.search_songs('closer')), ['s4'])
+        self.assertEqual(self.ids(self.client.search_songs('hurt', title='hurt', artist='cash')), ['s1'])
+        self.assertEqual(self.ids(self.client.search('hurt', limit=1)), ['s1'])
+        self.assertEqual(self.server.calls, [])
+
+    def test_client_filters_live_results_without_mirror(self):
+        self.client.mirror = None
+        songs = [{'id': 'a', 'genre': 'Rock', 'year': 1991}, {'id': 'b', 'genre': 'Pop', 'year': 2005}]
+        self.client._make_request.side_effect = lambda *args, **kwargs: {'searchResult3': {'song': songs}}
+
+        self.assertEqual(self.ids(self.client.search_songs('x', genre='rock')), ['a'])
+        self.assertEqual(self.ids(self.client.search_songs('x', year_from=2000)), ['b'])
+
+
+class TestLibraryMirrorSearchSpeed(unittest.TestCase):
+    def test_search_is_fast_on_100k_songs(self):
+        tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp)
+        mirror = LibraryMirror(client=None, db_path=os.path.join(tmp, 'library.db'))
+
+        rng = random.Random(7)
+        vocabulary = [''.join(rng.choices('abcdefghijklmnopqrstuvwxyz', k=rng.randint(3, 8))) for _ in range(5000)]
+        vocabulary += ['love', 'night', 'you'] * 20
+        genres = ['Rock', 'Pop', 'Jazz', 'Electronic', 'Folk']
+        conn = mirror._connect()
+        try:
+            conn.execute('BEGIN')
+            for album_number in range(10000):
+                album_id = f"al{album_number}"
+                artist = f"{rng.choice(vocabulary)} {rng.choice(vocabulary)}"
+                year, genre = rng.randint(1960, 2024), rng.choice(genres)
+                songs = [{'id': f"{album_id}-{n}", 'title': ' '.join(rng.choices(vocabulary, k=3)),
+                          'artist': artist, 'album': album_id, 'year': year, 'genre': genre, 'track': n}
+                         for n in range(10)]
+                album = {'id': album_id, 'name': album_id, 'artist': artist, 'song': songs}
+                mirror._write_album(conn, album, album)
+            conn.execute('COMMIT')
+        finally:
+            conn.close()
+
+        queries = [('love', {}), ('love night', {}), ('"night you"', {}), ('lov', {'prefix': True}),
+                   ('love', {'genre': 'jazz', 'year_from': 1990, 'year_to': 1999}),
+                   (vocabulary[42][:3] + '*', {})]
+        for query, options in queries:
+            self.assertTrue(mirror.search(query, **options), query)
+
+        started = time.perf_counter()
+        for _ in range(5):
+            for query, options in queries:
+                mirror.search(query, **options)
+        per_query = (time.perf_counter() - started) / (5 * len(queries))
+        self.assertLess(per_query, 0.01)
+
+if __name__ == '__main__':
+    unittest.main()
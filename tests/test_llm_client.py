@@ -0,0 +1,89 @@
+import json
+import unittest
+from unittest import mock
+
+from server.integrations.llm_client import LLMClient
+
+
+class TestRouteParsing(unittest.TestCase):
+    def test_parses_json_with_surrounding_text(self):
+        """The parser tolerates code fences and chatter around the JSON object."""
+        content = '```json\n{"verdict": "MUSIC_RELATED", "intent": "play_song", ' \
+                  '"entities": {"artist": "Daft Punk", "title": "Get Lucky", "mood": null, "theme": "null"}, ' \
+                  '"message": ""}\n```'
+        route = LLMClient._parse_route(content)
+
+        self.assertTrue(route["is_music_related"])
+        self.assertEqual(route["intent"], "play_song")
+        self.assertEqual(route["entities"]["artist"], "Daft Punk")
+        self.assertEqual(route["entities"]["title"], "Get Lucky")
+        self.assertIsNone(route["entities"]["mood"])
+        self.assertIsNone(route["entities"]["theme"])
+
+    def test_rejection_message(self):
+        route = LLMClient._parse_route(
+            '{"verdict": "not_music_related", "intent": "generic", "entities": {}, "message": "Stick to music."}'
+        )
+        self.assertFalse(route["is_music_related"])
+        self.assertEqual(route["message"], "Stick to music.")
+
+    def test_unknown_intent_defaults_to_generic(self):
+        route = LLMClient._parse_route('{"verdict": "MUSIC_RELATED", "intent": "dance"}')
+        self.assertEqual(route["intent"], "generic")
+        self.assertEqual(route["entities"], {"artist": None, "title": None, "mood": None, "theme": None})
+
+    def test_invalid_responses_raise(self):
+        for content in ("MUSIC_RELATED", '{"verdict": "MAYBE"}', '{"verdict": '):
+            with self.assertRaises(ValueError):
+                LLMClient._parse_route(content)
+
+
+class FakeStreamingResponse:
+    def __init__(self, lines):
+        self.lines = lines
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        return False
+
+    def raise_for_status(self):
+        pass
+
+    def iter_lines(self):
+        return iter(self.lines)
+
+
+class TestStreamChatCompletion(unittest.TestCase):
+    def setUp(self):
+        self.client = LLMClient(provider='ollama', model='llama3')
+
+    def test_ollama_stream_yields_deltas_and_metrics(self):
+        lines = [json.dumps({"message": {"content": part}, "done": False}).encode() for part in ("Hel", "lo", "!")]
+        lines.append(json.dumps({"message": {"content": ""}, "done": True, "eval_count": 3}).encode())
+        with mock.patch('server.utils.http_transport.HTTPTransport.post',
+                        return_value=FakeStreamingResponse(lines)) as post:
+            stream = self.client.stream_chat_completion([{"role": "user", "content": "hi"}])
+            received = []
+            text = stream.collect(received.append)
+
+        self.assertEqual(text, "Hello!")
+        self.assertEqual(received, ["Hel", "lo", "!"])
+        self.assertTrue(post.call_args.kwargs["json"]["stream"])
+        metrics = stream.metrics
+        self.assertEqual(metrics["tokens"], 3)
+        self.assertIsNotNone(metrics["time_to_first_token"])
+        self.assertGreaterEqual(metrics["total_time"], metrics["time_to_first_token"])
+
+    def test_ollama_stream_error(self):
+        lines = [json.dumps({"error": "model not found"}).encode()]
+        with mock.patch('server.utils.http_transport.HTTPTransport.post',
+                        return_value=FakeStreamingResponse(lines)):
+            stream = self.client.stream_chat_completion([{"role": "user", "content": "hi"}])
+            with self.assertRaises(RuntimeError):
+                stream.collect()
+
+
+if __name__ == '__main__':
+    unittest.main()
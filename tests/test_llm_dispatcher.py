@@ -0,0 +1,123 @@
+import threading
+import time
+import unittest
+from unittest import mock
+
+from server.integrations.llm_client import LLMClient
+from server.utils.llm_dispatcher import (BACKGROUND, INTERACTIVE, STANDARD, LLMDispatcher,
+                                         LLMQueueTimeout, current_priority, llm_priority)
+
+
+def wait_until(condition, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            raise AssertionError("condition not reached")
+        time.sleep(0.005)
+
+
+class TestLLMDispatcher(unittest.TestCase):
+    def start_waiter(self, dispatcher, priority, order, hold=None):
+        def run():
+            with dispatcher.slot(priority):
+                order.append(priority)
+                if hold:
+                    hold.wait(2)
+
+        thread = threading.Thread(target=run, daemon=True)
+        thread.start()
+        return thread
+
+    def test_limits_concurrency(self):
+        dispatcher = LLMDispatcher(max_concurrent=2)
+        release = threading.Event()
+        order = []
+        threads = [self.start_waiter(dispatcher, BACKGROUND, order, release) for _ in range(3)]
+
+        wait_until(lambda: dispatcher.stats()["queued"] == 1)
+        self.assertEqual(dispatcher.stats()["active"], 2)
+        release.set()
+        for thread in threads:
+            thread.join(2)
+        self.assertEqual(dispatcher.stats()["classes"][BACKGROUND]["started"], 3)
+        self.assertEqual(dispatcher.stats()["active"], 0)
+
+    def test_interactive_overtakes_queued_background_work(self):
+        dispatcher = LLMDispatcher(max_concurrent=1)
+        release = threading.Event()
+        order = []
+        running = self.start_waiter(dispatcher, STANDARD, order, release)
+        wait_until(lambda: dispatcher.stats()["active"] == 1)
+
+        background = [self.start_waiter(dispatcher, BACKGROUND, order) for _ in range(2)]
+        wait_until(lambda: dispatcher.stats()["queued"] == 2)
+        interactive = self.start_waiter(dispatcher, INTERACTIVE, order)
+        wait_until(lambda: dispatcher.stats()["queued"] == 3)
+
+        release.set()
+        for thread in [running, interactive] + background:
+            thread.join(2)
+
+        self.assertEqual(order, [STANDARD, INTERACTIVE, BACKGROUND, BACKGROUND])
+        stats = dispatcher.stats()["classes"]
+        self.assertEqual(stats[BACKGROUND]["preempted"], 2)
+        self.assertGreater(stats[BACKGROUND]["wait_max"], 0)
+
+    def test_queued_work_times_out(self):
+        dispatcher = LLMDispatcher(max_concurrent=1, max_wait={BACKGROUND: 0.05})
+        with dispatcher.slot(INTERACTIVE):
+            with self.assertRaises(LLMQueueTimeout):
+                dispatcher.acquire(BACKGROUND)
+        stats = dispatcher.stats()
+        self.assertEqual(stats["classes"][BACKGROUND]["timed_out"], 1)
+        self.assertEqual(stats["queued"], 0)
+        # The abandoned entry doesn't block later callers
+        with dispatcher.slot(BACKGROUND):
+            self.assertEqual(dispatcher.stats()["active"], 1)
+
+    def test_priority_context(self):
+        self.assertEqual(current_priority(), INTERACTIVE)
+        with llm_priority(BACKGROUND):
+            self.assertEqual(current_priority(), BACKGROUND)
+        self.assertEqual(current_priority(), INTERACTIVE)
+        with self.assertRaises(ValueError):
+            with llm_priority('urgent'):
+                pass
+
+
+class TestLLMClientDispatch(unittest.TestCase):
+    def setUp(self):
+        self.dispatcher = LLMDispatcher(max_concurrent=1)
+        self.client = LLMClient(provider='ollama', dispatcher=self.dispatcher)
+        self.seen = []
+
+    def fake_completion(self, messages, temperature, max_tokens):
+        self.seen.append(self.dispatcher.stats()["active"])
+        return "ok"
+
+    def test_completions_use_context_priority(self):
+        with mock.patch.object(self.client, '_chat_completion', side_effect=self.fake_completion):
+            self.client.chat_completion([{"role": "user", "content": "hi"}])
+            with llm_priority(BACKGROUND):
+                self.client.chat_completion([{"role": "user", "content": "hi"}])
+
+        classes = self.dispatcher.stats()["classes"]
+        self.assertEqual(self.seen, [1, 1])
+        self.assertEqual(classes[INTERACTIVE]["started"], 1)
+        self.assertEqual(classes[BACKGROUND]["started"], 1)
+
+    def test_trend_analysis_runs_in_background(self):
+        with mock.patch.object(self.client, '_chat_completion', side_effect=self.fake_completion):
+            self.client.analyze_trends({"lastfm": ["x"]}, [])
+        self.assertEqual(self.dispatcher.stats()["classes"][BACKGROUND]["started"], 1)
+
+    def test_stream_holds_slot_until_finished(self):
+        with mock.patch.object(self.client, '_stream_ollama', return_value=iter(["a", "b"])):
+            stream = self.client.stream_chat_completion([{"role": "user", "content": "hi"}])
+            seen = [self.dispatcher.stats()["active"] for _ in stream]
+        self.assertEqual(seen, [1, 1])
+        self.assertEqual(self.dispatcher.stats()["active"], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
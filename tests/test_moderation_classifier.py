@@ -0,0 +1,91 @@
+import os
+import shutil
+import tempfile
+import time
+import unittest
+
+from server.utils.moderation_classifier import (
+    ModerationClassifier,
+    SEED_MUSIC_REQUESTS,
+    SEED_OFF_TOPIC_REQUESTS,
+    build_training_samples,
+    library_requests,
+    load_recorded_samples
+)
+
+
+class TestModerationClassifier(unittest.TestCase):
+    def setUp(self):
+        self.workdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.workdir)
+        self.classifier = ModerationClassifier(
+            model_path=os.path.join(self.workdir, 'model.json'),
+            samples_path=os.path.join(self.workdir, 'samples.jsonl')
+        )
+        self.samples = build_training_samples(
+            log_file=os.path.join(self.workdir, 'missing.json'),
+            samples_path=self.classifier.samples_path
+        )
+        self.classifier.train(self.samples)
+
+    def test_untrained_model_escalates(self):
+        classifier = ModerationClassifier()
+        self.assertIsNone(classifier.classify("play some jazz"))
+
+    def test_clear_cases_decided_locally(self):
+        self.assertTrue(self.classifier.classify("play something by miles davis"))
+        self.assertFalse(self.classifier.classify("how do i bake bread"))
+
+    def test_reject_only_mode(self):
+        self.assertIsNone(self.classifier.classify("play some jazz", allow_accept=False))
+        self.assertFalse(self.classifier.classify("how do i bake bread", allow_accept=False))
+
+    def test_stats_report_saved_calls(self):
+        self.classifier.classify("play something by miles davis")
+        self.classifier.classify("hello")
+        stats = self.classifier.stats()
+        self.assertEqual(stats["llm_calls_saved"], 1)
+        self.assertEqual(stats["escalations"], 1)
+        self.assertAlmostEqual(stats["saved_ratio"], 0.5)
+
+    def test_classification_is_sub_millisecond(self):
+        start = time.perf_counter()
+        for text in SEED_MUSIC_REQUESTS + SEED_OFF_TOPIC_REQUESTS:
+            self.classifier.classify(text)
+        per_call = (time.perf_counter() - start) / len(SEED_MUSIC_REQUESTS + SEED_OFF_TOPIC_REQUESTS)
+        self.assertLess(per_call, 0.001)
+
+    def test_save_and_load_round_trip(self):
+        self.classifier.save()
+        loaded = ModerationClassifier(model_path=self.classifier.model_path)
+        self.assertTrue(loaded.load())
+        text = "create a playlist for a road trip"
+        self.assertAlmostEqual(loaded.predict_proba(text), self.classifier.predict_proba(text))
+
+    def test_recorded_verdicts_become_training_samples(self):
+        self.classifier.record_verdict("fix my bike", False)
+        samples = build_training_samples(
+            log_file=os.path.join(self.workdir, 'missing.json'),
+            samples_path=self.classifier.samples_path
+        )
+        self.assertIn(("fix my bike", False), samples)
+
+    def test_recorded_verdicts_rotate_at_size_cap(self):
+        self.classifier.max_samples_bytes = 200
+        for index in range(20):
+            self.classifier.record_verdict(f"fix my bike {index}", False)
+
+        self.assertLessEqual(os.path.getsize(self.classifier.samples_path), 200)
+        self.assertTrue(os.path.exists(self.classifier.samples_path + '.1'))
+        samples = load_recorded_samples(self.classifier.samples_path)
+        self.assertIn(("fix my bike 19", False), samples)
+        self.assertLess(len(samples), 20)
+
+    def test_library_requests(self):
+        examples = library_requests([{"title": "Get Lucky", "artist": "Daft Punk"}])
+        self.assertIn("Get Lucky by Daft Punk", examples)
+        self.assertIn("tell me about Daft Punk", examples)
+
+
+if __name__ == '__main__':
+    unittest.main()
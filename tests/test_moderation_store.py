@@ -0,0 +1,189 @@
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+
+from server.utils.moderation_store import MemoryModerationStore, SQLiteModerationStore
+
+
+class Clock:
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+class StoreBehaviour:
+    """Checks shared by every backend; subclasses define make_store."""
+
+    def test_new_user_is_created_once(self):
+        store = self.make_store()
+
+        _, created = store.touch('alice')
+        state, created_again = store.touch('alice')
+
+        self.assertTrue(created)
+        self.assertFalse(created_again)
+        self.assertEqual(state['status'], 'active')
+
+    def test_warnings_mute_then_suspend(self):
+        store = self.make_store()
+        store.update_rules({'warning_threshold': 2, 'mute_threshold': 2})
+
+        self.assertEqual(store.record_warning('bob')['warnings'], 1)
+        self.assertEqual(store.record_warning('bob')['status'], 'muted')
+        store.record_warning('bob')
+        state = store.record_warning('bob')
+
+        self.assertEqual(state['status'], 'suspended')
+        self.assertEqual(state['suspended_until'], self.clock.now + 3600)
+
+    def test_expired_mute_is_cleared_on_touch(self):
+        store = self.make_store()
+        store.touch('carol')
+        store.record_warning('carol')
+        store.record_warning('carol')
+
+        self.clock.now += 61
+        state, _ = store.touch('carol')
+
+        self.assertEqual(state['status'], 'active')
+        self.assertIsNone(state['muted_until'])
+
+    def test_idle_users_are_purged_unless_penalized(self):
+        store = self.make_store(idle_ttl=100)
+        store.touch('idle')
+        store.touch('muted')
+        store.update_rules({'mute_duration': 1000})
+        store.record_warning('muted')
+        store.record_warning('muted')
+
+        self.clock.now += 200
+        removed = store.purge_idle()
+
+        self.assertEqual(removed, 1)
+        self.assertIsNone(store.get_user('idle'))
+        self.assertIsNotNone(store.get_user('muted'))
+
+    def test_reset_user(self):
+        store = self.make_store()
+        store.touch('dave')
+        store.record_warning('dave')
+
+        store.reset_user('dave')
+
+        self.assertEqual(store.get_user('dave')['warnings'], 0)
+
+    def test_list_users_pages_then_returns_only_changes(self):
+        store = self.make_store()
+        for user_id in ('a', 'b', 'c'):
+            store.touch(user_id)
+            self.clock.now += 1
+
+        first, cursor, has_more = store.list_users(limit=2)
+        self.assertEqual([user['user_id'] for user in first], ['a', 'b'])
+        self.assertTrue(has_more)
+        rest, cursor, has_more = store.list_users(since=cursor, limit=2)
+        self.assertEqual([user['user_id'] for user in rest], ['c'])
+        self.assertFalse(has_more)
+
+        self.assertEqual(store.list_users(since=cursor)[0], [])
+        store.record_warning('a')
+        changed, _, _ = store.list_users(since=cursor)
+        self.assertEqual([(user['user_id'], user['warnings']) for user in changed], [('a', 1)])
+
+    def test_list_users_filters_by_activity(self):
+        store = self.make_store()
+        store.touch('old')
+        self.clock.now += 500
+        store.touch('recent')
+
+        users, _, _ = store.list_users(active_since=self.clock.now - 100)
+
+        self.assertEqual([user['user_id'] for user in users], ['recent'])
+
+    def test_unknown_rules_are_ignored(self):
+        store = self.make_store()
+
+        rules = store.update_rules({'mute_duration': '30', 'bogus': 1})
+
+        self.assertEqual(rules['mute_duration'], 30)
+        self.assertNotIn('bogus', rules)
+
+
+class TestMemoryModerationStore(StoreBehaviour, unittest.TestCase):
+    def make_store(self, idle_ttl=3600):
+        self.clock = Clock()
+        return MemoryModerationStore(idle_ttl=idle_ttl, clock=self.clock)
+
+
+class TestSQLiteModerationStore(StoreBehaviour, unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmpdir)
+        self.db_path = os.path.join(self.tmpdir, 'moderation_state.db')
+        self.clock = Clock()
+
+    def make_store(self, idle_ttl=3600, cache_ttl=0):
+        return SQLiteModerationStore(self.db_path, idle_ttl=idle_ttl, cache_ttl=cache_ttl, clock=self.clock)
+
+    def test_state_and_rules_are_shared_between_workers(self):
+        worker_a = self.make_store()
+        worker_b = self.make_store()
+
+        worker_a.update_rules({'warning_threshold': 1, 'mute_duration': 120})
+        worker_b.touch('erin')
+        worker_b.record_warning('erin')
+        state = worker_a.get_user('erin')
+
+        self.assertEqual(worker_b.rules()['mute_duration'], 120)
+        self.assertEqual(state['status'], 'muted')
+        self.assertEqual(state['muted_until'], self.clock.now + 120)
+
+    def test_concurrent_warnings_are_not_lost(self):
+        self.make_store().update_rules({'warning_threshold': 1000})
+        workers = [self.make_store() for _ in range(4)]
+
+        def reject(store):
+            for _ in range(10):
+                store.record_warning('frank')
+
+        threads = [threading.Thread(target=reject, args=(store,)) for store in workers]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(self.make_store().get_user('frank')['warnings'], 40)
+
+    def test_late_commit_is_not_skipped_by_cursor(self):
+        """A write whose clock reading is older than the cursor still shows up."""
+        store = self.make_store()
+        self.clock.now = 1005.0
+        store.touch('a')
+        _, cursor, _ = store.list_users()
+
+        # Another worker read the clock before 'a' was written but commits after
+        self.clock.now = 1001.0
+        store.record_warning('b')
+        store.reset_user('a')
+
+        changed, _, _ = store.list_users(since=cursor)
+        self.assertEqual([user['user_id'] for user in changed], ['b', 'a'])
+
+    def test_reads_are_cached(self):
+        store = self.make_store(cache_ttl=60)
+        store.touch('gina')
+        other = self.make_store()
+        other.record_warning('gina')
+
+        # The cached copy is used until it expires or this worker writes
+        self.assertEqual(store.get_user('gina')['warnings'], 0)
+        self.assertEqual(store.record_warning('gina')['warnings'], 0)  # second warning mutes
+        self.assertEqual(store.get_user('gina')['status'], 'muted')
+
+
+if __name__ == '__main__':
+    unittest.main()
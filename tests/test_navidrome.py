@@ -0,0 +1,200 @@
+import threading
+import time
+import unittest
+from unittest import mock
+
+from server.utils.navidrome import NavidromeClient
+
+
+class FakeSubsonic:
+    """Answers getAlbumList and getAlbum with a fixed delay per call."""
+
+    def __init__(self, delay=0.05, songs_per_album=4):
+        self.delay = delay
+        self.songs_per_album = songs_per_album
+        # Reported in getAlbumList; None when the server leaves it out
+        self.song_count = songs_per_album
+        self.album_calls = []
+        self.lock = threading.Lock()
+
+    def __call__(self, endpoint, params=None, method='GET'):
+        if endpoint == 'getAlbumList':
+            albums = [{'id': f"a{i}", 'songCount': self.song_count} for i in range(8)]
+            return {'albumList': {'album': albums[:params['size']]}}
+        with self.lock:
+            self.album_calls.append(params['id'])
+        time.sleep(self.delay)
+        album_id = params['id']
+        songs = [{'id': f"{album_id}-s{n}"} for n in range(self.songs_per_album)]
+        return {'album': {'id': album_id, 'song': songs}}
+
+
+class TestNavidromeFanOut(unittest.TestCase):
+    def setUp(self):
+        with mock.patch.object(NavidromeClient, '_authenticate'):
+            self.client = NavidromeClient('http://navidrome', 'user', 'pass', fan_out_workers=8)
+        self.subsonic = FakeSubsonic()
+        patcher = mock.patch.object(self.client, '_make_request', side_effect=self.subsonic)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_recent_plays_fetches_albums_concurrently(self):
+        started = time.monotonic()
+        songs = self.client.get_recent_plays(limit=20)
+        elapsed = time.monotonic() - started
+
+        self.assertEqual(len(songs), 20)
+        # In album order, as before
+        self.assertEqual(songs[0]['id'], 'a0-s0')
+        self.assertEqual(songs[4]['id'], 'a1-s0')
+        # Roughly one round trip rather than five
+        self.assertLess(elapsed, 0.2)
+
+    def test_only_requests_albums_needed_for_limit(self):
+        self.subsonic.songs_per_album = self.subsonic.song_count = 10
+        songs = self.client.get_recent_plays(limit=5)
+        self.assertEqual([song['id'] for song in songs], [f"a0-s{n}" for n in range(5)])
+        self.assertEqual(self.subsonic.album_calls, ['a0'])
+
+    def test_stops_early_without_song_counts(self):
+        self.subsonic.song_count = None
+        songs = self.client.get_recent_plays(limit=6)
+        self.assertEqual([song['id'] for song in songs][-2:], ['a1-s0', 'a1-s1'])
+
+    def test_pending_calls_are_cancelled(self):
+        with mock.patch.object(NavidromeClient, '_authenticate'):
+            client = NavidromeClient('http://navidrome', 'user', 'pass', fan_out_workers=1)
+        fetched = []
+
+        def fetch(item):
+            fetched.append(item)
+            time.sleep(0.02)
+            return item
+
+        for item in client.fan_out(fetch, range(10)):
+            if item == 1:
+                break
+        client.fan_out_executor.shutdown(wait=True)
+        self.assertLess(len(fetched), 10)
+
+    def test_albums_are_cached(self):
+        self.client.get_recent_plays(limit=8)
+        self.client.get_recent_plays(limit=8)
+        self.assertEqual(sorted(self.subsonic.album_calls), ['a0', 'a1'])
+        self.assertEqual(self.client.caches['getAlbum'].stats()['hits'], 2)
+
+    def test_album_errors_propagate(self):
+        def failing(endpoint, params=None, method='GET'):
+            if endpoint == 'getAlbum':
+                raise RuntimeError("boom")
+            return self.subsonic(endpoint, params, method)
+
+        self.client._make_request.side_effect = failing
+        with self.assertRaises(RuntimeError):
+            self.client.get_recent_plays(limit=4)
+
+
+
+class FakePlaylists:
+    """Answers playlist and song calls, recording each one."""
+
+    def __init__(self):
+        self.playlists = {'p1': {'id': 'p1', 'name': 'Chill', 'entry': []}}
+        self.calls = []
+        self.slow = threading.Event()
+        self.fail = False
+
+    def __call__(self, endpoint, params=None, method='GET'):
+        self.calls.append((endpoint, params))
+        if self.fail:
+            raise RuntimeError("navidrome down")
+        if endpoint == 'getPlaylists':
+            return {'playlists': {'playlist': [dict(playlist) for playlist in self.playlists.values()]}}
+        if endpoint == 'getPlaylist':
+            return {'playlist': dict(self.playlists[params['id']])}
+        if endpoint == 'createPlaylist':
+            playlist_id = f"p{len(self.playlists) + 1}"
+            self.playlists[playlist_id] = {'id': playlist_id, 'name': params['name'], 'entry': []}
+            return {'playlist': {'id': playlist_id}}
+        if endpoint == 'updatePlaylist':
+            playlist = self.playlists[params['playlistId']]
+            playlist['entry'] = playlist['entry'] + [{'id': song_id} for song_id in params.get('songIdToAdd', [])]
+            if 'comment' in params:
+                playlist['comment'] = params['comment']
+            return {}
+        if endpoint == 'getSong':
+            return {'song': {'id': params['id']}}
+        raise AssertionError(f"Unexpected endpoint {endpoint}")
+
+    def count(self, endpoint):
+        return sum(1 for called, _ in self.calls if called == endpoint)
+
+
+class TestNavidromeMetadataCache(unittest.TestCase):
+    def setUp(self):
+        with mock.patch.object(NavidromeClient, '_authenticate'):
+            self.client = NavidromeClient('http://navidrome', 'user', 'pass')
+        self.subsonic = FakePlaylists()
+        patcher = mock.patch.object(self.client, '_make_request', side_effect=self.subsonic)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_metadata_is_cached_per_endpoint(self):
+        for _ in range(3):
+            self.client.get_playlists()
+            self.client.get_playlist('p1')
+            self.client.get_song_info('s1')
+        self.assertEqual([self.subsonic.count(endpoint) for endpoint in ('getPlaylists', 'getPlaylist', 'getSong')],
+                         [1, 1, 1])
+        self.assertEqual(self.client.cache_stats()['getPlaylist']['hits'], 2)
+
+    def test_writes_invalidate_playlists(self):
+        self.assertEqual(len(self.client.get_playlists()), 1)
+        self.client.get_playlist('p1')
+
+        playlist_id = self.client.create_playlist('Focus', songs=['s1', 's2'])
+        self.assertEqual(len(self.client.get_playlists()), 2)
+        self.assertEqual(len(self.client.get_playlist(playlist_id)['entry']), 2)
+
+        self.client.update_playlist('p1', song_ids_to_add=['s3'])
+        self.assertEqual(self.client.get_playlist('p1')['entry'], [{'id': 's3'}])
+        self.client.get_playlists()
+        self.assertEqual(self.subsonic.count('getPlaylists'), 3)
+
+    def test_create_playlist_sets_comment(self):
+        playlist_id = self.client.create_playlist('Focus', comment="Deep work")
+
+        self.assertEqual(self.client.get_playlist(playlist_id)['comment'], "Deep work")
+        self.assertEqual(self.subsonic.count('updatePlaylist'), 1)
+
+    def test_failed_update_still_invalidates(self):
+        self.client.get_playlist('p1')
+        self.subsonic.fail = True
+        with self.assertRaises(RuntimeError):
+            self.client.update_playlist('p1', name='Renamed')
+        self.assertEqual(len(self.client.caches['getPlaylist']), 0)
+
+    def test_stale_playlists_do_not_wait_for_navidrome(self):
+        clock = [0.0]
+        cache = self.client.caches['getPlaylists']
+        cache.clock = lambda: clock[0]
+        self.client.get_playlists()
+
+        release = threading.Event()
+
+        def slow(endpoint, params=None, method='GET'):
+            release.wait(5)
+            return self.subsonic(endpoint, params, method)
+
+        self.client._make_request.side_effect = slow
+        clock[0] = cache.ttl + 1
+        started = time.monotonic()
+        self.assertEqual(len(self.client.get_playlists()), 1)
+        self.assertLess(time.monotonic() - started, 0.5)
+        release.set()
+        self.client.refresh_executor.shutdown(wait=True)
+        self.assertEqual(cache.stats()['refreshes'], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
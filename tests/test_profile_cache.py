@@ -0,0 +1,147 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from flask import Flask
+
+from server.routes import dj_interaction as dj
+from server.routes import settings
+from server.utils.profile_cache import ProfileCache, SQLiteVersionStamp, dj_profile_cache, profile_system_prompt
+from server.utils.prompt_registry import PromptTemplate
+
+
+class Loader:
+    def __init__(self, profiles):
+        self.profiles = profiles
+        self.calls = 0
+
+    def __call__(self, profile_id):
+        self.calls += 1
+        return self.profiles.get(profile_id)
+
+
+class TestProfileCache(unittest.TestCase):
+    def test_hit_skips_loader(self):
+        cache = ProfileCache()
+        load = Loader({1: {"id": 1, "personality": "Chill"}})
+
+        first = cache.get(1, load)
+        second = cache.get('1', load)
+
+        self.assertIs(first, second)
+        self.assertEqual(load.calls, 1)
+        self.assertEqual(cache.stats()["hits"], 1)
+
+    def test_missing_profile_is_cached(self):
+        cache = ProfileCache()
+        load = Loader({})
+
+        self.assertIsNone(cache.get(7, load))
+        self.assertIsNone(cache.get(7, load))
+        self.assertEqual(load.calls, 1)
+
+    def test_invalidate_reloads_and_notifies(self):
+        cache = ProfileCache()
+        load = Loader({1: {"id": 1, "personality": "Chill"}})
+        notified = []
+        cache.add_listener(notified.append)
+        cache.get(1, load)
+
+        load.profiles[1] = {"id": 1, "personality": "Loud"}
+        cache.invalidate(1)
+
+        self.assertEqual(cache.get(1, load)["personality"], "Loud")
+        self.assertEqual(notified, [1])
+
+    def test_profile_invalidated_while_loading_is_not_stored(self):
+        cache = ProfileCache()
+
+        def load(profile_id):
+            cache.invalidate(profile_id)
+            return {"id": profile_id, "personality": "Old"}
+
+        cache.get(1, load)
+
+        self.assertEqual(cache.stats()["size"], 0)
+
+    def test_composed_prompt_follows_template_reloads(self):
+        profile = ProfileCache().get(1, Loader({1: {"id": 1, "personality": "Chill"}}))
+        template = PromptTemplate('trivia', "Share a fact.", "")
+
+        self.assertEqual(profile_system_prompt(profile, template), "Chill\n\nShare a fact.")
+        self.assertIn('trivia', profile["system_prompts"])
+
+        reloaded = PromptTemplate('trivia', "Share a short fact.", "")
+        self.assertEqual(profile_system_prompt(profile, reloaded), "Chill\n\nShare a short fact.")
+
+
+class TestSharedInvalidation(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmpdir)
+        self.db_path = os.path.join(self.tmpdir, 'user_settings.db')
+
+    def make_worker(self):
+        return ProfileCache(stamp=SQLiteVersionStamp(self.db_path, 'dj_profiles'), check_interval=0)
+
+    def test_invalidation_reaches_other_workers(self):
+        load = Loader({1: {"id": 1, "personality": "Chill"}})
+        worker_a, worker_b = self.make_worker(), self.make_worker()
+        notified = []
+        worker_b.add_listener(notified.append)
+        worker_b.get(1, load)
+
+        del load.profiles[1]
+        worker_a.invalidate(1)
+
+        self.assertIsNone(worker_b.get(1, load))
+        self.assertEqual(notified, [None])
+        self.assertEqual(worker_b.stats()["remote_invalidations"], 1)
+
+    def test_reading_does_not_create_the_database(self):
+        worker = self.make_worker()
+        worker.get(1, Loader({}))
+
+        self.assertFalse(os.path.exists(self.db_path))
+
+
+class TestSettingsInvalidation(unittest.TestCase):
+    def setUp(self):
+        self.workdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.workdir)
+        self.addCleanup(os.chdir, os.getcwd())
+        os.chdir(self.workdir)
+        settings.init_db()
+        dj_profile_cache.invalidate()
+        self.addCleanup(dj_profile_cache.invalidate)
+
+        app = Flask(__name__)
+        app.register_blueprint(settings.settings, url_prefix='/api')
+        self.client = app.test_client()
+
+    def save_profile(self, personality):
+        response = self.client.post('/api/dj_profiles', json={
+            'user_id': 'tester', 'name': 'Night Owl', 'voice_id': 'v1', 'personality': personality
+        })
+        return response.get_json()["profile_id"]
+
+    def test_updated_profile_is_reloaded(self):
+        profile_id = self.save_profile("Mellow")
+        self.assertEqual(dj.get_dj_profile(profile_id)["personality"], "Mellow")
+
+        self.save_profile("Energetic")
+
+        self.assertEqual(dj.get_dj_profile(profile_id)["personality"], "Energetic")
+
+    def test_deleted_profile_is_dropped(self):
+        profile_id = self.save_profile("Mellow")
+        dj.get_dj_profile(profile_id)
+
+        self.client.delete(f'/api/dj_profiles/{profile_id}?user_id=tester')
+
+        self.assertIsNone(dj.get_dj_profile(profile_id))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,107 @@
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+from server.integrations.llm_client import LLMClient
+from server.routes import dj_interaction as dj
+from server.utils.prompt_registry import (
+    PromptError, PromptRegistry, PromptTemplate, get_registry, parse_placeholders
+)
+
+
+class TestPromptTemplate(unittest.TestCase):
+    def test_placeholders_are_parsed(self):
+        self.assertEqual(parse_placeholders("Tell me about {title} by {artist}. {{literal}}"),
+                         frozenset({"title", "artist"}))
+
+    def test_invalid_placeholders_rejected(self):
+        for text in ("{0}", "{}", "{song.title}", "{unclosed"):
+            with self.assertRaises(PromptError):
+                parse_placeholders(text)
+
+    def test_missing_values_raise(self):
+        template = PromptTemplate('song_info', "system", "About {title} by {artist}")
+        with self.assertRaises(PromptError) as ctx:
+            template.format_user(title="Yesterday")
+        self.assertIn("artist", str(ctx.exception))
+
+    def test_extra_values_are_ignored(self):
+        template = PromptTemplate('song_info', "system", "About {title}")
+        self.assertEqual(template.format_user(title="Yesterday", year=1965), "About Yesterday")
+
+
+class TestPromptRegistry(unittest.TestCase):
+    def setUp(self):
+        self.prompts_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.prompts_dir)
+        self.write('trivia', "Be fun.", "Tell me trivia.")
+
+    def write(self, name, system, user):
+        path = os.path.join(self.prompts_dir, f"{name}.json")
+        with open(path, 'w') as f:
+            json.dump({"system": system, "user": user}, f)
+        # Make sure the change is visible even on coarse mtime filesystems
+        stat = os.stat(path)
+        os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+    def test_loads_templates(self):
+        registry = PromptRegistry(self.prompts_dir)
+        self.assertEqual(registry.names(), ['trivia'])
+        self.assertEqual(registry.get('trivia').system, "Be fun.")
+        self.assertIsNone(registry.get('missing'))
+
+    def test_changed_files_are_reloaded(self):
+        registry = PromptRegistry(self.prompts_dir, check_interval=0)
+        self.write('trivia', "Be serious.", "Tell me trivia.")
+        self.write('song_info', "Expert.", "About {title}")
+
+        self.assertEqual(registry.get('trivia').system, "Be serious.")
+        self.assertEqual(registry.get('song_info').placeholders, frozenset({"title"}))
+        self.assertEqual(registry.reloads, 1)
+
+    def test_checks_are_rate_limited(self):
+        registry = PromptRegistry(self.prompts_dir, check_interval=60)
+        self.write('trivia', "Be serious.", "Tell me trivia.")
+        self.assertEqual(registry.get('trivia').system, "Be fun.")
+
+    def test_invalid_file_keeps_previous_version(self):
+        registry = PromptRegistry(self.prompts_dir, check_interval=0)
+        self.write('trivia', "Be serious.", "Broken {")
+
+        self.assertEqual(registry.get('trivia').system, "Be fun.")
+
+    def test_version_changes_on_reload_and_removal(self):
+        registry = PromptRegistry(self.prompts_dir, check_interval=0)
+        initial = registry.version('trivia', 'song_info')
+
+        self.write('trivia', "Be serious.", "Broken {")
+        self.assertEqual(registry.version('trivia', 'song_info'), initial)
+
+        self.write('song_info', "Expert.", "About {title}")
+        added = registry.version('trivia', 'song_info')
+        self.assertNotEqual(added, initial)
+
+        os.remove(os.path.join(self.prompts_dir, 'song_info.json'))
+        self.assertNotEqual(registry.version('trivia', 'song_info'), added)
+
+    def test_deleted_files_are_dropped(self):
+        registry = PromptRegistry(self.prompts_dir, check_interval=0)
+        os.remove(os.path.join(self.prompts_dir, 'trivia.json'))
+        self.assertIsNone(registry.get('trivia'))
+
+
+class TestSharedRegistry(unittest.TestCase):
+    def test_llm_client_and_routes_share_registry(self):
+        client = LLMClient(provider='ollama', model='llama3')
+        self.assertIs(client.prompts, dj.prompts)
+        self.assertIs(get_registry(), dj.prompts)
+
+    def test_repository_prompts_are_valid(self):
+        for name in ('trivia', 'song_info', 'dj_chat', 'moderation', 'router', 'dj_intro'):
+            self.assertIsNotNone(dj.prompts.get(name), name)
+
+
+if __name__ == '__main__':
+    unittest.main()
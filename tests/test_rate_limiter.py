@@ -0,0 +1,122 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from server.utils.rate_limiter import PURGE_INTERVAL, RateLimiter, SQLiteRateLimiter, estimate_request_tokens
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestRateLimiter(unittest.TestCase):
+    def setUp(self):
+        self.clock = Clock()
+
+    def test_user_bucket_refills_over_time(self):
+        limiter = RateLimiter(user_per_minute=60, user_burst=10, global_per_minute=0, clock=self.clock)
+
+        self.assertTrue(limiter.acquire('a', 10)[0])
+        allowed, retry_after, scope = limiter.acquire('a', 5)
+        self.assertFalse(allowed)
+        self.assertEqual((retry_after, scope), (5.0, 'user'))
+
+        self.clock.now += 5
+        self.assertTrue(limiter.acquire('a', 5)[0])
+
+    def test_global_limit_is_shared(self):
+        limiter = RateLimiter(user_per_minute=600, user_burst=100, global_per_minute=60,
+                              global_burst=150, clock=self.clock)
+
+        self.assertTrue(limiter.acquire('a', 100)[0])
+        allowed, _, scope = limiter.acquire('b', 100)
+
+        self.assertFalse(allowed)
+        self.assertEqual(scope, 'global')
+        self.assertEqual(limiter.stats()["limited_global"], 1)
+
+    def test_refused_user_does_not_spend_global_tokens(self):
+        limiter = RateLimiter(user_per_minute=60, user_burst=10, global_per_minute=60,
+                              global_burst=20, clock=self.clock)
+        limiter.acquire('greedy', 10)
+        for _ in range(5):
+            limiter.acquire('greedy', 10)
+
+        self.assertTrue(limiter.acquire('polite', 10)[0])
+
+    def test_oversized_request_is_charged_full_capacity(self):
+        limiter = RateLimiter(user_per_minute=60, user_burst=10, global_per_minute=0, clock=self.clock)
+
+        self.assertTrue(limiter.acquire('a', 50)[0])
+        self.assertFalse(limiter.acquire('a', 1)[0])
+
+    def test_least_recent_users_are_forgotten(self):
+        limiter = RateLimiter(global_per_minute=0, max_users=2, clock=self.clock)
+        for user_id in ('a', 'b', 'c'):
+            limiter.acquire(user_id, 1)
+
+        self.assertEqual(limiter.stats()["tracked_users"], 2)
+
+    def test_estimate_grows_with_text(self):
+        self.assertGreater(estimate_request_tokens("x" * 400), estimate_request_tokens("hi"))
+
+
+class TestSQLiteRateLimiter(unittest.TestCase):
+    def setUp(self):
+        self.clock = Clock()
+        self.tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmpdir)
+        self.db_path = os.path.join(self.tmpdir, 'rate_limits.db')
+
+    def limiter(self, **limits):
+        return SQLiteRateLimiter(self.db_path, clock=self.clock, **limits)
+
+    def test_workers_share_user_buckets(self):
+        first = self.limiter(user_per_minute=60, user_burst=10, global_per_minute=0)
+        second = self.limiter(user_per_minute=60, user_burst=10, global_per_minute=0)
+
+        self.assertTrue(first.acquire('a', 10)[0])
+        allowed, retry_after, scope = second.acquire('a', 5)
+        self.assertFalse(allowed)
+        self.assertEqual((retry_after, scope), (5.0, 'user'))
+
+        self.clock.now += 5
+        self.assertTrue(second.acquire('a', 5)[0])
+
+    def test_workers_share_global_bucket(self):
+        first = self.limiter(user_per_minute=600, user_burst=100, global_per_minute=60, global_burst=150)
+        second = self.limiter(user_per_minute=600, user_burst=100, global_per_minute=60, global_burst=150)
+
+        self.assertTrue(first.acquire('a', 100)[0])
+        allowed, _, scope = second.acquire('b', 100)
+
+        self.assertFalse(allowed)
+        self.assertEqual(scope, 'global')
+        self.assertEqual(first.stats()["global_tokens_available"], 50)
+
+    def test_refused_user_does_not_spend_global_tokens(self):
+        limiter = self.limiter(user_per_minute=60, user_burst=10, global_per_minute=60, global_burst=20)
+        for _ in range(6):
+            limiter.acquire('greedy', 10)
+
+        self.assertTrue(limiter.acquire('polite', 10)[0])
+
+    def test_refilled_buckets_are_purged(self):
+        limiter = self.limiter(user_per_minute=60, user_burst=10, global_per_minute=0)
+        limiter.acquire('a', 10)
+        self.assertEqual(limiter.stats()["tracked_users"], 1)
+
+        self.clock.now += PURGE_INTERVAL
+        limiter.acquire('b', 1)
+
+        self.assertEqual(limiter.stats()["tracked_users"], 1)
+        self.assertTrue(limiter.acquire('a', 10)[0])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,101 @@
+import os
+import threading
+import time
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+
+from server.integrations.elevenlabs_client import ElevenLabsClient
+from server.integrations.llm_client import LLMClient
+from server.utils.single_flight import SingleFlight
+
+
+class TestSingleFlight(unittest.TestCase):
+    def test_concurrent_callers_share_one_call(self):
+        flight = SingleFlight()
+        calls = []
+        release = threading.Event()
+
+        def slow():
+            calls.append(1)
+            release.wait(1)
+            return "result"
+
+        with ThreadPoolExecutor(max_workers=5) as pool:
+            futures = [pool.submit(flight.do, 'key', slow) for _ in range(5)]
+            while flight.stats()["coalesced"] < 4:
+                time.sleep(0.01)
+            release.set()
+            results = [future.result() for future in futures]
+
+        self.assertEqual(results, ["result"] * 5)
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(flight.stats()["executions"], 1)
+        self.assertEqual(flight.stats()["in_flight"], 0)
+
+    def test_exceptions_are_shared(self):
+        flight = SingleFlight()
+        started = threading.Event()
+        release = threading.Event()
+
+        def failing():
+            started.set()
+            release.wait(1)
+            raise RuntimeError("boom")
+
+        with ThreadPoolExecutor(max_workers=2) as pool:
+            first = pool.submit(flight.do, 'key', failing)
+            started.wait(1)
+            second = pool.submit(flight.do, 'key', failing)
+            while flight.stats()["coalesced"] < 1:
+                time.sleep(0.01)
+            release.set()
+            for future in (first, second):
+                with self.assertRaises(RuntimeError):
+                    future.result()
+
+    def test_sequential_calls_are_not_coalesced(self):
+        flight = SingleFlight()
+        self.assertEqual(flight.do('key', lambda: 1), 1)
+        self.assertEqual(flight.do('key', lambda: 2), 2)
+        self.assertEqual(flight.stats()["coalesced"], 0)
+
+
+def call_concurrently(fn, count=8):
+    with ThreadPoolExecutor(max_workers=count) as pool:
+        return [future.result() for future in [pool.submit(fn) for _ in range(count)]]
+
+
+class TestClientCoalescing(unittest.TestCase):
+    def test_identical_intros_share_one_completion(self):
+        client = LLMClient(provider='ollama', model='llama3')
+
+        def slow_completion(*args, **kwargs):
+            time.sleep(0.1)
+            return "Up next!"
+
+        with mock.patch.object(client, 'chat_completion', side_effect=slow_completion) as completion:
+            intros = call_concurrently(lambda: client.generate_dj_intro({'artist': 'A', 'title': 'B'}))
+
+        self.assertEqual(intros, ["Up next!"] * 8)
+        self.assertEqual(completion.call_count, 1)
+        self.assertEqual(client.single_flight.stats()["coalesced"], 7)
+
+    @mock.patch('server.utils.http_transport.HTTPTransport.post')
+    def test_identical_speech_shares_one_api_call(self, post):
+        def slow_post(*args, **kwargs):
+            time.sleep(0.1)
+            return mock.Mock(content=b"mp3")
+
+        post.side_effect = slow_post
+        with mock.patch.dict(os.environ, {'ELEVENLABS_API_KEY': 'key'}):
+            client = ElevenLabsClient()
+
+        audio = call_concurrently(lambda: client.text_to_speech("Up next!", "voice"))
+
+        self.assertEqual(audio, [b"mp3"] * 8)
+        self.assertEqual(post.call_count, 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
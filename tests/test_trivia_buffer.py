@@ -0,0 +1,87 @@
+import threading
+import unittest
+
+from server.utils.trivia_buffer import TriviaBuffer
+
+
+class Producer:
+    def __init__(self, fail=False):
+        self.fail = fail
+        self.calls = []
+
+    def __call__(self, key):
+        self.calls.append(key)
+        if self.fail:
+            raise RuntimeError("LLM down")
+        return f"{key}-{len(self.calls)}"
+
+
+class TestTriviaBuffer(unittest.TestCase):
+    def test_pop_from_empty_buffer_tracks_key(self):
+        produce = Producer()
+        buffer = TriviaBuffer(produce, capacity=2)
+
+        self.assertIsNone(buffer.pop('a'))
+        buffer.fill_once()
+        buffer.fill_once()
+        buffer.fill_once()
+
+        self.assertEqual(len(produce.calls), 2)
+        self.assertEqual(buffer.pop('a'), 'a-1')
+        self.assertEqual(buffer.pop('a'), 'a-2')
+        stats = buffer.stats()
+        self.assertEqual((stats["hits"], stats["misses"], stats["produced"]), (2, 1, 2))
+
+    def test_active_keys_are_filled_without_requests(self):
+        buffer = TriviaBuffer(Producer(), capacity=1, active_keys=lambda: ['p1', 'p2'])
+
+        self.assertEqual(buffer.fill_once(), 2)
+        self.assertEqual(buffer.pop('p2'), 'p2-2')
+
+    def test_peeked_item_stays_until_claimed(self):
+        buffer = TriviaBuffer(Producer(), capacity=2, active_keys=lambda: ['a'])
+        buffer.fill_once()
+
+        item = buffer.peek('a')
+        self.assertEqual(buffer.peek('a'), item)
+        self.assertTrue(buffer.claim('a', item))
+        self.assertFalse(buffer.claim('a', item))
+        self.assertIsNone(buffer.peek('a'))
+        stats = buffer.stats()
+        self.assertEqual((stats["hits"], stats["misses"]), (2, 1))
+
+    def test_least_recently_requested_key_is_dropped(self):
+        buffer = TriviaBuffer(Producer(), capacity=1, max_keys=2)
+        for key in ('a', 'b', 'c'):
+            buffer.pop(key)
+
+        self.assertEqual(buffer.tracked_keys(), ['b', 'c'])
+
+    def test_failures_are_counted(self):
+        buffer = TriviaBuffer(Producer(fail=True), capacity=1, active_keys=lambda: ['a'])
+
+        self.assertEqual(buffer.fill_once(), 0)
+        self.assertEqual(buffer.stats()["failures"], 1)
+
+    def test_background_producer_refills(self):
+        filled = threading.Event()
+
+        def produce(key):
+            filled.set()
+            return "fact"
+
+        buffer = TriviaBuffer(produce, capacity=1, active_keys=lambda: ['a'], idle_interval=0.05)
+        buffer.start()
+        self.addCleanup(buffer.stop)
+
+        self.assertTrue(filled.wait(1))
+        for _ in range(100):
+            item = buffer.pop('a')
+            if item:
+                break
+            filled.wait(0.01)
+        self.assertEqual(item, "fact")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,115 @@
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+from server.integrations.elevenlabs_client import ElevenLabsClient
+from server.utils.tts_cache import DEFAULT_CACHE_DIR, TTSCache, audio_url, make_key
+
+
+class TestMakeKey(unittest.TestCase):
+    def test_every_input_changes_the_key(self):
+        base = make_key("Hello", "voice", "model", {"stability": 0.5}, 1.0)
+        self.assertEqual(base, make_key("Hello", "voice", "model", {"stability": 0.5}, 1.0))
+        self.assertNotEqual(base, make_key("Hello!", "voice", "model", {"stability": 0.5}, 1.0))
+        self.assertNotEqual(base, make_key("Hello", "other", "model", {"stability": 0.5}, 1.0))
+        self.assertNotEqual(base, make_key("Hello", "voice", "model2", {"stability": 0.5}, 1.0))
+        self.assertNotEqual(base, make_key("Hello", "voice", "model", {"stability": 0.6}, 1.0))
+        self.assertNotEqual(base, make_key("Hello", "voice", "model", {"stability": 0.5}, 1.2))
+
+
+
+class TestAudioURL(unittest.TestCase):
+    def test_cached_files_are_served_from_their_subdirectory(self):
+        self.assertEqual(audio_url(os.path.join(DEFAULT_CACHE_DIR, 'tts_abc.mp3')),
+                         "/static/audio/tts_cache/tts_abc.mp3")
+        self.assertEqual(audio_url(os.path.join('voicebot', 'outputs', 'dj_response_1.mp3')),
+                         "/static/audio/dj_response_1.mp3")
+
+
+class TestTTSCache(unittest.TestCase):
+    def setUp(self):
+        self.cache_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.cache_dir)
+
+    def test_put_and_get(self):
+        cache = TTSCache(self.cache_dir)
+        self.assertIsNone(cache.get("abc"))
+
+        path = cache.put("abc", b"audio")
+
+        self.assertEqual(cache.get("abc", characters=5), path)
+        self.assertEqual(cache.read("abc"), b"audio")
+        stats = cache.stats()
+        self.assertEqual(stats["hits"], 2)
+        self.assertEqual(stats["misses"], 1)
+        self.assertEqual(stats["characters_saved"], 5)
+        self.assertEqual(stats["bytes"], 5)
+
+    def test_evicts_least_recently_used(self):
+        cache = TTSCache(self.cache_dir, max_bytes=10)
+        first = cache.put("a", b"1111")
+        cache.put("b", b"2222")
+        cache.get("a")
+        cache.put("c", b"3333")
+
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(cache.get("a"), first)
+        self.assertEqual(cache.stats()["evictions"], 1)
+        self.assertEqual(sorted(os.listdir(self.cache_dir)), ["tts_a.mp3", "tts_c.mp3"])
+
+    def test_index_rebuilt_from_disk(self):
+        TTSCache(self.cache_dir).put("abc", b"audio")
+
+        cache = TTSCache(self.cache_dir)
+
+        self.assertEqual(cache.read("abc"), b"audio")
+        self.assertEqual(cache.stats()["entries"], 1)
+
+    def test_missing_file_is_a_miss(self):
+        cache = TTSCache(self.cache_dir)
+        os.remove(cache.put("abc", b"audio"))
+
+        self.assertIsNone(cache.get("abc"))
+        self.assertEqual(cache.stats()["entries"], 0)
+
+
+class TestElevenLabsClientCache(unittest.TestCase):
+    def setUp(self):
+        self.cache_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.cache_dir)
+        with mock.patch.dict(os.environ, {'ELEVENLABS_API_KEY': 'key'}):
+            self.client = ElevenLabsClient(tts_cache=TTSCache(self.cache_dir))
+
+    @mock.patch('server.utils.http_transport.HTTPTransport.post')
+    def test_repeat_text_skips_api(self, post):
+        post.return_value.content = b"mp3"
+
+        first = self.client.speech_file("Welcome back!", "voice")
+        second = self.client.speech_file("Welcome back!", "voice")
+        audio = self.client.text_to_speech("Welcome back!", "voice")
+
+        self.assertEqual(first, second)
+        self.assertEqual(audio, b"mp3")
+        self.assertEqual(post.call_count, 1)
+
+    @mock.patch('server.utils.http_transport.HTTPTransport.post')
+    def test_speed_is_part_of_key(self, post):
+        post.return_value.content = b"mp3"
+
+        self.client.text_to_speech("Welcome back!", "voice", speed=1.0)
+        self.client.text_to_speech("Welcome back!", "voice", speed=1.2)
+
+        self.assertEqual(post.call_count, 2)
+
+    @mock.patch('server.utils.http_transport.HTTPTransport.post')
+    def test_failures_are_not_cached(self, post):
+        post.return_value.content = b""
+
+        self.assertIsNone(self.client.speech_file("Welcome back!"))
+        self.assertEqual(self.client.tts_cache.stats()["entries"], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
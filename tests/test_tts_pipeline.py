@@ -0,0 +1,137 @@
+import os
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+
+from server.utils.tts_pipeline import SentencePipeline, prune_files, split_sentences
+
+
+class TestSplitSentences(unittest.TestCase):
+    def test_splits_complete_sentences(self):
+        sentences, remainder = split_sentences("First sentence is here. Second one too! And a tail", min_chars=5)
+        self.assertEqual(sentences, ["First sentence is here.", "Second one too!"])
+        self.assertEqual(remainder, "And a tail")
+
+    def test_short_sentences_are_merged(self):
+        sentences, remainder = split_sentences("Hi! Welcome to the late show. ", min_chars=20)
+        self.assertEqual(sentences, ["Hi! Welcome to the late show."])
+        self.assertEqual(remainder, "")
+
+    def test_waits_for_whitespace_after_punctuation(self):
+        sentences, remainder = split_sentences("Released in 1969.", min_chars=5)
+        self.assertEqual(sentences, [])
+        self.assertEqual(remainder, "Released in 1969.")
+
+
+class TestPruneFiles(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+
+    def touch(self, name, mtime):
+        path = os.path.join(self.directory, name)
+        with open(path, 'wb') as f:
+            f.write(b"audio")
+        os.utime(path, (mtime, mtime))
+
+    def test_keeps_newest_matching_files(self):
+        for n in range(4):
+            self.touch(f"dj_response_{n}.mp3", 1000 + n)
+        self.touch("tts_cached.mp3", 0)
+
+        self.assertEqual(prune_files(self.directory, 'dj_response_', keep=2), 2)
+
+        self.assertEqual(sorted(os.listdir(self.directory)),
+                         ["dj_response_2.mp3", "dj_response_3.mp3", "tts_cached.mp3"])
+
+
+class TestSentencePipeline(unittest.TestCase):
+    def setUp(self):
+        self.output_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.output_dir)
+        self.chunk_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.chunk_dir)
+        self.executor = ThreadPoolExecutor(max_workers=4)
+        self.addCleanup(self.executor.shutdown)
+
+    def make_pipeline(self, synthesize, **kwargs):
+        return SentencePipeline(synthesize, self.executor, self.output_dir, 'dj_test',
+                                min_chars=5, **kwargs)
+
+    def save(self, audio_data):
+        """Stand in for the TTS cache: store audio and return its path."""
+        fd, path = tempfile.mkstemp(suffix='.mp3', dir=self.chunk_dir)
+        with os.fdopen(fd, 'wb') as f:
+            f.write(audio_data)
+        return path
+
+    def test_chunks_reported_in_order(self):
+        """Later sentences that finish first wait for earlier ones."""
+        reported = []
+        done = threading.Event()
+
+        def synthesize(text):
+            if text.startswith("One"):
+                time.sleep(0.1)
+            return self.save(text.encode())
+
+        pipeline = self.make_pipeline(synthesize,
+                                      on_chunk=lambda index, path: reported.append(index),
+                                      on_complete=done.set)
+        for delta in ["One is slow. ", "Two is fast. ", "Three"]:
+            pipeline.feed(delta)
+        self.assertTrue(pipeline.close("One is slow. Two is fast. Three"))
+
+        self.assertTrue(done.wait(1))
+        self.assertEqual(reported, [0, 1, 2])
+        with open(pipeline.concatenate(), 'rb') as f:
+            self.assertEqual(f.read(), b"One is slow.Two is fast.Three")
+        # Chunks stay where synthesize put them; only the combined file is written
+        self.assertEqual(os.listdir(self.output_dir), ["dj_test.mp3"])
+
+    def test_synthesis_starts_before_close(self):
+        started = threading.Event()
+
+        def synthesize(text):
+            started.set()
+            return self.save(b"audio")
+
+        pipeline = self.make_pipeline(synthesize)
+        pipeline.feed("The first sentence is done. The second")
+        self.assertTrue(started.wait(1))
+        pipeline.close()
+        self.assertEqual(len(pipeline.wait()), 2)
+
+    def test_unstreamed_text_is_added_on_close(self):
+        calls = []
+        pipeline = self.make_pipeline(lambda text: calls.append(text) or self.save(b"audio"))
+
+        self.assertTrue(pipeline.close("Now playing Yesterday by The Beatles."))
+        pipeline.wait()
+
+        self.assertEqual(calls, ["Now playing Yesterday by The Beatles."])
+
+    def test_mismatched_final_text_abandons(self):
+        pipeline = self.make_pipeline(lambda text: self.save(b"audio"))
+        pipeline.feed("Here is something")
+
+        self.assertFalse(pipeline.close("Sorry, I had trouble with that."))
+        self.assertTrue(pipeline.abandoned)
+
+    def test_failed_chunks_are_skipped(self):
+        pipeline = self.make_pipeline(lambda text: None if "bad" in text else self.save(text.encode()))
+        pipeline.feed("This one is bad. ")
+        pipeline.close("This one is bad. This one is fine.")
+
+        paths = pipeline.wait()
+
+        self.assertEqual(len(paths), 1)
+        with open(paths[0], 'rb') as f:
+            self.assertEqual(f.read(), b"This one is fine.")
+
+
+if __name__ == '__main__':
+    unittest.main()
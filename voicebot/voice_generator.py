@@ -1,11 +1,13 @@
 import os
 import json
+import shutil
 import logging
 import time
 from datetime import datetime
 from dotenv import load_dotenv
 from elevenlabs import generate, set_api_key, voices
 from elevenlabs.api import Voice, VoiceSettings
+from server.utils.tts_cache import TTSCache, make_key
 
 # Configure logging
 logging.basicConfig(
@@ -18,11 +20,18 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+MODEL_ID = "eleven_monolingual_v1"
+
 class VoiceGenerator:
     """Class to generate voice announcements for the AI DJ."""
     
-    def __init__(self):
-        """Initialize the voice generator."""
+    def __init__(self, tts_cache=None):
+        """Initialize the voice generator.
+        
+        Args:
+            tts_cache (TTSCache, optional): Cache of synthesized audio.
+                Defaults to the shared cache in voicebot/outputs/tts_cache.
+        """
         # Load environment variables
         load_dotenv()
         
@@ -39,16 +48,22 @@ class VoiceGenerator:
         self.default_voice_id = os.getenv('ELEVENLABS_VOICE_ID', 'EXAVITQu4vr4xnSDxMaL')
         
         # Voice settings optimized for a DJ-like voice
-        self.voice_settings = VoiceSettings(
-            stability=0.71,  # Higher stability for consistent DJ voice
-            similarity_boost=0.5,  # Balanced similarity
-            style=0.0,  # Neutral style
-            use_speaker_boost=True  # Enhanced clarity
-        )
+        self.voice_settings_values = {
+            'stability': 0.71,  # Higher stability for consistent DJ voice
+            'similarity_boost': 0.5,  # Balanced similarity
+            'style': 0.0,  # Neutral style
+            'use_speaker_boost': True  # Enhanced clarity
+        }
+        self.voice_settings = VoiceSettings(**self.voice_settings_values)
         
         # Create output directory
         os.makedirs(os.path.join('voicebot', 'outputs'), exist_ok=True)
         
+        # Repeated announcements are copied from the cache instead of re-synthesized
+        self.tts_cache = tts_cache or TTSCache(
+            max_bytes=int(os.getenv('TTS_CACHE_MAX_MB', '500')) * 1024 * 1024
+        )
+        
         # Load available voices
         self.available_voices = self._get_available_voices()
     
@@ -87,19 +102,22 @@ class VoiceGenerator:
             output_path = os.path.join('voicebot', 'outputs', f"speech_{timestamp}.mp3")
         
         try:
-            # Generate audio using the elevenlabs library
-            audio_data = generate(
-                text=text,
-                voice=Voice(
-                    voice_id=voice_id,
-                    settings=self.voice_settings
-                ),
-                model="eleven_monolingual_v1"
-            )
+            key = make_key(text, voice_id, MODEL_ID, self.voice_settings_values)
+            cached_path = self.tts_cache.get(key, characters=len(text))
+            if cached_path is None:
+                # Generate audio using the elevenlabs library
+                audio_data = generate(
+                    text=text,
+                    voice=Voice(
+                        voice_id=voice_id,
+                        settings=self.voice_settings
+                    ),
+                    model=MODEL_ID
+                )
+                cached_path = self.tts_cache.put(key, audio_data)
             
             # Save audio to file
-            with open(output_path, 'wb') as f:
-                f.write(audio_data)
+            shutil.copyfile(cached_path, output_path)
             
             logger.info(f"Generated speech saved to {output_path}")
             